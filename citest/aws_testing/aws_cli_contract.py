@@ -15,49 +15,155 @@
 
 """Support for specifying citest.json_contract.Contract on AWS resources."""
 
+
 import json
 
 from .. import json_contract as jc
 from ..json_predicate import JsonError
 from ..service_testing import cli_agent
 
+
+# The ec2 describe commands whose --filters we know how to use.
+# Keyed by command, the values are the path to the described resources in
+# the command output and the filter names for paths within those resources.
+# EC2 rejects unknown filter names so this is deliberately a whitelist.
+_EC2_DESCRIBE_FILTERS = {
+    'describe-instances': ('Reservations/Instances', {
+        'ImageId': 'image-id',
+        'InstanceId': 'instance-id',
+        'InstanceType': 'instance-type',
+        'KeyName': 'key-name',
+        'PrivateIpAddress': 'private-ip-address',
+        'PublicIpAddress': 'ip-address',
+        'State/Name': 'instance-state-name',
+        'SubnetId': 'subnet-id',
+        'VpcId': 'vpc-id'}),
+    'describe-images': ('Images', {
+        'ImageId': 'image-id',
+        'Name': 'name',
+        'State': 'state'}),
+    'describe-security-groups': ('SecurityGroups', {
+        'Description': 'description',
+        'GroupId': 'group-id',
+        'GroupName': 'group-name',
+        'VpcId': 'vpc-id'}),
+    'describe-subnets': ('Subnets', {
+        'AvailabilityZone': 'availability-zone',
+        'CidrBlock': 'cidr-block',
+        'State': 'state',
+        'SubnetId': 'subnet-id',
+        'VpcId': 'vpc-id'}),
+    'describe-volumes': ('Volumes', {
+        'AvailabilityZone': 'availability-zone',
+        'State': 'status',
+        'VolumeId': 'volume-id',
+        'VolumeType': 'volume-type'}),
+    'describe-vpcs': ('Vpcs', {
+        'CidrBlock': 'cidr',
+        'State': 'state',
+        'VpcId': 'vpc-id'})
+}
+
+
+def _escape_ec2_filter_value(value):
+  """Escape the EC2 filter wildcards in a literal value."""
+  for special in ['\\', '*', '?']:
+    value = value.replace(special, '\\' + special)
+  return value
+
+
+def _find_ec2_describe_command(args):
+  """Returns the ec2 describe command in the aws arguments, or None."""
+  for index, arg in enumerate(args[:-1]):
+    if arg == 'ec2' and args[index + 1] in _EC2_DESCRIBE_FILTERS:
+      return args[index + 1]
+  return None
+
+
+def _add_ec2_filter_args(args, command, conditions):
+  """Add --filters expressing the FilterConditions to aws ec2 arguments.
+
+  Args:
+    args: [list of string] The aws command line arguments.
+    command: [string] The ec2 describe command in args.
+    conditions: [list of FilterCondition] The conditions on the resources.
+
+  Returns:
+    The new list of command line arguments.
+  """
+  if [arg for arg in args if arg.split('=')[0] == '--filters']:
+    return args
+
+  filter_names = _EC2_DESCRIBE_FILTERS[command][1]
+  filters = []
+  for condition in conditions or []:
+    name = filter_names.get(condition.path)
+    if name is None or not isinstance(condition.value, basestring):
+      continue
+    value = _escape_ec2_filter_value(condition.value)
+    if condition.op == jc.FILTER_CONTAINS:
+      value = '*{0}*'.format(value)
+    filters.append({'Name': name, 'Values': [value]})
+  if not filters:
+    return args
+  return list(args) + ['--filters', json.JSONEncoder().encode(filters)]
+
+
 class AwsObjectObserver(jc.ObjectObserver):
   """Observe AWS resources."""
 
-  def __init__(self, agent, args, filter=None):
+  @property
+  def pushdown_element_path(self):
+    """Implements ObjectObserver interface."""
+    command = (_find_ec2_describe_command(self.__args)
+               if isinstance(self.__args, list) else None)
+    return _EC2_DESCRIBE_FILTERS[command][0] if command else ''
+
+  def __init__(self, agent, args, filter=None, streaming=False,
+               pushdown=False):
     """Construct new observer.
 
     Args:
       agent: AwsCliAgent to observe with.
       args: Command line arguments to pass to aws program.
       filter: If provided, then use this to filter observations.
+      streaming: If True then only decode the parts of the output that the
+         observation will be verified against.
+      pushdown: If True and args are for a supported ec2 describe command
+         then add --filters so that only the resources the observation will
+         be verified against are described.
     """
-    super(AwsObjectObserver, self).__init__(filter)
+    super(AwsObjectObserver, self).__init__(
+        filter, streaming=streaming, pushdown=pushdown)
     self.__aws = agent
     self.__args = args
 
   def __str__(self):
     return 'AwsObjectObserver({0})'.format(self.__args)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['AwsObjectObserver', id(self.__aws), context.eval(self.__args)]
+
   def collect_observation(self, context, observation, trace=True):
     args = context.eval(self.__args)
+    command = _find_ec2_describe_command(args)
+    if self.pushdown and command:
+      args = _add_ec2_filter_args(args, command, observation.filter_conditions)
     aws_response = self.__aws.run(args, trace)
     if not aws_response.ok():
       observation.add_error(
           cli_agent.CliAgentRunError(self.__aws, aws_response))
       return []
 
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(aws_response.output)
+      doc = self.decode_json_objects(context, aws_response.output, observation)
     except (ValueError, UnicodeError) as e:
       error = 'Invalid JSON in response: %s' % str(aws_response)
       print 'ERROR:' + error
       observation.add_error(JsonError(error, e))
       return []
 
-    if not isinstance(doc, list):
-      doc = [doc]
     self.filter_all_objects_to_observation(context, doc, observation)
 
     return observation.objects
@@ -87,7 +193,7 @@ class AwsClauseBuilder(jc.ContractClauseBuilder):
 
   def collect_resources(self, aws_module, command,
                         args=None, filter=None,
-                        no_resources_ok=False):
+                        no_resources_ok=False, pushdown=False):
     """Collect the AWS resources of a particular type.
 
     Args:
@@ -98,12 +204,15 @@ class AwsClauseBuilder(jc.ContractClauseBuilder):
       no_resources_ok: Whether or not the resource is required.
           If the resource is not required, 'resource not found' error is
           considered successful.
+      pushdown: Whether to add ec2 --filters for the equality and substring
+          constraints common to all the constraints added to the clause.
+          This is only supported for the common ec2 describe commands.
     """
     args = args or []
     cmd = self.__aws.build_aws_command_args(
         command, args, aws_module=aws_module, profile=self.__aws.profile)
 
-    self.observer = AwsObjectObserver(self.__aws, cmd)
+    self.observer = AwsObjectObserver(self.__aws, cmd, pushdown=pushdown)
 
     if no_resources_ok:
       error_verifier = cli_agent.CliAgentObservationFailureVerifier(
@@ -3,7 +3,6 @@
 """Support for specifying citest.json_contract.Contract on Azure resources."""
 
 # Python modules
-import json
 import logging
 import traceback
 
@@ -13,38 +12,105 @@ from ..json_predicate import JsonError
 from ..service_testing import cli_agent
 
 
+def _jmespath_literal(value):
+  """Encode a value as a JMESPath literal, or None if it cannot be."""
+  if isinstance(value, bool):
+    return '`true`' if value else '`false`'
+  if isinstance(value, float):
+    return '`{0!r}`'.format(value)
+  if isinstance(value, (int, long)):
+    return '`{0}`'.format(value)
+  if '\\' in value:
+    return None
+  return "'{0}'".format(value.replace("'", "\\'"))
+
+
+def _jmespath_identifier(name):
+  """Encode a field name as a JMESPath quoted identifier."""
+  return '"{0}"'.format(name.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _jmespath_condition(condition):
+  """Encode a FilterCondition as a JMESPath filter expression, if possible.
+
+  The values along the path are flattened so that a condition traversing
+  lists is satisfied by any of their elements.
+  """
+  literal = _jmespath_literal(condition.value)
+  if literal is None:
+    return None
+  values = '[@][].{0}[]'.format(
+      '[].'.join([_jmespath_identifier(name)
+                  for name in condition.path.split('/')]))
+  if condition.op == jc.FILTER_EQUALS:
+    return 'contains({0}, {1})'.format(values, literal)
+  if condition.op == jc.FILTER_CONTAINS and literal.startswith("'"):
+    return ("({0} | [?type(@) == 'string' && contains(@, {1})]"
+            " | length(@) > `0`)".format(values, literal))
+  return None
+
+
+def _add_az_query_args(args, conditions):
+  """Add a --query expressing the FilterConditions to az list arguments.
+
+  Args:
+    args: [list of string] The az command line arguments.
+    conditions: [list of FilterCondition] The conditions on the list items.
+
+  Returns:
+    The new list of command line arguments.
+  """
+  if [arg for arg in args if arg.split('=')[0] == '--query']:
+    return args
+  terms = [term for term in [_jmespath_condition(condition)
+                             for condition in conditions or []]
+           if term is not None]
+  if not terms:
+    return args
+  return list(args) + ['--query', '[?{0}]'.format(' && '.join(terms))]
+
+
 class AzObjectObserver(jc.ObjectObserver):
   """ Observe Az resources"""
 
-  def __init__(self, az, args, filter=None):
+  def __init__(self, az, args, filter=None, streaming=False, pushdown=False):
     """Construct the observer.
 
     Attributes:
         az = AzCloudAgent instance to use.
         args: Commang-line arguments list to execute.
         filter: If provided, then use this to filter observations.
+        streaming: Whether to only decode the parts of the output that the
+            observation will be verified against.
+        pushdown: Whether to add a --query so that az only outputs the
+            list elements the observation will be verified against.
+            This is only valid for commands that output a list.
     """
 
-    super(AzObjectObserver, self).__init__(filter)
+    super(AzObjectObserver, self).__init__(
+        filter, streaming=streaming, pushdown=pushdown)
     self.__az = az
     self.__args = args
 
   def __str__(self):
     return 'AzObjectObserver({0})'.format(self.__args)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['AzObjectObserver', id(self.__az), context.eval(self.__args)]
+
   def collect_observation(self, context, observation, trace=True):
     args = context.eval(self.__args)
+    if self.pushdown:
+      args = _add_az_query_args(args, observation.filter_conditions)
     az_response = self.__az.run(args, trace=trace)
     if not az_response.ok():
         observation.add_error(
             cli_agent.CliAgentRunError(self.__az, az_response))
         return []
 
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(az_response.output)
-      if not isinstance(doc, list):
-        doc = [doc]
+      doc = self.decode_json_objects(context, az_response.output, observation)
       observation.add_all_objects(doc)
       self.filter_all_objects_to_observation(context, doc, observation)
     except ValueError as vex:
@@ -80,7 +146,7 @@ class AzClauseBuilder(jc.ContractClauseBuilder):
 
   def collect_resources(self, az_resource, command,
                         args=None, filter=None,
-                        no_resources_ok=False):
+                        no_resources_ok=False, pushdown=False):
     """Collect the Azure resources of a particular type.
 
     Attributes:
@@ -91,12 +157,16 @@ class AzClauseBuilder(jc.ContractClauseBuilder):
         no_resources_ok: Whether or not the resource is required.
             If the resource is not required, 'resource not found' error is
             considered successful.
+        pushdown: Whether to add a --query for the equality and substring
+            constraints common to all the constraints added to the clause.
+            This is only applied to 'list' commands.
     """
     args = args or []
     cmd = self.__az.build_az_command_args(
         az_resource, command, args)
 
-    self.observer = AzObjectObserver(self.__az, cmd)
+    self.observer = AzObjectObserver(
+        self.__az, cmd, pushdown=pushdown and command == 'list')
 
     if no_resources_ok:
       error_verifier = cli_agent.CliAgentObservationFailureVerifier(
@@ -39,9 +39,27 @@ from global_journal import (
     set_global_journal,
     unset_global_journal)
 
+from deadline import (
+    DEADLINE_CONTEXT_KEY,
+    Deadline,
+    DeadlineExceededError)
+
+from event_loop import (
+    EventLoop,
+    Future,
+    Return,
+    Task)
+
+from cassette import (
+    Cassette,
+    CassetteMissError)
+
 from execution_context import ExecutionContext
 from json_scrubber import JsonScrubber
 from base_test_case import BaseTestCase
+from sharded_test_suite import (
+    ShardedTestError,
+    ShardedTestSuite)
 from test_runner import TestRunner
 
 from test_package import run_all_tests_in_dir
@@ -0,0 +1,182 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Records the messages agents exchange with services so they can be replayed.
+
+An agent bound to a recording Cassette (see BaseAgent.cassette) writes each
+request it makes and the response it got into the cassette file. An agent
+bound to a replaying Cassette serves the responses from the file instead of
+sending the requests, so tests can be rerun offline, quickly and
+deterministically.
+
+Requests and responses are recorded as they would be journaled, after the
+agent's scrubbers are applied. A replaying agent scrubs its requests the same
+way before looking them up, so scrubbed values still match.
+
+Each kind of agent records its own kind of request (e.g. 'http' or 'cli').
+The responses to identical requests are replayed in the order they were
+recorded, the last repeating once the others are used up.
+"""
+
+
+import collections
+import json
+import threading
+
+from .record_stream import RecordInputStream
+from .record_stream import RecordOutputStream
+from .snapshot import JsonSnapshotableEntity
+
+
+class CassetteMissError(Exception):
+  """Denotes a request that the replaying Cassette has no response for."""
+
+  def __init__(self, kind, request):
+    """Constructor.
+
+    Args:
+      kind: [string] The kind of request.
+      request: [dict] The request that was not found.
+    """
+    super(CassetteMissError, self).__init__(
+        'No recorded {0} response for {1}'.format(
+            kind, json.JSONEncoder(sort_keys=True).encode(request)))
+
+
+def default_cassette_match_function(kind, request):
+  """The default Cassette match function requiring identical requests.
+
+  Args:
+    kind: [string] The kind of request.
+    request: [dict] The JSON-encodable request.
+
+  Returns:
+    A key that is the same for requests that should match one another.
+  """
+  return (kind, json.JSONEncoder(sort_keys=True).encode(request))
+
+
+class Cassette(JsonSnapshotableEntity):
+  """A file of request/response pairs that agents record into or replay from.
+  """
+
+  RECORD = 'record'
+  REPLAY = 'replay'
+
+  @property
+  def path(self):
+    """The path of the cassette file."""
+    return self.__path
+
+  @property
+  def mode(self):
+    """Either RECORD or REPLAY."""
+    return self.__mode
+
+  @property
+  def replaying(self):
+    """Whether responses should come from the cassette rather than services."""
+    return self.__mode == self.REPLAY
+
+  def __init__(self, path, mode, match_function=None):
+    """Constructor.
+
+    Args:
+      path: [string] The path of the cassette file.
+      mode: [string] RECORD to write a new cassette file, REPLAY to read one.
+      match_function: [callable] Given the kind and request dictionary,
+         returns a hashable key that is equal for requests that should match.
+         This can ignore parts of the request that change from run to run.
+         The default requires the requests to be identical.
+    """
+    if mode not in [self.RECORD, self.REPLAY]:
+      raise ValueError('Unknown cassette mode "{0}"'.format(mode))
+    self.__path = path
+    self.__mode = mode
+    self.__match_function = match_function or default_cassette_match_function
+    self.__lock = threading.Lock()
+    self.__encoder = json.JSONEncoder(encoding='utf-8', sort_keys=True)
+    self.__output = None
+    self.__index = {}
+
+    if mode == self.RECORD:
+      self.__output = RecordOutputStream(open(path, 'wb'))
+    else:
+      self.__load()
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    snapshot.edge_builder.make_control(entity, 'Path', self.__path)
+    snapshot.edge_builder.make_control(entity, 'Mode', self.__mode)
+
+  def close(self):
+    """Finish writing the cassette file, if recording."""
+    with self.__lock:
+      if self.__output is not None:
+        self.__output.close()
+        self.__output = None
+
+  def record(self, kind, request, response):
+    """Add a request and its response to the cassette.
+
+    Args:
+      kind: [string] The kind of request.
+      request: [dict] The JSON-encodable request that was made.
+      response: [dict] The JSON-encodable response that was received.
+    """
+    text = self.__encoder.encode(
+        {'kind': kind, 'request': request, 'response': response})
+    with self.__lock:
+      if self.__output is None:
+        raise ValueError('Cassette "{0}" is not recording.'.format(
+            self.__path))
+      self.__output.append(text)
+      self.__output.stream.flush()
+
+  def replay(self, kind, request):
+    """Returns the recorded response to a request.
+
+    Args:
+      kind: [string] The kind of request.
+      request: [dict] The JSON-encodable request being made.
+
+    Raises:
+      CassetteMissError if no such request was recorded.
+    """
+    if self.__mode != self.REPLAY:
+      raise ValueError('Cassette "{0}" is not replaying.'.format(self.__path))
+
+    # Round trip the request so it looks the same as those that were loaded.
+    request = json.JSONDecoder(encoding='utf-8').decode(
+        self.__encoder.encode(request))
+    with self.__lock:
+      responses = self.__index.get(self.__match_function(kind, request))
+      if not responses:
+        raise CassetteMissError(kind, request)
+      if len(responses) > 1:
+        return responses.popleft()
+      return responses[0]
+
+  def __load(self):
+    """Index the responses in the cassette file by their request keys."""
+    decoder = json.JSONDecoder(encoding='utf-8')
+    stream = RecordInputStream(open(self.__path, 'rb'))
+    try:
+      for text in stream:
+        entry = decoder.decode(text)
+        key = self.__match_function(entry['kind'], entry['request'])
+        self.__index.setdefault(key, collections.deque()).append(
+            entry['response'])
+    finally:
+      stream.close()
@@ -0,0 +1,140 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bounds the total time that a test may spend waiting.
+
+Operation waits, clause retries and observations each have their own
+timeouts, which add up in the worst case. A Deadline placed on the
+ExecutionContext (see ExecutionContext.deadline) is a budget they all share.
+Each shrinks its sleeps and timeouts to fit within what remains, and once
+the budget is exhausted they fail fast with a DeadlineExceededError rather
+than start waiting again.
+"""
+
+
+import time
+
+from .snapshot import JsonSnapshotableEntity
+
+
+# The ExecutionContext internal attribute holding the Deadline, if any.
+DEADLINE_CONTEXT_KEY = 'Deadline'
+
+
+class DeadlineExceededError(Exception):
+  """Denotes that something was not attempted because the budget ran out."""
+
+  @property
+  def deadline(self):
+    """The Deadline that was exceeded."""
+    return self.__deadline
+
+  def __init__(self, deadline, what):
+    """Constructor.
+
+    Args:
+      deadline: [Deadline] The deadline that was exceeded.
+      what: [string] Describes what was not attempted.
+    """
+    super(DeadlineExceededError, self).__init__(
+        'Deadline budget of {0} secs was exhausted before {1}.'.format(
+            deadline.budget_secs, what))
+    self.__deadline = deadline
+
+  def __eq__(self, error):
+    return (self.__class__ == error.__class__
+            and self.__deadline == error.deadline
+            and self.args == error.args)
+
+  def __ne__(self, error):
+    return not self.__eq__(error)
+
+
+class Deadline(JsonSnapshotableEntity):
+  """A point in time by which a test must be finished waiting."""
+
+  @property
+  def budget_secs(self):
+    """The number of seconds the deadline originally allowed."""
+    return self.__budget_secs
+
+  @property
+  def end_time(self):
+    """The time at which the budget is exhausted."""
+    return self.__end_time
+
+  @property
+  def remaining_secs(self):
+    """The number of seconds remaining in the budget, never negative."""
+    return max(0, self.__end_time - self.__now_function())
+
+  @property
+  def expired(self):
+    """Whether the budget is exhausted."""
+    return self.__now_function() >= self.__end_time
+
+  def __init__(self, budget_secs, now_function=time.time):
+    """Constructor.
+
+    Args:
+      budget_secs: [float] The number of seconds from now until the deadline.
+      now_function: [callable] Returns the current time in seconds.
+    """
+    self.__budget_secs = budget_secs
+    self.__now_function = now_function
+    self.__end_time = now_function() + budget_secs
+
+  def __str__(self):
+    return 'Deadline budget={0} remaining={1:.3f}'.format(
+        self.__budget_secs, self.remaining_secs)
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    snapshot.edge_builder.make_control(entity, 'Budget', self.__budget_secs)
+    snapshot.edge_builder.make_data(entity, 'Remaining', self.remaining_secs)
+
+  def clamp(self, secs):
+    """Shrink a timeout or sleep to fit within the remaining budget.
+
+    Args:
+      secs: [float] The desired number of seconds, or None for unbounded.
+
+    Returns:
+      The number of seconds that can be spent.
+    """
+    remaining = self.remaining_secs
+    return remaining if secs is None else min(secs, remaining)
+
+  def clamp_end_time(self, end_time):
+    """Returns the earlier of end_time and the deadline."""
+    return min(end_time, self.__end_time)
+
+  def check(self, what):
+    """Fail fast if the budget is exhausted.
+
+    Args:
+      what: [string] Describes what is about to be attempted.
+
+    Raises:
+      DeadlineExceededError if the budget is exhausted.
+    """
+    if self.expired:
+      raise DeadlineExceededError(self, what)
+
+  def narrow(self, budget_secs):
+    """Returns the earlier of this deadline and one budget_secs from now."""
+    if budget_secs is None:
+      return self
+    deadline = Deadline(budget_secs, now_function=self.__now_function)
+    return deadline if deadline.end_time < self.__end_time else self
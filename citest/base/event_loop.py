@@ -0,0 +1,385 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A single-threaded event loop for running many waits concurrently.
+
+Python 2 does not have asyncio, so this provides the small part of it that
+citest needs. Coroutines are generator functions. A coroutine waits on a
+Future, another coroutine, or a list of them by yielding it, and receives
+the result as the value of the yield expression. Since generators cannot
+return values in Python 2, a coroutine returns a value by raising Return.
+
+  def both_ok(agent):
+    first, second = yield [agent.get_async('a'), agent.get_async('b')]
+    raise Return(first.ok() and second.ok())
+
+  loop = EventLoop()
+  ok = loop.run_until_complete(both_ok(agent))
+
+Everything runs on the thread calling run_until_complete, so a coroutine
+that makes a blocking call holds up all the others until it returns.
+"""
+
+
+import collections
+import heapq
+import itertools
+import logging
+import math
+import select
+import sys
+import time
+import types
+
+
+class Return(Exception):
+  """Raised by a coroutine to return a value.
+
+  Note that a coroutine catching Exception will also catch this.
+  """
+
+  def __init__(self, value=None):
+    super(Return, self).__init__(value)
+    self.value = value
+
+
+class Future(object):
+  """The eventual result of an asynchronous call."""
+
+  def __init__(self):
+    self.__done = False
+    self.__result = None
+    self.__exc_info = None
+    self.__callbacks = []
+
+  def done(self):
+    """Whether the result or exception has been set."""
+    return self.__done
+
+  def result(self):
+    """Returns the result, or raises the exception if there was one.
+
+    Raises:
+      ValueError if the future is not done yet.
+    """
+    if not self.__done:
+      raise ValueError('Future is not done.')
+    if self.__exc_info is not None:
+      raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+    return self.__result
+
+  def exc_info(self):
+    """Returns the (type, value, traceback) of the exception, if any."""
+    return self.__exc_info
+
+  def set_result(self, value):
+    """Complete the future with a result."""
+    self.__finish(value, None)
+
+  def set_exception(self, exception):
+    """Complete the future with an exception."""
+    self.__finish(None, (exception.__class__, exception, None))
+
+  def set_exc_info(self, exc_info):
+    """Complete the future with an exception as returned by sys.exc_info()."""
+    self.__finish(None, exc_info)
+
+  def add_done_callback(self, callback):
+    """Call callback(future) once the future is done."""
+    if self.__done:
+      callback(self)
+    else:
+      self.__callbacks.append(callback)
+
+  def __finish(self, value, exc_info):
+    if self.__done:
+      raise ValueError('Future is already done.')
+    self.__done = True
+    self.__result = value
+    self.__exc_info = exc_info
+    callbacks = self.__callbacks
+    self.__callbacks = None
+    for callback in callbacks:
+      callback(self)
+
+
+class Task(Future):
+  """A Future for the outcome of running a coroutine on an EventLoop."""
+
+  def __init__(self, loop, coroutine):
+    """Constructor.
+
+    Args:
+      loop: [EventLoop] The loop to run the coroutine on.
+      coroutine: [generator] The coroutine to run.
+    """
+    super(Task, self).__init__()
+    self.__loop = loop
+    self.__stack = [coroutine]
+    loop.call_soon(self.__step, None, None)
+
+  def __step(self, value, exc_info):
+    """Run the coroutine until it waits on something or finishes.
+
+    Coroutines yielded by the coroutine are run within this task, as if
+    they were function calls, rather than as tasks of their own.
+    """
+    stack = self.__stack
+    while stack:
+      generator = stack[-1]
+      try:
+        if exc_info is None:
+          yielded = generator.send(value)
+        else:
+          yielded = generator.throw(*exc_info)
+      except Return as ret:
+        stack.pop()
+        value, exc_info = ret.value, None
+        continue
+      except StopIteration:
+        stack.pop()
+        value, exc_info = None, None
+        continue
+      except Exception:  # pylint: disable=broad-except
+        stack.pop()
+        value, exc_info = None, sys.exc_info()
+        continue
+
+      value, exc_info = None, None
+      if isinstance(yielded, types.GeneratorType):
+        stack.append(yielded)
+        continue
+      try:
+        future = self.__loop.as_future(yielded)
+      except TypeError:
+        exc_info = sys.exc_info()
+        continue
+      future.add_done_callback(self.__resume)
+      return
+
+    if exc_info is None:
+      self.set_result(value)
+    else:
+      self.set_exc_info(exc_info)
+
+  def __resume(self, future):
+    """Continue the coroutine with the outcome of what it waited on."""
+    exc_info = future.exc_info()
+    value = None if exc_info is not None else future.result()
+    self.__loop.call_soon(self.__step, value, exc_info)
+
+
+class _Timer(object):
+  """A callback scheduled by EventLoop.call_later."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, callback, args):
+    self.callback = callback
+    self.args = args
+    self.cancelled = False
+
+  def cancel(self):
+    """Do not call the callback after all."""
+    self.cancelled = True
+
+
+class EventLoop(object):
+  """Runs callbacks and coroutines as timers expire and sockets are ready."""
+
+  def __init__(self, now_function=time.time):
+    """Constructor.
+
+    Args:
+      now_function: [callable] Returns the current time in seconds.
+    """
+    self.__now_function = now_function
+    self.__ready = collections.deque()
+    self.__timers = []  # heap of (when, sequence, _Timer)
+    self.__sequence = itertools.count()
+    self.__readers = {}  # (callback, args) keyed by file descriptor.
+    self.__writers = {}  # (callback, args) keyed by file descriptor.
+    self.logger = logging.getLogger(__name__)
+
+  def time(self):
+    """Returns the loop's current time in seconds."""
+    return self.__now_function()
+
+  def call_soon(self, callback, *args):
+    """Call callback(*args) on the next iteration of the loop."""
+    self.__ready.append((callback, args))
+
+  def call_later(self, delay, callback, *args):
+    """Call callback(*args) after delay seconds.
+
+    Returns:
+      A handle whose cancel() method prevents the call.
+    """
+    timer = _Timer(callback, args)
+    heapq.heappush(self.__timers,
+                   (self.time() + max(0, delay), next(self.__sequence), timer))
+    return timer
+
+  def add_reader(self, fd, callback, *args):
+    """Call callback(*args) whenever fd is readable."""
+    self.__readers[fd] = (callback, args)
+
+  def remove_reader(self, fd):
+    """Stop watching fd for being readable."""
+    self.__readers.pop(fd, None)
+
+  def add_writer(self, fd, callback, *args):
+    """Call callback(*args) whenever fd is writable."""
+    self.__writers[fd] = (callback, args)
+
+  def remove_writer(self, fd):
+    """Stop watching fd for being writable."""
+    self.__writers.pop(fd, None)
+
+  def sleep(self, secs):
+    """Returns a Future that completes after secs seconds."""
+    future = Future()
+    self.call_later(secs, future.set_result, None)
+    return future
+
+  def spawn(self, coroutine):
+    """Start running a coroutine concurrently.
+
+    Returns:
+      Task for the outcome of the coroutine.
+    """
+    return Task(self, coroutine)
+
+  def gather(self, items):
+    """Wait for all of the items.
+
+    Args:
+      items: [list] Futures or coroutines to wait for. Coroutines are
+         spawned so that they run concurrently.
+
+    Returns:
+      A Future for the list of results in the order of items. If any failed
+      then it has the exception of the first in the list that failed.
+    """
+    futures = [self.as_future(item) for item in items]
+    gathered = Future()
+    pending = [len(futures)]
+
+    def finish():
+      for future in futures:
+        if future.exc_info() is not None:
+          gathered.set_exc_info(future.exc_info())
+          return
+      gathered.set_result([future.result() for future in futures])
+
+    def on_done(_):
+      pending[0] -= 1
+      if pending[0] == 0:
+        finish()
+
+    if not futures:
+      gathered.set_result([])
+    for future in futures:
+      future.add_done_callback(on_done)
+    return gathered
+
+  def as_future(self, obj):
+    """Returns a Future for a Future, coroutine or list of them.
+
+    Raises:
+      TypeError if obj cannot be waited on.
+    """
+    if isinstance(obj, Future):
+      return obj
+    if isinstance(obj, types.GeneratorType):
+      return self.spawn(obj)
+    if isinstance(obj, (list, tuple)):
+      return self.gather(obj)
+    raise TypeError('Cannot wait on {0!r}'.format(obj))
+
+  def run_until_complete(self, obj):
+    """Run the loop until obj is done.
+
+    Args:
+      obj: [Future, coroutine or list] What to wait for.
+
+    Raises:
+      The exception raised by obj, if any.
+
+    Returns:
+      The result of obj.
+    """
+    future = self.as_future(obj)
+    while not future.done():
+      self.__run_once()
+    return future.result()
+
+  def __run_once(self):
+    """Wait for the next event then run the callbacks that are due."""
+    if self.__ready:
+      timeout = 0
+    elif self.__timers:
+      timeout = max(0, self.__timers[0][0] - self.time())
+    elif self.__readers or self.__writers:
+      timeout = None
+    else:
+      raise RuntimeError('Nothing left to wait for.')
+
+    if self.__readers or self.__writers:
+      self.__poll(timeout)
+    elif timeout > 0:
+      time.sleep(timeout)
+
+    now = self.time()
+    while self.__timers and self.__timers[0][0] <= now:
+      timer = heapq.heappop(self.__timers)[2]
+      if not timer.cancelled:
+        self.__ready.append((timer.callback, timer.args))
+
+    for _ in range(len(self.__ready)):
+      callback, args = self.__ready.popleft()
+      try:
+        callback(*args)
+      except Exception:  # pylint: disable=broad-except
+        self.logger.exception('Unhandled exception in event loop callback.')
+
+  def __poll(self, timeout):
+    """Queue the callbacks for the file descriptors that are ready."""
+    if hasattr(select, 'poll'):
+      # Unlike select, poll is not limited to FD_SETSIZE descriptors.
+      poller = select.poll()
+      for fd in set(self.__readers.keys() + self.__writers.keys()):
+        poller.register(fd, ((select.POLLIN if fd in self.__readers else 0)
+                             | (select.POLLOUT if fd in self.__writers else 0)))
+      events = poller.poll(
+          None if timeout is None else int(math.ceil(timeout * 1000)))
+      failed = select.POLLERR | select.POLLHUP | select.POLLNVAL
+      readable = [fd for fd, event in events
+                  if event & (select.POLLIN | failed)]
+      writable = [fd for fd, event in events
+                  if event & (select.POLLOUT | failed)]
+    else:
+      readable, writable, _ = select.select(
+          self.__readers.keys(), self.__writers.keys(), [], timeout)
+
+    for fd in readable:
+      self.__ready.append((self.__dispatch, (self.__readers, fd)))
+    for fd in writable:
+      self.__ready.append((self.__dispatch, (self.__writers, fd)))
+
+  @staticmethod
+  def __dispatch(watching, fd):
+    """Call the callback for fd unless it stopped being watched meanwhile."""
+    entry = watching.get(fd)
+    if entry is not None:
+      entry[0](*entry[1])
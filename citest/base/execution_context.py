@@ -22,12 +22,30 @@ needed later in the tests execution or evaluation.
 """
 
 import logging
+import threading
+from .deadline import DEADLINE_CONTEXT_KEY
 from .snapshot import JsonSnapshotable
 
 
 class ExecutionContext(JsonSnapshotable):
   """Execution context"""
 
+  @property
+  def deadline(self):
+    """The Deadline bounding how long to keep waiting, or None if unbounded.
+
+    Looking this up is not recorded as an access (see peek).
+    """
+    return self.peek(DEADLINE_CONTEXT_KEY, None)
+
+  @deadline.setter
+  def deadline(self, deadline):
+    """Sets the Deadline, or removes it if None."""
+    if deadline is None:
+      self.clear_key(DEADLINE_CONTEXT_KEY)
+    else:
+      self.set_internal(DEADLINE_CONTEXT_KEY, deadline)
+
   def __init__(self, **kwargs):
     """Constructor.
 
@@ -36,9 +54,22 @@ class ExecutionContext(JsonSnapshotable):
     """
     self.__external = dict(kwargs or {})
     self.__internal = {}
+    self.__thread_local = threading.local()
+
+  def copy(self):
+    """Returns a shallow copy of this context.
+
+    The copy starts with the same attributes, but attributes subsequently
+    set or removed in one are not seen by the other.
+    """
+    result = ExecutionContext(**self.__external)
+    for key, value in self.__internal.items():
+      result.set_internal(key, value)
+    return result
 
   def __contains__(self, key):
     """Determine if key is a known attribute."""
+    self.__note_access(key)
     return key in self.__internal or key in self.__external
 
   def __delitem__(self, key):
@@ -52,6 +83,7 @@ class ExecutionContext(JsonSnapshotable):
     self.set_snapshotable(key, value)
 
   def __getitem__(self, key):
+    self.__note_access(key)
     return (self.__internal[key]
             if key in self.__internal
             else self.__external[key])
@@ -69,6 +101,15 @@ class ExecutionContext(JsonSnapshotable):
 
   def get(self, key, default_value):
     """Lookup value of attribute, or default_value if attribute isn't known."""
+    self.__note_access(key)
+    return self.peek(key, default_value)
+
+  def peek(self, key, default_value):
+    """Lookup value of attribute without recording the access.
+
+    This is intended for infrastructure that needs to consult the context
+    without appearing to be dependent on it (see begin_access_recording).
+    """
     return (self.__internal[key]
             if key in self.__internal
             else self.__external[key] if key in self.__external
@@ -118,6 +159,42 @@ class ExecutionContext(JsonSnapshotable):
       KeyError('{0} already exists'.format(key))
     self.__internal[key] = value
 
+  def begin_access_recording(self):
+    """Start recording which attributes are looked up in this thread.
+
+    Recordings nest, so outer recordings also see the keys recorded by the
+    inner ones. Each call must be balanced with end_access_recording.
+    """
+    recorders = getattr(self.__thread_local, 'recorders', None)
+    if recorders is None:
+      recorders = []
+      self.__thread_local.recorders = recorders
+    recorders.append(set())
+
+  def end_access_recording(self):
+    """Stop the innermost recording started by begin_access_recording.
+
+    Returns:
+      set of keys that were looked up while recording.
+    """
+    return self.__thread_local.recorders.pop()
+
+  def note_access(self, keys):
+    """Record keys as if they were looked up by the current thread.
+
+    This is used to propagate dependencies that were satisfied without
+    actually looking up the keys again (e.g. when reusing a cached result).
+    """
+    for key in keys:
+      self.__note_access(key)
+
+  def __note_access(self, key):
+    """Add the key to any active access recordings for this thread."""
+    recorders = getattr(self.__thread_local, 'recorders', None)
+    if recorders:
+      for recorder in recorders:
+        recorder.add(key)
+
   def snapshotable_items(self):
     """Return list of snapshotable (name, value) tuples."""
     return self.__external.items()
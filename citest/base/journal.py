@@ -51,6 +51,7 @@ class Journal(object):
     self.__lock = threading.Lock()
     self.__now_function = now_function
     self.__output = None
+    self.__thread_local = threading.local()
 
   def now(self):
     """Returns current timestamp for marking journal entries."""
@@ -143,6 +144,28 @@ class Journal(object):
     entry.update(metadata)
     self.__write_json_object(entry)
 
+  def write_metrics(self, _title, _metrics, **metadata):
+    """Write structured measurements into the journal.
+
+    Unlike messages, metrics are meant to be aggregated across journals
+    by reporting tools rather than read individually.
+
+    Args:
+      _title: [string] Identifies what was measured.
+      _metrics: [dict] The JSON encodable measurements, keyed by name.
+      metadata: [kwargs] Additional metadata for the entry.
+    """
+    if not isinstance(_metrics, dict):
+      raise TypeError('{0} is not dict'.format(_metrics.__class__))
+
+    entry = {
+        '_type': 'JournalMetrics',
+        '_title': _title,
+        '_value': _metrics,
+    }
+    entry.update(metadata)
+    self.__write_json_object(entry)
+
   def store(self, obj, **metadata):
     """Stores an object as a graph within the journal.
 
@@ -154,6 +177,63 @@ class Journal(object):
     snapshot.add_object(obj)
     self.__write_json_object(snapshot.to_json_object())
 
+  def begin_capture(self):
+    """Hold back the entries subsequently written by the current thread.
+
+    This is used by threads working concurrently so that their entries can
+    be written together later, keeping their contexts properly nested
+    within the journal rather than interleaved with other threads.
+    """
+    if getattr(self.__thread_local, 'captured', None) is not None:
+      raise ValueError('Journal is already capturing this thread.')
+    self.__thread_local.captured = []
+
+  def end_capture(self):
+    """Stop holding back entries written by the current thread.
+
+    Returns:
+      list of the entries written since begin_capture, to be passed to
+      write_captured.
+    """
+    captured = getattr(self.__thread_local, 'captured', None)
+    if captured is None:
+      raise ValueError('Journal is not capturing this thread.')
+    self.__thread_local.captured = None
+    return captured
+
+  def write_captured(self, entries):
+    """Write entries returned by end_capture into the journal.
+
+    The entries are written together, without any interleaving entries
+    from other threads. They retain the timestamps from when they were
+    originally written.
+
+    Args:
+      entries: [list] The entries returned by end_capture.
+    """
+    self.__lock.acquire(True)
+    try:
+      if self.__output is None:
+        raise ValueError('Journal is not open')
+      for entry in entries:
+        self.__output.append(self.__encoder.encode(entry))
+    finally:
+      self.__lock.release()
+
+  def flush(self):
+    """Flush the entries written so far into the journal file.
+
+    Entries are normally left to the file's own buffering. This is used
+    before forking a process so that the buffered entries are not written
+    again by the child.
+    """
+    self.__lock.acquire(True)
+    try:
+      if self.__output is not None:
+        self.__output.stream.flush()
+    finally:
+      self.__lock.release()
+
   def _do_close(self):
     """Actually closes the journal output file.
 
@@ -172,6 +252,11 @@ class Journal(object):
     json_copy.setdefault('_timestamp', self.now())
     json_copy.setdefault('_thread', threading.current_thread().ident)
 
+    captured = getattr(self.__thread_local, 'captured', None)
+    if captured is not None:
+      captured.append(json_copy)
+      return
+
     # protect both the encoder and the output stream.
     self.__lock.acquire(True)
     try:
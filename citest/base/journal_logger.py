@@ -191,6 +191,19 @@ class JournalLogHandler(logging.StreamHandler):
      _joural_message [string]: Journal this instead of the LogRecord message.
   """
 
+  @property
+  def journal(self):
+    """The journal that the handler writes into."""
+    return self.__journal
+
+  @journal.setter
+  def journal(self, journal):
+    """Redirect the handler into another journal.
+
+    This is used by child processes that write their own journal.
+    """
+    self.__journal = journal
+
   def __init__(self, path):
     """Construct a handler using the global journal.
 
@@ -0,0 +1,347 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs the tests in a suite across worker processes.
+
+Threads within one process share the global journal and the global
+TestRunner, and contend for the interpreter lock while encoding snapshots
+and evaluating predicates. A ShardedTestSuite instead forks worker processes
+that each run a shard of the tests with their own copy of the bindings and
+their own journal segment.
+
+Tests are sharded by TestCase class so that the tests in a class still run
+in order within one process, sharing their class fixtures and any scenario
+data. Each worker reports its outcomes back to the parent, which replays
+them into the unittest result it was given. Once a worker finishes, its
+journal segment is copied into the parent's global journal within a context
+for that worker and then removed. Segments are merged whole, one after
+another, rather than interleaved by time so that their contexts stay nested.
+"""
+
+
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import unittest
+
+from . import global_journal
+from .journal_logger import JournalLogHandler
+from .record_stream import RecordInputStream
+
+
+class ShardedTestError(Exception):
+  """Carries the error reported for a test run in a worker process.
+
+  The traceback was formatted by the worker, so is carried as the message.
+  """
+  pass
+
+
+class _RemoteErrorHolder(object):
+  """Stands in for errors that were not raised by a test in the shard.
+
+  These are errors in class or module fixtures, or the worker itself failing.
+  """
+  # pylint: disable=too-few-public-methods
+
+  failureException = None
+
+  def __init__(self, description):
+    self.__description = description
+
+  def __str__(self):
+    return self.__description
+
+  def id(self):
+    # pylint: disable=invalid-name
+    """Implements the unittest.TestCase interface."""
+    return self.__description
+
+  def shortDescription(self):
+    # pylint: disable=invalid-name
+    """Implements the unittest.TestCase interface."""
+    return None
+
+
+class _ShardTestResult(unittest.TestResult):
+  """Records the outcome of each test in a form that can be sent back.
+
+  The records are a list of (test_id, started, outcomes) where outcomes is
+  a list of (kind, detail) in the order they were added.
+  """
+
+  @property
+  def records(self):
+    """The records of the tests run so far."""
+    return self.__records
+
+  def __init__(self):
+    super(_ShardTestResult, self).__init__()
+    self.__records = []
+    self.__current = None
+
+  def startTest(self, test):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).startTest(test)
+    self.__current = (test.id(), True, [])
+    self.__records.append(self.__current)
+
+  def stopTest(self, test):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).stopTest(test)
+    self.__current = None
+
+  def addSuccess(self, test):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addSuccess(test)
+    self.__add(test, 'success', None)
+
+  def addError(self, test, err):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addError(test, err)
+    self.__add(test, 'error', self.errors[-1][1])
+
+  def addFailure(self, test, err):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addFailure(test, err)
+    self.__add(test, 'failure', self.failures[-1][1])
+
+  def addSkip(self, test, reason):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addSkip(test, reason)
+    self.__add(test, 'skip', reason)
+
+  def addExpectedFailure(self, test, err):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addExpectedFailure(test, err)
+    self.__add(test, 'expected_failure', self.expectedFailures[-1][1])
+
+  def addUnexpectedSuccess(self, test):
+    """Implements the unittest.TestResult interface."""
+    super(_ShardTestResult, self).addUnexpectedSuccess(test)
+    self.__add(test, 'unexpected_success', None)
+
+  def __add(self, test, kind, detail):
+    """Add an outcome to the test's record."""
+    if self.__current is None:
+      # Fixture errors are added outside of any test.
+      self.__records.append((test.id(), False, [(kind, detail)]))
+    else:
+      self.__current[2].append((kind, detail))
+
+
+def _flatten_suite(obj_or_suite):
+  """Returns the list of individual tests within a suite."""
+  if not isinstance(obj_or_suite, unittest.TestSuite):
+    return [obj_or_suite]
+  tests = []
+  for test in obj_or_suite:
+    tests.extend(_flatten_suite(test))
+  return tests
+
+
+def _shard_tests(tests, num_shards):
+  """Partition tests into shards, keeping the tests in a class together.
+
+  Args:
+    tests: [list of TestCase] The tests to shard.
+    num_shards: [int] The most shards to create.
+
+  Returns:
+    list of non-empty lists of tests.
+  """
+  groups = collections.OrderedDict()
+  for test in tests:
+    groups.setdefault(test.__class__, []).append(test)
+
+  shards = [[] for _ in range(num_shards)]
+  for group in sorted(groups.values(), key=len, reverse=True):
+    min(shards, key=len).extend(group)
+  return [shard for shard in shards if shard]
+
+
+def _redirect_journal_log_handlers(journal):
+  """Point the JournalLogHandlers in this process at another journal."""
+  loggers = [logging.getLogger()]
+  loggers.extend([logger
+                  for logger in logging.Logger.manager.loggerDict.values()
+                  if isinstance(logger, logging.Logger)])
+  for logger in loggers:
+    for handler in logger.handlers:
+      if isinstance(handler, JournalLogHandler):
+        handler.journal = journal
+
+
+def _run_shard(tests, journal_path, connection):
+  """The body of a worker process.
+
+  Args:
+    tests: [list of TestCase] The tests to run.
+    journal_path: [string] The path of the journal segment to write, or None.
+    connection: [Connection] The pipe to send the result records into.
+  """
+  # The parent's journal is still the parent's to finish.
+  global_journal.unset_global_journal()
+  journal = None
+  if journal_path:
+    journal = global_journal.new_global_journal_with_path(journal_path)
+    _redirect_journal_log_handlers(journal)
+
+  result = _ShardTestResult()
+  try:
+    unittest.TestSuite(tests).run(result)
+  finally:
+    if journal is not None:
+      global_journal.unset_global_journal()
+      journal.terminate()
+    connection.send(result.records)
+    connection.close()
+
+
+def _remote_exc_info(detail):
+  """Returns an exc_info tuple for an error reported by a worker."""
+  return (ShardedTestError, ShardedTestError(detail), None)
+
+
+class ShardedTestSuite(unittest.TestSuite):
+  """A TestSuite that runs its tests in worker processes."""
+
+  @property
+  def num_processes(self):
+    """The most worker processes to run the tests in."""
+    return self.__num_processes
+
+  def __init__(self, obj_or_suite, num_processes, segment_path_prefix):
+    """Constructor.
+
+    Args:
+      obj_or_suite: [TestCase or TestSuite] The tests to run.
+      num_processes: [int] The most worker processes to run the tests in.
+      segment_path_prefix: [string] The path prefix for the journal segments
+         written by the workers, if there is a global journal to merge
+         them into.
+    """
+    tests = _flatten_suite(obj_or_suite)
+    super(ShardedTestSuite, self).__init__(tests)
+    if num_processes < 1:
+      raise ValueError('num_processes must be positive.')
+    self.__num_processes = num_processes
+    self.__segment_path_prefix = segment_path_prefix
+
+  def run(self, result, debug=False):
+    """Implements the unittest.TestSuite interface."""
+    # pylint: disable=unused-argument
+    journal = global_journal.get_global_journal()
+    if journal is not None:
+      journal.flush()
+
+    workers = []
+    shards = _shard_tests(list(self), self.__num_processes)
+    for index, shard in enumerate(shards):
+      journal_path = (None if journal is None
+                      else '{0}.shard{1}.journal'.format(
+                          self.__segment_path_prefix, index))
+      receiver, sender = multiprocessing.Pipe(duplex=False)
+      process = multiprocessing.Process(
+          target=_run_shard, args=(shard, journal_path, sender))
+      process.start()
+      sender.close()
+      workers.append((index, shard, journal_path, receiver, process))
+
+    for index, shard, journal_path, receiver, process in workers:
+      try:
+        records = receiver.recv()
+      except EOFError:
+        records = None
+      receiver.close()
+      process.join()
+      if records is None:
+        records = [('Worker process {0}'.format(index), False,
+                    [('error', 'Exited with code {0} without a result.'.format(
+                        process.exitcode))])]
+      self.__replay(shard, records, result)
+      if journal_path is not None:
+        self.__merge_segment(journal, index, journal_path)
+    return result
+
+  @staticmethod
+  def __replay(shard, records, result):
+    """Add the outcomes reported by a worker into the result.
+
+    Args:
+      shard: [list of TestCase] The tests the worker ran.
+      records: [list] The _ShardTestResult records from the worker.
+      result: [TestResult] The result to add the outcomes into.
+    """
+    tests_by_id = {}
+    for test in shard:
+      tests_by_id.setdefault(test.id(), test)
+
+    for test_id, started, outcomes in records:
+      test = tests_by_id.get(test_id) or _RemoteErrorHolder(test_id)
+      if started:
+        result.startTest(test)
+      for kind, detail in outcomes:
+        if kind == 'success':
+          result.addSuccess(test)
+        elif kind == 'error':
+          result.addError(test, _remote_exc_info(detail))
+        elif kind == 'failure':
+          result.addFailure(test, _remote_exc_info(detail))
+        elif kind == 'skip':
+          result.addSkip(test, detail)
+        elif kind == 'expected_failure':
+          result.addExpectedFailure(test, _remote_exc_info(detail))
+        elif kind == 'unexpected_success':
+          result.addUnexpectedSuccess(test)
+        else:
+          raise ValueError('Unknown outcome "{0}"'.format(kind))
+      if started:
+        result.stopTest(test)
+
+  @staticmethod
+  def __merge_segment(journal, index, journal_path):
+    """Copy a worker's journal segment into the journal then remove it.
+
+    Args:
+      journal: [Journal] The journal to copy into.
+      index: [int] The index of the worker.
+      journal_path: [string] The path of the worker's journal segment.
+    """
+    decoder = json.JSONDecoder()
+    entries = []
+    try:
+      stream = RecordInputStream(open(journal_path, 'rb'))
+    except IOError:
+      return
+    try:
+      for text in stream:
+        entry = decoder.decode(text)
+        if (entry.get('_type') == 'JournalMessage'
+            and entry.get('_value') in ['Starting journal.',
+                                        'Finished journal.']):
+          continue
+        entries.append(entry)
+    except ValueError:
+      # The worker did not finish the segment; keep what it did write.
+      pass
+    finally:
+      stream.close()
+
+    journal.begin_context('Worker process {0}'.format(index))
+    journal.write_captured(entries)
+    journal.end_context()
+    os.remove(journal_path)
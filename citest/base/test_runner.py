@@ -30,6 +30,7 @@ so is not advised to rely on it at this time.
 
 # Standard python modules.
 import ast
+import json
 import logging
 import logging.config
 import os
@@ -41,6 +42,7 @@ import unittest
 from . import global_journal
 from . import args_util
 from .bindings import ConfigurationBindingsBuilder
+from .sharded_test_suite import ShardedTestSuite
 from .snapshot import JsonSnapshotableEntity
 
 # If a -log_config is not provided, then use this.
@@ -316,15 +318,57 @@ class TestRunner(object):
     logger = logging.getLogger(__name__)
     logger.info('Running tests')
 
+    num_processes = int(self.bindings.get('NUM_PROCESSES') or 1)
+    if num_processes > 1 and self.bindings.get('PROFILE_PREDICATES'):
+      # The predicates would be evaluated, and profiled, in the workers.
+      raise ValueError(
+          '--profile_predicates cannot be used with --num_processes > 1.')
+    if num_processes > 1:
+      logger.info('Sharding tests across %d processes', num_processes)
+      obj_or_suite = ShardedTestSuite(
+          obj_or_suite, num_processes,
+          segment_path_prefix=os.path.join(self.bindings['LOG_DIR'],
+                                           self.bindings['LOG_FILEBASE']))
+
+    profiler = None
+    if self.bindings.get('PROFILE_PREDICATES'):
+      # Imported here because json_predicate depends on this package.
+      from ..json_predicate import PredicateProfiler
+      profiler = PredicateProfiler()
+      profiler.enable()
+
     try:
       result = self.__delegate.run(obj_or_suite)
     finally:
       if sys.exc_info()[0] != None:
         sys.stderr.write('Terminated early due to an exception\n')
+      if profiler is not None:
+        profiler.disable()
+        self.__report_predicate_profile(profiler)
       self._cleanup()
 
     return result
 
+  def __report_predicate_profile(self, profiler):
+    """Write the predicate profile into the journal and report files.
+
+    Args:
+      profiler: [PredicateProfiler] The profiler that ran with the tests.
+    """
+    if self.__journal is not None:
+      self.__journal.store(profiler, _title='Predicate Profile')
+
+    path_base = os.path.join(
+        self.bindings['LOG_DIR'],
+        self.bindings['LOG_FILEBASE'] + '.predicate_profile')
+    with open(path_base + '.txt', 'w') as stream:
+      stream.write(profiler.format_text_report(limit=None))
+      stream.write('\n')
+    with open(path_base + '.json', 'w') as stream:
+      json.dump(profiler.to_json(), stream, indent=2, separators=(',', ': '))
+    logging.getLogger(__name__).info(
+        'Wrote predicate profile to %s.txt and %s.json', path_base, path_base)
+
   def init_bindings_builder(self, builder, defaults=None):
     """Adds configuration introduced by the TestRunner module.
 
@@ -352,6 +396,20 @@ class TestRunner(object):
         ' configuration schema as described in'
         ' https://docs.python.org/2/library/logging.config.html'
         '#logging-config-dictschema')
+    builder.add_argument(
+        '--profile_predicates',
+        default=defaults.get('PROFILE_PREDICATES', False),
+        action='store_true',
+        help='Profile the cost of evaluating each predicate. The profile is'
+        ' written into the journal and to $LOG_FILEBASE.predicate_profile'
+        ' .txt and .json files in the $LOG_DIR.')
+    builder.add_argument(
+        '--num_processes', type=int,
+        default=defaults.get('NUM_PROCESSES', 1),
+        help='Run the tests across this many worker processes. The tests in'
+        ' each TestCase class run together in one process. The journals'
+        ' written by the workers are merged into the main journal.'
+        ' This cannot be used with --profile_predicates.')
 
   def initArgumentParser(self, parser, defaults=None):
     """Adds arguments introduced by the TestRunner module.
@@ -16,8 +16,8 @@
 """Provides a means for specifying and verifying expectations of GCE state."""
 
 # Standard python modules.
-import json
 import logging
+import re
 import traceback
 
 # Our modules.
@@ -25,17 +25,73 @@ from .. import json_contract as jc
 from ..json_predicate import JsonError
 from ..service_testing import cli_agent
 
+def _quote_gcloud_filter_value(value):
+  """Encode a value as a gcloud filter expression operand."""
+  if isinstance(value, bool):
+    return 'true' if value else 'false'
+  if isinstance(value, (int, long, float)):
+    return repr(value)
+  return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _add_gcloud_filter_args(args, conditions):
+  """Add a --filter expressing the FilterConditions to gcloud arguments.
+
+  gcloud matches a key traversing lists if any of the elements match, which
+  is consistent with how the conditions were derived.
+
+  Args:
+    args: [list of string] The gcloud command line arguments.
+    conditions: [list of FilterCondition] The conditions to filter on.
+
+  Returns:
+    The new list of command line arguments.
+  """
+  terms = []
+  for condition in conditions or []:
+    key = condition.path.replace('/', '.')
+    if condition.op == jc.FILTER_EQUALS:
+      terms.append('{0}={1}'.format(
+          key, _quote_gcloud_filter_value(condition.value)))
+    elif (condition.op == jc.FILTER_CONTAINS
+          and isinstance(condition.value, basestring)):
+      terms.append('{0}~{1}'.format(
+          key, _quote_gcloud_filter_value(re.escape(condition.value))))
+  if not terms:
+    return args
+
+  result = list(args)
+  expression = ' AND '.join(terms)
+  for index, arg in enumerate(result):
+    if arg.startswith('--filter='):
+      result[index] = '--filter=({0}) AND {1}'.format(
+          arg[len('--filter='):], expression)
+      return result
+    if arg == '--filter' and index + 1 < len(result):
+      result[index + 1] = '({0}) AND {1}'.format(result[index + 1],
+                                                 expression)
+      return result
+  result.append('--filter=' + expression)
+  return result
+
+
 class GCloudObjectObserver(jc.ObjectObserver):
   """Observe GCP resources."""
 
-  def __init__(self, gcloud, args, filter=None):
+  def __init__(self, gcloud, args, filter=None, streaming=False,
+               pushdown=False):
     """Construct observer.
 
     Args:
       gcloud: GCloudAgent instance to use.
       args: Command-line argument list to execute.
+      streaming: [bool] Whether to only decode the parts of the output
+         that the observation will be verified against.
+      pushdown: [bool] Whether to add a --filter so that gcloud only returns
+         the resources that the observation will be verified against.
     """
-    super(GCloudObjectObserver, self).__init__(filter)
+    super(GCloudObjectObserver, self).__init__(
+        filter, streaming=streaming, pushdown=pushdown)
     self.__gcloud = gcloud
     self.__args = args
 
@@ -47,19 +103,24 @@ class GCloudObjectObserver(jc.ObjectObserver):
   def __str__(self):
     return 'GCloudObjectObserver({0})'.format(self.__args)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['GCloudObjectObserver', id(self.__gcloud),
+            context.eval(self.__args)]
+
   def collect_observation(self, context, observation, trace=True):
     args = context.eval(self.__args)
+    if self.pushdown:
+      args = _add_gcloud_filter_args(args, observation.filter_conditions)
     gcloud_response = self.__gcloud.run(args, trace=trace)
     if not gcloud_response.ok():
       observation.add_error(
           cli_agent.CliAgentRunError(self.__gcloud, gcloud_response))
       return []
 
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(gcloud_response.output)
-      if not isinstance(doc, list):
-        doc = [doc]
+      doc = self.decode_json_objects(
+          context, gcloud_response.output, observation)
       observation.add_all_objects(doc)
     except ValueError as vex:
       error = 'Invalid JSON in response: %s' % str(gcloud_response)
@@ -76,11 +137,13 @@ class GCloudObjectFactory(object):
   def __init__(self, gcloud):
     self.__gcloud = gcloud
 
-  def new_list_resources(self, type, extra_args=None):
+  def new_list_resources(self, type, extra_args=None, pushdown=False):
     """Specify a resource list to be returned later.
 
     Args:
       type: gcloud's name for the GCE resource type.
+      pushdown: Whether to have gcloud filter the list by the constraints
+         that will be verified.
 
     Returns:
       A jc.ObjectObserver to return the specified resource list when called.
@@ -99,7 +162,7 @@ class GCloudObjectFactory(object):
 
     cmd = self.__gcloud.build_gcloud_command_args(
         type, ['list'] + extra_args, project=self.__gcloud.project, zone=zone)
-    return GCloudObjectObserver(self.__gcloud, cmd)
+    return GCloudObjectObserver(self.__gcloud, cmd, pushdown=pushdown)
 
   def new_inspect_resource(self, type, name, extra_args=None):
     """Specify a resource instance to inspect later.
@@ -155,12 +218,18 @@ class GCloudClauseBuilder(jc.ContractClauseBuilder):
     self.__factory = GCloudObjectFactory(gcloud)
     self.__strict = strict
 
-  def list_resources(self, type, extra_args=None):
+  def list_resources(self, type, extra_args=None, pushdown=False):
     """Observe resources of a particular type.
 
     This ultimately calls a "gcloud ... |type| list |extra_args|"
+
+    If pushdown is True then a --filter is added so that gcloud only lists
+    the resources that satisfy the equality and substring constraints common
+    to all the constraints added to the clause. The resources are still
+    verified against all the constraints.
     """
-    self.observer = self.__factory.new_list_resources(type, extra_args)
+    self.observer = self.__factory.new_list_resources(
+        type, extra_args, pushdown=pushdown)
     observation_builder = jc.ValueObservationVerifierBuilder(
         'List ' + type, strict=self.__strict)
     self.verifier_builder.append_verifier_builder(observation_builder)
@@ -21,6 +21,8 @@ import logging
 import apiclient
 import httplib2
 
+from googleapiclient.errors import HttpError
+
 from oauth2client.client import GoogleCredentials
 from oauth2client.service_account import ServiceAccountCredentials
 
@@ -274,7 +276,9 @@ class GcpAgent(BaseAgent):
           _context='request')
 
       request = getattr(resource_obj(), method)(**variables)
-      response = request.execute()
+      response = self.__execute_request(
+          request, {'method': method, 'resource_type': resource_type,
+                    'variables': variables})
       JournalLogger.journal_or_log(
           json.JSONEncoder(
               encoding='utf-8', separators=(',', ': ')).encode(response),
@@ -311,12 +315,16 @@ class GcpAgent(BaseAgent):
     try:
       all_objects = []
       more = ''
+      page = 0
       while request:
         JournalLogger.journal_or_log(
             'Listing {0}{1}'.format(more, resource_type),
             _module=self.logger.name,
             _context='request')
-        response = request.execute()
+        response = self.__execute_request(
+            request, {'method': method_variant, 'resource_type': resource_type,
+                      'variables': variables, 'page': page})
+        page += 1
         JournalLogger.journal_or_log(
             json.JSONEncoder(
                 encoding='utf-8', separators=(',', ': ')).encode(response),
@@ -346,6 +354,40 @@ class GcpAgent(BaseAgent):
 
     return all_objects
 
+  def __execute_request(self, request, cassette_request):
+    """Execute an API request, or replay its response from the cassette.
+
+    Args:
+      request: [HttpRequest] The request to execute.
+      cassette_request: [dict] Identifies the request within a Cassette.
+
+    Raises:
+      HttpError if the request failed.
+
+    Returns:
+      The response from the request.
+    """
+    cassette = self.cassette
+    if cassette is None:
+      return request.execute()
+
+    if cassette.replaying:
+      recorded = cassette.replay('gcp', cassette_request)
+      if 'error_status' in recorded:
+        raise HttpError(httplib2.Response({'status': recorded['error_status']}),
+                        recorded['error_content'].encode('utf-8'))
+      return recorded['response']
+
+    try:
+      response = request.execute()
+    except HttpError as error:
+      cassette.record('gcp', cassette_request,
+                      {'error_status': error.resp.status,
+                       'error_content': error.content})
+      raise
+    cassette.record('gcp', cassette_request, {'response': response})
+    return response
+
   def resource_type_to_discovery_info(self, resource_type):
     parts = resource_type.split('.')
     node = self.discovery_document
@@ -26,18 +26,69 @@ from .. import json_contract as jc
 from .gcp_error_predicates import GoogleAgentObservationFailureVerifier
 
 
+def _compute_filter_term(condition):
+  """Encode a FilterCondition as a Compute API filter term, if possible.
+
+  Only equality on top-level fields and labels is used since those are
+  supported by all the Compute list methods and are never lists.
+  """
+  parts = condition.path.split('/')
+  if (condition.op != jc.FILTER_EQUALS
+      or not (len(parts) == 1 or (len(parts) == 2 and parts[0] == 'labels'))):
+    return None
+
+  value = condition.value
+  if isinstance(value, bool):
+    value = 'true' if value else 'false'
+  elif isinstance(value, float):
+    value = repr(value)
+  elif isinstance(value, (int, long)):
+    value = str(value)
+  else:
+    value = '"{0}"'.format(
+        value.replace('\\', '\\\\').replace('"', '\\"'))
+  return '({0} = {1})'.format('.'.join(parts), value)
+
+
+def _add_compute_filter_kwargs(kwargs, conditions):
+  """Add a Compute API filter parameter expressing the FilterConditions.
+
+  Args:
+    kwargs: [dict] The parameters to the list method.
+    conditions: [list of FilterCondition] The conditions to filter on.
+
+  Returns:
+    The new parameters. An existing filter parameter is left as is.
+  """
+  if 'filter' in kwargs:
+    return kwargs
+  terms = [term for term in [_compute_filter_term(condition)
+                             for condition in conditions or []]
+           if term is not None]
+  if not terms:
+    return kwargs
+  result = dict(kwargs)
+  result['filter'] = ' '.join(terms)
+  return result
+
+
 class GcpObjectObserver(jc.ObjectObserver):
   """Observe GCP resources."""
 
-  def __init__(self, method, filter=None, **kwargs):
+  def __init__(self, method, filter=None, pushdown=False, **kwargs):
     """Construct observer.
 
     Args:
       gcp_agent: GcpAgent instance to use.
       method: [method] The method to invoke.
+      filter: [ValuePredicate] If provided, only observe objects passing it.
+      pushdown: [bool] Whether to pass a 'filter' parameter to the method so
+         that only the resources the observation will be verified against
+         are returned. This is only valid for API list methods that take a
+         filter parameter in the Compute API syntax.
       kwargs: [kwargs] arguments to pass to method.
     """
-    super(GcpObjectObserver, self).__init__(filter)
+    super(GcpObjectObserver, self).__init__(filter, pushdown=pushdown)
 
     self.__method = method
     self.__kwargs = dict(kwargs)
@@ -50,9 +101,17 @@ class GcpObjectObserver(jc.ObjectObserver):
   def __str__(self):
     return 'GcpObjectObserver({0})'.format(self.__kwargs)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['GcpObjectObserver', self.__method, context.eval(self.__kwargs)]
+
   def collect_observation(self, context, observation, trace=True):
     try:
-      doc = self.__method(context, **self.__kwargs)
+      kwargs = self.__kwargs
+      if self.pushdown:
+        kwargs = _add_compute_filter_kwargs(
+            kwargs, observation.filter_conditions)
+      doc = self.__method(context, **kwargs)
       if not isinstance(doc, list):
         doc = [doc]
       self.filter_all_objects_to_observation(context, doc, observation)
@@ -92,21 +151,35 @@ class GcpClauseBuilder(jc.ContractClauseBuilder):
     self.__gcp_agent = gcp_agent
     self.__strict = strict
 
-  def list_resource(self, resource_type, **kwargs):
-    """Observe resources of a particular type."""
+  def list_resource(self, resource_type, pushdown=False, **kwargs):
+    """Observe resources of a particular type.
+
+    Args:
+      resource_type: The gcp resource type  (e.g. instances)
+      pushdown: Whether to pass the equality constraints that are common to
+          all the constraints added to the clause as the list method's
+          filter parameter. This is only valid for APIs such as Compute
+          whose list methods take a filter.
+      kwargs: Additional parameters to pass to gcp_agent
+    """
     self.observer = GcpObjectObserver(
-        self.__gcp_agent.list_resource, resource_type=resource_type, **kwargs)
+        self.__gcp_agent.list_resource, resource_type=resource_type,
+        pushdown=pushdown, **kwargs)
     observation_builder = jc.ValueObservationVerifierBuilder(
         'List ' + resource_type, strict=self.__strict)
     self.verifier_builder.append_verifier_builder(observation_builder)
 
     return observation_builder
 
-  def aggregated_list_resource(self, resource_type, **kwargs):
-    """Observe resources of a particular type."""
+  def aggregated_list_resource(self, resource_type, pushdown=False,
+                               **kwargs):
+    """Observe resources of a particular type.
+
+    See list_resource for a description of pushdown.
+    """
     self.observer = GcpObjectObserver(
         self.__gcp_agent.aggregated_list_resource, resource_type=resource_type,
-        **kwargs)
+        pushdown=pushdown, **kwargs)
     observation_builder = jc.ValueObservationVerifierBuilder(
         'List Aggregated ' + resource_type, strict=self.__strict)
     self.verifier_builder.append_verifier_builder(observation_builder)
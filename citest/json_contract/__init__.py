@@ -24,8 +24,48 @@ from observer import (
     Observation)
 
 
+# The filter_pushdown module determines which constraints observers may ask
+# the services they observe to filter on.
+from filter_pushdown import (
+    FILTER_CONTAINS,
+    FILTER_EQUALS,
+    FilterCondition,
+    intersect_filter_conditions,
+    predicate_filter_conditions)
+
+
+# The observation_cache module lets clauses share identical observations.
+from observation_cache import (
+    OBSERVATION_CACHE_CONTEXT_KEY,
+    ObservationCache)
+
+
+# The retry_policy module decides how long clauses wait between attempts.
+from retry_policy import (
+    RETRY_POLICY_CONTEXT_KEY,
+    ConvergenceStats,
+    ExponentialBackoffRetryPolicy,
+    FixedRetryPolicy,
+    LearningRetryPolicy,
+    RetryPolicy,
+    server_retry_hint)
+
+
 # The verifier module provides support for verifying observations meet
 # expectations.
+from change_stream import (
+    ChangeStream,
+    EventChangeStream,
+    PollingChangeStream,
+    ProcessChangeStream)
+
+
+from incremental_verification import (
+    DEFAULT_IDENTITY_PATHS,
+    IncrementalValueVerification,
+    object_identity)
+
+
 from observation_verifier import (
     ObservationVerifier,
     ObservationVerifierBuilder,
@@ -0,0 +1,213 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lets a retrying ContractClause wait for what it observes to change.
+
+Rather than sleeping between attempts, a clause whose observer offers a
+ChangeStream (see ObjectObserver.open_change_stream) waits until the stream
+reports a change, then observes again. If no change is reported within the
+stream's fallback_secs, the clause observes again anyway, so a missed or
+unsupported event only costs latency.
+
+   EventChangeStream is notified of changes by whatever produces them.
+   ProcessChangeStream treats each line a long-running program writes as a
+      change, such as "kubectl get --watch-only".
+   PollingChangeStream repeatedly calls a blocking function, such as an HTTP
+      long-poll or an operation "wait" request, that returns when there is
+      a change.
+"""
+
+
+import logging
+import os
+import subprocess
+import threading
+import time
+
+
+class ChangeStream(object):
+  """Interface for waiting on changes to observed resources."""
+
+  @property
+  def fallback_secs(self):
+    """The longest to wait for a change before observing again anyway.
+
+    None indicates that the clause's RetryPolicy determines this.
+    """
+    return None
+
+  def wait_for_change(self, timeout_secs):
+    """Wait until a change is reported or the timeout expires.
+
+    Changes reported since the previous call are consumed by this call.
+
+    Args:
+      timeout_secs: [float] The longest time to wait.
+
+    Returns:
+      True if there was a change, False if the timeout expired.
+    """
+    raise NotImplementedError('{0}.wait_for_change not implemented.'.format(
+        self.__class__.__name__))
+
+  def close(self):
+    """Release the stream's resources. The stream is no longer used."""
+    pass
+
+
+class EventChangeStream(ChangeStream):
+  """A ChangeStream that is told about changes by calling notify.
+
+  notify may be called from any thread. Changes reported in between calls to
+  wait_for_change are coalesced into one.
+  """
+
+  @property
+  def fallback_secs(self):
+    """Implements ChangeStream interface."""
+    return self.__fallback_secs
+
+  @property
+  def num_changes(self):
+    """The number of times notify has been called."""
+    return self.__num_changes
+
+  def __init__(self, fallback_secs=None):
+    """Constructor.
+
+    Args:
+      fallback_secs: [float] The longest to wait for a change, if bounded
+         independent of the clause's RetryPolicy.
+    """
+    self.__fallback_secs = fallback_secs
+    self.__event = threading.Event()
+    self.__lock = threading.Lock()
+    self.__num_changes = 0
+
+  def notify(self):
+    """Report that there was a change."""
+    with self.__lock:
+      self.__num_changes += 1
+    self.__event.set()
+
+  def wait_for_change(self, timeout_secs):
+    """Implements ChangeStream interface."""
+    changed = self.__event.wait(max(0, timeout_secs))
+    # Python 2.6 Event.wait returned None.
+    changed = self.__event.is_set() if changed is None else changed
+    self.__event.clear()
+    return changed
+
+
+class ProcessChangeStream(EventChangeStream):
+  """A ChangeStream that runs a program reporting each change on a line.
+
+  Lines are read in a background thread. If the program exits then no more
+  changes are reported and waiting falls back to the timeout.
+  """
+
+  def __init__(self, command, fallback_secs=None):
+    """Constructor.
+
+    This starts the program.
+
+    Args:
+      command: [list of string] The program and its arguments.
+      fallback_secs: [float] See EventChangeStream.
+    """
+    super(ProcessChangeStream, self).__init__(fallback_secs=fallback_secs)
+    self.__command = command
+    # Nothing reads stderr, so it must not be a pipe that could fill up.
+    with open(os.devnull, 'w') as devnull:
+      self.__process = subprocess.Popen(
+          command, stdout=subprocess.PIPE, stderr=devnull, close_fds=True)
+    self.__thread = threading.Thread(
+        name='ChangeStream', target=self.__read_lines)
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def __read_lines(self):
+    """Notify of a change for each non-blank line of output."""
+    for line in iter(self.__process.stdout.readline, ''):
+      if line.strip():
+        self.notify()
+    logging.getLogger(__name__).debug(
+        'Change stream "%s" ended.', ' '.join(self.__command))
+
+  def close(self):
+    """Implements ChangeStream interface."""
+    if self.__process.poll() is None:
+      try:
+        self.__process.terminate()
+      except OSError:
+        pass  # It already finished.
+    self.__process.wait()
+    self.__thread.join(1)
+    self.__process.stdout.close()
+
+
+class PollingChangeStream(EventChangeStream):
+  """A ChangeStream that repeatedly calls a function blocking until a change.
+
+  The function is called in a background thread. It should return True when
+  there was a change and False when it gave up waiting (e.g. the long-poll
+  request timed out on the server). Calls are started at least retry_secs
+  apart, whatever they return, so a function that fails or does not block
+  does not spin.
+  """
+
+  def __init__(self, wait_function, fallback_secs=None, retry_secs=1):
+    """Constructor.
+
+    This starts calling the function.
+
+    Args:
+      wait_function: [callable] Blocks until a change, returning whether
+         there was one.
+      fallback_secs: [float] See EventChangeStream.
+      retry_secs: [float] The minimum time between starting calls.
+    """
+    super(PollingChangeStream, self).__init__(fallback_secs=fallback_secs)
+    self.__wait_function = wait_function
+    self.__retry_secs = retry_secs
+    self.__closed = threading.Event()
+    self.__thread = threading.Thread(
+        name='ChangeStream', target=self.__poll)
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def __poll(self):
+    """Call the wait function until closed."""
+    while not self.__closed.is_set():
+      start_time = time.time()
+      try:
+        changed = self.__wait_function()
+      except Exception as ex:  # pylint: disable=broad-except
+        logging.getLogger(__name__).debug(
+            'Waiting for change failed: %s', ex)
+        changed = False
+
+      if self.__closed.is_set():
+        break
+      if changed:
+        self.notify()
+      self.__closed.wait(
+          max(0, self.__retry_secs - (time.time() - start_time)))
+
+  def close(self):
+    """Implements ChangeStream interface.
+
+    The function is not interrupted, but will not be called again.
+    """
+    self.__closed.set()
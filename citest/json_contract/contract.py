@@ -24,12 +24,25 @@ attempting to make it (e.g. the observed resource does not exist).
 
 
 import logging
+import sys
 import time
+from multiprocessing.pool import ThreadPool
 
+from ..base import DeadlineExceededError
 from ..base import JournalLogger
+from ..base import get_global_journal
 from ..base import JsonSnapshotableEntity
+from ..base import Return
+from .. import json_predicate as jp
 from ..json_predicate import predicate
 from . import observer as ob
+from .observation_cache import (
+    OBSERVATION_CACHE_CONTEXT_KEY,
+    ObservationCache)
+from .retry_policy import (
+    RETRY_POLICY_CONTEXT_KEY,
+    FixedRetryPolicy,
+    server_retry_hint)
 from . import observation_verifier as ov
 
 
@@ -103,6 +116,10 @@ class ContractClauseVerifyResult(predicate.PredicateResult):
         snapshot, entity)
 
 
+# The RetryPolicy used by clauses when none was specified.
+_DEFAULT_RETRY_POLICY = FixedRetryPolicy()
+
+
 class ContractClause(predicate.ValuePredicate):
   """Specifies how to obtain state information and expectations on it."""
   @property
@@ -143,9 +160,12 @@ class ContractClause(predicate.ValuePredicate):
       verifier: A ObservationVerifier on the observer's Observations.
       retryable_for_secs: If > 0, then how long to continue retrying
         when a verification attempt fails.
+      retry_policy: [RetryPolicy] Decides how long to wait between retries.
+        If None then use the policy in the context, if any.
     """
     self.logger = logging.getLogger(__name__)
     self.__retryable_for_secs = kwargs.pop('retryable_for_secs', 0)
+    self.__retry_policy = kwargs.pop('retry_policy', None)
     self.__title = title
     self.__observer = observer
     self.__verifier = verifier
@@ -169,12 +189,14 @@ class ContractClause(predicate.ValuePredicate):
         'Verifying ContractClause: {0}'.format(self.__title))
 
     context_relation = 'ERROR'
+    jp.begin_profile_scope(jp.PROFILE_CLAUSE_SCOPE, self.__title)
     try:
       JournalLogger.delegate("store", self, _title='Clause Specification')
 
       result = self.__do_verify(context)
       context_relation = 'VALID' if result else 'INVALID'
     finally:
+      jp.end_profile_scope()
       JournalLogger.end_context(relation=context_relation)
     return result
 
@@ -182,8 +204,13 @@ class ContractClause(predicate.ValuePredicate):
     """Helper function that implements the clause verification policy.
 
     We will periodically attempt to verify the clause until we succeed
-    or give up trying. Each individual iteration attempt is performed
-    by the verify_once method.
+    or give up trying. Each individual iteration attempt collects a new
+    observation then verifies it. Failed attempts that will be retried are
+    only checked for validity, without building the detailed results.
+
+    How long the clause took to become consistent is written into the journal
+    as metrics so that it can be aggregated across runs (see
+    citest.reporting.clause_metrics).
 
     Args:
       context: Runtime citest execution context.
@@ -194,34 +221,116 @@ class ContractClause(predicate.ValuePredicate):
     # self.logger.debug('Verifying Contract: %s', self.__title)
     start_time = time.time()
     end_time = start_time + self.__retryable_for_secs
+    deadline = context.deadline
+    if deadline is not None:
+      end_time = max(start_time, deadline.clamp_end_time(end_time))
+    retry_policy = (self.__retry_policy
+                    or context.peek(RETRY_POLICY_CONTEXT_KEY, None)
+                    or _DEFAULT_RETRY_POLICY)
+    attempt = 0
+    metrics = self.__new_metrics()
+
+    # Remember predicate results between attempts so that observed objects
+    # that have not changed since the previous attempt are not re-evaluated.
+    prior_memo = context.peek(jp.PREDICATE_MEMO_CONTEXT_KEY, None)
+    memo = prior_memo
+    if memo is None and self.__retryable_for_secs > 0:
+      memo = jp.PredicateResultMemo()
+      context.set_internal(jp.PREDICATE_MEMO_CONTEXT_KEY, memo)
+
+    # Observers that can watch for changes let us observe again as soon as
+    # something changes rather than on a timer. The stream is opened before
+    # the first observation so that no change can slip in between.
+    stream = None
+    if self.__retryable_for_secs > 0 and self.__observer and self.__verifier:
+      stream = self.__observer.open_change_stream(
+          context, self.__new_observation(context))
 
-    while True:
-      clause_result = self.verify_once(context)
-      if clause_result:
-        break
+    try:
+      while True:
+        # While there is still time to retry, first check the observation
+        # using the cheap is_valid predicate mode. The full result with all
+        # its diagnostic details is only built when it looks like the clause
+        # passes or on the final attempt.
+        if memo is not None:
+          memo.begin_attempt()
+        attempt += 1
+        observe_start = time.time()
+        observation = self.observe(context)
+        now = time.time()
+        metrics['observe_secs'].append(now - observe_start)
+        if metrics['first_observation_secs'] is None:
+          metrics['first_observation_secs'] = now - start_time
+        if now < end_time and not self.__verifier.is_valid(
+            context, observation):
+          clause_result = None
+        else:
+          clause_result = self.verify_observation(context, observation)
+          if clause_result:
+            metrics['first_pass_secs'] = time.time() - start_time
+            break
+
+        now = time.time()
+        if end_time <= now:
+          if clause_result is None:
+            clause_result = self.verify_observation(context, observation)
+          if end_time > start_time:
+            self.logger.debug(
+                'Giving up verifying %s after %r of %r secs.',
+                self.__title, end_time - start_time, self.__retryable_for_secs)
+          if deadline is not None and deadline.expired and not clause_result:
+            self.logger.info('%s: %s', self.__title, deadline)
+          break
+
+        secs_remaining = end_time - now
+        sleep = retry_policy.next_delay(
+            self.__title, attempt, start_time, end_time, now, observation)
+        self.logger.debug(
+            '%s not yet satisfied with secs_remaining=%r. Retry in %r\n%s',
+            self.__title, secs_remaining, sleep,
+            clause_result if clause_result is not None else '')
+        wait_start = time.time()
+        self.__wait_to_retry(stream, sleep, secs_remaining, observation)
+        metrics['sleep_secs'] += time.time() - wait_start
 
-      now = time.time()
-      if end_time <= now:
-        if end_time > start_time:
-          self.logger.debug(
-              'Giving up verifying %s after %r of %r secs.',
-              self.__title, end_time - start_time, self.__retryable_for_secs)
-        break
+    finally:
+      if stream is not None:
+        stream.close()
+      if prior_memo is None and memo is not None:
+        context.clear_key(jp.PREDICATE_MEMO_CONTEXT_KEY)
 
-      secs_remaining = end_time - now
-
-      # This could be a bounded exponential backoff, but we probably
-      # want to have an idea of when it actually becomes available so keep low.
-      # But if we are going to wait a long time, then dont poll very frequently.
-      # The numbers here are arbitrary otherwise.
-      #
-      # 1/10 total time or 5 seconds if that is pretty long,
-      # but no less than 1 second unless there is less than 1 second left.
-      sleep = min(secs_remaining, min(5, max(1, self.__retryable_for_secs / 10)))
-      self.logger.debug(
-          '%s not yet satisfied with secs_remaining=%r. Retry in %r\n%s',
-          self.__title, secs_remaining, sleep, clause_result)
-      time.sleep(sleep)
+    elapsed_secs = time.time() - start_time
+    if self.__retryable_for_secs > 0:
+      retry_policy.record_outcome(
+          self.__title, bool(clause_result), elapsed_secs)
+
+    self.__report_result(clause_result, metrics, attempt, elapsed_secs)
+    return clause_result
+
+  def __new_metrics(self):
+    """Returns the metrics to collect while verifying the clause."""
+    return {
+        'retryable_for_secs': self.__retryable_for_secs,
+        'first_observation_secs': None,
+        'first_pass_secs': None,
+        'sleep_secs': 0,
+        'observe_secs': []
+    }
+
+  def __report_result(self, clause_result, metrics, attempts, elapsed_secs):
+    """Write the outcome of verifying the clause into the journal.
+
+    Args:
+      clause_result: [ContractClauseVerifyResult] The final result.
+      metrics: [dict] The metrics collected while verifying the clause.
+      attempts: [int] The number of observations that were made.
+      elapsed_secs: [float] How long the verification took.
+    """
+    metrics.update({'attempts': attempts,
+                    'elapsed_secs': elapsed_secs,
+                    'valid': bool(clause_result)})
+    JournalLogger.delegate('write_metrics', self.__title, metrics,
+                           kind='ContractClause')
 
     summary = clause_result.enumerated_summary_message
     ok_str = 'OK' if clause_result else 'FAILED'
@@ -230,7 +339,26 @@ class ContractClause(predicate.ValuePredicate):
         _title='Validation Analysis of "{0}"'.format(self.__title))
     self.logger.debug('ContractClause %s: %s\n%s',
                       ok_str, self.__title, summary)
-    return clause_result
+
+  def __wait_to_retry(self, stream, sleep, secs_remaining, observation):
+    """Wait until it is time to observe again.
+
+    Args:
+      stream: [ChangeStream] The stream of changes to wait on, if any.
+      sleep: [float] The delay the RetryPolicy asked for.
+      secs_remaining: [float] The time until the clause's deadline.
+      observation: [Observation] The most recent observation.
+    """
+    # Honor the server asking us to back off even if something changes.
+    if stream is None or server_retry_hint(observation) is not None:
+      time.sleep(sleep)
+      return
+
+    fallback_secs = stream.fallback_secs
+    timeout = sleep if fallback_secs is None else fallback_secs
+    changed = stream.wait_for_change(min(secs_remaining, timeout))
+    self.logger.debug('%s observing again %s.', self.__title,
+                      'after a change' if changed else 'without a change')
 
   def verify_once(self, context):
     """Make a single attempt to collect an observation and verify it.
@@ -244,6 +372,22 @@ class ContractClause(predicate.ValuePredicate):
     Returns:
       ContractClauseVerifyResult from verifying the observation
     """
+    return self.verify_observation(context, self.observe(context))
+
+  def observe(self, context):
+    """Collect a new observation from the clause's observer.
+
+    Args:
+      context: Runtime citest execution context.
+
+    Raises:
+      ValueError of the clause is not yet fully specified.
+
+    Returns:
+      Observation collected. If the context's deadline budget is exhausted
+      then the observer is not consulted and the observation will contain
+      a DeadlineExceededError.
+    """
     if not self.__observer:
       raise ValueError(
           'No ObjectObserver bound to clause {0!r}'.format(self.__title))
@@ -251,9 +395,149 @@ class ContractClause(predicate.ValuePredicate):
       raise ValueError(
           'No ObservationVerifier bound to clause {0!r}'.format(self.__title))
 
-    observation = ob.Observation()
-    self.__observer.collect_observation(context, observation)
+    observation = self.__new_observation(context)
+    deadline = context.deadline
+    if deadline is not None and deadline.expired:
+      observation.add_error(DeadlineExceededError(
+          deadline, 'observing {0!r}'.format(self.__title)))
+      return observation
+
+    cache = context.peek(OBSERVATION_CACHE_CONTEXT_KEY, None)
+    if cache is None:
+      self.__observer.collect_observation(context, observation)
+    else:
+      cache.collect_observation(context, self.__observer, observation, self)
+    return observation
+
+  def verify_async(self, loop, context):
+    """Coroutine that verifies the clause without blocking the event loop.
+
+    This is like verify, but it observes with the observer's
+    collect_observation_async and waits between attempts on the loop so
+    that many clauses can be verified concurrently by a single thread.
+    Clauses verified this way do not watch for changes, share observations,
+    or remember predicate results between attempts.
+
+    Other clauses may be verified while this one waits, so the clause's
+    journal context is only written once it is done. Messages logged by the
+    observer while observing are outside that context.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      context: Runtime citest execution context.
+
+    Returns:
+      ContractClauseVerifyResult with details.
+    """
+    start_time = loop.time()
+    end_time = start_time + self.__retryable_for_secs
+    deadline = context.deadline
+    if deadline is not None:
+      end_time = max(start_time, deadline.clamp_end_time(end_time))
+    retry_policy = (self.__retry_policy
+                    or context.peek(RETRY_POLICY_CONTEXT_KEY, None)
+                    or _DEFAULT_RETRY_POLICY)
+    attempt = 0
+    metrics = self.__new_metrics()
+    while True:
+      attempt += 1
+      observe_start = loop.time()
+      observation = yield self.observe_async(loop, context)
+      now = loop.time()
+      metrics['observe_secs'].append(now - observe_start)
+      if metrics['first_observation_secs'] is None:
+        metrics['first_observation_secs'] = now - start_time
+
+      # The profile scope is per thread, so must not be open across a yield.
+      jp.begin_profile_scope(jp.PROFILE_CLAUSE_SCOPE, self.__title)
+      try:
+        if now < end_time and not self.__verifier.is_valid(
+            context, observation):
+          clause_result = None
+        else:
+          clause_result = self.verify_observation(context, observation)
+      finally:
+        jp.end_profile_scope()
+
+      if clause_result:
+        metrics['first_pass_secs'] = loop.time() - start_time
+        break
+      if end_time <= now:
+        break
+
+      sleep = retry_policy.next_delay(
+          self.__title, attempt, start_time, end_time, now, observation)
+      wait_start = loop.time()
+      yield loop.sleep(min(sleep, end_time - now))
+      metrics['sleep_secs'] += loop.time() - wait_start
 
+    elapsed_secs = loop.time() - start_time
+    if self.__retryable_for_secs > 0:
+      retry_policy.record_outcome(
+          self.__title, bool(clause_result), elapsed_secs)
+
+    JournalLogger.begin_context(
+        'Verifying ContractClause: {0}'.format(self.__title))
+    try:
+      JournalLogger.delegate("store", self, _title='Clause Specification')
+      self.__report_result(clause_result, metrics, attempt, elapsed_secs)
+    finally:
+      JournalLogger.end_context(
+          relation='VALID' if clause_result else 'INVALID')
+    raise Return(clause_result)
+
+  def observe_async(self, loop, context):
+    """Coroutine that collects a new observation from the clause's observer.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      context: Runtime citest execution context.
+
+    Raises:
+      ValueError of the clause is not yet fully specified.
+
+    Returns:
+      Observation collected. See observe.
+    """
+    if not self.__observer:
+      raise ValueError(
+          'No ObjectObserver bound to clause {0!r}'.format(self.__title))
+    if not self.__verifier:
+      raise ValueError(
+          'No ObservationVerifier bound to clause {0!r}'.format(self.__title))
+
+    observation = self.__new_observation(context)
+    deadline = context.deadline
+    if deadline is not None and deadline.expired:
+      observation.add_error(DeadlineExceededError(
+          deadline, 'observing {0!r}'.format(self.__title)))
+      raise Return(observation)
+
+    yield self.__observer.collect_observation_async(loop, context, observation)
+    raise Return(observation)
+
+  def __new_observation(self, context):
+    """Create the empty Observation for the observer to collect into."""
+    projection_paths = None
+    if self.__observer.streaming:
+      projection_paths = self.__verifier.projection_paths(context)
+    filter_conditions = None
+    if self.__observer.pushdown:
+      filter_conditions = self.__observer.plan_filter_conditions(
+          context, self.__verifier)
+    return ob.Observation(projection_paths=projection_paths,
+                          filter_conditions=filter_conditions)
+
+  def verify_observation(self, context, observation):
+    """Verify an observation against the clause's verifier.
+
+    Args:
+      context: Runtime citest execution context.
+      observation: [Observation] The observation to verify.
+
+    Returns:
+      ContractClauseVerifyResult from verifying the observation
+    """
     verify_result = self.__verifier(context, observation)
     return ContractClauseVerifyResult(
         verify_result.__nonzero__(), self, verify_result)
@@ -306,6 +590,7 @@ class ContractClauseBuilder(object):
       verifier_builder: Builds the clause verifier.
       retryable_for_secs: [int] How long the clause can continue colllecting
          observation data until it can be confirmed to hold.
+      retry_policy: [RetryPolicy] Decides how long to wait between retries.
     """
     strict = kwargs.pop('strict', False)
     if strict:
@@ -313,6 +598,7 @@ class ContractClauseBuilder(object):
       logger.warning('Strict flag is DEPRECATED in %s', title)
 
     self.__retryable_for_secs = kwargs.pop('retryable_for_secs', 0)
+    self.__retry_policy = kwargs.pop('retry_policy', None)
     self.__title = title
     self.__observer = observer
     self.__verifier_builder = (verifier_builder
@@ -324,7 +610,8 @@ class ContractClauseBuilder(object):
         title=self.__title,
         observer=self.__observer,
         verifier=self.__verifier_builder.build(),
-        retryable_for_secs=self.__retryable_for_secs)
+        retryable_for_secs=self.__retryable_for_secs,
+        retry_policy=self.__retry_policy)
 
 
 class ContractVerifyResult(predicate.PredicateResult):
@@ -388,8 +675,29 @@ class Contract(JsonSnapshotableEntity):
     """The list of ContractClause."""
     return self.__clauses
 
-  def __init__(self):
+  @property
+  def max_workers(self):
+    """The maximum number of clauses to verify concurrently."""
+    return self.__max_workers
+
+  @property
+  def observation_cache_secs(self):
+    """How long clauses can reuse each other's observations, if at all."""
+    return self.__observation_cache_secs
+
+  def __init__(self, max_workers=1, observation_cache_secs=0):
+    """Constructor.
+
+    Args:
+      max_workers: [int] The maximum number of clauses to verify concurrently.
+         The default verifies each clause in turn.
+      observation_cache_secs: [float] If positive then clauses whose
+         observers make the same request within this many seconds of one
+         another share a single observation. See ObservationCache.
+    """
     self.__clauses = []
+    self.__max_workers = max_workers
+    self.__observation_cache_secs = observation_cache_secs
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
@@ -403,27 +711,133 @@ class Contract(JsonSnapshotableEntity):
     """
     self.__clauses.append(clause)
 
-  def verify(self, context):
+  def verify(self, context, max_workers=None):
     """Verify the clauses in the contract are currently satisified.
 
+    Clauses that are eventually consistent may each wait for some time.
+    Verifying them concurrently waits for the slowest rather than their sum.
+    The clauses must be independent of one another to do so.
+
+    Args:
+      context: [ExecutionContext] The context to verify within.
+      max_workers: [int] If not None then override the bound max_workers.
+
     Returns:
-     True if success, False if not.
+     ContractVerifyResult with the clause results in declaration order.
     """
+    if max_workers is None:
+      max_workers = self.__max_workers
+
+    cache = None
+    if (self.__observation_cache_secs > 0
+        and context.peek(OBSERVATION_CACHE_CONTEXT_KEY, None) is None):
+      cache = ObservationCache(self.__observation_cache_secs)
+      context.set_internal(OBSERVATION_CACHE_CONTEXT_KEY, cache)
+
+    try:
+      if max_workers > 1 and len(self.__clauses) > 1:
+        all_results = self.__verify_concurrently(context, max_workers)
+      else:
+        all_results = [clause.verify(context) for clause in self.__clauses]
+    finally:
+      if cache is not None:
+        context.clear_key(OBSERVATION_CACHE_CONTEXT_KEY)
+        JournalLogger.journal_or_log(
+            'Observation cache reused {0} and collected {1} observations.'
+            .format(cache.hits, cache.misses),
+            _module=__name__)
+
     valid = True
-    all_results = []
-    for clause in self.__clauses:
-      clause_results = clause.verify(context)
-      all_results.append(clause_results)
+    for clause_results in all_results:
       if not clause_results:
         valid = False
 
     return ContractVerifyResult(valid, all_results)
 
+  def verify_async(self, loop, context):
+    """Coroutine that verifies all the clauses concurrently on the event loop.
+
+    Each clause is verified with its own copy of the context. See
+    ContractClause.verify_async.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      context: [ExecutionContext] The context to verify within.
+
+    Returns:
+     ContractVerifyResult with the clause results in declaration order.
+    """
+    contexts = [context.copy() for _ in self.__clauses]
+    for clause_context in contexts:
+      # A memo from the caller is not safe to share between clauses.
+      clause_context.clear_key(jp.PREDICATE_MEMO_CONTEXT_KEY)
+    all_results = yield [clause.verify_async(loop, clause_context)
+                         for clause, clause_context
+                         in zip(self.__clauses, contexts)]
+    valid = all([bool(clause_result) for clause_result in all_results])
+    raise Return(ContractVerifyResult(valid, all_results))
+
+  def __verify_concurrently(self, context, max_workers):
+    """Verify the clauses on a pool of threads.
+
+    Each clause is verified with its own copy of the context. The journal
+    entries for each clause are held back until the clause finishes, then
+    written after those of the clauses declared before it so the journal
+    reads as if the clauses were verified in turn.
+
+    Args:
+      context: [ExecutionContext] The context to verify within.
+      max_workers: [int] The maximum number of threads to use.
+
+    Returns:
+      list of ContractClauseVerifyResult in declaration order.
+    """
+    journal = get_global_journal()
+    scopes = jp.get_profile_scopes()
+
+    def verify_clause(clause):
+      """Verify a clause within a worker thread."""
+      clause_context = context.copy()
+      # A memo from the caller is not safe to share between threads.
+      clause_context.clear_key(jp.PREDICATE_MEMO_CONTEXT_KEY)
+      if journal is not None:
+        journal.begin_capture()
+      for kind, name in scopes:
+        jp.begin_profile_scope(kind, name)
+
+      result = None
+      exc_info = None
+      try:
+        result = clause.verify(clause_context)
+      except Exception:  # pylint: disable=broad-except
+        exc_info = sys.exc_info()
+
+      for _ in scopes:
+        jp.end_profile_scope()
+      entries = journal.end_capture() if journal is not None else []
+      return result, exc_info, entries
+
+    all_results = []
+    pool = ThreadPool(min(max_workers, len(self.__clauses)))
+    try:
+      for result, exc_info, entries in pool.imap(verify_clause,
+                                                 self.__clauses):
+        if journal is not None:
+          journal.write_captured(entries)
+        if exc_info is not None:
+          raise exc_info[0], exc_info[1], exc_info[2]
+        all_results.append(result)
+    finally:
+      pool.close()
+      pool.join()
+    return all_results
+
 
 class ContractBuilder(object):
   """Acts as a clause factory to assemble clauses into contracts."""
 
-  def __init__(self, clause_factory=None):
+  def __init__(self, clause_factory=None, max_workers=1,
+               observation_cache_secs=0):
     """Constructs a new contract.
 
     Args:
@@ -432,7 +846,13 @@ class ContractBuilder(object):
          It also takes a DEPRECATED strict flag. This is deprecated
          because in the future the strict flag will be on individual
          constraints added to the clause.
+      max_workers: [int] The maximum number of clauses that the contract
+         will verify concurrently.
+      observation_cache_secs: [float] How long the contract's clauses can
+         reuse each other's observations, if at all.
     """
+    self.__max_workers = max_workers
+    self.__observation_cache_secs = observation_cache_secs
     self.__clause_factory = (
         clause_factory
         or (lambda title, retryable_for_secs=0, strict=False:
@@ -460,7 +880,8 @@ class ContractBuilder(object):
 
   def build(self):
     """Creates a new contract with the added clauses."""
-    contract = Contract()
+    contract = Contract(max_workers=self.__max_workers,
+                        observation_cache_secs=self.__observation_cache_secs)
     for builder in self.__builders:
       contract.add_clause(builder.build())
     return contract
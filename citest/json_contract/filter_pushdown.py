@@ -0,0 +1,266 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Plans which verifier constraints a service could filter on for us.
+
+Observers typically fetch entire collections then leave it to the verifier
+to find the objects it is interested in. Most services can filter their
+collections on the server, which avoids transferring and decoding objects
+that the verifier would not count anyway.
+
+The planner derives FilterConditions that every object influencing a
+verifier's outcome must satisfy. Objects that do not satisfy all of them
+can be dropped without changing the outcome, so the verifier still runs in
+full over whatever remains. Each observer translates the conditions its
+service supports into the native filter syntax and ignores the rest.
+"""
+
+
+import collections
+import re
+
+from ..base import JsonSnapshotableEntity
+from ..json_predicate import (
+    PATH_SEP,
+    CardinalityPredicate,
+    ConjunctivePredicate,
+    ContainsPredicate,
+    DictMatchesPredicate,
+    DictSubsetPredicate,
+    DisjunctivePredicate,
+    EquivalentPredicate,
+    PathPredicate,
+    StandardBinaryPredicate)
+
+
+# The condition operators.
+FILTER_EQUALS = 'EQUALS'      # The value (or a list element) equals operand.
+FILTER_CONTAINS = 'CONTAINS'  # The value (or a list element) has substring.
+
+# Only plain field names can be translated into the services' syntaxes.
+_SIMPLE_PATH_RE = re.compile(r'^[A-Za-z_][\w\-\.]*(/[A-Za-z_][\w\-\.]*)*$')
+
+
+class FilterCondition(
+    collections.namedtuple('FilterCondition', ['path', 'op', 'value']),
+    JsonSnapshotableEntity):
+  """A condition that an object must satisfy to be of interest.
+
+  Attributes:
+    path: [string] The slash-delimited path to the value within the object.
+       If the path traverses lists then any of the elements may satisfy it.
+    op: [string] FILTER_EQUALS or FILTER_CONTAINS.
+    value: [string, number or bool] The operand to compare against.
+  """
+
+  def __str__(self):
+    return '"{0}" {1} {2!r}'.format(self.path, self.op, self.value)
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    snapshot.edge_builder.make_control(entity, 'Path', self.path)
+    snapshot.edge_builder.make_control(entity, 'Op', self.op)
+    snapshot.edge_builder.make_control(entity, 'Value', self.value)
+
+
+def intersect_filter_conditions(condition_lists):
+  """Determine the conditions common to each of the lists.
+
+  Args:
+    condition_lists: [list of list of FilterCondition] None entries have no
+       requirements so are ignored.
+
+  Returns:
+    list of FilterCondition or None if every entry was None.
+  """
+  result = None
+  for conditions in condition_lists:
+    if conditions is None:
+      continue
+    if result is None:
+      result = list(conditions)
+    else:
+      result = [condition for condition in result if condition in conditions]
+  return result
+
+
+def _join_path(base, path):
+  """Join a field path relative to the value at base."""
+  if not base:
+    return path
+  if not path:
+    return base
+  return base + PATH_SEP + path
+
+
+def _is_within(path, element_path):
+  """Determine if path is at or below element_path."""
+  return (not element_path
+          or path == element_path
+          or path.startswith(element_path + PATH_SEP))
+
+
+def _make_condition(path, op, value, element_path):
+  """Create the FilterCondition for a value at an absolute path, if possible.
+
+  Returns:
+    list containing the condition relative to the element, or empty list if
+    the condition cannot be expressed on the elements.
+  """
+  if not isinstance(value, (basestring, bool, int, long, float)):
+    return []
+  if element_path:
+    if not path.startswith(element_path + PATH_SEP):
+      return []
+    path = path[len(element_path) + 1:]
+  if not _SIMPLE_PATH_RE.match(path):
+    return []
+  return [FilterCondition(path, op, value)]
+
+
+def _union(condition_lists):
+  """Determine all the conditions in the lists without duplicates."""
+  result = []
+  for conditions in condition_lists:
+    result.extend([condition for condition in conditions
+                   if condition not in result])
+  return result
+
+
+def _conjunction_conditions(path, condition_lists, element_path):
+  """Determine the conditions implied by all the terms of a conjunction.
+
+  Within an element every term holds on that same element. Above the element
+  level different terms may be satisfied by different elements so only the
+  conditions they all share can be pushed down.
+  """
+  if _is_within(path, element_path):
+    return _union(condition_lists)
+  return intersect_filter_conditions(condition_lists) or []
+
+
+def _dict_subset_conditions(context, path, operand, element_path):
+  """Determine the conditions implied by DICT_SUBSET(operand) at path."""
+  terms = []
+  for key, expect in operand.items():
+    key_path = _join_path(path, key)
+    if isinstance(expect, dict):
+      terms.append(
+          _dict_subset_conditions(context, key_path, expect, element_path))
+      continue
+    expect = context.eval(expect)
+    # A string may also be found as a substring of a list element.
+    terms.append(_make_condition(
+        key_path,
+        FILTER_CONTAINS if isinstance(expect, basestring) else FILTER_EQUALS,
+        expect, element_path))
+  return _conjunction_conditions(path, terms, element_path)
+
+
+def _value_conditions(context, pred, path, element_path):
+  """Determine the conditions implied by pred holding on a value at path.
+
+  Args:
+    context: [ExecutionContext] The context the predicate will evaluate in.
+    pred: [ValuePredicate] The predicate to analyze.
+    path: [string] The absolute path that the predicate is applied at.
+    element_path: [string] The path to the elements that the service filters.
+
+  Returns:
+    list of FilterCondition relative to the elements.
+  """
+  # pylint: disable=too-many-return-statements
+  if isinstance(pred, PathPredicate):
+    if pred.pred is None or pred.transform is not None:
+      return []
+    sub_path, _ = pred.eval_path(context)
+    return _value_conditions(context, pred.pred,
+                             _join_path(path, sub_path), element_path)
+
+  if isinstance(pred, ConjunctivePredicate):
+    return _conjunction_conditions(
+        path,
+        [_value_conditions(context, term, path, element_path)
+         for term in pred.predicates],
+        element_path)
+
+  if isinstance(pred, DisjunctivePredicate):
+    return intersect_filter_conditions(
+        [_value_conditions(context, term, path, element_path)
+         for term in pred.predicates]) or []
+
+  if isinstance(pred, DictMatchesPredicate):
+    return _conjunction_conditions(
+        path,
+        [_value_conditions(context, field_pred,
+                           _join_path(path, context.eval(key)), element_path)
+         for key, field_pred in pred.operand.items()],
+        element_path)
+
+  if isinstance(pred, DictSubsetPredicate):
+    return _dict_subset_conditions(
+        context, path, pred.eval_context_operand(context), element_path)
+
+  if isinstance(pred, StandardBinaryPredicate):
+    if pred.name == '==':
+      op = FILTER_EQUALS
+    elif pred.name == 'has-substring':
+      op = FILTER_CONTAINS
+    else:
+      return []
+    return _make_condition(path, op, pred.eval_context_operand(context),
+                           element_path)
+
+  if isinstance(pred, (EquivalentPredicate, ContainsPredicate)):
+    operand = context.eval(pred.operand)
+    op = (FILTER_CONTAINS
+          if isinstance(pred, ContainsPredicate)
+          and isinstance(operand, basestring)
+          else FILTER_EQUALS)
+    return _make_condition(path, op, operand, element_path)
+
+  return []
+
+
+def predicate_filter_conditions(context, pred, element_path=''):
+  """Determine the conditions implied by a verifier's value constraint.
+
+  The constraint is applied to the list of observed objects. Any element
+  that does not satisfy all the returned conditions does not contribute to
+  the constraint's outcome, nor to its cardinality.
+
+  Args:
+    context: [ExecutionContext] The context the constraint will evaluate in.
+    pred: [ValuePredicate] The constraint to analyze.
+    element_path: [string] The path within the observed objects to the
+       elements that the service filters, or empty for the objects themselves.
+
+  Returns:
+    list of FilterCondition relative to the elements.
+  """
+  if isinstance(pred, CardinalityPredicate):
+    # The count only includes values satisfying the path predicate.
+    pred = pred.path_pred
+
+  if isinstance(pred, PathPredicate):
+    if pred.pred is None or pred.transform is not None:
+      return []
+    path, enumerate_terminal = pred.eval_path(context)
+    if not path and not enumerate_terminal:
+      # The predicate is applied to the object list as a whole.
+      return []
+    return _value_conditions(context, pred.pred, path, element_path)
+
+  # Other predicates are applied to each object.
+  return _value_conditions(context, pred, '', element_path)
@@ -0,0 +1,242 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Re-verifies only the observed objects that changed since the last attempt.
+
+When a clause is retried, usually only a few of the observed objects have
+changed since the previous attempt. An IncrementalValueVerification keeps,
+for each object, what each value constraint found in that object alone. On
+the next attempt, objects are matched to the previous ones by a stable
+identity (e.g. their selfLink). Only objects that were added or changed are
+evaluated again. The per-object findings are then combined into the outcome
+for the whole observation.
+
+This is possible because value constraints are satisfied by at least one
+object, or count the values confirmed across the objects, which are the
+sums of what they confirm in each object. Strict verifiers also need the
+distinct values that the constraints confirmed, which are combined too.
+
+Constraints that look at the object list as a whole (e.g. a path that
+indexes into the list) cannot be decomposed this way. If there are any, or
+the objects do not have unique identities, the caller must fall back to
+evaluating the whole observation.
+"""
+
+
+import logging
+import re
+
+from ..json_predicate import PATH_SEP
+from ..json_predicate.cardinality_predicate import CardinalityPredicate
+from ..json_predicate.path_predicate import (
+    PathPredicate,
+    ProducesPathPredicateResult)
+
+
+# The paths tried, in order, to identify an object when none is specified.
+DEFAULT_IDENTITY_PATHS = ['selfLink', 'metadata/selfLink', 'metadata/uid',
+                          'id', 'name', 'metadata/name']
+
+# Matches a path that starts by indexing into the list of observed objects.
+_LEADING_INDEX_RE = re.compile(r'^\{0}?\['.format(PATH_SEP))
+
+
+def object_identity(obj, identity_path=None):
+  """Determine the stable identity of an observed object.
+
+  Args:
+    obj: [obj] The observed object.
+    identity_path: [string] The path to the value identifying the object.
+       If None then the first of the DEFAULT_IDENTITY_PATHS the object has.
+
+  Returns:
+    A hashable identity or None if the object could not be identified.
+  """
+  paths = [identity_path] if identity_path else DEFAULT_IDENTITY_PATHS
+  for path in paths:
+    value = obj
+    for segment in path.split(PATH_SEP):
+      value = value.get(segment) if isinstance(value, dict) else None
+      if value is None:
+        break
+    if value is None or isinstance(value, (dict, list)):
+      continue
+    return (path, value)
+  return None
+
+
+def _equality_key(value):
+  """A hashable key where keys are equal if and only if the values are ==."""
+  if isinstance(value, dict):
+    return frozenset([(key, _equality_key(elem))
+                      for key, elem in value.items()])
+  if isinstance(value, list):
+    return tuple([_equality_key(elem) for elem in value])
+  return value
+
+
+class _ObjectFindings(object):
+  """What the value constraints found in a single observed object."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, obj, counts, confirmed_values, dependencies):
+    self.obj = obj
+    self.counts = counts
+    self.confirmed_values = confirmed_values
+    self.dependencies = dependencies
+
+
+class IncrementalValueVerification(object):
+  """Combines the per-object findings of value constraints across attempts.
+
+  The findings are remembered in the context's PredicateResultMemo, which
+  retains them from one attempt of the clause to the next.
+  """
+
+  @property
+  def num_evaluated(self):
+    """The number of objects evaluated by the most recent is_valid."""
+    return self.__num_evaluated
+
+  @property
+  def num_reused(self):
+    """The number of objects whose findings is_valid most recently reused."""
+    return self.__num_reused
+
+  def __init__(self, value_constraints, strict=False, identity_path=None):
+    """Constructor.
+
+    Args:
+      value_constraints: [list of ValuePredicate] The verifier's constraints
+         on the list of observed objects.
+      strict: [bool] Whether every object must be confirmed by a constraint.
+      identity_path: [string] The path to the value identifying each object.
+         If None then use DEFAULT_IDENTITY_PATHS.
+    """
+    self.__value_constraints = value_constraints
+    self.__strict = strict
+    self.__identity_path = identity_path
+    self.__num_evaluated = 0
+    self.__num_reused = 0
+
+  def __plan(self, context):
+    """Determine how to evaluate each constraint on an individual object.
+
+    Returns:
+      list of (PathPredicate, CardinalityPredicate or None) per constraint,
+      or None if some constraint cannot be evaluated object by object.
+    """
+    plan = []
+    for constraint in self.__value_constraints:
+      cardinality = None
+      if isinstance(constraint, CardinalityPredicate):
+        cardinality = constraint
+        path_pred = constraint.path_pred
+      elif isinstance(constraint, PathPredicate):
+        path_pred = constraint
+      elif not isinstance(constraint, ProducesPathPredicateResult):
+        path_pred = PathPredicate('', constraint)
+      else:
+        return None
+
+      path, enumerate_terminal = path_pred.eval_path(context)
+      if (not path and not enumerate_terminal) or _LEADING_INDEX_RE.match(path):
+        return None
+      plan.append((path_pred, cardinality))
+    return plan
+
+  def __evaluate(self, context, plan, obj, memo):
+    """Find what each constraint confirms within obj alone."""
+    counts = []
+    confirmed_values = [] if self.__strict else None
+    context.begin_access_recording()
+    try:
+      for path_pred, cardinality in plan:
+        if self.__strict:
+          # The same values the full evaluation would count as validated.
+          result = path_pred(context, [obj])
+          counts.append(len(result.path_values))
+          confirmed_values.extend([elem.path_value.value
+                                   for elem in result.valid_candidates])
+        elif cardinality is None:
+          counts.append(1 if path_pred.is_valid(context, [obj]) else 0)
+        else:
+          counts.append(len(list(path_pred.iter_valid_values(context, [obj]))))
+    finally:
+      accessed = context.end_access_recording()
+      context.note_access(accessed)
+    return _ObjectFindings(obj, counts, confirmed_values,
+                           memo.snapshot_dependencies(context, accessed))
+
+  def is_valid(self, context, objects, memo):
+    """Determine whether the value constraints hold on the observed objects.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      objects: [list] The observed objects. This should not be empty.
+      memo: [PredicateResultMemo] Remembers the findings between attempts.
+
+    Returns:
+      True or False, or None if the objects could not be verified
+      incrementally.
+    """
+    plan = self.__plan(context)
+    if plan is None or not objects:
+      return None
+
+    identities = [object_identity(obj, self.__identity_path)
+                  for obj in objects]
+    if None in identities or len(set(identities)) != len(identities):
+      return None
+
+    key = ('IncrementalValueVerification', id(self))
+    prior_findings = memo.recall(key) or {}
+    findings = {}
+    totals = [0] * len(plan)
+    confirmed = set()
+    self.__num_evaluated = 0
+    self.__num_reused = 0
+    for identity, obj in zip(identities, objects):
+      entry = prior_findings.get(identity)
+      if (entry is not None and entry.dependencies is not None
+          and (entry.obj is obj or entry.obj == obj)
+          and memo.dependencies_hold(context, entry.dependencies)):
+        context.note_access(entry.dependencies.keys())
+        self.__num_reused += 1
+      else:
+        entry = self.__evaluate(context, plan, obj, memo)
+        self.__num_evaluated += 1
+
+      findings[identity] = entry
+      totals = [total + count for total, count in zip(totals, entry.counts)]
+      if self.__strict:
+        try:
+          confirmed.update([_equality_key(value)
+                            for value in entry.confirmed_values])
+        except TypeError:
+          return None  # Not JSON values, so cannot tell which are equal.
+
+    memo.remember(key, findings)
+    logging.getLogger(__name__).debug(
+        'Evaluated %d changed objects and reused %d unchanged objects.',
+        self.__num_evaluated, self.__num_reused)
+
+    for (_, cardinality), total in zip(plan, totals):
+      if cardinality is None:
+        if not total:
+          return False
+      elif not cardinality.count_is_valid(context, total):
+        return False
+
+    return not self.__strict or len(confirmed) == len(objects)
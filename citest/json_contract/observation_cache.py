@@ -0,0 +1,183 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shares observations between the clauses of a contract.
+
+Clauses in the same contract often observe the same thing, such as listing
+the same resources. An ObservationCache lets a clause reuse what another
+clause observed moments earlier rather than making the identical request
+and decoding the identical response again.
+
+An entry is only reused within a short time of being collected, and never
+by a clause that has already seen it. So a clause that is retrying until
+it holds always makes a new observation.
+"""
+
+
+import logging
+import threading
+import time
+
+from ..base import JsonSnapshotableEntity
+from .observer import Observation
+
+
+# The ExecutionContext internal attribute holding the active cache, if any.
+OBSERVATION_CACHE_CONTEXT_KEY = 'ObservationCache'
+
+
+def _freeze(value):
+  """Convert a key containing lists and dicts into a hashable value.
+
+  Raises:
+    TypeError if the value contains something that is not hashable.
+  """
+  if isinstance(value, dict):
+    return (dict, tuple(sorted([(key, _freeze(elem))
+                                for key, elem in value.items()])))
+  if isinstance(value, (list, tuple)):
+    return (list, tuple([_freeze(elem) for elem in value]))
+  hash(value)
+  return value
+
+
+class _CacheEntry(object):
+  """An observation in the cache."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.observation = None
+    self.timestamp = None
+    self.consumers = set()
+
+
+class ObservationCache(JsonSnapshotableEntity):
+  """Remembers recent observations so they can be reused.
+
+  The cache is keyed by ObjectObserver.observation_cache_key, which
+  identifies the request the observer makes in the context. Observers
+  without a key are not cached. The key is qualified by the observer's
+  filter and by the paths and conditions that the observation asks for.
+
+  The cache is thread-safe. Concurrent requests for the same key wait for a
+  single observation to be collected.
+  """
+
+  @property
+  def ttl_secs(self):
+    """How long an observation can be reused for."""
+    return self.__ttl_secs
+
+  @property
+  def hits(self):
+    """The number of observations that were reused."""
+    return self.__hits
+
+  @property
+  def misses(self):
+    """The number of observations that were collected."""
+    return self.__misses
+
+  def __init__(self, ttl_secs, now_function=time.time):
+    """Constructor.
+
+    Args:
+      ttl_secs: [float] How long an observation can be reused for.
+      now_function: [callable] Returns the current time in seconds.
+    """
+    self.__ttl_secs = ttl_secs
+    self.__now_function = now_function
+    self.__lock = threading.Lock()
+    self.__entries = {}
+    self.__hits = 0
+    self.__misses = 0
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    snapshot.edge_builder.make_control(entity, 'TTL', self.__ttl_secs)
+    snapshot.edge_builder.make_data(entity, 'Hits', self.__hits)
+    snapshot.edge_builder.make_data(entity, 'Misses', self.__misses)
+
+  @staticmethod
+  def make_key(context, observer, observation):
+    """Determine the cache key for an observation, if it can be cached.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+      observer: [ObjectObserver] The observer collecting the observation.
+      observation: [Observation] The observation to collect into.
+
+    Returns:
+      A hashable key or None if the observation cannot be cached.
+    """
+    observer_key = observer.observation_cache_key(context)
+    if observer_key is None:
+      return None
+    try:
+      observer_key = _freeze(observer_key)
+    except TypeError:
+      return None
+
+    paths = observation.projection_paths
+    conditions = observation.filter_conditions
+    return (observer_key,
+            id(observer.filter) if observer.filter is not None else None,
+            tuple(paths) if paths is not None else None,
+            tuple(conditions) if conditions is not None else None)
+
+  def collect_observation(self, context, observer, observation, consumer):
+    """Collect an observation, reusing a recent one if possible.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+      observer: [ObjectObserver] The observer to collect with.
+      observation: [Observation] The observation to collect into.
+      consumer: [any] Identifies who is asking. An entry is never reused by
+         the same consumer, since it would be asking to see something new.
+    """
+    key = self.make_key(context, observer, observation)
+    if key is None:
+      observer.collect_observation(context, observation)
+      return
+
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry is None:
+        entry = _CacheEntry()
+        self.__entries[key] = entry
+
+    with entry.lock:
+      now = self.__now_function()
+      if (entry.observation is not None
+          and now - entry.timestamp < self.__ttl_secs
+          and id(consumer) not in entry.consumers):
+        entry.consumers.add(id(consumer))
+        with self.__lock:
+          self.__hits += 1
+        logging.getLogger(__name__).debug(
+            'Reusing observation from %s made %.3f secs ago.',
+            observer, now - entry.timestamp)
+        observation.extend(entry.observation)
+        return
+
+      collected = Observation(projection_paths=observation.projection_paths,
+                              filter_conditions=observation.filter_conditions)
+      observer.collect_observation(context, collected)
+      entry.observation = collected
+      entry.timestamp = self.__now_function()
+      entry.consumers = set([id(consumer)])
+      with self.__lock:
+        self.__misses += 1
+    observation.extend(collected)
@@ -65,6 +65,20 @@ class ObservationFailureVerifier(ov.ObservationVerifier):
     """
     super(ObservationFailureVerifier, self).__init__(title)
 
+  def projection_paths(self, context):
+    """Implements ObservationVerifier interface.
+
+    Only the observation errors are looked at, not the objects.
+    """
+    return []
+
+  def filter_conditions(self, context, element_path=''):
+    """Implements ObservationVerifier interface.
+
+    Only the observation errors are looked at, not the objects.
+    """
+    return None
+
   def _error_comment_or_none(self, error):
     """Determine if the error is expected or not.
 
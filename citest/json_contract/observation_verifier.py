@@ -21,6 +21,7 @@ import logging
 from ..base import JsonSnapshotableEntity
 from ..json_predicate import map_predicate
 from ..json_predicate import predicate
+from . import filter_pushdown
 
 class ObservationVerifyResultBuilder(object):
   @property
@@ -337,6 +338,66 @@ class ObservationVerifier(predicate.ValuePredicate):
 
     return builder.build(valid)
 
+  def projection_paths(self, context):
+    """Determine the paths within the observed objects that are verified.
+
+    Streaming observers use these to avoid decoding values that the verifier
+    does not look at.
+
+    Args:
+      context: [ExecutionContext] The context the verifier will run in.
+
+    Returns:
+      list of path strings or None if entire objects may be needed.
+    """
+    if not self.__dnf_verifiers:
+      return None
+
+    paths = []
+    for term in self.__dnf_verifiers:
+      for verifier in term:
+        verifier_paths = verifier.projection_paths(context)
+        if verifier_paths is None:
+          return None
+        paths.extend(verifier_paths)
+    return paths
+
+  def filter_conditions(self, context, element_path=''):
+    """Determine conditions that the objects being verified must satisfy.
+
+    Observers that push down filters to the service use these to avoid
+    fetching objects that cannot affect the verification outcome.
+
+    Args:
+      context: [ExecutionContext] The context the verifier will run in.
+      element_path: [string] The path within the observed objects to the
+         elements that the service filters, or empty for the objects.
+
+    Returns:
+      list of FilterCondition relative to the elements (possibly empty) or
+      None if the outcome does not depend on the objects at all.
+    """
+    if not self.__dnf_verifiers:
+      return []
+
+    return filter_pushdown.intersect_filter_conditions(
+        [verifier.filter_conditions(context, element_path)
+         for term in self.__dnf_verifiers
+         for verifier in term])
+
+  def is_valid(self, context, observation):
+    """Implements ValuePredicate interface."""
+    if not self.__dnf_verifiers:
+      return bool(self(context, observation))
+
+    for term in self.__dnf_verifiers:
+      for verifier in term:
+        if not verifier.is_valid(context, observation):
+          break
+      else:
+        return True
+    return False
+
 
 class _VerifierBuilderWrapper(object):
   """Wraps an existing verifier into a builder.
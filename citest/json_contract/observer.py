@@ -16,7 +16,12 @@
 """Observers make observations that are a collection of data to be verified."""
 
 
+import json
+
 from ..base import JsonSnapshotableEntity
+from ..base import Return
+from ..json_predicate import json_stream
+from . import filter_pushdown
 
 class Observation(JsonSnapshotableEntity):
   """Tracks details for ObjectObserver and ObservationVerifier."""
@@ -31,9 +36,29 @@ class Observation(JsonSnapshotableEntity):
     """Failed PredicateResult objects or other observer errors."""
     return self.__errors
 
-  def __init__(self):
+  @property
+  def projection_paths(self):
+    """The paths within the objects that will be verified, if known.
+
+    Streaming observers may only decode the values along these paths.
+    None indicates that the entire objects may be needed.
+    """
+    return self.__projection_paths
+
+  @property
+  def filter_conditions(self):
+    """The FilterConditions that observers may push down to the service.
+
+    Objects that do not satisfy all of these do not affect the verification
+    so need not be observed. None or empty indicates no filtering.
+    """
+    return self.__filter_conditions
+
+  def __init__(self, projection_paths=None, filter_conditions=None):
     self.__objects = []
     self.__errors = []
+    self.__projection_paths = projection_paths
+    self.__filter_conditions = filter_conditions
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
@@ -44,6 +69,9 @@ class Observation(JsonSnapshotableEntity):
     builder.make_data(entity, 'Objects', self.__objects,
                       format='json',
                       summary=builder.object_count_to_summary(self.__objects))
+    if self.__filter_conditions:
+      builder.make_control(entity, 'Filter Conditions',
+                           self.__filter_conditions)
 
   def __str__(self):
     return 'objects={0!r}  errors={1!r}'.format(
@@ -132,19 +160,148 @@ class ObjectObserver(JsonSnapshotableEntity):
     """
     return self.__filter
 
+  @property
+  def streaming(self):
+    """Whether observed JSON documents are decoded incrementally.
+
+    Streaming observers only materialize the values along the paths that the
+    observation will be verified against. See decode_json_objects.
+    """
+    return self.__streaming
+
+  @property
+  def pushdown(self):
+    """Whether the observer asks the service to filter what it returns.
+
+    See plan_filter_conditions.
+    """
+    return self.__pushdown
+
+  @property
+  def pushdown_element_path(self):
+    """The path within the observed objects to what the service filters.
+
+    This is empty when the service filters the observed objects themselves,
+    which is the default. Specialized observers override this when the
+    observed objects are envelopes around the filtered resources.
+    """
+    return ''
+
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     snapshot.edge_builder.make_mechanism(entity, 'Filter', self.__filter)
+    if self.__streaming:
+      snapshot.edge_builder.make_control(entity, 'Streaming', True)
+    if self.__pushdown:
+      snapshot.edge_builder.make_control(entity, 'Pushdown', True)
 
-  def __init__(self, filter=None):
+  def __init__(self, filter=None, streaming=False, pushdown=False):
     """Construct instance.
 
     Args:
       filter: An optional ValuePredicate. If provided, then use this to filter
           objects as they are collected. Only objects passing the filter will
           be added to observations.
+      streaming: [bool] If True then decode_json_objects only materializes
+          the parts of the objects that the observation's verifier needs.
+      pushdown: [bool] If True then the observation's filter_conditions
+          are translated into the service's native filters, where supported.
     """
     self.__filter = filter
+    self.__streaming = streaming
+    self.__pushdown = pushdown
+
+  def observation_cache_key(self, context):
+    """Identify the request that collect_observation would make.
+
+    Observers making the same request in the same context return equal keys
+    so that an ObservationCache can share their observations.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+
+    Returns:
+      A key built from hashable values, lists and dicts, or None if the
+      observation should not be shared. The default is None.
+    """
+    # pylint: disable=unused-argument
+    return None
+
+  def open_change_stream(self, context, observation):
+    """Start watching for changes to what collect_observation would observe.
+
+    A clause retrying until it holds waits on the stream rather than sleeping
+    so that it observes again as soon as something changes.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+      observation: [Observation] An empty observation like those that will be
+         collected, indicating the filter_conditions, if any.
+
+    Returns:
+      A ChangeStream that the caller will close, or None if changes cannot
+      be watched. The default is None.
+    """
+    # pylint: disable=unused-argument
+    return None
+
+  def plan_filter_conditions(self, context, verifier):
+    """Determine the conditions to push down to the service.
+
+    The result combines the conditions implied by the verifier with those
+    implied by this observer's filter, since objects failing either would
+    not be verified anyway.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+      verifier: [ObservationVerifier] The verifier of the observation.
+
+    Returns:
+      list of FilterCondition relative to pushdown_element_path.
+    """
+    element_path = self.pushdown_element_path
+    conditions = verifier.filter_conditions(context, element_path) or []
+    if self.__filter is not None and not element_path:
+      conditions = conditions + [
+          condition
+          for condition in filter_pushdown.predicate_filter_conditions(
+              context, self.__filter)
+          if condition not in conditions]
+    return conditions
+
+  def decode_json_objects(self, context, content, observation):
+    """Decode the observed objects from a JSON document.
+
+    If the observer is streaming and the observation knows which paths will
+    be verified, then the document is tokenized incrementally and only the
+    values along those paths (and the paths that the filter needs) are
+    materialized. The objects will be missing the other values.
+
+    Args:
+      context: [ExecutionContext] The context the observation is made within.
+      content: [string or file] The JSON encoded document.
+      observation: [Observation] The observation the objects are for.
+
+    Raises:
+      ValueError if the content is not valid JSON.
+
+    Returns:
+      The list of objects in the document. If the document is not a list then
+      it is the only object.
+    """
+    paths = observation.projection_paths if self.__streaming else None
+    if paths is not None and self.__filter is not None:
+      filter_paths = json_stream.predicate_paths(context, self.__filter)
+      paths = None if filter_paths is None else paths + filter_paths
+
+    if paths is None and isinstance(content, basestring):
+      doc = json.JSONDecoder().decode(content)
+      return doc if isinstance(doc, list) else [doc]
+    if paths is None and hasattr(content, 'read'):
+      # The standard decoder is much faster than projecting the whole stream.
+      doc = json.load(content)
+      return doc if isinstance(doc, list) else [doc]
+    return json_stream.JsonPathProjection(paths).decode_elements(content)
 
   def filter_all_objects_to_observation(self, context, objects, observation):
     """Add objects to Observation that comply with the observer's filter.
@@ -175,3 +332,20 @@ class ObjectObserver(JsonSnapshotableEntity):
       trace: If true then debug the details producing the observation.
     """
     raise NotImplementedError('Needs Specialized in ' + self.__class__)
+
+  def collect_observation_async(self, loop, context, observation, trace=True):
+    """Coroutine that collects an Observation.
+
+    The default implementation calls collect_observation, which blocks the
+    event loop. Specializations can override this to observe without blocking.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      See collect_observation for the remaining arguments.
+
+    Returns:
+      The objects collected so far.
+    """
+    # pylint: disable=unused-argument
+    raise Return(self.collect_observation(context, observation, trace=trace))
+    yield  # pylint: disable=unreachable
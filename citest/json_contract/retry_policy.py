@@ -0,0 +1,305 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Decides how long a ContractClause waits before observing again.
+
+A clause that is retryable_for_secs keeps observing until it holds or its
+deadline passes. A RetryPolicy determines the delay between attempts:
+
+   FixedRetryPolicy is the traditional heuristic polling every 1-5 secs.
+   ExponentialBackoffRetryPolicy backs off exponentially with jitter and
+      honors the server's hints to slow down (Retry-After or HTTP 429).
+   LearningRetryPolicy remembers how long each clause took to hold in a
+      local stats file, and first polls near when it is expected to hold.
+
+Every policy is deadline aware: it never delays past the clause's deadline,
+so the final attempt is always made at the deadline.
+
+A clause uses the policy it was constructed with, otherwise the one in its
+ExecutionContext under RETRY_POLICY_CONTEXT_KEY, otherwise the
+FixedRetryPolicy.
+"""
+
+
+import email.utils
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+# The ExecutionContext attribute holding the default RetryPolicy, if any.
+RETRY_POLICY_CONTEXT_KEY = 'RetryPolicy'
+
+
+def _parse_retry_after(value, now):
+  """Convert a Retry-After header value into seconds from now.
+
+  Args:
+    value: [string] Either a number of seconds or an HTTP date.
+    now: [float] The current time.
+
+  Returns:
+    The number of seconds or None if the value could not be understood.
+  """
+  if value is None:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  parsed = email.utils.parsedate_tz(value)
+  if parsed is None:
+    return None
+  return max(0.0, email.utils.mktime_tz(parsed) - now)
+
+
+def _error_status_and_headers(error):
+  """Determine the HTTP status and headers that an observation error has.
+
+  This recognizes errors holding an HttpResponseType (e.g. HttpAgentError)
+  and googleapiclient HttpErrors without depending on either.
+
+  Returns:
+    (status, headers) where either may be None.
+  """
+  http_result = getattr(error, 'http_result', None)
+  if http_result is not None:
+    return (getattr(http_result, 'http_code', None),
+            getattr(http_result, 'headers', None))
+
+  resp = getattr(error, 'resp', None)
+  if resp is not None:
+    return getattr(resp, 'status', None), resp
+  return None, None
+
+
+def server_retry_hint(observation, now=None, throttled_secs=10):
+  """Determine how long the observed server asked us to wait, if at all.
+
+  Args:
+    observation: [Observation] The observation that failed to verify.
+    now: [float] The current time, for Retry-After dates.
+    throttled_secs: [float] The delay to assume when the server indicated
+       that we were being throttled (HTTP 429) without saying for how long.
+
+  Returns:
+    The number of seconds to wait or None if there were no hints.
+  """
+  if observation is None:
+    return None
+  now = time.time() if now is None else now
+  hint = None
+  for error in observation.errors:
+    status, headers = _error_status_and_headers(error)
+    secs = None
+    if headers:
+      secs = _parse_retry_after(
+          headers.get('retry-after', headers.get('Retry-After')), now)
+    if secs is None and status == 429:
+      secs = throttled_secs
+    if secs is not None:
+      hint = secs if hint is None else max(hint, secs)
+  return hint
+
+
+class RetryPolicy(object):
+  """Interface for deciding the delay between clause verification attempts."""
+
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    """Determine how long to wait before the next attempt.
+
+    Args:
+      title: [string] The title of the clause being verified.
+      attempt: [int] The number of attempts made so far.
+      start_time: [float] When the clause started to be verified.
+      end_time: [float] The clause's deadline.
+      now: [float] The current time.
+      observation: [Observation] The most recent observation.
+
+    Returns:
+      The number of seconds to wait. This is no more than end_time - now.
+    """
+    raise NotImplementedError('{0}.next_delay not implemented.'.format(
+        self.__class__.__name__))
+
+  def record_outcome(self, title, valid, elapsed_secs):
+    """Record the final outcome of verifying a retryable clause.
+
+    Args:
+      title: [string] The title of the clause that was verified.
+      valid: [bool] Whether the clause held.
+      elapsed_secs: [float] How long it took to hold or give up.
+    """
+    pass
+
+
+class FixedRetryPolicy(RetryPolicy):
+  """Polls every 1/10 of the retryable time, but within 1 to 5 seconds."""
+
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    """Implements RetryPolicy interface."""
+    return max(0, min(end_time - now,
+                      min(5, max(1, (end_time - start_time) / 10))))
+
+
+class ExponentialBackoffRetryPolicy(RetryPolicy):
+  """Backs off exponentially with jitter, honoring server hints.
+
+  The nominal delay after attempt n is initial_secs * multiplier^(n-1), up
+  to max_secs. The actual delay is randomly reduced by up to the jitter
+  fraction so that concurrent tests do not poll in lockstep. If the server
+  asked us to wait longer, we do.
+  """
+
+  def __init__(self, initial_secs=1, multiplier=2, max_secs=30, jitter=0.5,
+               throttled_secs=10, random_function=random.random):
+    """Constructor.
+
+    Args:
+      initial_secs: [float] The nominal delay after the first attempt.
+      multiplier: [float] How much the nominal delay grows each attempt.
+      max_secs: [float] The largest nominal delay.
+      jitter: [float] The fraction of the delay that may be randomized away.
+      throttled_secs: [float] The delay when throttled by HTTP 429 without
+         a Retry-After.
+      random_function: [callable] Returns a random number in [0, 1).
+    """
+    # pylint: disable=too-many-arguments
+    self.__initial_secs = initial_secs
+    self.__multiplier = multiplier
+    self.__max_secs = max_secs
+    self.__jitter = jitter
+    self.__throttled_secs = throttled_secs
+    self.__random = random_function
+
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    """Implements RetryPolicy interface."""
+    nominal = min(self.__max_secs,
+                  self.__initial_secs * self.__multiplier ** (attempt - 1))
+    delay = nominal * (1 - self.__jitter * self.__random())
+    hint = server_retry_hint(observation, now=now,
+                             throttled_secs=self.__throttled_secs)
+    if hint is not None:
+      delay = max(delay, hint)
+    return max(0, min(end_time - now, delay))
+
+
+class ConvergenceStats(object):
+  """Remembers how long clauses have taken to hold, in a local JSON file.
+
+  The file maps each clause title to its most recent times-to-consistency.
+  """
+
+  def __init__(self, path, max_samples=20):
+    """Constructor.
+
+    Args:
+      path: [string] The path to the stats file. It need not exist yet.
+      max_samples: [int] The number of recent samples to keep per clause.
+    """
+    self.__path = path
+    self.__max_samples = max_samples
+    self.__lock = threading.Lock()
+    self.__samples = None
+
+  def __load(self):
+    """Returns the samples, reading them from the file if needed."""
+    if self.__samples is None:
+      try:
+        with open(self.__path, 'r') as stream:
+          self.__samples = json.JSONDecoder().decode(stream.read())
+      except (IOError, ValueError):
+        self.__samples = {}
+    return self.__samples
+
+  def expected_secs(self, title):
+    """Returns the median time the clause took to hold, or None if unknown."""
+    with self.__lock:
+      samples = sorted(self.__load().get(title, []))
+    if not samples:
+      return None
+    return samples[len(samples) / 2]
+
+  def add_sample(self, title, secs):
+    """Record the time a clause took to hold and save the file."""
+    with self.__lock:
+      samples = self.__load()
+      entries = samples.get(title, []) + [secs]
+      samples[title] = entries[-self.__max_samples:]
+
+      # Replace the file atomically so concurrent readers see it whole.
+      directory = os.path.dirname(os.path.abspath(self.__path))
+      fd, temp_path = tempfile.mkstemp(dir=directory)
+      with os.fdopen(fd, 'w') as stream:
+        stream.write(json.JSONEncoder(indent=2, sort_keys=True)
+                     .encode(samples))
+      os.rename(temp_path, self.__path)
+
+
+class LearningRetryPolicy(RetryPolicy):
+  """Schedules the first re-poll near when the clause usually holds.
+
+  The time each clause took to hold is recorded in ConvergenceStats. After
+  the first attempt fails, the next attempt is made when the clause held
+  in the past. Thereafter, or when there is no history, the base policy
+  determines the delays.
+  """
+
+  @property
+  def stats(self):
+    """The ConvergenceStats learned from."""
+    return self.__stats
+
+  def __init__(self, stats, base_policy=None):
+    """Constructor.
+
+    Args:
+      stats: [ConvergenceStats] The history to learn from and add to.
+      base_policy: [RetryPolicy] The policy to use when there is no history.
+         The default is an ExponentialBackoffRetryPolicy.
+    """
+    self.__stats = stats
+    self.__base_policy = base_policy or ExponentialBackoffRetryPolicy()
+
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    """Implements RetryPolicy interface."""
+    delay = self.__base_policy.next_delay(
+        title, attempt, start_time, end_time, now, observation)
+    if attempt == 1:
+      expected = self.__stats.expected_secs(title)
+      if expected is not None and start_time + expected > now:
+        # Honor any server hint the base policy is waiting longer for.
+        learned = start_time + expected - now
+        if server_retry_hint(observation, now=now) is None:
+          delay = learned
+        else:
+          delay = max(delay, learned)
+        logging.getLogger(__name__).debug(
+            '%s usually holds after %.3f secs. Waiting %.3f secs.',
+            title, expected, delay)
+    return max(0, min(end_time - now, delay))
+
+  def record_outcome(self, title, valid, elapsed_secs):
+    """Implements RetryPolicy interface."""
+    if valid:
+      self.__stats.add_sample(title, elapsed_secs)
+    self.__base_policy.record_outcome(title, valid, elapsed_secs)
@@ -19,9 +19,13 @@ import logging
 
 from ..json_predicate import binary_predicate
 from ..json_predicate import cardinality_predicate
+from ..json_predicate import json_stream
 from ..json_predicate import logic_predicate
 from ..json_predicate import path_predicate
 from ..json_predicate import predicate
+from ..json_predicate.predicate_memo import PREDICATE_MEMO_CONTEXT_KEY
+from . import filter_pushdown
+from .incremental_verification import IncrementalValueVerification
 from . import observation_verifier as ov
 from . import observation_failure as of
 
@@ -40,7 +44,8 @@ class ValueObservationVerifierBuilder(ov.ObservationVerifierBuilder):
   predicate being specified.
   """
 
-  def __init__(self, title, strict=False):
+  def __init__(self, title, strict=False, incremental=False,
+               identity_path=None):
     """Constructor.
 
     Args:
@@ -50,9 +55,15 @@ class ValueObservationVerifierBuilder(ov.ObservationVerifierBuilder):
          constraints.  Non-strict verifiers require all the constraints
          to be satisfied by at least one object (but not necessarily the same),
          and some objects may not satisfy any constraints at all.
+      incremental: [bool] Whether retries only re-evaluate the objects that
+         changed since the previous attempt.
+      identity_path: [string] The path to the value identifying objects
+         when incremental. None uses the selfLink, id, name, etc.
     """
     super(ValueObservationVerifierBuilder, self).__init__(title)
     self.__strict = strict
+    self.__incremental = incremental
+    self.__identity_path = identity_path
     self.__constraints = []
 
   def __eq__(self, builder):
@@ -68,7 +79,9 @@ class ValueObservationVerifierBuilder(ov.ObservationVerifierBuilder):
         title=self.title,
         dnf_verifiers=dnf_verifiers,
         constraints=self.__constraints,
-        strict=self.__strict)
+        strict=self.__strict,
+        incremental=self.__incremental,
+        identity_path=self.__identity_path)
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
@@ -228,6 +241,8 @@ class ValueObservationVerifier(ov.ObservationVerifier):
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     snapshot.edge_builder.make_control(entity, 'Strict', self.__strict)
+    if self.__incremental is not None:
+      snapshot.edge_builder.make_control(entity, 'Incremental', True)
     snapshot.edge_builder.make_control(
         entity, 'Constraints', self.__constraints)
     super(ValueObservationVerifier, self).export_to_json_snapshot(
@@ -254,10 +269,17 @@ class ValueObservationVerifier(ov.ObservationVerifier):
           Otherwise if False then the verifier requires each of the constraints
           to be satisfied by at least one object. Not necessarily the same
           object, nor does any object have to satisfy even one constraint.
+      incremental: If True then when the clause is retried, is_valid only
+          re-evaluates the objects that were added or changed since the
+          previous attempt. Objects are matched up by identity_path.
+      identity_path: The path to the value identifying each object when
+          incremental. If None then use the selfLink, uid, id or name.
 
        See base class (ov.ObservationVerifier) for additional kwargs.
     """
     self.__strict = kwargs.pop('strict', False)
+    incremental = kwargs.pop('incremental', False)
+    identity_path = kwargs.pop('identity_path', None)
     constraints = kwargs.pop('constraints', None)
     self.__constraints = constraints
     self.__value_constraints = []
@@ -267,6 +289,11 @@ class ValueObservationVerifier(ov.ObservationVerifier):
         self.__observation_constraints.append(constraint)
       else:
         self.__value_constraints.append(constraint)
+    self.__incremental = (
+        IncrementalValueVerification(self.__value_constraints,
+                                     strict=self.__strict,
+                                     identity_path=identity_path)
+        if incremental or identity_path else None)
     super(ValueObservationVerifier, self).__init__(title, **kwargs)
 
   def __call__(self, context, observation):
@@ -308,15 +335,12 @@ class ValueObservationVerifier(ov.ObservationVerifier):
     # constraint.
     final_builder = ov.ObservationVerifyResultBuilder(observation)
 
-    for constraint in self.__value_constraints:
+    constraint_results = self.__evaluate_value_constraints(
+        context, object_list)
+    for constraint, constraint_result in zip(self.__value_constraints,
+                                             constraint_results):
       logging.getLogger(__name__).debug('Verifying constraint=%s',
                                         constraint)
-
-      if isinstance(constraint, path_predicate.ProducesPathPredicateResult):
-        constraint_result = constraint(context, object_list)
-      else:
-        constraint_result = (
-            path_predicate.PathPredicate('', constraint)(context, object_list))
       if not constraint_result:
         logging.getLogger(__name__).debug('FAILED constraint')
         valid = False
@@ -334,3 +358,109 @@ class ValueObservationVerifier(ov.ObservationVerifier):
         logging.getLogger(__name__).info(comment)
 
     return final_builder.build(valid)
+
+  def is_valid(self, context, observation):
+    """Implements ValuePredicate interface.
+
+    Strict verifiers need to know which objects were validated, so they
+    fall back to the full evaluation unless they are incremental.
+    """
+    if self.__strict and self.__incremental is None:
+      return bool(self(context, observation))
+
+    for constraint in self.__observation_constraints:
+      if not constraint.is_valid(context, observation):
+        return False
+
+    if observation.errors:
+      return not self.__value_constraints
+
+    memo = context.peek(PREDICATE_MEMO_CONTEXT_KEY, None)
+    if self.__incremental is not None and memo is not None:
+      valid = self.__incremental.is_valid(context, observation.objects, memo)
+      if valid is not None:
+        return valid
+    if self.__strict:
+      return bool(self(context, observation))
+
+    object_list = observation.objects or [None]
+    for constraint in self.__value_constraints:
+      if not isinstance(constraint,
+                        path_predicate.ProducesPathPredicateResult):
+        constraint = path_predicate.PathPredicate('', constraint)
+      if not constraint.is_valid(context, object_list):
+        return False
+    return True
+
+  def projection_paths(self, context):
+    """Implements ObservationVerifier interface."""
+    paths = []
+    for constraint in self.__observation_constraints:
+      constraint_paths = constraint.projection_paths(context)
+      if constraint_paths is None:
+        return None
+      paths.extend(constraint_paths)
+
+    for constraint in self.__value_constraints:
+      constraint_paths = json_stream.predicate_paths(context, constraint)
+      if constraint_paths is None:
+        return None
+      paths.extend(constraint_paths)
+    return paths
+
+  def filter_conditions(self, context, element_path=''):
+    """Implements ObservationVerifier interface.
+
+    Strict verifiers require every object to satisfy the constraints, so
+    filtering out objects could hide failures.
+    """
+    if self.__strict:
+      return []
+
+    condition_lists = [constraint.filter_conditions(context, element_path)
+                       for constraint in self.__observation_constraints]
+    condition_lists.extend(
+        [filter_pushdown.predicate_filter_conditions(
+            context, constraint, element_path)
+         for constraint in self.__value_constraints])
+    return filter_pushdown.intersect_filter_conditions(condition_lists)
+
+  def __evaluate_value_constraints(self, context, object_list):
+    """Evaluate each of the value constraints against the object list.
+
+    Constraints that are driven by a PathPredicate share a single
+    PathPredicateTrie traversal of the object_list rather than each walking
+    the objects independently.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      object_list: [list] The observed objects to verify.
+
+    Returns:
+      list of PathPredicateResult in the order of the value constraints.
+    """
+    results = [None] * len(self.__value_constraints)
+    trie_preds = []
+    trie_indexes = []
+    for index, constraint in enumerate(self.__value_constraints):
+      if isinstance(constraint, cardinality_predicate.CardinalityPredicate):
+        trie_preds.append(constraint.path_pred)
+      elif isinstance(constraint, path_predicate.PathPredicate):
+        trie_preds.append(constraint)
+      elif not isinstance(constraint,
+                          path_predicate.ProducesPathPredicateResult):
+        trie_preds.append(path_predicate.PathPredicate('', constraint))
+      else:
+        results[index] = constraint(context, object_list)
+        continue
+      trie_indexes.append(index)
+
+    trie = path_predicate.PathPredicateTrie(trie_preds)
+    for index, path_result in zip(trie_indexes, trie(context, object_list)):
+      constraint = self.__value_constraints[index]
+      if isinstance(constraint, cardinality_predicate.CardinalityPredicate):
+        results[index] = constraint.evaluate_path_predicate_result(
+            context, object_list, path_result)
+      else:
+        results[index] = path_result
+    return results
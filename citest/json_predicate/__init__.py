@@ -61,9 +61,15 @@ from .path_predicate_result import (
     PathPredicateResultBuilder,
     PathPredicateResultCandidate)
 
+from .predicate_memo import (
+    PREDICATE_MEMO_CONTEXT_KEY,
+    PredicateResultMemo,
+    fingerprint_json)
+
 from .path_predicate import (
     DONT_ENUMERATE_TERMINAL,
-    PathPredicate)
+    PathPredicate,
+    PathPredicateTrie)
 
 from .path_transforms import (
     FieldDifference)
@@ -137,3 +143,18 @@ from .cardinality_predicate import (
     FailedCardinalityRangeResult,
     MissingValueCardinalityResult,
     UnexpectedValueCardinalityResult)
+
+from .json_stream import (
+    JsonPathProjection,
+    iter_json_tokens,
+    predicate_paths)
+
+from .predicate_profiler import (
+    PROFILE_CLAUSE_SCOPE,
+    PROFILE_TEST_SCOPE,
+    PredicateProfiler,
+    PredicateStats,
+    begin_profile_scope,
+    end_profile_scope,
+    get_active_profiler,
+    get_profile_scopes)
@@ -21,6 +21,7 @@ predicate to.
 """
 
 
+import collections
 import inspect
 
 from . import predicate
@@ -28,12 +29,14 @@ from .keyed_predicate_result import KeyedPredicateResultBuilder
 from .map_predicate import MapPredicate
 from .path_value import PathValue
 from .path_predicate import PathPredicate
+from .predicate_memo import predicate_is_valid
 from .path_result import (
     MissingPathError,
     PathValueResult,
     TypeMismatchError,
     UnexpectedPathError)
 from .sequenced_predicate_result import SequencedPredicateResultBuilder
+from . import vectorized_ops
 
 
 class BinaryPredicate(predicate.ValuePredicate):
@@ -130,6 +133,11 @@ class StandardBinaryPredicateFactory(object):
     """The name of the predicate for reporting purposes."""
     return self.__name
 
+  @property
+  def comparison_op(self):
+    """The callable taking (value, operand) implementing the predicate."""
+    return self.__comparison_op
+
   def __init__(self, name, comparison_op, **kwargs):
     """Constructor.
 
@@ -137,6 +145,8 @@ class StandardBinaryPredicateFactory(object):
       name: Name of the comparison_op
       comparison_op: Callable that takes (value, operand) and returns bool.
       operand_type: Class expected for operands, or None to not enforce.
+      vectorized_op: Optional callable that takes (values, operand) and
+         returns a list of bool for each value or None (see vectorized_ops).
     """
     self.__name = name
     self.__comparison_op = comparison_op
@@ -150,6 +160,11 @@ class StandardBinaryPredicateFactory(object):
 class StandardBinaryPredicate(BinaryPredicate):
   """A BinaryPredicate using a bool predicate bound at construction."""
 
+  @property
+  def comparison_op(self):
+    """The callable taking (value, operand) implementing the predicate."""
+    return self.__comparison_op
+
   def __init__(self, name, comparison_op, operand, **kwargs):
     """Constructor.
 
@@ -157,9 +172,12 @@ class StandardBinaryPredicate(BinaryPredicate):
       name: Name of predicate
       comparison_op: Implements bool predicate
       operand: Value to bind to predicate.
+      vectorized_op: Optional implementation of comparison_op over a list
+         of values, returning a list of bool or None if it cannot.
 
       See base class (BinaryPredicate) for additional kwargs.
     """
+    self.__vectorized_op = kwargs.pop('vectorized_op', None)
     super(StandardBinaryPredicate, self).__init__(name, operand, **kwargs)
     self.__comparison_op = comparison_op
 
@@ -172,6 +190,17 @@ class StandardBinaryPredicate(BinaryPredicate):
     return PathValueResult(pred=self, source=value, target_path='',
                            path_value=PathValue('', value), valid=valid)
 
+  @property
+  def supports_batch(self):
+    """Implements ValuePredicate interface."""
+    return self.__vectorized_op is not None
+
+  def is_valid_batch(self, context, values):
+    """Implements ValuePredicate interface."""
+    if self.__vectorized_op is None:
+      return None
+    return self.__vectorized_op(values, self.eval_context_operand(context))
+
 
 class DictMatchesPredicate(BinaryPredicate):
   """Implements binary predicate comparison predicates against dict values.
@@ -199,6 +228,13 @@ class DictMatchesPredicate(BinaryPredicate):
     self.__strict = kwargs.pop('strict', False)
     super(DictMatchesPredicate, self).__init__('Matches', operand, **kwargs)
 
+    # The field predicates do not change so are only constructed once.
+    self.__path_preds = [
+        (key, pred, PathPredicate(key, pred, source_pred=pred,
+                                  enumerate_terminals=False))
+        for key, pred in operand.items()]
+    self.__expect_keys = frozenset(operand.keys())
+
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     entity.add_metadata('strict', self.__strict)
@@ -223,10 +259,9 @@ class DictMatchesPredicate(BinaryPredicate):
     match_result_builder = KeyedPredicateResultBuilder(self)
     valid = True
     # pylint: disable=redefined-variable-type
-    for key, pred in self.operand.items():
+    for key, _, path_pred in self.__path_preds:
       name = context.eval(key)
-      name_result = PathPredicate(key, pred, source_pred=pred,
-                                  enumerate_terminals=False)(context, value)
+      name_result = path_pred(context, value)
       if not name_result:
         valid = False
       match_result_builder.add_result(name, name_result)
@@ -240,6 +275,27 @@ class DictMatchesPredicate(BinaryPredicate):
 
     return match_result_builder.build(valid)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface.
+
+    Plain field names are looked up directly rather than traversing a path.
+    """
+    if not isinstance(value, dict):
+      return False
+    if self.strict:
+      for key in value.keys():
+        if key not in self.__expect_keys:
+          return False
+
+    for key, pred, path_pred in self.__path_preds:
+      if _is_field_name(key):
+        field = value.get(key)
+        if field is None or not predicate_is_valid(context, pred, field):
+          return False
+      elif not path_pred.is_valid(context, value):
+        return False
+    return True
+
   def _find_unexpected_path_errors(self, context, source):
     """Check value keys for unexpected ones.
 
@@ -252,13 +308,276 @@ class DictMatchesPredicate(BinaryPredicate):
     """
     # pylint: disable=unused-argument
     errors = {}
-    expect_keys = self.operand.keys()
     for key, value in source.items():
-      if key not in expect_keys:
+      if key not in self.__expect_keys:
         errors[key] = UnexpectedPathError(source=source, target_path=key,
                                           path_value=PathValue(key, value))
     return errors
 
+def _is_field_name(key):
+  """Determine if a DictMatchesPredicate key is a plain field name."""
+  return (isinstance(key, basestring) and key != ''
+          and not [c for c in '/@[' if c in key])
+
+
+def _is_hashable_scalar(value):
+  """Determine if value is a JSON scalar that can be used as a hash key."""
+  return value is None or isinstance(value, (basestring, bool, int, long,
+                                             float))
+
+
+class _ListElementIndex(object):
+  """Hash indexes over a list of values for finding likely predicate matches.
+
+  The indexes are built lazily as predicates ask for candidates so only
+  the discriminating fields actually referenced by the predicates get
+  indexed. A value that could not be indexed (e.g. a field whose value is a
+  container) is always returned as a candidate so the caller still evaluates
+  it with the real predicate.
+  """
+
+  def __init__(self, values):
+    self.__values = values
+    self.__value_index = None
+    self.__field_indexes = {}
+    self.__signatures = None
+
+  def candidates(self, context, pred):
+    """Determine which list elements could possibly satisfy a predicate.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate operands within.
+      pred: [ValuePredicate] The predicate to find candidates for.
+
+    Returns:
+      Sorted list of element indexes that might satisfy pred, or None if
+      the predicate is not one that can use an index.
+    """
+    if (isinstance(pred, StandardBinaryPredicate)
+        and pred.name == '=='):
+      operand = context.eval(pred.operand)
+      if not _is_hashable_scalar(operand):
+        return None
+      return self.__lookup_value(operand)
+
+    if isinstance(pred, DictSubsetPredicate):
+      return self.subset_candidates(context, pred.eval_context_operand(context))
+
+    return None
+
+  def subset_candidates(self, context, operand):
+    """Determine which list elements could possibly have operand as a subset.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate operands within.
+      operand: [dict] The expected subset.
+
+    Returns:
+      Sorted list of element indexes that might be supersets of operand, or
+      None if operand has no scalar fields to look up.
+    """
+    best = None
+    for key, operand_value in operand.items():
+      if isinstance(operand_value, (dict, list)):
+        continue
+      operand_value = context.eval(operand_value)
+      if not _is_hashable_scalar(operand_value):
+        continue
+      found = self.__lookup_field(key, operand_value)
+      if best is None or len(found) < len(best):
+        best = found
+        if not best:
+          break
+    return best
+
+  def has_value(self, value):
+    """Determine if value is in the list, as the 'in' operator would."""
+    values = self.__values
+    return any([values[index] == value
+                for index in self.__lookup_value(value)])
+
+  def has_signature(self, signature):
+    """Determine if a container element has the given _freeze_json value."""
+    if self.__signatures is None:
+      signatures = set()
+      for value in self.__values:
+        if isinstance(value, (dict, list)):
+          try:
+            signatures.add(_freeze_json(value))
+          except TypeError:
+            pass
+      self.__signatures = signatures
+    return signature in self.__signatures
+
+  def __lookup_value(self, operand):
+    """Return the indexes of the elements that equal the operand."""
+    if self.__value_index is None:
+      value_index = {}
+      unindexed = []
+      for index, value in enumerate(self.__values):
+        if _is_hashable_scalar(value):
+          value_index.setdefault(value, []).append(index)
+        elif not isinstance(value, (dict, list)):
+          unindexed.append(index)
+      self.__value_index = (value_index, unindexed)
+
+    value_index, unindexed = self.__value_index
+    return sorted(value_index.get(operand, []) + unindexed)
+
+  def __lookup_field(self, key, operand):
+    """Return the indexes of the dict elements whose key might be operand."""
+    if key not in self.__field_indexes:
+      field_index = {}
+      unindexed = []
+      for index, value in enumerate(self.__values):
+        if not isinstance(value, dict) or key not in value:
+          continue
+        field_value = value[key]
+        if _is_hashable_scalar(field_value):
+          field_index.setdefault(field_value, []).append(index)
+        else:
+          unindexed.append(index)
+      self.__field_indexes[key] = (field_index, unindexed)
+
+    field_index, unindexed = self.__field_indexes[key]
+    return sorted(field_index.get(operand, []) + unindexed)
+
+
+def _signature_or_none(value):
+  """Returns the _freeze_json signature of value or None if not hashable."""
+  try:
+    return _freeze_json(value)
+  except TypeError:
+    return None
+
+
+def _dict_is_subset(context, expect, value):
+  """Determine if expect is a subset of the dictionary value.
+
+  This is the boolean form of DictSubsetPredicate, using _ListElementIndex
+  to find the elements of lists rather than trying each against each.
+
+  Args:
+    context: [ExecutionContext] The context to evaluate operands within.
+    expect: [dict] The expected subset.
+    value: [dict] The value that should be a superset of expect.
+  """
+  for name, expect_value in expect.items():
+    if name not in value:
+      return False
+    value_value = value[name]
+    if isinstance(value_value, dict):
+      if not _dict_is_subset(context, expect_value, value_value):
+        return False
+    elif isinstance(value_value, list):
+      if isinstance(expect_value, list):
+        found = _list_has_subset(context, expect_value, value_value)
+      else:
+        found = _list_contains(context, expect_value, value_value)
+      if not found:
+        return False
+    elif context.eval(expect_value) != value_value:
+      return False
+  return True
+
+
+def _list_has_subset(context, expect, values, index=None):
+  """Determine if every element of expect is a (non-strict) member of values.
+
+  This is the boolean form of a non-strict ListSubsetPredicate. Expected
+  elements are deduplicated by their signature, scalars are looked up by
+  hash, and dictionaries are only compared against the candidate elements
+  sharing their scalar fields.
+
+  Args:
+    context: [ExecutionContext] The context to evaluate operands within.
+    expect: [list] The expected subset.
+    values: [list] The value that should be a superset of expect.
+    index: [_ListElementIndex] An existing index over values, if any.
+  """
+  index = index or _ListElementIndex(values)
+  checked = set()
+  for elem in expect:
+    signature = _signature_or_none(elem)
+    if signature is not None:
+      if signature in checked:
+        continue
+      checked.add(signature)
+
+    if isinstance(elem, (int, long, float, basestring)):
+      found = index.has_value(elem)
+    elif isinstance(elem, dict):
+      found = ((signature is not None and index.has_signature(signature))
+               or _find_dict_superset(context, elem, values, index))
+    elif isinstance(elem, list):
+      found = False
+      for value in values:
+        if isinstance(value, list) and _list_has_subset(context, elem, value):
+          found = True
+          break
+    else:
+      raise TypeError('Unhandled type {0}'.format(elem.__class__))
+    if not found:
+      return False
+  return True
+
+
+def _find_dict_superset(context, expect, values, index):
+  """Determine if any dictionary in values has expect as a subset."""
+  candidates = index.subset_candidates(context, expect)
+  if candidates is None:
+    candidates = range(len(values))
+  for elem_index in candidates:
+    value = values[elem_index]
+    if isinstance(value, dict) and _dict_is_subset(context, expect, value):
+      return True
+  return False
+
+
+def _list_contains(context, operand, values):
+  """Determine if the list values CONTAINS operand.
+
+  This is the boolean form of ContainsPredicate on a list. Exact matches
+  are looked up by hash before resorting to examining each element.
+
+  Args:
+    context: [ExecutionContext] The context to evaluate operands within.
+    operand: [any] The operand to look for.
+    values: [list] The list to look in.
+  """
+  if isinstance(operand, list):
+    return _list_has_subset(context, operand, values)
+
+  index = _ListElementIndex(values)
+  if isinstance(operand, basestring) and index.has_value(operand):
+    return True
+  if isinstance(operand, dict):
+    signature = _signature_or_none(operand)
+    if signature is not None and index.has_signature(signature):
+      return True
+    # Examine the elements in order, as ContainsPredicate does, but only
+    # those dictionaries that might match.
+    candidates = index.subset_candidates(context, operand)
+    if candidates is not None:
+      candidates = set(candidates)
+    for elem_index, value in enumerate(values):
+      if isinstance(value, list):
+        if _list_contains(context, operand, value):
+          return True
+      elif (isinstance(value, dict)
+            and (candidates is None or elem_index in candidates)
+            and _dict_is_subset(context, operand, value)):
+        return True
+    return False
+
+  # Stop at the first match, as ContainsPredicate does.
+  pred = CONTAINS(operand)
+  for value in values:
+    if pred(context, value):
+      return True
+  return False
+
+
 class ListMatchesPredicate(BinaryPredicate):
   """Implements binary predicate comparison predicates against list values.
 
@@ -338,6 +657,36 @@ class ListMatchesPredicate(BinaryPredicate):
 
     return match_result_builder.build(valid)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface.
+
+    Operands that are equality or DICT_SUBSET predicates look up their
+    candidate elements in hash indexes on the discriminating fields so that
+    only those candidates are evaluated. Other operands are evaluated
+    against every element as __call__ does.
+    """
+    if not isinstance(value, list):
+      return False
+
+    index = _ListElementIndex(value)
+    matched = set()
+    for match_pred in self.operand:
+      candidates = index.candidates(context, match_pred)
+      if candidates is None:
+        candidates = range(len(value))
+
+      count = 0
+      for elem_index in candidates:
+        if match_pred.is_valid(context, value[elem_index]):
+          count += 1
+          if self.__unique and count > 1:
+            return False
+          matched.add(elem_index)
+      if not count:
+        return False
+
+    return not self.__strict or len(matched) == len(value)
+
   def _find_strictness_errors(self, matched_element_count, source):
     """Check for each element being matched
 
@@ -374,6 +723,12 @@ class DictSubsetPredicate(BinaryPredicate):
     operand = self.eval_context_operand(context)
     return self._is_subset(context, value, '', operand, value)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    if not isinstance(value, dict):
+      return False
+    return _dict_is_subset(context, self.eval_context_operand(context), value)
+
   def _is_subset(self, context, source, path, a, b):
     """Determine if |a| is a subset of |b|.
 
@@ -406,8 +761,17 @@ class DictSubsetPredicate(BinaryPredicate):
 
       # IF the element is a list
       # THEN ensure that |a_item| is a subset of |b_item|.
+      # The indexed search determines this quickly. Only if it fails do we
+      # use the element predicate to explain why.
       if isinstance(b_value, list):
-        elem_pred = LIST_SUBSET if isinstance(a_value, list) else CONTAINS
+        if isinstance(a_value, list):
+          found = _list_has_subset(context, a_value, b_value)
+          elem_pred = LIST_SUBSET
+        else:
+          found = _list_contains(context, a_value, b_value)
+          elem_pred = CONTAINS
+        if found:
+          continue
         result = elem_pred(a_value)(context, b_value)
         if not result:
           return result.clone_with_source(
@@ -510,16 +874,31 @@ class ListSubsetPredicate(_BaseListMembershipPredicate):
     if not isinstance(value, list):
       return TypeMismatchError(list, value.__class__, value)
 
-    for elem in self.eval_context_operand(context):
-      if not self._verify_elem(context, elem, the_list=value):
-        return PathValueResult(pred=self, valid=False,
-                               path_value=PathValue('', value),
-                               source=value, target_path='')
-
+    valid = self.is_valid(context, value)
     return PathValueResult(
-        pred=self, valid=True, path_value=PathValue('', value),
+        pred=self, valid=valid, path_value=PathValue('', value),
         source=value, target_path='')
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    if not isinstance(value, list):
+      return False
+    operand = self.eval_context_operand(context)
+    if not self.strict:
+      return _list_has_subset(context, operand, value)
+
+    index = _ListElementIndex(value)
+    for elem in operand:
+      if isinstance(elem, (dict, list)):
+        signature = _signature_or_none(elem)
+        found = (index.has_signature(signature) if signature is not None
+                 else elem in value)
+      else:
+        found = index.has_value(elem)
+      if not found:
+        return False
+    return True
+
 
 class ListMembershipPredicate(_BaseListMembershipPredicate):
   """Implements binary predicate comparison predicate for list membership."""
@@ -679,16 +1058,19 @@ class DifferentPredicate(BinaryPredicate):
 
 
 NUM_LE = StandardBinaryPredicateFactory(
-    '<=', lambda a, b: a <= b, operand_type=(int, long, float))
+    '<=', lambda a, b: a <= b, operand_type=(int, long, float),
+    vectorized_op=vectorized_ops.make_numeric_op(lambda a, b: a <= b))
 NUM_GE = StandardBinaryPredicateFactory(
-    '>=', lambda a, b: a >= b, operand_type=(int, long, float))
+    '>=', lambda a, b: a >= b, operand_type=(int, long, float),
+    vectorized_op=vectorized_ops.make_numeric_op(lambda a, b: a >= b))
 NUM_EQ = StandardBinaryPredicateFactory(
     '==', lambda a, b: a == b, operand_type=(int, long, float))
 NUM_NE = StandardBinaryPredicateFactory(
     '!=', lambda a, b: a != b, operand_type=(int, long, float))
 
 STR_SUBSTR = StandardBinaryPredicateFactory(
-    'has-substring', lambda a, b: a.find(b) >= 0, operand_type=basestring)
+    'has-substring', lambda a, b: a.find(b) >= 0, operand_type=basestring,
+    vectorized_op=vectorized_ops.substring_op)
 STR_EQ = StandardBinaryPredicateFactory(
     '==', lambda a, b: a == b, operand_type=basestring)
 STR_NE = StandardBinaryPredicateFactory(
@@ -707,11 +1089,36 @@ LIST_NE = StandardBinaryPredicateFactory(
     '!=', lambda a, b: a != b, operand_type=list)
 LIST_MATCHES = ListMatchesPredicate
 
+def _freeze_json(value):
+  """Convert a JSON value into an equivalent hashable value.
+
+  Raises:
+    TypeError if the value contains something that is not hashable.
+  """
+  if isinstance(value, dict):
+    return frozenset([(key, _freeze_json(elem))
+                      for key, elem in value.items()])
+  if isinstance(value, list):
+    return (list, tuple([_freeze_json(elem) for elem in value]))
+  hash(value)
+  return value
+
+
 def lists_equivalent(a, b):
   """Determine if two lists are equivalent without regard to order."""
   # pylint: disable=invalid-name
   if len(a) != len(b):
     return False
+
+  # Count the occurances of each element rather than sorting so that this
+  # is linear and does not depend on the elements being orderable.
+  try:
+    counts = collections.Counter([_freeze_json(value) for value in a])
+    counts.subtract([_freeze_json(value) for value in b])
+    return not any(counts.values())
+  except TypeError:
+    pass
+
   sorted_a = sorted(a)
   sorted_b = sorted(b)
   for index, value in enumerate(sorted_a):
@@ -264,7 +264,56 @@ class CardinalityPredicate(predicate.ValuePredicate,
     Returns:
       PredicateResponse
     """
-    collected_result = self.__path_pred(context, obj)
+    return self.evaluate_path_predicate_result(
+        context, obj, self.__path_pred(context, obj))
+
+  def is_valid(self, context, obj):
+    """Implements ValuePredicate interface.
+
+    This mirrors the cardinality rules in __call__ but stops counting
+    as soon as the outcome is known.
+    """
+    the_max = context.eval(self.__max)
+    the_min = context.eval(self.__min)
+    count = 0
+    for _ in self.__path_pred.iter_valid_values(context, obj):
+      count += 1
+      if the_max == 0:
+        return False
+      if the_max is None and count >= the_min:
+        return True
+      if the_max is not None and count > the_max:
+        return False
+
+    return self.count_is_valid(context, count)
+
+  def count_is_valid(self, context, count):
+    """Determine if the number of values confirmed by path_pred is valid.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate min and max within.
+      count: [int] The number of values that path_pred confirmed.
+    """
+    the_max = context.eval(self.__max)
+    the_min = context.eval(self.__min)
+    if not count:
+      return the_max == 0
+    return count >= the_min and (the_max is None or count <= the_max)
+
+  def evaluate_path_predicate_result(self, context, obj, collected_result):
+    """Determine the cardinality result from an already collected result.
+
+    This allows the path_pred to be evaluated elsewhere (e.g. alongside
+    other predicates in a PathPredicateTrie).
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      obj: [obj] The JSON object the path_pred was applied to.
+      collected_result: [PathPredicateResult] The result from path_pred.
+
+    Returns:
+      PredicateResponse
+    """
     count = len(collected_result.path_values)
 
     the_max = context.eval(self.__max)
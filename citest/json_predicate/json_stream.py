@@ -0,0 +1,562 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Decodes JSON documents incrementally, keeping only the parts of interest.
+
+Decoding a large JSON document into python objects can take far more memory
+than the encoded document itself. When the document is only going to be
+checked by predicates on some paths within it, a JsonPathProjection can
+decode it from a stream of tokens while only materializing the values along
+those paths. The resulting values have the same structure as the original
+document except that dictionary entries that no path refers to are omitted
+and list elements that no path refers to are replaced by None so that the
+remaining elements keep their original indexes.
+
+Predicates on the projected paths evaluate the same as they would on the
+original document. Other predicates, or predicates applied to the values
+containing a projected path, may not.
+"""
+
+
+import json
+import json.decoder
+import json.scanner
+import re
+
+from .binary_predicate import DictMatchesPredicate
+from .cardinality_predicate import CardinalityPredicate
+from .logic_predicate import (
+    ConjunctivePredicate,
+    DisjunctivePredicate,
+    NegationPredicate)
+from .path_predicate import (
+    DONT_ENUMERATE_TERMINAL,
+    PathPredicate)
+from .path_value import PATH_SEP
+from .predicate_compiler import (
+    _INDEX_STEP,
+    _KEY_STEP,
+    _SELF_STEP,
+    _compile_path_steps)
+
+
+# The kinds of tokens produced by iter_json_tokens.
+BEGIN_OBJECT = 'BEGIN_OBJECT'
+END_OBJECT = 'END_OBJECT'
+BEGIN_ARRAY = 'BEGIN_ARRAY'
+END_ARRAY = 'END_ARRAY'
+KEY = 'KEY'
+VALUE = 'VALUE'
+
+# The number of characters to read from a stream at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+_NUMBER_CHARS_RE = re.compile(r'[-+.eE0-9]*')
+
+# The literal names that JSONDecoder accepts and their values.
+_LITERALS = [
+    ('true', True),
+    ('false', False),
+    ('null', None),
+    ('NaN', float('nan')),
+    ('Infinity', float('inf')),
+    ('-Infinity', float('-inf'))
+]
+_MAX_LITERAL_LEN = max([len(name) for name, _ in _LITERALS])
+
+# What the tokenizer expects to see next.
+_EXPECT_VALUE = 'VALUE'
+_EXPECT_VALUE_OR_END = 'VALUE_OR_END'
+_EXPECT_KEY = 'KEY'
+_EXPECT_KEY_OR_END = 'KEY_OR_END'
+_EXPECT_COLON = 'COLON'
+_EXPECT_COMMA_OR_END = 'COMMA_OR_END'
+_EXPECT_NOTHING = 'NOTHING'
+
+
+def _iter_chunks(source, chunk_size):
+  """Generate the text of source in chunks.
+
+  Args:
+    source: [string, file or iterable of string] The encoded JSON.
+    chunk_size: [int] The size to read file-like sources in.
+  """
+  if isinstance(source, basestring):
+    yield source
+  elif hasattr(source, 'read'):
+    while True:
+      chunk = source.read(chunk_size)
+      if not chunk:
+        break
+      yield chunk
+  else:
+    for chunk in source:
+      yield chunk
+
+
+class _JsonTokenizer(object):
+  """Implements iter_json_tokens."""
+
+  def __init__(self, source, chunk_size):
+    self.__chunks = _iter_chunks(source, chunk_size)
+    self.__buffer = ''
+    self.__pos = 0
+    self.__consumed = 0   # Offset of the buffer within the document.
+    self.__eof = False
+
+  def __fill(self):
+    """Append the next chunk to the buffer.
+
+    Returns:
+      False if there is no more input.
+    """
+    if self.__eof:
+      return False
+    for chunk in self.__chunks:
+      if not chunk:
+        continue
+      self.__consumed += self.__pos
+      self.__buffer = self.__buffer[self.__pos:] + chunk
+      self.__pos = 0
+      return True
+    self.__eof = True
+    return False
+
+  def __error(self, message):
+    return ValueError('{0}: char {1}'.format(
+        message, self.__consumed + self.__pos))
+
+  def __skip_whitespace(self):
+    """Advance to the next non-whitespace character.
+
+    Returns:
+      False if there is no more input.
+    """
+    while True:
+      self.__pos = _WHITESPACE_RE.match(self.__buffer, self.__pos).end()
+      if self.__pos < len(self.__buffer):
+        return True
+      if not self.__fill():
+        return False
+
+  def __read_string(self):
+    """Read the string starting at the current position."""
+    while True:
+      try:
+        value, end = json.decoder.scanstring(self.__buffer, self.__pos + 1)
+        self.__pos = end
+        return value
+      except ValueError as ex:
+        # The string may just continue into the next chunk.
+        if not self.__fill():
+          raise self.__error(str(ex))
+
+  def __read_scalar(self):
+    """Read the number or literal starting at the current position."""
+    # Make sure the whole literal is in the buffer if this might be one.
+    while True:
+      rest = self.__buffer[self.__pos:self.__pos + _MAX_LITERAL_LEN]
+      if not [name for name, _ in _LITERALS
+              if len(rest) < len(name) and name.startswith(rest)]:
+        break
+      if not self.__fill():
+        break
+
+    for name, value in _LITERALS:
+      if self.__buffer.startswith(name, self.__pos):
+        self.__pos += len(name)
+        return value
+
+    # Make sure the whole number is in the buffer before matching it.
+    while (_NUMBER_CHARS_RE.match(self.__buffer, self.__pos).end()
+           == len(self.__buffer)
+           and self.__fill()):
+      pass
+
+    match = json.scanner.NUMBER_RE.match(self.__buffer, self.__pos)
+    if match is None:
+      raise self.__error('Expecting value')
+    self.__pos = match.end()
+    integer, fraction, exponent = match.groups()
+    if fraction or exponent:
+      return float(integer + (fraction or '') + (exponent or ''))
+    return int(integer)
+
+  def tokens(self):
+    """Generate the (kind, value) tokens in the document."""
+    # pylint: disable=too-many-branches
+    stack = []
+    expect = _EXPECT_VALUE
+    while True:
+      if not self.__skip_whitespace():
+        if expect != _EXPECT_NOTHING:
+          raise self.__error('Unexpected end of JSON input')
+        return
+
+      char = self.__buffer[self.__pos]
+      if expect == _EXPECT_NOTHING:
+        raise self.__error('Extra data')
+
+      if expect == _EXPECT_COLON:
+        if char != ':':
+          raise self.__error('Expecting : delimiter')
+        self.__pos += 1
+        expect = _EXPECT_VALUE
+        continue
+
+      if expect == _EXPECT_COMMA_OR_END:
+        self.__pos += 1
+        if char == ',':
+          expect = (_EXPECT_KEY if stack[-1] == BEGIN_OBJECT
+                    else _EXPECT_VALUE)
+          continue
+        if char == '}' and stack[-1] == BEGIN_OBJECT:
+          stack.pop()
+          yield END_OBJECT, None
+        elif char == ']' and stack[-1] == BEGIN_ARRAY:
+          stack.pop()
+          yield END_ARRAY, None
+        else:
+          self.__pos -= 1
+          raise self.__error('Expecting , delimiter')
+        expect = _EXPECT_COMMA_OR_END if stack else _EXPECT_NOTHING
+        continue
+
+      if expect in (_EXPECT_KEY, _EXPECT_KEY_OR_END):
+        if char == '}' and expect == _EXPECT_KEY_OR_END:
+          self.__pos += 1
+          stack.pop()
+          yield END_OBJECT, None
+          expect = _EXPECT_COMMA_OR_END if stack else _EXPECT_NOTHING
+          continue
+        if char != '"':
+          raise self.__error('Expecting property name enclosed in '
+                             'double quotes')
+        yield KEY, self.__read_string()
+        expect = _EXPECT_COLON
+        continue
+
+      # Otherwise we are expecting a value.
+      if char == ']' and expect == _EXPECT_VALUE_OR_END:
+        self.__pos += 1
+        stack.pop()
+        yield END_ARRAY, None
+      elif char == '{':
+        self.__pos += 1
+        stack.append(BEGIN_OBJECT)
+        yield BEGIN_OBJECT, None
+        expect = _EXPECT_KEY_OR_END
+        continue
+      elif char == '[':
+        self.__pos += 1
+        stack.append(BEGIN_ARRAY)
+        yield BEGIN_ARRAY, None
+        expect = _EXPECT_VALUE_OR_END
+        continue
+      elif char == '"':
+        yield VALUE, self.__read_string()
+      else:
+        yield VALUE, self.__read_scalar()
+      expect = _EXPECT_COMMA_OR_END if stack else _EXPECT_NOTHING
+
+
+def iter_json_tokens(source, chunk_size=DEFAULT_CHUNK_SIZE):
+  """Incrementally tokenize a JSON document.
+
+  Args:
+    source: [string, file or iterable of string] The JSON encoded document.
+       File-like objects are read a chunk at a time, as are iterables.
+    chunk_size: [int] The number of characters to read from files at a time.
+
+  Raises:
+    ValueError if the document is not valid JSON. Tokens preceding the error
+    will have already been generated.
+
+  Returns:
+    A generator of (kind, value) tuples where kind is one of BEGIN_OBJECT,
+    END_OBJECT, BEGIN_ARRAY, END_ARRAY, KEY or VALUE. The value is the
+    name for KEY tokens, the decoded scalar for VALUE tokens, otherwise None.
+  """
+  return _JsonTokenizer(source, chunk_size).tokens()
+
+
+def _build_value(tokens, token):
+  """Materialize the value whose first token is token."""
+  kind, value = token
+  if kind == VALUE:
+    return value
+  if kind == BEGIN_OBJECT:
+    result = {}
+    for kind, value in tokens:
+      if kind == END_OBJECT:
+        return result
+      result[value] = _build_value(tokens, next(tokens))
+  else:
+    result = []
+    for token in tokens:
+      if token[0] == END_ARRAY:
+        return result
+      result.append(_build_value(tokens, token))
+  raise ValueError('Unexpected end of JSON input')
+
+
+def _skip_value(tokens, token):
+  """Consume the tokens of the value whose first token is token."""
+  if token[0] == VALUE:
+    return
+  depth = 1
+  for kind, _ in tokens:
+    if kind in (BEGIN_OBJECT, BEGIN_ARRAY):
+      depth += 1
+    elif kind in (END_OBJECT, END_ARRAY):
+      depth -= 1
+      if not depth:
+        return
+
+
+class _ProjectionState(object):
+  """The positions along the projected paths of a value being decoded."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, positions, path_steps):
+    """Constructor.
+
+    Args:
+      positions: [frozenset] The (path index, step index) within path_steps
+         that the value is at.
+      path_steps: [list of list] The parsed steps for each path.
+    """
+    self.positions = positions
+
+    # A dictionary value is at the end of paths ending with a SELF step.
+    self.terminal = False
+    for path_index, step_index in positions:
+      steps = path_steps[path_index]
+      if (step_index == len(steps)
+          or (step_index == len(steps) - 1
+              and steps[step_index][0] is _SELF_STEP)):
+        self.terminal = True
+
+    # The positions of the children of a dictionary value by key.
+    # The positions of the children of a list value that are not indexed.
+    # The positions of the children of a list value by index.
+    self.key_positions = {}
+    enumerated = set()
+    self.index_positions = {}
+    for path_index, step_index in positions:
+      if step_index == len(path_steps[path_index]):
+        continue
+      kind, arg = path_steps[path_index][step_index]
+      if kind is _KEY_STEP:
+        self.key_positions.setdefault(arg, set()).add(
+            (path_index, step_index + 1))
+        enumerated.add((path_index, step_index))
+      elif kind is _INDEX_STEP:
+        self.index_positions.setdefault(arg, set()).add(
+            (path_index, step_index + 1))
+      else:
+        enumerated.add((path_index, step_index))
+    self.enumerated_positions = frozenset(enumerated)
+
+
+class JsonPathProjection(object):
+  """Decodes JSON documents keeping only the values along certain paths.
+
+  The paths are interpreted the same way as PathPredicate paths, including
+  the implicit traversal of lists.
+  """
+
+  @property
+  def paths(self):
+    """The paths being kept, or None if entire documents are kept."""
+    return self.__paths
+
+  def __init__(self, paths):
+    """Constructor.
+
+    Args:
+      paths: [list of string] The PathPredicate paths to keep, or None to
+         keep the entire document.
+    """
+    self.__paths = None if paths is None else list(paths)
+    if paths is None:
+      # A single empty path keeps everything.
+      self.__path_steps = [[]]
+    else:
+      self.__path_steps = [
+          _compile_path_steps(path.rstrip(PATH_SEP + DONT_ENUMERATE_TERMINAL))
+          for path in self.__paths]
+    self.__states = {}
+
+  def __state(self, positions):
+    """Return the _ProjectionState for the given positions."""
+    state = self.__states.get(positions)
+    if state is None:
+      state = _ProjectionState(positions, self.__path_steps)
+      self.__states[positions] = state
+    return state
+
+  def __list_element_state(self, state, index):
+    """Return the state of the element at index within a list in state."""
+    if state.terminal:
+      return state
+    positions = state.enumerated_positions
+    indexed = state.index_positions.get(index)
+    if indexed:
+      positions = positions.union(indexed)
+    return self.__state(positions) if positions else None
+
+  def __project(self, tokens, token, state):
+    """Decode the value whose first token is token in the given state."""
+    kind = token[0]
+    if kind == VALUE:
+      return token[1]
+    if state.terminal:
+      return _build_value(tokens, token)
+
+    if kind == BEGIN_OBJECT:
+      result = {}
+      for kind, key in tokens:
+        if kind == END_OBJECT:
+          return result
+        child_token = next(tokens)
+        positions = state.key_positions.get(key)
+        if positions is None:
+          _skip_value(tokens, child_token)
+        else:
+          result[key] = self.__project(
+              tokens, child_token, self.__state(frozenset(positions)))
+    else:
+      result = []
+      for child_token in tokens:
+        if child_token[0] == END_ARRAY:
+          return result
+        child_state = self.__list_element_state(state, len(result))
+        if child_state is None:
+          _skip_value(tokens, child_token)
+          result.append(None)
+        else:
+          result.append(self.__project(tokens, child_token, child_state))
+    raise ValueError('Unexpected end of JSON input')
+
+  def iter_elements(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generate the projected elements of a JSON document as they are decoded.
+
+    If the document is a list then its elements are generated individually
+    as a list of observed objects would be. Otherwise the document is treated
+    as a list containing only the document. The paths are relative to this
+    list so, as with PathPredicate, they apply to each of the elements.
+
+    Args:
+      source: [string, file or iterable of string] The JSON encoded document.
+      chunk_size: [int] The number of characters to read from files at a time.
+
+    Raises:
+      ValueError if the document is not valid JSON.
+    """
+    tokens = iter_json_tokens(source, chunk_size=chunk_size)
+    root = self.__state(
+        frozenset([(index, 0) for index in range(len(self.__path_steps))]))
+
+    try:
+      token = next(tokens)
+    except StopIteration:
+      raise ValueError('No JSON object could be decoded')
+
+    if token[0] != BEGIN_ARRAY:
+      state = self.__list_element_state(root, 0)
+      yield (None if state is None
+             else self.__project(tokens, token, state))
+    else:
+      index = 0
+      for token in tokens:
+        if token[0] == END_ARRAY:
+          break
+        state = self.__list_element_state(root, index)
+        if state is None:
+          _skip_value(tokens, token)
+          yield None
+        else:
+          yield self.__project(tokens, token, state)
+        index += 1
+
+    # Make sure the remainder of the document is valid.
+    for _ in tokens:
+      pass
+
+  def decode_elements(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return the list of projected elements from iter_elements."""
+    return list(self.iter_elements(source, chunk_size=chunk_size))
+
+
+def _join_paths(base, path):
+  """Join a path relative to the values at base."""
+  if not base:
+    return path
+  if not path:
+    return base
+  if path.startswith('['):
+    return base + path
+  return base + PATH_SEP + path.lstrip(PATH_SEP)
+
+
+def predicate_paths(context, pred):
+  """Determine the paths within a value that a predicate looks at.
+
+  This is used to determine the JsonPathProjection needed to evaluate pred.
+
+  Args:
+    context: [ExecutionContext] The context the predicate will evaluate in.
+    pred: [ValuePredicate] The predicate to analyze.
+
+  Returns:
+    list of path strings, or None if pred may look at the entire value.
+  """
+  # pylint: disable=too-many-return-statements
+  if isinstance(pred, CardinalityPredicate):
+    pred = pred.path_pred
+
+  if isinstance(pred, PathPredicate):
+    path, enumerate_terminal = pred.eval_path(context)
+    if pred.pred is None or pred.transform is not None:
+      return [path]
+    sub_paths = predicate_paths(context, pred.pred)
+    if not sub_paths:
+      return [path]
+    if enumerate_terminal and [p for p in sub_paths if p.startswith('[')]:
+      return [path]
+    return [_join_paths(path, sub_path) for sub_path in sub_paths]
+
+  if isinstance(pred, (ConjunctivePredicate, DisjunctivePredicate)):
+    paths = []
+    for term in pred.predicates:
+      term_paths = predicate_paths(context, term)
+      if term_paths is None:
+        return None
+      paths.extend(term_paths)
+    return paths
+
+  if isinstance(pred, NegationPredicate):
+    return predicate_paths(context, pred.predicate)
+
+  if isinstance(pred, DictMatchesPredicate) and not pred.strict:
+    paths = []
+    for key, field_pred in pred.operand.items():
+      field_paths = predicate_paths(context, field_pred) or ['']
+      paths.extend([_join_paths(key, path) for path in field_paths])
+    return paths
+
+  return None
@@ -62,6 +62,13 @@ class ConjunctivePredicate(ValuePredicate):
     return SequencedPredicateResult(
         valid=valid, pred=self, results=everything)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    for pred in self.__conjunction:
+      if not pred.is_valid(context, value):
+        return False
+    return True
+
 
 class DisjunctivePredicate(ValuePredicate):
   """A ValuePredicate that calls a sequence of predicates until one succeeds."""
@@ -106,6 +113,13 @@ class DisjunctivePredicate(ValuePredicate):
     return SequencedPredicateResult(
         valid=valid, pred=self, results=everything)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    for pred in self.__disjunction:
+      if pred.is_valid(context, value):
+        return True
+    return False
+
 
 class NegationPredicate(ValuePredicate):
   """A ValuePredicate that negates another predicate."""
@@ -138,6 +152,10 @@ class NegationPredicate(ValuePredicate):
     return SequencedPredicateResult(
         valid=not base_result.valid, pred=self, results=[base_result])
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    return not self.__pred.is_valid(context, value)
+
 
 class ConditionalPredicate(ValuePredicate):
   """A ValuePredicate that implements IF/THEN.
@@ -165,7 +183,7 @@ class ConditionalPredicate(ValuePredicate):
   @property
   def else_predicate(self):
     """The predicate forming the ELSE clause."""
-    return self.__then_pred
+    return self.__else_pred
 
   def __init__(self, if_predicate, then_predicate, else_predicate=None,
                **kwargs):
@@ -227,6 +245,14 @@ class ConditionalPredicate(ValuePredicate):
     return SequencedPredicateResult(
         valid=result.valid, pred=self, results=tried)
 
+  def is_valid(self, context, value):
+    """Implements ValuePredicate interface."""
+    if self.__demorgan_pred:
+      return self.__demorgan_pred.is_valid(context, value)
+    if self.__if_pred.is_valid(context, value):
+      return self.__then_pred.is_valid(context, value)
+    return self.__else_pred.is_valid(context, value)
+
 
 AND = ConjunctivePredicate
 OR = DisjunctivePredicate
@@ -185,6 +185,16 @@ class MapPredicate(predicate.ValuePredicate):
     """The predicate to map over the individual values."""
     return self.__pred
 
+  @property
+  def min(self):
+    """The minimum number of values expected to be valid, if any."""
+    return self.__min
+
+  @property
+  def max(self):
+    """The maximum number of values expected to be valid, if any."""
+    return self.__max
+
   def __init__(self, pred, min=1, max=None, **kwargs):
     """Constructor.
 
@@ -248,6 +258,25 @@ class MapPredicate(predicate.ValuePredicate):
         good_map=good_map,
         bad_map=bad_map)
 
+  def is_valid(self, context, obj):
+    """Implements ValuePredicate interface."""
+    if not isinstance(obj, list) and obj != None:
+      obj_list = [obj]
+    else:
+      obj_list = obj or []
+
+    the_min = context.eval(self.__min)
+    the_max = context.eval(self.__max)
+    count = 0
+    for elem in obj_list:
+      if self.__pred.is_valid(context, elem):
+        count += 1
+        if the_max != None and count > the_max:
+          return False
+        if the_max == None and the_min != None and count >= the_min:
+          return True
+    return not (the_min != None and count < the_min)
+
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     builder = snapshot.edge_builder
@@ -59,6 +59,7 @@ exact index in the source.
 
 
 import collections
+import itertools
 import re
 
 from .path_value import (
@@ -71,6 +72,12 @@ from .predicate import (
 
 from .path_predicate_result import PathPredicateResultBuilder
 
+from .predicate_memo import (
+    apply_predicate,
+    predicate_is_valid)
+
+from . import vectorized_ops
+
 from .path_result import (
     MissingPathError,
     PathValueResult,
@@ -83,6 +90,9 @@ _QueueElement = collections.namedtuple('QueueElem',
                                        ['path_offset', 'path_value'])
 
 
+# Marks the end of the values remaining at a level of the traversal stack.
+_NO_VALUE = object()
+
 # Terminal used to mean dont enumerate the value if it is a list
 DONT_ENUMERATE_TERMINAL = '@'
 
@@ -118,7 +128,8 @@ def _process_dict_element(elem, target_path):
   # Determine the next path segment we are looking for.
   match = _INDEX_RE.search(target_path, path_offset)
   if match is not None and match.start(0) == path_offset:
-    return TypeMismatchError(list, dict, source, target_path, from_path_value)
+    return [], [TypeMismatchError(list, dict, source, target_path,
+                                  from_path_value)]
   match = _SEGMENT_RE.search(target_path, path_offset)
   if match is None:
     next_offset = len(target_path)
@@ -314,33 +325,181 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
         (i.e. pred(lookup(source, path)))
     """
 
-    path = context.eval(self.__path)
-
-    builder = PathPredicateResultBuilder(pred=self.source_pred, source=source)
-    enumerate_terminal = self.__enumerate_terminals
-    if path and path[-1] in (PATH_SEP, DONT_ENUMERATE_TERMINAL):
-      enumerate_terminal = path[-1] != DONT_ENUMERATE_TERMINAL
-      path = path[:-1]
+    path, enumerate_terminal = self.eval_path(context)
 
-    queue = [_QueueElement(0, PathValue('', source))]
+    queue = collections.deque([_QueueElement(0, PathValue('', source))])
     if not path and not (enumerate_terminal and isinstance(source, list)):
-      return self.__add_queue_to_builder(
-          context, builder, queue, enumerate_terminal)
+      return self.build_result(context, source, list(queue), [],
+                               enumerate_terminal)
 
     final_queue = []
+    path_failures = []
     while queue:
-      top = queue.pop(0)
+      top = queue.popleft()
       if top.path_offset >= len(path):
         final_queue.append(top)
         continue
 
       candidates, fails = _process_queue_element(top, path)
       queue.extend(candidates)
-      builder.add_all_path_failures(fails)
+      path_failures.extend(fails)
+
+    return self.build_result(context, source, final_queue, path_failures,
+                             enumerate_terminal)
+
+  def eval_path(self, context):
+    """Determine the actual path to traverse within the given context.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate the path in.
+
+    Returns:
+      The (path, enumerate_terminal) tuple where path has any trailing
+      PATH_SEP or DONT_ENUMERATE_TERMINAL marker removed and
+      enumerate_terminal indicates the effective terminal policy.
+    """
+    path = context.eval(self.__path)
+    enumerate_terminal = self.__enumerate_terminals
+    if path and path[-1] in (PATH_SEP, DONT_ENUMERATE_TERMINAL):
+      enumerate_terminal = path[-1] != DONT_ENUMERATE_TERMINAL
+      path = path[:-1]
+    return path, enumerate_terminal
+
+  def build_result(self, context, source, final_queue, path_failures,
+                   enumerate_terminal):
+    """Build the PathPredicateResult from an already traversed source.
+
+    This is the second half of __call__, which is exposed so that other
+    components (e.g. PathPredicateTrie) can traverse the source on our
+    behalf then finish the evaluation here.
 
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      source: [obj] The JSON object the path was traversed from.
+      final_queue: [list of _QueueElement] The values at the end of the path.
+      path_failures: [list of PredicateResult] The pruned paths in the
+         order they were encountered.
+      enumerate_terminal: [bool] See eval_path.
+
+    Returns:
+      PathPredicateResult
+    """
+    builder = PathPredicateResultBuilder(pred=self.source_pred, source=source)
+    builder.add_all_path_failures(path_failures)
     return self.__add_queue_to_builder(
         context, builder, final_queue, enumerate_terminal)
 
+  def iter_valid_values(self, context, source):
+    """Lazily generate the values that this predicate would confirm.
+
+    This follows the same traversal as __call__ but only yields the values
+    (after any transform) that satisfy the filter pred. It does not record
+    the paths or failures, nor does it construct any result objects.
+
+    If NumPy is available and the filter pred supports batches, then once
+    there are at least MIN_BATCH_SIZE values they are all collected so that
+    the filter pred can evaluate them together with is_valid_batch.
+    Otherwise the values are evaluated as they are found, stopping as soon
+    as the caller stops asking for more.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      source: [obj] The JSON object to apply the predicate to.
+
+    Yields:
+      The individual values found along the path that satisfy the filter.
+    """
+    candidates = self.__iter_terminal_values(context, source)
+    if self.__pred is None:
+      for candidate in candidates:
+        yield candidate
+      return
+
+    if vectorized_ops.numpy_available() and self.__pred.supports_batch:
+      head = list(itertools.islice(candidates, vectorized_ops.MIN_BATCH_SIZE))
+      if len(head) < vectorized_ops.MIN_BATCH_SIZE:
+        candidates = head
+      else:
+        candidates = head + list(candidates)
+        batch_valid = self.__pred.is_valid_batch(context, candidates)
+        if batch_valid is not None:
+          for candidate, valid in zip(candidates, batch_valid):
+            if valid:
+              yield candidate
+          return
+
+    for candidate in candidates:
+      if predicate_is_valid(context, self.__pred, candidate):
+        yield candidate
+
+  def __iter_terminal_values(self, context, source):
+    """Lazily generate the (transformed) values found along the path.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      source: [obj] The JSON object to traverse.
+
+    Yields:
+      The individual values at the end of the path.
+    """
+    # This walks depth-first so that the first values are yielded before
+    # the remainder of a large list is traversed. The stack holds iterators
+    # over the values remaining at each offset so that enumerating a list
+    # does not visit its elements until they are reached, in their order.
+    path, enumerate_terminal = self.eval_path(context)
+    path_len = len(path)
+    stack = [(0, iter([source]))]
+    while stack:
+      offset, values = stack[-1]
+      value = next(values, _NO_VALUE)
+      if value is _NO_VALUE:
+        stack.pop()
+        continue
+
+      if offset >= path_len:
+        if enumerate_terminal and isinstance(value, list):
+          candidates = value
+        else:
+          candidates = [value]
+        for candidate in candidates:
+          if self.__transform:
+            candidate = self.__transform(context, candidate)
+          yield candidate
+        continue
+
+      if isinstance(value, dict):
+        match = _INDEX_RE.match(path, offset)
+        if match is not None:
+          continue
+        match = _SEGMENT_RE.search(path, offset)
+        if match is None:
+          next_offset = path_len
+          next_segment = path[offset:]
+          if next_segment == PATH_SEP:
+            stack.append((next_offset, iter([value])))
+            continue
+        else:
+          next_offset = match.end(0)
+          next_segment = match.groups(0)[0]
+        child = value.get(next_segment, None)
+        if child is not None:
+          stack.append((next_offset, iter([child])))
+
+      elif isinstance(value, list):
+        match = _INDEX_RE.match(path, offset)
+        if match is None:
+          stack.append((offset, iter(value)))
+        else:
+          index = int(match.groups(0)[0])
+          if index < len(value):
+            stack.append((match.end(0), iter([value[index]])))
+
+  def is_valid(self, context, source):
+    """Implements ValuePredicate interface."""
+    for _ in self.iter_valid_values(context, source):
+      return True
+    return False
+
   def __add_queue_to_builder(
       self, context, builder, final_queue, enumerate_terminal):
     """Helper method for processing the final candidates from the queue.
@@ -393,7 +552,7 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
           else:
             xformed = path_value.value
 
-          pred_result = self.__pred(context, xformed)
+          pred_result = apply_predicate(context, self.__pred, xformed)
           if isinstance(pred_result, CloneableWithNewSource):
             base_path = path_value.path
             pred_result = pred_result.clone_with_source(
@@ -404,3 +563,228 @@ class PathPredicate(ValuePredicate, ProducesPathPredicateResult):
           builder.add_result_candidate(path_value, pred_result)
 
     return builder.build()
+
+
+class _PathTrieEntry(object):
+  """Tracks the traversal state for one distinct path within a PathTrie."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, path):
+    self.path = path
+    self.final_queue = []
+    self.path_failures = []
+
+
+class _PathTrieNode(object):
+  """A node in the PathPredicateTrie denoting a common path prefix.
+
+  All the entries at a node share the same path prefix up to |offset|.
+  The node precomputes how values reaching it should continue on to
+  the next nodes depending on whether the value is a dict or a list.
+  """
+  # pylint: disable=too-few-public-methods
+  # pylint: disable=too-many-instance-attributes
+
+  def __init__(self, offset, entries):
+    self.offset = offset
+    self.entries = entries
+
+    # Entries whose path ends at this node.
+    self.terminal = []
+
+    # Entries whose path is still pending past this node.
+    self.pending = []
+
+    # Entries whose next path element is an index, which dicts cannot follow.
+    self.dict_index_entries = []
+
+    # List of (segment, is_self, child node) for following dict values.
+    self.dict_steps = []
+
+    # List of (index, child node) for following list values with an index.
+    self.list_index_steps = []
+
+    # The node to enumerate list elements into, if any.
+    self.list_enumerate_node = None
+
+
+class PathPredicateTrie(object):
+  """Evaluates multiple PathPredicates against a common source in one pass.
+
+  Each PathPredicate normally walks the source independently. When there are
+  many predicates over the same source, the shared path prefixes (and
+  especially the enumeration of the source list itself) are walked over and
+  over again. The trie merges the paths so each value is visited once and
+  dispatched to every path interested in it. The results for each predicate
+  are the same PathPredicateResult that calling the predicate would return.
+  """
+
+  @property
+  def path_predicates(self):
+    """The list of PathPredicate evaluated together."""
+    return self.__path_predicates
+
+  def __init__(self, path_predicates):
+    """Constructor.
+
+    Args:
+      path_predicates: [list of PathPredicate] The predicates to evaluate.
+    """
+    self.__path_predicates = list(path_predicates)
+
+  def __call__(self, context, source):
+    """Apply each of the path predicates to the source.
+
+    Args:
+      context: [ExecutionContext] The context to evaluate within.
+      source: [obj] The JSON object to apply the predicates to.
+
+    Returns:
+      list of PathPredicateResult corresponding to each path_predicate.
+    """
+    entry_map = {}
+    pred_entries = []
+    for pred in self.__path_predicates:
+      path, enumerate_terminal = pred.eval_path(context)
+      entry = entry_map.get(path)
+      if entry is None:
+        entry = _PathTrieEntry(path)
+        entry_map[path] = entry
+      pred_entries.append((pred, entry, enumerate_terminal))
+
+    root = self.__build_node(0, sorted(entry_map.values(),
+                                       key=lambda entry: entry.path), {})
+    self.__traverse(root, source)
+
+    return [pred.build_result(context, source,
+                              entry.final_queue, entry.path_failures,
+                              enumerate_terminal)
+            for pred, entry, enumerate_terminal in pred_entries]
+
+  def __build_node(self, offset, entries, node_cache):
+    """Build the trie node for the entries sharing a prefix up to offset.
+
+    Args:
+      offset: [int] The offset into the paths that this node is at.
+      entries: [list of _PathTrieEntry] The entries sharing the prefix.
+      node_cache: [dict] Nodes already built keyed by offset and entries.
+
+    Returns:
+      _PathTrieNode
+    """
+    key = (offset, tuple([id(entry) for entry in entries]))
+    node = node_cache.get(key)
+    if node is not None:
+      return node
+    node = _PathTrieNode(offset, entries)
+    node_cache[key] = node
+
+    dict_groups = collections.OrderedDict()
+    list_index_groups = collections.OrderedDict()
+    enumerate_entries = []
+    for entry in entries:
+      path = entry.path
+      if offset >= len(path):
+        node.terminal.append(entry)
+        continue
+      node.pending.append(entry)
+
+      # These mirror the decisions in _process_list_element and
+      # _process_dict_element, which only depend on the path.
+      match = _INDEX_RE.search(path, offset)
+      if match is not None and match.start(0) == offset:
+        node.dict_index_entries.append(entry)
+        index = int(match.groups(0)[0])
+        list_index_groups.setdefault(
+            (path[:match.end(0)], index), []).append(entry)
+        continue
+      enumerate_entries.append(entry)
+
+      match = _SEGMENT_RE.search(path, offset)
+      is_self = False
+      if match is None:
+        next_offset = len(path)
+        next_segment = path[offset:]
+        is_self = offset == next_offset - 1 and next_segment == PATH_SEP
+      else:
+        next_offset = match.end(0)
+        next_segment = match.groups(0)[0]
+      dict_groups.setdefault(
+          (path[:next_offset], next_segment, is_self), []).append(entry)
+
+    for (prefix, segment, is_self), group in dict_groups.items():
+      node.dict_steps.append(
+          (segment, is_self, self.__build_node(len(prefix), group, node_cache)))
+    for (prefix, index), group in list_index_groups.items():
+      node.list_index_steps.append(
+          (index, self.__build_node(len(prefix), group, node_cache)))
+    if enumerate_entries:
+      node.list_enumerate_node = self.__build_node(
+          offset, enumerate_entries, node_cache)
+    return node
+
+  @staticmethod
+  def __traverse(root, source):
+    """Walk the source once, collecting values and failures for each entry.
+
+    The queue is processed in the same breadth-first order as
+    PathPredicate.__call__ so each entry sees its values and failures in the
+    same order that it would had it been traversed on its own.
+    """
+    queue = collections.deque([(root, PathValue('', source))])
+    while queue:
+      node, path_value = queue.popleft()
+      for entry in node.terminal:
+        entry.final_queue.append(_QueueElement(node.offset, path_value))
+      if not node.pending:
+        continue
+
+      value = path_value.value
+      base_path = path_value.path
+      if isinstance(value, dict):
+        for entry in node.dict_index_entries:
+          entry.path_failures.append(
+              TypeMismatchError(list, dict, value, entry.path, path_value))
+
+        for segment, is_self, child in node.dict_steps:
+          if is_self:
+            queue.append((child, path_value))
+            continue
+          child_value = value.get(segment, None)
+          if child_value is None:
+            failure = MissingPathError(value, segment, path_value=path_value)
+            for entry in child.entries:
+              entry.path_failures.append(failure)
+            continue
+          value_path = (PATH_SEP.join([base_path, segment]) if base_path
+                        else segment)
+          queue.append((child, PathValue(value_path, child_value)))
+
+      elif isinstance(value, list):
+        for index, child in node.list_index_steps:
+          if index >= len(value):
+            for entry in child.entries:
+              entry.path_failures.append(
+                  IndexBoundsError(index, list,
+                                   target_path=entry.path[node.offset:],
+                                   path_value=path_value))
+            continue
+          queue.append(
+              (child, PathValue('{0}[{1}]'.format(base_path, index),
+                                value[index])))
+
+        enumerate_node = node.list_enumerate_node
+        if enumerate_node is not None:
+          for index, elem in enumerate(value):
+            queue.append(
+                (enumerate_node,
+                 PathValue('{0}[{1}]'.format(base_path, index), elem)))
+
+      else:
+        for entry in node.pending:
+          path_offset = node.offset
+          if entry.path[path_offset] == PATH_SEP:
+            path_offset += 1
+          entry.path_failures.append(
+              MissingPathError(value, entry.path[path_offset:],
+                               path_value=path_value))
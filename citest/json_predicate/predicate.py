@@ -44,6 +44,77 @@ class ValuePredicate(JsonSnapshotableEntity):
         '__call__() needs to be specialized for {0}'.format(
             self.__class__.__name__))
 
+  def is_valid(self, context, value):
+    """Determine only whether this predicate holds for the provided value.
+
+    This is a fast alternative to __call__ for when the details of the
+    result are not wanted (e.g. while retrying a verification). It
+    should return the same validity as __call__ but is free to stop as soon
+    as the outcome is known and need not construct any result objects.
+
+    The default implementation just calls __call__. Specialized predicates
+    can override this to do less work.
+
+    Args:
+      context: The evaluation context to consider within.
+      value: The value to consider.
+
+    Returns:
+      True if the predicate holds, False otherwise.
+    """
+    return bool(self(context, value))
+
+  @property
+  def supports_batch(self):
+    """Whether is_valid_batch can evaluate values together.
+
+    Callers use this to avoid collecting values for a batch that would just
+    be evaluated one at a time anyway.
+    """
+    return False
+
+  def is_valid_batch(self, context, values):
+    """Determine is_valid for each of many values at once, if supported.
+
+    Predicates that can evaluate many values more efficiently together
+    (e.g. with vectorized operations) can override this.
+
+    Args:
+      context: The evaluation context to consider within.
+      values: [list] The values to consider.
+
+    Returns:
+      list of bool corresponding to each of the values, or None if the
+      batch could not be evaluated together. In that case the caller
+      should call is_valid on each value.
+    """
+    # pylint: disable=unused-argument
+    return None
+
+  def compile(self):
+    """Compile this predicate into a specialized validity function.
+
+    The compiled function takes (context, value) and returns the same
+    validity as is_valid, but the predicate tree is lowered into nested
+    closures with constant operands folded in, so evaluating it avoids
+    most of the overhead of walking the predicate objects.
+
+    The function is cached, so the predicate should not be modified after it
+    has been compiled.
+
+    Returns:
+      callable taking (context, value) and returning bool.
+    """
+    try:
+      return self.__compiled
+    except AttributeError:
+      pass
+
+    # Imported here because the compiler depends on the predicate modules.
+    from .predicate_compiler import compile_predicate
+    self.__compiled = compile_predicate(self)
+    return self.__compiled
+
   def __repr__(self):
     """Specializes interface."""
     return str(self)
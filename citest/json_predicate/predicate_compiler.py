@@ -0,0 +1,412 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiles ValuePredicate trees into specialized validity functions.
+
+Evaluating a predicate normally walks the predicate objects, evaluating
+operands within the context and building result objects along the way.
+When only the validity is wanted, the compiler lowers the tree into nested
+closures that are specialized for the particular predicates:
+   * Operands that do not depend on the context are evaluated once.
+   * Standard comparisons are replaced by the equivalent operator.
+   * Paths are parsed into a fixed sequence of steps.
+
+Predicates that the compiler does not know how to lower, or whose
+specification depends on the context (e.g. callable paths), are compiled
+into a call to their is_valid method so they still behave the same.
+
+Use ValuePredicate.compile() rather than this module directly so that the
+compiled functions are cached.
+"""
+
+
+import operator
+
+from ..base import ExecutionContext
+
+from . import binary_predicate as bp
+from .cardinality_predicate import CardinalityPredicate
+from .logic_predicate import (
+    ConditionalPredicate,
+    ConjunctivePredicate,
+    DisjunctivePredicate,
+    NegationPredicate)
+from .map_predicate import MapPredicate
+from .path_predicate import (
+    _INDEX_RE,
+    _SEGMENT_RE,
+    PathPredicate)
+from .path_value import PATH_SEP
+
+
+# Path steps for compiled paths.
+_KEY_STEP = 'KEY'
+_INDEX_STEP = 'INDEX'
+_SELF_STEP = 'SELF'
+
+
+def _substring(value, operand):
+  """Implements STR_SUBSTR."""
+  return operand in value
+
+
+# Standard comparisons that can be replaced by builtin operators.
+_INLINE_COMPARISONS = {
+    bp.NUM_LE.comparison_op: operator.le,
+    bp.NUM_GE.comparison_op: operator.ge,
+    bp.NUM_EQ.comparison_op: operator.eq,
+    bp.NUM_NE.comparison_op: operator.ne,
+    bp.STR_EQ.comparison_op: operator.eq,
+    bp.STR_NE.comparison_op: operator.ne,
+    bp.STR_SUBSTR.comparison_op: _substring,
+    bp.DICT_EQ.comparison_op: operator.eq,
+    bp.DICT_NE.comparison_op: operator.ne,
+    bp.LIST_EQ.comparison_op: operator.eq,
+    bp.LIST_NE.comparison_op: operator.ne,
+}
+
+
+def _is_constant(value):
+  """Determine if a value does not depend on the ExecutionContext."""
+  if isinstance(value, list):
+    return all([_is_constant(elem) for elem in value])
+  if isinstance(value, dict):
+    return all([_is_constant(elem) for elem in value.values()])
+  return not callable(value)
+
+
+def _compile_bounds(bound):
+  """Return a function evaluating a min or max bound in a context."""
+  if _is_constant(bound):
+    return lambda context: bound
+  return lambda context: context.eval(bound)
+
+
+def compile_predicate(pred):
+  """Compile a predicate into a specialized validity function.
+
+  Args:
+    pred: [ValuePredicate] The predicate to compile.
+
+  Returns:
+    callable taking (context, value) and returning bool.
+  """
+  for pred_class, compiler in _COMPILERS:
+    if isinstance(pred, pred_class):
+      if not _overrides_evaluation(pred, pred_class):
+        compiled = compiler(pred)
+        if compiled is not None:
+          return compiled
+      break
+
+  return pred.is_valid
+
+
+def _overrides_evaluation(pred, pred_class):
+  """Determine if pred is a specialization that evaluates differently."""
+  for name in ['__call__', 'is_valid']:
+    if (getattr(pred.__class__, name).__func__
+        is not getattr(pred_class, name).__func__):
+      return True
+  return False
+
+
+def _compile_standard_binary(pred):
+  """Compiles a StandardBinaryPredicate."""
+  operand = pred.operand
+  if not _is_constant(operand):
+    return None
+
+  # Validate the operand now, as evaluating it would.
+  operand = pred.eval_context_operand(ExecutionContext())
+  operand_type = pred.operand_type
+  comparison = _INLINE_COMPARISONS.get(pred.comparison_op, pred.comparison_op)
+
+  if operand_type is None:
+    return lambda context, value: bool(comparison(value, operand))
+
+  def compiled(context, value):
+    # pylint: disable=unused-argument
+    return isinstance(value, operand_type) and bool(comparison(value, operand))
+  return compiled
+
+
+def _compile_dict_subset(pred):
+  """Compiles a DictSubsetPredicate.
+
+  Only the scalar fields are compared directly. If the value has a container
+  where the operand specifies a field, the whole value is handed to the
+  original predicate since those are compared using other predicates.
+  """
+  operand = pred.operand
+  if not isinstance(operand, dict) or not _is_constant(operand):
+    return None
+  items = operand.items()
+  interpreted = pred.is_valid
+
+  def compiled(context, value):
+    if not isinstance(value, dict):
+      return False
+    for name, a_value in items:
+      if name not in value:
+        return False
+      b_value = value[name]
+      if isinstance(b_value, (dict, list)):
+        return interpreted(context, value)
+      if a_value != b_value:
+        return False
+    return True
+  return compiled
+
+
+def _compile_dict_matches(pred):
+  """Compiles a DictMatchesPredicate."""
+  operand = pred.operand
+  if not _is_constant(operand.keys()):
+    return None
+  fields = [PathPredicate(key, field_pred, source_pred=field_pred,
+                          enumerate_terminals=False).compile()
+            for key, field_pred in operand.items()]
+  expect_keys = frozenset(operand.keys())
+  strict = pred.strict
+
+  def compiled(context, value):
+    if not isinstance(value, dict):
+      return False
+    for field in fields:
+      if not field(context, value):
+        return False
+    if strict:
+      for key in value:
+        if key not in expect_keys:
+          return False
+    return True
+  return compiled
+
+
+def _compile_conjunction(pred):
+  """Compiles a ConjunctivePredicate."""
+  terms = tuple([term.compile() for term in pred.predicates])
+
+  def compiled(context, value):
+    for term in terms:
+      if not term(context, value):
+        return False
+    return True
+  return compiled
+
+
+def _compile_disjunction(pred):
+  """Compiles a DisjunctivePredicate."""
+  terms = tuple([term.compile() for term in pred.predicates])
+
+  def compiled(context, value):
+    for term in terms:
+      if term(context, value):
+        return True
+    return False
+  return compiled
+
+
+def _compile_negation(pred):
+  """Compiles a NegationPredicate."""
+  term = pred.predicate.compile()
+  return lambda context, value: not term(context, value)
+
+
+def _compile_conditional(pred):
+  """Compiles a ConditionalPredicate."""
+  if_term = pred.if_predicate.compile()
+  then_term = pred.then_predicate.compile()
+  if not pred.else_predicate:
+    return (lambda context, value:
+            not if_term(context, value) or then_term(context, value))
+
+  else_term = pred.else_predicate.compile()
+  def compiled(context, value):
+    if if_term(context, value):
+      return then_term(context, value)
+    return else_term(context, value)
+  return compiled
+
+
+def _compile_path_steps(path):
+  """Parse a path into the sequence of steps taken to follow it.
+
+  Each step is applied to a dictionary value to get the next value. List
+  values are enumerated and each element continues with the same step,
+  unless the step is an index into the list.
+
+  Args:
+    path: [string] The path, as returned by PathPredicate.eval_path.
+
+  Returns:
+    list of (step kind, argument) tuples.
+  """
+  steps = []
+  offset = 0
+  while offset < len(path):
+    match = _INDEX_RE.match(path, offset)
+    if match is not None:
+      steps.append((_INDEX_STEP, int(match.groups(0)[0])))
+      offset = match.end(0)
+      continue
+
+    match = _SEGMENT_RE.search(path, offset)
+    if match is None:
+      remainder = path[offset:]
+      if remainder == PATH_SEP:
+        steps.append((_SELF_STEP, None))
+      else:
+        steps.append((_KEY_STEP, remainder))
+      break
+    steps.append((_KEY_STEP, match.groups(0)[0]))
+    offset = match.end(0)
+  return steps
+
+
+def compile_path_values(pred):
+  """Compile the values a PathPredicate would confirm.
+
+  Args:
+    pred: [PathPredicate] The path predicate to compile.
+
+  Returns:
+    A generator function taking (context, source) that yields the values
+    confirmed by the path predicate (as in PathPredicate.iter_valid_values)
+    or None if the path depends on the context.
+  """
+  if not _is_constant(pred.path):
+    return None
+
+  path, enumerate_terminal = pred.eval_path(ExecutionContext())
+  steps = _compile_path_steps(path)
+  num_steps = len(steps)
+  transform = pred.transform
+  filter_pred = pred.pred.compile() if pred.pred is not None else None
+
+  def terminal_values(source):
+    stack = [(0, source)]
+    while stack:
+      step_index, value = stack.pop()
+      if step_index == num_steps:
+        if enumerate_terminal and isinstance(value, list):
+          for elem in value:
+            yield elem
+        else:
+          yield value
+        continue
+
+      kind, arg = steps[step_index]
+      if isinstance(value, dict):
+        if kind is _KEY_STEP:
+          child = value.get(arg, None)
+          if child is not None:
+            stack.append((step_index + 1, child))
+        elif kind is _SELF_STEP:
+          stack.append((step_index + 1, value))
+      elif isinstance(value, list):
+        if kind is _INDEX_STEP:
+          if arg < len(value):
+            stack.append((step_index + 1, value[arg]))
+        else:
+          stack.extend([(step_index, elem) for elem in reversed(value)])
+
+  def valid_values(context, source):
+    for value in terminal_values(source):
+      if transform:
+        value = transform(context, value)
+      if filter_pred is None or filter_pred(context, value):
+        yield value
+
+  return valid_values
+
+
+def _compile_path(pred):
+  """Compiles a PathPredicate."""
+  valid_values = compile_path_values(pred)
+  if valid_values is None:
+    return None
+
+  def compiled(context, source):
+    for _ in valid_values(context, source):
+      return True
+    return False
+  return compiled
+
+
+def _compile_cardinality(pred):
+  """Compiles a CardinalityPredicate."""
+  valid_values = compile_path_values(pred.path_pred)
+  if valid_values is None:
+    return None
+  get_min = _compile_bounds(pred.min)
+  get_max = _compile_bounds(pred.max)
+
+  def compiled(context, source):
+    the_max = get_max(context)
+    the_min = get_min(context)
+    count = 0
+    for _ in valid_values(context, source):
+      count += 1
+      if the_max == 0:
+        return False
+      if the_max is None and count >= the_min:
+        return True
+      if the_max is not None and count > the_max:
+        return False
+
+    if not count:
+      return the_max == 0
+    return count >= the_min and (the_max is None or count <= the_max)
+  return compiled
+
+
+def _compile_map(pred):
+  """Compiles a MapPredicate."""
+  term = pred.pred.compile()
+  get_min = _compile_bounds(pred.min)
+  get_max = _compile_bounds(pred.max)
+
+  def compiled(context, obj):
+    if not isinstance(obj, list) and obj != None:
+      obj_list = [obj]
+    else:
+      obj_list = obj or []
+
+    the_min = get_min(context)
+    the_max = get_max(context)
+    count = 0
+    for elem in obj_list:
+      if term(context, elem):
+        count += 1
+    return not (the_min != None and count < the_min
+                or the_max != None and count > the_max)
+  return compiled
+
+
+# The compilers for each of the predicate types, in the order to consider.
+# A compiler returns None if it cannot compile the particular instance.
+_COMPILERS = [
+    (bp.StandardBinaryPredicate, _compile_standard_binary),
+    (bp.DictSubsetPredicate, _compile_dict_subset),
+    (bp.DictMatchesPredicate, _compile_dict_matches),
+    (ConjunctivePredicate, _compile_conjunction),
+    (DisjunctivePredicate, _compile_disjunction),
+    (NegationPredicate, _compile_negation),
+    (ConditionalPredicate, _compile_conditional),
+    (CardinalityPredicate, _compile_cardinality),
+    (PathPredicate, _compile_path),
+    (MapPredicate, _compile_map),
+]
@@ -0,0 +1,278 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memoizes predicate results across repeated evaluations of the same values.
+
+When a contract clause is retried, the observer often returns exactly the
+same objects as it did on the previous attempt. A PredicateResultMemo
+remembers the results of applying predicates to values so that values
+which have not changed since the previous attempt can reuse their prior
+results rather than be re-evaluated.
+
+Values are identified by a structural fingerprint of their JSON content.
+Predicates whose operands are callables may depend on the ExecutionContext.
+The memo records which context attributes are looked up while evaluating a
+predicate and only reuses the result while those attributes still have the
+same values. Callables that depend on state outside the context are not
+detected, so they should not be used with a memo.
+"""
+
+
+import threading
+
+
+# The ExecutionContext internal attribute holding the active memo, if any.
+PREDICATE_MEMO_CONTEXT_KEY = 'PredicateResultMemo'
+
+# Marks a context attribute that was looked up but did not exist.
+_MISSING = object()
+
+
+def fingerprint_json(value, cache=None):
+  """Compute a hashable structural fingerprint of a JSON value.
+
+  Two values have the same fingerprint only if they have the same structure,
+  types and values. Unlike comparing with ==, 1, 1.0 and True all have
+  different fingerprints.
+
+  Args:
+    value: [obj] The JSON value to fingerprint.
+    cache: [dict] If provided, remembers the fingerprints of the containers
+       by their id so that shared values are only fingerprinted once. The
+       entries hold onto the values so their ids remain unique.
+
+  Raises:
+    TypeError if the value is not a JSON value.
+
+  Returns:
+    A hashable object that can be compared to other fingerprints.
+  """
+  if isinstance(value, (dict, list)):
+    if cache is not None:
+      entry = cache.get(id(value))
+      if entry is not None:
+        return entry[1]
+
+    if isinstance(value, dict):
+      result = (dict, frozenset([(key, fingerprint_json(elem, cache))
+                                 for key, elem in value.items()]))
+    else:
+      result = (list, tuple([fingerprint_json(elem, cache) for elem in value]))
+
+    if cache is not None:
+      cache[id(value)] = (value, result)
+    return result
+
+  if value is None or isinstance(value, (basestring, bool, int, long, float)):
+    return (value.__class__, value)
+
+  raise TypeError('{0} is not a JSON value: {1!r}'.format(
+      value.__class__, value))
+
+
+class _MemoEntry(object):
+  """A remembered predicate result and what it depended on."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, pred, result, dependencies):
+    self.pred = pred
+    self.result = result
+    self.dependencies = dependencies
+
+
+class PredicateResultMemo(object):
+  """Remembers the results of applying predicates to JSON values.
+
+  The memo is organized into attempts (e.g. each attempt at verifying a
+  contract clause). Results are retained from the current and previous
+  attempt only, so the memo does not grow over a long series of retries.
+  """
+
+  @property
+  def hit_count(self):
+    """The number of evaluations that reused a prior result."""
+    return self.__hit_count
+
+  @property
+  def miss_count(self):
+    """The number of evaluations that had to call the predicate."""
+    return self.__miss_count
+
+  def __init__(self):
+    self.__lock = threading.Lock()
+    self.__current = {}
+    self.__previous = {}
+    self.__current_state = {}
+    self.__previous_state = {}
+    self.__fingerprints = {}
+    self.__hit_count = 0
+    self.__miss_count = 0
+
+  def begin_attempt(self):
+    """Start a new attempt.
+
+    The values observed by earlier attempts are forgotten, as are the results
+    that were not used by the previous attempt.
+    """
+    with self.__lock:
+      self.__previous = self.__current
+      self.__current = {}
+      self.__previous_state = self.__current_state
+      self.__current_state = {}
+      self.__fingerprints = {}
+
+  def remember(self, key, value):
+    """Remember arbitrary state for the current and next attempt.
+
+    This lets components that are evaluated on each attempt carry their own
+    bookkeeping from one attempt to the next.
+
+    Args:
+      key: [hashable] Identifies the state.
+      value: [any] The state to remember.
+    """
+    with self.__lock:
+      self.__current_state[key] = value
+
+  def recall(self, key, default_value=None):
+    """Return the state remembered this attempt, else the previous attempt."""
+    with self.__lock:
+      if key in self.__current_state:
+        return self.__current_state[key]
+      return self.__previous_state.get(key, default_value)
+
+  def fingerprint(self, value):
+    """Return the fingerprint of value, computing it once per attempt."""
+    with self.__lock:
+      return fingerprint_json(value, self.__fingerprints)
+
+  def __call__(self, context, pred, value):
+    """Apply pred to value, reusing a prior result if possible."""
+    return self.__evaluate(context, pred, value, False)
+
+  def is_valid(self, context, pred, value):
+    """Determine pred.is_valid of value, reusing a prior result if possible."""
+    return self.__evaluate(context, pred, value, True)
+
+  def __evaluate(self, context, pred, value, validity_only):
+    """Implements __call__ and is_valid."""
+    try:
+      key = (id(pred), validity_only, self.fingerprint(value))
+    except TypeError:
+      key = None
+
+    if key is not None:
+      entry = self.__lookup(context, pred, key)
+      if entry is not None:
+        context.note_access(entry.dependencies.keys())
+        return entry.result
+
+    context.begin_access_recording()
+    try:
+      if validity_only:
+        result = pred.is_valid(context, value)
+      else:
+        result = pred(context, value)
+    finally:
+      accessed = context.end_access_recording()
+      context.note_access(accessed)
+
+    if key is not None:
+      dependencies = self.snapshot_dependencies(context, accessed)
+      if dependencies is not None:
+        with self.__lock:
+          self.__current[key] = _MemoEntry(pred, result, dependencies)
+    return result
+
+  def __lookup(self, context, pred, key):
+    """Find a prior entry for the key whose dependencies are unchanged."""
+    with self.__lock:
+      entry = self.__current.get(key)
+      if entry is None:
+        entry = self.__previous.get(key)
+
+    if entry is None or entry.pred is not pred:
+      with self.__lock:
+        self.__miss_count += 1
+      return None
+
+    if not self.dependencies_hold(context, entry.dependencies):
+      entry = None
+
+    with self.__lock:
+      if entry is None:
+        self.__miss_count += 1
+        return None
+      self.__hit_count += 1
+      self.__current[key] = entry
+    return entry
+
+  def snapshot_dependencies(self, context, accessed):
+    """Fingerprint the current values of the accessed context attributes.
+
+    Args:
+      context: [ExecutionContext] The context the attributes are in.
+      accessed: [set of string] The attributes a result depended on, as
+         returned by context.end_access_recording.
+
+    Returns:
+      dict of fingerprints keyed by attribute name or None if any of the
+      values is not a JSON value, in which case the result cannot be reused.
+    """
+    dependencies = {}
+    for name in accessed:
+      try:
+        dependencies[name] = self.__context_fingerprint(context, name)
+      except TypeError:
+        return None
+    return dependencies
+
+  def dependencies_hold(self, context, dependencies):
+    """Determine if the context attributes still have the snapshot values.
+
+    Args:
+      context: [ExecutionContext] The context the attributes are in.
+      dependencies: [dict] As returned by snapshot_dependencies.
+    """
+    for name, fingerprint in dependencies.items():
+      try:
+        if self.__context_fingerprint(context, name) != fingerprint:
+          return False
+      except TypeError:
+        return False
+    return True
+
+  @staticmethod
+  def __context_fingerprint(context, name):
+    """Fingerprint the value of a context attribute."""
+    value = context.peek(name, _MISSING)
+    if value is _MISSING:
+      return _MISSING
+    return fingerprint_json(value)
+
+
+def apply_predicate(context, pred, value):
+  """Apply pred to value, using the memo in the context if there is one."""
+  memo = context.peek(PREDICATE_MEMO_CONTEXT_KEY, None)
+  if memo is None:
+    return pred(context, value)
+  return memo(context, pred, value)
+
+
+def predicate_is_valid(context, pred, value):
+  """Determine pred.is_valid, using the memo in the context if there is one."""
+  memo = context.peek(PREDICATE_MEMO_CONTEXT_KEY, None)
+  if memo is None:
+    return pred.is_valid(context, value)
+  return memo.is_valid(context, pred, value)
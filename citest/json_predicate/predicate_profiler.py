@@ -0,0 +1,389 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiles the evaluation of individual predicates.
+
+A PredicateProfiler records how often each predicate instance is evaluated,
+how long it took, whether it passed and how many objects it examined. The
+statistics are kept separately for each test and contract clause that the
+predicates were evaluated within.
+
+Profiling is opt-in. While a profiler is enabled, the __call__ and is_valid
+methods of the ValuePredicate classes are wrapped with instrumentation.
+When it is disabled the original methods are restored so there is no cost
+at all. Predicate classes defined after the profiler was enabled are not
+instrumented.
+"""
+
+
+import threading
+import timeit
+
+from ..base import JsonSnapshotableEntity
+from .predicate import ValuePredicate
+
+
+# The profiler that is currently enabled, if any.
+_ACTIVE_PROFILER = None
+
+# Predicate descriptions are truncated to this length in reports.
+_MAX_DESCRIPTION_LEN = 200
+
+# The scope kinds for begin_profile_scope.
+PROFILE_TEST_SCOPE = 'test'
+PROFILE_CLAUSE_SCOPE = 'clause'
+
+
+def get_active_profiler():
+  """Returns the PredicateProfiler that is currently enabled, or None."""
+  return _ACTIVE_PROFILER
+
+
+def begin_profile_scope(kind, name):
+  """Attribute subsequent predicate evaluations in this thread to a scope.
+
+  This does nothing if there is no active profiler.
+
+  Args:
+    kind: [string] PROFILE_TEST_SCOPE or PROFILE_CLAUSE_SCOPE.
+    name: [string] The name of the test or clause.
+  """
+  profiler = _ACTIVE_PROFILER
+  if profiler is not None:
+    profiler.begin_scope(kind, name)
+
+
+def end_profile_scope():
+  """End the innermost scope started with begin_profile_scope."""
+  profiler = _ACTIVE_PROFILER
+  if profiler is not None:
+    profiler.end_scope()
+
+
+def get_profile_scopes():
+  """Returns the list of (kind, name) scopes active in this thread.
+
+  This is used to begin the same scopes in other threads working on behalf
+  of this one. It is empty if there is no active profiler.
+  """
+  profiler = _ACTIVE_PROFILER
+  if profiler is None:
+    return []
+  return profiler.get_scopes()
+
+
+def _all_subclasses(klass):
+  """Returns all the classes derived from klass, including klass."""
+  found = [klass]
+  for subclass in klass.__subclasses__():
+    found.extend(_all_subclasses(subclass))
+  return found
+
+
+def _count_objects(value):
+  """Determine the number of objects a predicate is examining in value."""
+  if isinstance(value, list):
+    return len(value)
+  objects = getattr(value, 'objects', None)  # e.g. an Observation
+  if isinstance(objects, list):
+    return len(objects)
+  return 1
+
+
+def _make_profiled_method(method):
+  """Wrap a predicate's __call__ or is_valid method with instrumentation."""
+  def profiled(pred, context, value):
+    profiler = _ACTIVE_PROFILER
+    if profiler is None:
+      return method(pred, context, value)
+    return profiler.profile(method, pred, context, value)
+  profiled.__name__ = method.__name__
+  profiled.__doc__ = method.__doc__
+  return profiled
+
+
+class _Frame(object):
+  """A predicate evaluation in progress."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, pred):
+    self.pred = pred
+    self.child_secs = 0.0
+
+
+class PredicateStats(object):
+  """The profile of a predicate instance within a test and clause."""
+  # pylint: disable=too-many-instance-attributes
+
+  @property
+  def predicate(self):
+    """The profiled ValuePredicate."""
+    return self.__pred
+
+  def __init__(self, pred, test, clause):
+    self.__pred = pred
+    self.test = test
+    self.clause = clause
+    self.calls = 0
+    self.valid_count = 0
+    self.invalid_count = 0
+    self.objects_examined = 0
+    self.total_secs = 0.0
+    self.self_secs = 0.0
+
+  def to_json(self):
+    """Returns a JSON encodable dictionary of the statistics."""
+    description = str(self.__pred)
+    if len(description) > _MAX_DESCRIPTION_LEN:
+      description = description[:_MAX_DESCRIPTION_LEN - 3] + '...'
+    return {
+        'test': self.test,
+        'clause': self.clause,
+        'class': self.__pred.__class__.__name__,
+        'predicate': description,
+        'calls': self.calls,
+        'valid': self.valid_count,
+        'invalid': self.invalid_count,
+        'objects': self.objects_examined,
+        'total_secs': self.total_secs,
+        'self_secs': self.self_secs
+    }
+
+
+class PredicateProfiler(JsonSnapshotableEntity):
+  """Records the cost of evaluating each predicate instance.
+
+  Typical use is:
+     profiler = PredicateProfiler()
+     profiler.enable()
+     try:
+       ... run tests ...
+     finally:
+       profiler.disable()
+     print profiler.format_text_report()
+  """
+
+  @property
+  def enabled(self):
+    """Whether this profiler is currently recording."""
+    return _ACTIVE_PROFILER is self
+
+  def __init__(self, timer=timeit.default_timer):
+    """Constructor.
+
+    Args:
+      timer: [callable] Returns the current time in seconds.
+    """
+    self.__timer = timer
+    self.__lock = threading.Lock()
+    self.__thread_local = threading.local()
+    self.__stats = {}
+    self.__patched = []
+
+  def enable(self):
+    """Start recording predicate evaluations.
+
+    Raises:
+      ValueError if another profiler is already enabled.
+    """
+    # pylint: disable=global-statement
+    global _ACTIVE_PROFILER
+    if _ACTIVE_PROFILER is self:
+      return
+    if _ACTIVE_PROFILER is not None:
+      raise ValueError('Another PredicateProfiler is already enabled.')
+
+    for klass in _all_subclasses(ValuePredicate):
+      for name in ['__call__', 'is_valid']:
+        method = klass.__dict__.get(name)
+        if method is not None:
+          self.__patched.append((klass, name, method))
+          setattr(klass, name, _make_profiled_method(method))
+    _ACTIVE_PROFILER = self
+
+  def disable(self):
+    """Stop recording and remove the instrumentation."""
+    # pylint: disable=global-statement
+    global _ACTIVE_PROFILER
+    if _ACTIVE_PROFILER is not self:
+      return
+    for klass, name, method in reversed(self.__patched):
+      setattr(klass, name, method)
+    self.__patched = []
+    _ACTIVE_PROFILER = None
+
+  def __scopes(self):
+    """Returns the scope stack for the current thread."""
+    scopes = getattr(self.__thread_local, 'scopes', None)
+    if scopes is None:
+      scopes = []
+      self.__thread_local.scopes = scopes
+    return scopes
+
+  def __frames(self):
+    """Returns the evaluation stack for the current thread."""
+    frames = getattr(self.__thread_local, 'frames', None)
+    if frames is None:
+      frames = []
+      self.__thread_local.frames = frames
+    return frames
+
+  def begin_scope(self, kind, name):
+    """Attribute subsequent evaluations in this thread to a test or clause."""
+    self.__scopes().append((kind, name))
+
+  def get_scopes(self):
+    """Returns a copy of the (kind, name) scopes active in this thread."""
+    return list(self.__scopes())
+
+  def end_scope(self):
+    """End the innermost scope started with begin_scope."""
+    scopes = self.__scopes()
+    if scopes:
+      scopes.pop()
+
+  def __current_scope(self):
+    """Returns the (test, clause) that evaluations are attributed to."""
+    test = None
+    clause = None
+    for kind, name in self.__scopes():
+      if kind == PROFILE_TEST_SCOPE:
+        test = name
+        clause = None
+      elif kind == PROFILE_CLAUSE_SCOPE:
+        clause = name
+    return test, clause
+
+  def profile(self, method, pred, context, value):
+    """Evaluate a predicate method, recording its cost.
+
+    Args:
+      method: [callable] The uninstrumented method to call.
+      pred: [ValuePredicate] The predicate being evaluated.
+      context: [ExecutionContext] The context to evaluate within.
+      value: [obj] The value being evaluated.
+
+    Returns:
+      The result of calling the method.
+    """
+    frames = self.__frames()
+    if frames and frames[-1].pred is pred:
+      # A specialized method delegating to a base class method, or is_valid
+      # delegating to __call__ is all part of the same evaluation.
+      return method(pred, context, value)
+
+    frame = _Frame(pred)
+    frames.append(frame)
+    start = self.__timer()
+    try:
+      result = method(pred, context, value)
+    finally:
+      elapsed = self.__timer() - start
+      frames.pop()
+      if frames:
+        frames[-1].child_secs += elapsed
+
+    test, clause = self.__current_scope()
+    key = (test, clause, id(pred))
+    with self.__lock:
+      stats = self.__stats.get(key)
+      if stats is None:
+        stats = PredicateStats(pred, test, clause)
+        self.__stats[key] = stats
+      stats.calls += 1
+      if result:
+        stats.valid_count += 1
+      else:
+        stats.invalid_count += 1
+      stats.objects_examined += _count_objects(value)
+      stats.total_secs += elapsed
+      stats.self_secs += elapsed - frame.child_secs
+    return result
+
+  def reset(self):
+    """Discard the statistics recorded so far."""
+    with self.__lock:
+      self.__stats = {}
+
+  def get_stats(self):
+    """Returns the list of PredicateStats, most expensive self time first."""
+    with self.__lock:
+      stats = list(self.__stats.values())
+    return sorted(stats, key=lambda entry: entry.self_secs, reverse=True)
+
+  def to_json(self):
+    """Returns a JSON encodable report of the recorded statistics.
+
+    The report contains the individual predicate statistics as well as
+    their totals for each clause and test. The totals use the self time so
+    nested predicates are not counted more than once.
+    """
+    predicates = [stats.to_json() for stats in self.get_stats()]
+    clauses = {}
+    tests = {}
+    for entry in predicates:
+      for totals, key, extra in [
+          (clauses, (entry['test'], entry['clause']),
+           {'test': entry['test'], 'clause': entry['clause']}),
+          (tests, entry['test'], {'test': entry['test']})]:
+        total = totals.get(key)
+        if total is None:
+          total = dict(extra, calls=0, objects=0, predicate_secs=0.0)
+          totals[key] = total
+        total['calls'] += entry['calls']
+        total['objects'] += entry['objects']
+        total['predicate_secs'] += entry['self_secs']
+
+    def by_secs(totals):
+      return sorted(totals.values(), key=lambda entry: entry['predicate_secs'],
+                    reverse=True)
+    return {'predicates': predicates,
+            'clauses': by_secs(clauses),
+            'tests': by_secs(tests)}
+
+  def format_text_report(self, limit=25):
+    """Returns a text table of the most expensive predicates.
+
+    Args:
+      limit: [int] The maximum number of predicates to list, or None for all.
+    """
+    report = self.to_json()
+    lines = ['{0:>10} {1:>10} {2:>8} {3:>8} {4:>8} {5:>9}  {6}'.format(
+        'self_secs', 'total_secs', 'calls', 'valid', 'invalid', 'objects',
+        'predicate')]
+    for entry in report['predicates'][:limit]:
+      lines.append(
+          '{self_secs:10.4f} {total_secs:10.4f} {calls:8d} {valid:8d}'
+          ' {invalid:8d} {objects:9d}  {class}: {predicate}'.format(**entry))
+      lines.append('{0:>58}test={1!r} clause={2!r}'.format(
+          '', entry['test'], entry['clause']))
+
+    lines.append('')
+    lines.append('{0:>10} {1:>8} {2:>9}  {3}'.format(
+        'pred_secs', 'calls', 'objects', 'clause'))
+    for entry in report['clauses'][:limit]:
+      lines.append('{predicate_secs:10.4f} {calls:8d} {objects:9d}'
+                   '  {test!r} / {clause!r}'.format(**entry))
+    return '\n'.join(lines)
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    report = self.to_json()
+    builder = snapshot.edge_builder
+    builder.make_data(entity, 'Tests', report['tests'], format='json')
+    builder.make_data(entity, 'Clauses', report['clauses'], format='json')
+    builder.make_data(entity, 'Predicates', report['predicates'],
+                      format='json',
+                      summary='{0} predicates'.format(
+                          len(report['predicates'])))
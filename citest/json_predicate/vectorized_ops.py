@@ -0,0 +1,130 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Optional NumPy implementations of binary predicates over many values.
+
+These are used by predicates that can evaluate a whole batch of values in one
+vectorized operation rather than one value at a time. NumPy is not required.
+When it is not installed, or the values are not suitable for an array, the
+operations return None and the caller evaluates the values individually.
+"""
+
+# pylint: disable=invalid-name
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+# Batches smaller than this are not worth the cost of building arrays.
+MIN_BATCH_SIZE = 32
+
+# Integers beyond this magnitude cannot be represented exactly as float64.
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+
+
+def numpy_available():
+  """Determine whether NumPy is available for vectorized operations."""
+  return numpy is not None
+
+
+def _gather(values, value_type, is_exact):
+  """Separate the values that have the desired type from those that do not.
+
+  Args:
+    values: [list] The values to gather.
+    value_type: [type] The type of value the operation applies to.
+    is_exact: [callable] Returns False for values of value_type that
+       cannot be exactly represented in the array.
+
+  Returns:
+    (list of indexes of values with the desired type, list of those values)
+    or None if some value cannot be represented.
+  """
+  indexes = []
+  gathered = []
+  for index, value in enumerate(values):
+    if isinstance(value, value_type):
+      if not is_exact(value):
+        return None
+      indexes.append(index)
+      gathered.append(value)
+  return indexes, gathered
+
+
+def _scatter(count, indexes, mask):
+  """Expand a mask over gathered values into a list of bool over all values."""
+  result = [False] * count
+  for index, valid in zip(indexes, mask.tolist()):
+    result[index] = bool(valid)
+  return result
+
+
+def make_numeric_op(comparison):
+  """Create a vectorized numeric comparison.
+
+  Args:
+    comparison: [callable] Takes (array, operand) and returns a bool array.
+
+  Returns:
+    A callable taking (values, operand) that returns a list of bool
+    indicating which values are numbers satisfying the comparison, or None
+    if the values could not be vectorized.
+  """
+  numeric_types = (int, long, float)
+  def is_exact(value):
+    return (isinstance(value, float)
+            or -_MAX_EXACT_FLOAT_INT <= value <= _MAX_EXACT_FLOAT_INT)
+
+  def vectorized_op(values, operand):
+    if numpy is None or len(values) < MIN_BATCH_SIZE:
+      return None
+    if not isinstance(operand, float) and not is_exact(operand):
+      return None
+    gathered = _gather(values, numeric_types, is_exact)
+    if gathered is None:
+      return None
+    indexes, numbers = gathered
+    mask = comparison(numpy.array(numbers, dtype=numpy.float64), operand)
+    return _scatter(len(values), indexes, mask)
+
+  return vectorized_op
+
+
+def substring_op(values, operand):
+  """A vectorized string containment test.
+
+  Args:
+    values: [list] The values to test.
+    operand: [basestring] The substring to look for.
+
+  Returns:
+    A list of bool indicating which values are strings containing the
+    operand, or None if the values could not be vectorized.
+  """
+  # NumPy strips trailing NUL characters from strings in arrays.
+  if numpy is None or len(values) < MIN_BATCH_SIZE or '\0' in operand:
+    return None
+  gathered = _gather(values, basestring, lambda value: '\0' not in value)
+  if gathered is None:
+    return None
+  indexes, strings = gathered
+  if not strings:
+    return [False] * len(values)
+  try:
+    array = numpy.array(strings)
+    mask = numpy.char.find(array, operand) >= 0
+  except (TypeError, ValueError, UnicodeError):
+    return None
+  return _scatter(len(values), indexes, mask)
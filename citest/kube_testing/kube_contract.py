@@ -16,8 +16,8 @@
 """Provides a means for specifying and verifying expectations of Kubernetes."""
 
 # Standard python modules.
-import json
 import logging
+import re
 import traceback
 
 # Our modules.
@@ -25,19 +25,113 @@ from .. import json_predicate as jp
 from .. import json_contract as jc
 from ..service_testing import cli_agent
 
+# Every resource kind supports field selectors on these fields.
+_KUBE_SELECTABLE_FIELDS = ['metadata/name', 'metadata/namespace']
+
+# Label keys and values that can be used in a selector.
+_KUBE_LABEL_RE = re.compile(r'^[A-Za-z0-9]([\w\.\-]*[A-Za-z0-9])?$')
+
+
+def _add_kube_selector_args(args, conditions):
+  """Add selectors expressing the FilterConditions to kubectl arguments.
+
+  Only equality on labels and the fields that all kinds support are used.
+  Selector kinds already present in the arguments are left as is.
+
+  Args:
+    args: [list of string] The kubectl command line arguments.
+    conditions: [list of FilterCondition] The conditions on the items.
+
+  Returns:
+    The new list of command line arguments.
+  """
+  field_terms = []
+  label_terms = []
+  for condition in conditions or []:
+    if (condition.op != jc.FILTER_EQUALS
+        or not isinstance(condition.value, basestring)):
+      continue
+    if condition.path in _KUBE_SELECTABLE_FIELDS:
+      if not re.search(r'[,=!\\]', condition.value):
+        field_terms.append('{0}={1}'.format(
+            condition.path.replace('/', '.'), condition.value))
+    elif condition.path.startswith('metadata/labels/'):
+      key = condition.path[len('metadata/labels/'):]
+      if (_KUBE_LABEL_RE.match(key)
+          and (not condition.value or _KUBE_LABEL_RE.match(condition.value))):
+        label_terms.append('{0}={1}'.format(key, condition.value))
+
+  def has_arg(names):
+    return [arg for arg in args
+            if arg in names or arg.split('=')[0] in names]
+
+  result = list(args)
+  if field_terms and not has_arg(['--field-selector']):
+    result.append('--field-selector=' + ','.join(field_terms))
+  if label_terms and not has_arg(['-l', '--selector']):
+    result.append('--selector=' + ','.join(label_terms))
+  return result
+
+
+def _kube_watch_args(args):
+  """Turn kubectl get arguments into those watching for changes instead.
+
+  The watch reports each change as a line naming the changed resource.
+
+  Args:
+    args: [list of string] The kubectl get command line arguments.
+
+  Returns:
+    The new list of command line arguments.
+  """
+  result = []
+  skip_next = False
+  for arg in args:
+    if skip_next:
+      skip_next = False
+    elif arg in ['-o', '--output']:
+      skip_next = True
+    elif not arg.startswith(('-o=', '--output=', '-w', '--watch')):
+      result.append(arg)
+  return result + ['--watch-only', '--output=name']
+
+
 class KubeObjectObserver(jc.ObjectObserver):
   """Observe Kubernetes resources."""
 
-  def __init__(self, kubectl, args, filter=None):
+  @property
+  def pushdown_element_path(self):
+    """Implements ObjectObserver interface.
+
+    kubectl returns the resources as the items of a List.
+    """
+    return 'items'
+
+  def __init__(self, kubectl, args, filter=None, streaming=False,
+               pushdown=False, watch=False, watch_fallback_secs=None):
     """Construct observer.
 
     Args:
       kubectl: KubeCtlAgent instance to use.
       args: Command-line argument list to execute.
+      streaming: [bool] Whether to only decode the parts of the output
+         that the observation will be verified against.
+      pushdown: [bool] Whether to add label and field selectors so that
+         kubectl only returns the items the observation will be verified
+         against.
+      watch: [bool] Whether retrying clauses should run "kubectl get
+         --watch-only" and observe again when it reports a change.
+      watch_fallback_secs: [float] When watching, the longest to wait for a
+         change before observing again anyway. None defers to the clause's
+         RetryPolicy.
     """
-    super(KubeObjectObserver, self).__init__(filter)
+    # pylint: disable=too-many-arguments
+    super(KubeObjectObserver, self).__init__(
+        filter, streaming=streaming, pushdown=pushdown)
     self.__kubectl = kubectl
     self.__args = args
+    self.__watch = watch
+    self.__watch_fallback_secs = watch_fallback_secs
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
@@ -47,19 +141,35 @@ class KubeObjectObserver(jc.ObjectObserver):
   def __str__(self):
     return 'KubeObjectObserver({0})'.format(self.__args)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['KubeObjectObserver', id(self.__kubectl), context.eval(self.__args)]
+
+  def open_change_stream(self, context, observation):
+    """Implements ObjectObserver interface."""
+    if not self.__watch:
+      return None
+    args = context.eval(self.__args)
+    if self.pushdown:
+      args = _add_kube_selector_args(args, observation.filter_conditions)
+    # pylint: disable=protected-access
+    command = self.__kubectl._args_to_full_commandline(_kube_watch_args(args))
+    return jc.ProcessChangeStream(
+        command, fallback_secs=self.__watch_fallback_secs)
+
   def collect_observation(self, context, observation, trace=True):
     args = context.eval(self.__args)
+    if self.pushdown:
+      args = _add_kube_selector_args(args, observation.filter_conditions)
     kube_response = self.__kubectl.run(args, trace=trace)
     if not kube_response.ok():
       observation.add_error(
           cli_agent.CliAgentRunError(self.__kubectl, kube_response))
       return []
 
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(kube_response.output)
-      if not isinstance(doc, list):
-        doc = [doc]
+      doc = self.decode_json_objects(
+          context, kube_response.output, observation)
       self.filter_all_objects_to_observation(context, doc, observation)
     except ValueError as vex:
       error = 'Invalid JSON in response: %s' % str(kube_response)
@@ -77,11 +187,15 @@ class KubeObjectFactory(object):
   def __init__(self, kubectl):
     self.__kubectl = kubectl
 
-  def new_get_resources(self, type, extra_args=None):
+  def new_get_resources(self, type, extra_args=None, pushdown=False,
+                        watch=False):
     """Specify a resource list to be returned later.
 
     Args:
       type: kubectl's name for the Kubernetes resource type.
+      pushdown: Whether to have kubectl select the resources by the
+         constraints that will be verified.
+      watch: Whether to watch the resources for changes when retrying.
 
     Returns:
       A jc.ObjectObserver to return the specified resource list when called.
@@ -91,7 +205,8 @@ class KubeObjectFactory(object):
 
     cmd = self.__kubectl.build_kubectl_command_args(
         action='get', resource=type, args=['--output=json'] + extra_args)
-    return KubeObjectObserver(self.__kubectl, cmd)
+    return KubeObjectObserver(self.__kubectl, cmd, pushdown=pushdown,
+                              watch=watch)
 
 
 class KubeClauseBuilder(jc.ContractClauseBuilder):
@@ -117,7 +232,8 @@ class KubeClauseBuilder(jc.ContractClauseBuilder):
     self.__factory = KubeObjectFactory(kubectl)
     self.__strict = strict
 
-  def get_resources(self, type, extra_args=None, no_resource_ok=False):
+  def get_resources(self, type, extra_args=None, no_resource_ok=False,
+                    pushdown=False, watch=False):
     """Observe resources of a particular type.
 
     This ultimately calls a "kubectl ... get |type| |extra_args|"
@@ -127,9 +243,15 @@ class KubeClauseBuilder(jc.ContractClauseBuilder):
           If the resource is not required, "not found" is treated as a valid
           check. Because resource deletion is asynchronous, there is no
           explicit API here to confirm that a resource does not exist.
+      pushdown: Whether to add field and label selectors for the
+          'items/metadata' name, namespace and label equality constraints
+          common to all the constraints added to the clause. This is only
+          meaningful when listing rather than getting a named resource.
+      watch: Whether to re-verify when "kubectl get --watch-only" reports
+          a change rather than polling, while the clause is retrying.
     """
     self.observer = self.__factory.new_get_resources(
-        type, extra_args=extra_args)
+        type, extra_args=extra_args, pushdown=pushdown, watch=watch)
 
     if no_resource_ok:
       # Unfortunately gcloud does not surface the actual 404 but prints an
@@ -16,7 +16,6 @@
 """Support for specifying citest.json_contract.Contract
 on OpenStack resources."""
 
-import json
 
 from .. import json_contract as jc
 from ..json_predicate import JsonError
@@ -25,21 +24,27 @@ from ..service_testing import cli_agent
 class OsObjectObserver(jc.ObjectObserver):
   """Observe OpenStack resources."""
 
-  def __init__(self, agent, args, filter=None):
+  def __init__(self, agent, args, filter=None, streaming=False):
     """Construct new observer.
 
     Args:
       agent: OsAgent to observe with.
       args: Command line arguments to pass to openstack program.
       filter: If provided, then use this to filter observations.
+      streaming: If True then only decode the parts of the output that the
+         observation will be verified against.
     """
-    super(OsObjectObserver, self).__init__(filter)
+    super(OsObjectObserver, self).__init__(filter, streaming=streaming)
     self.__os = agent
     self.__args = args
 
   def __str__(self):
     return 'OsObjectObserver({0})'.format(self.__args)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['OsObjectObserver', id(self.__os), context.eval(self.__args)]
+
   def collect_observation(self, context, observation, trace=True):
     args = context.eval(self.__args)
     os_response = self.__os.run(args, trace)
@@ -48,17 +53,14 @@ class OsObjectObserver(jc.ObjectObserver):
           cli_agent.CliAgentRunError(self.__os, os_response))
       return []
 
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(os_response.output)
+      doc = self.decode_json_objects(context, os_response.output, observation)
     except (ValueError, UnicodeError) as e:
       error = 'Invalid JSON in response: %s' % str(os_response)
       print 'ERROR:' + error
       observation.add_error(JsonError(error, e))
       return []
 
-    if not isinstance(doc, list):
-      doc = [doc]
     self.filter_all_objects_to_observation(context, doc, observation)
 
     return observation.objects
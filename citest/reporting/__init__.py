@@ -49,3 +49,9 @@ from .dump_renderer import DumpRenderer
 
 # Top level function for converting a journal into HTML.
 from .generate_html_report import journal_to_html
+
+# Aggregates the time-to-consistency metrics of contract clauses across
+# journals into percentiles.
+from .clause_metrics import (
+    ClauseMetricsProcessor,
+    ClauseMetricsSummary)
@@ -0,0 +1,199 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aggregates the time-to-consistency metrics of contract clauses.
+
+Each time a ContractClause is verified, it writes a JournalMetrics entry
+into the journal recording how many attempts it took, how long until it
+first passed, how long it slept between attempts and how long each
+observation took. This program aggregates those entries across journals
+into percentiles per clause.
+
+PYTHONPATH=. python -m citest.reporting.clause_metrics <test>.journal ...
+"""
+
+import argparse
+import math
+import sys
+
+from citest.reporting.journal_processor import JournalProcessor
+
+
+# The percentiles reported by default.
+DEFAULT_PERCENTILES = [50, 90, 99]
+
+
+def percentile(values, percent):
+  """Determine a percentile of values by linear interpolation.
+
+  Args:
+    values: [list of number] The values, in any order.
+    percent: [number] The percentile in the range 0..100.
+
+  Returns:
+    The percentile value or None if there were no values.
+  """
+  if not values:
+    return None
+  ordered = sorted(values)
+  rank = (len(ordered) - 1) * percent / 100.0
+  low = int(math.floor(rank))
+  high = int(math.ceil(rank))
+  return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class ClauseMetricsSummary(object):
+  """The metrics accumulated for a single clause across verifications."""
+
+  @property
+  def title(self):
+    """The title of the clause."""
+    return self.__title
+
+  @property
+  def num_verified(self):
+    """The number of times the clause was verified."""
+    return len(self.__attempts)
+
+  @property
+  def num_passed(self):
+    """The number of times the clause eventually passed."""
+    return len(self.__first_pass_secs)
+
+  def __init__(self, title):
+    """Constructor.
+
+    Args:
+      title: [string] The title of the clause.
+    """
+    self.__title = title
+    self.__attempts = []
+    self.__first_pass_secs = []
+    self.__sleep_secs = []
+    self.__observe_secs = []
+
+  def add(self, metrics):
+    """Accumulate the metrics from one verification of the clause.
+
+    Args:
+      metrics: [dict] The _value of a JournalMetrics entry.
+    """
+    self.__attempts.append(metrics.get('attempts', 0))
+    self.__sleep_secs.append(metrics.get('sleep_secs', 0))
+    self.__observe_secs.extend(metrics.get('observe_secs', []))
+    if metrics.get('first_pass_secs') is not None:
+      self.__first_pass_secs.append(metrics['first_pass_secs'])
+
+  def percentiles(self, percents=None):
+    """Summarize the accumulated metrics.
+
+    Args:
+      percents: [list of number] The percentiles to compute.
+         If None then use DEFAULT_PERCENTILES.
+
+    Returns:
+      dict keyed by metric name whose values are lists of the percentiles
+      in the order of percents.
+    """
+    percents = percents or DEFAULT_PERCENTILES
+    return {
+        name: [percentile(values, percent) for percent in percents]
+        for name, values in [('attempts', self.__attempts),
+                             ('first_pass_secs', self.__first_pass_secs),
+                             ('sleep_secs', self.__sleep_secs),
+                             ('observe_secs', self.__observe_secs)]
+    }
+
+
+class ClauseMetricsProcessor(JournalProcessor):
+  """Collects the ContractClause metrics from journals.
+
+  All other journal entries are ignored.
+  """
+
+  @property
+  def summaries(self):
+    """The ClauseMetricsSummary for each clause, keyed by clause title."""
+    return self.__summaries
+
+  def __init__(self, registry=None):
+    """Constructor.
+
+    Args:
+      registry: See JournalProcessor.
+    """
+    if registry is None:
+      registry = {'JournalMetrics': self.handle_metrics}
+    super(ClauseMetricsProcessor, self).__init__(registry=registry)
+    self.default_handler = lambda entry: None
+    self.__summaries = {}
+
+  def handle_metrics(self, entry):
+    """Accumulate a JournalMetrics entry if it is for a ContractClause."""
+    if entry.get('kind') != 'ContractClause':
+      return
+    title = entry.get('_title')
+    summary = self.__summaries.get(title)
+    if summary is None:
+      summary = ClauseMetricsSummary(title)
+      self.__summaries[title] = summary
+    summary.add(entry.get('_value', {}))
+
+  def render_text(self, percents=None):
+    """Render the summaries as a text table.
+
+    Args:
+      percents: [list of number] The percentiles to show.
+         If None then use DEFAULT_PERCENTILES.
+
+    Returns:
+      The table text, with one line per clause and metric.
+    """
+    percents = percents or DEFAULT_PERCENTILES
+    def format_value(value):
+      return '-' if value is None else '{0:.3f}'.format(value)
+
+    lines = ['\t'.join(['Clause', 'Passed', 'Metric']
+                       + ['p{0:g}'.format(percent) for percent in percents])]
+    for title in sorted(self.__summaries.keys()):
+      summary = self.__summaries[title]
+      passed = '{0}/{1}'.format(summary.num_passed, summary.num_verified)
+      stats = summary.percentiles(percents)
+      for name in sorted(stats.keys()):
+        lines.append('\t'.join([title, passed, name]
+                               + [format_value(value)
+                                  for value in stats[name]]))
+    return '\n'.join(lines)
+
+
+def main(argv):
+  """Main program for summarizing clause metrics."""
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--percentiles', default=','.join(
+      [str(percent) for percent in DEFAULT_PERCENTILES]),
+                      help='Comma-separated list of percentiles to report.')
+  parser.add_argument('journals', metavar='PATH', type=str, nargs='+',
+                      help='list of journals to process')
+  options = parser.parse_args(argv[1:])
+  percents = [float(percent) for percent in options.percentiles.split(',')]
+
+  processor = ClauseMetricsProcessor()
+  for path in options.journals:
+    processor.process(path)
+  processor.terminate()
+  print processor.render_text(percents)
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -68,7 +68,8 @@ class DumpRenderer(JournalProcessor):
       registry = {
           'JsonSnapshot': self.render_snapshot,
           'JournalContextControl': self.render_context_control,
-          'JournalMessage': self.render_message
+          'JournalMessage': self.render_message,
+          'JournalMetrics': self.render_metrics
       }
     super(DumpRenderer, self).__init__(registry)
     self.__context_stack = []
@@ -199,6 +200,19 @@ class DumpRenderer(JournalProcessor):
       self.emit('{format} {text!r}',
                 time=time, format=optional_format, text=text)
 
+  def render_metrics(self, metrics):
+    """Render a metrics entry."""
+    values = metrics.get('_value', {})
+    if self.__outline:
+      self.emit('METRICS {title} count={count}',
+                title=metrics.get('_title'), count=len(values))
+    else:
+      self.emit('METRICS {title} {values}',
+                time=metrics.get('_timestamp', None),
+                title=metrics.get('_title'),
+                values=' '.join(['{0}={1}'.format(key, values[key])
+                                 for key in sorted(values.keys())]))
+
 
 def main(argv):
   """Main program for dumping as text."""
@@ -412,7 +412,8 @@ class HtmlRenderer(JournalProcessor):
       registry = {
           'JsonSnapshot': self.render_snapshot,
           'JournalContextControl': self.handle_context_control,
-          'JournalMessage': self.render_message
+          'JournalMessage': self.render_message,
+          'JournalMetrics': self.render_metrics
       }
 
     super(HtmlRenderer, self).__init__(registry=registry)
@@ -641,3 +642,14 @@ class HtmlRenderer(JournalProcessor):
 
     self.render_log_tr(message.get('_timestamp'),
                        html_info.summary_block, html_info.detail_block)
+
+  def render_metrics(self, metrics):
+    """Default method for rendering a JournalMetrics into HTML."""
+    document_manager = self.__document_manager
+    processor = ProcessToRenderInfo(document_manager, self.__entity_manager)
+    html_info = processor.process_json_html_if_possible(
+        metrics.get('_value', {}))
+    summary = document_manager.make_text_block(
+        'Metrics for {0}'.format(metrics.get('_title')))
+    self.render_log_tr(metrics.get('_timestamp'),
+                       summary, html_info.detail_block)
@@ -44,6 +44,11 @@ from cli_agent import (
     CliRunOperation,
     CliRunStatus)
 
+# The cli_runner module provides the backends that CliAgent runs programs with.
+from cli_runner import (
+    PythonCliWorkerPool,
+    SubprocessCliRunner)
+
 
 # The http_agent module implements an agent that uses HTTP messaging.
 from http_agent import (
@@ -52,8 +57,21 @@ from http_agent import (
     HttpOperationStatus,
     HttpPostOperation,
     HttpResponseType,
+    SpooledHttpResponseType,
     SynchronousHttpOperationStatus)
 
+# The spooled_http_body module keeps large HTTP responses in files.
+from spooled_http_body import SpooledHttpBody
+
+# The async_http_agent module implements an HttpAgent whose coroutines
+# do not block the event loop.
+from async_http_agent import AsyncHttpAgent
+
+# The http_connection_pool module reuses persistent HTTP connections.
+from http_connection_pool import (
+    HttpConnectionPool,
+    HttpConnectionPoolResponse)
+
 from http_observer import (
     HttpObjectObserver,
     HttpContractBuilder,
@@ -65,12 +83,25 @@ from http_scrubber import (
     DefaultHttpHeadersScrubber,
     HttpScrubber)
 
+# A StatusPoller refreshes the statuses of many waiting threads together.
+from status_poller import StatusPoller
+
 # The operation_contract module combines AgentOperation and JsonContract.
 from operation_contract import OperationContract
 
+# The async_runner module runs many OperationContracts on one thread.
+from async_runner import (
+    AsyncOperationContractResult,
+    AsyncOperationContractRunner)
+
 # A NoOpOperation can be used to create a contract for an invariant.
 from nop_operation import NoOpOperation
 
+# A TestCaseScheduler runs OperationContracts that depend on one another.
+from test_case_scheduler import (
+    TestCaseScheduler,
+    TestCaseScheduleResult)
+
 # The service_testing module adds support for writing tests with BaseAgent.
 from agent_test_case import (
     AgentTestCase,
@@ -31,7 +31,6 @@ but can be changed with --log_filename and --log_dir.
 
 
 # Standard python modules.
-from multiprocessing.pool import ThreadPool
 import argparse
 import logging
 import os
@@ -43,9 +42,12 @@ from ..base import (
     args_util,
     BaseTestCase,
     ConfigurationBindingsBuilder,
+    Deadline,
     ExecutionContext,
     JournalLogger,
     JsonSnapshotableEntity)
+from .. import json_predicate as jp
+from .test_case_scheduler import TestCaseScheduler
 
 
 _DEFAULT_TEST_ID = os.environ.get('CITEST_TEST_ID', time.strftime('%H%M%S'))
@@ -483,6 +485,9 @@ class AgentTestCase(BaseTestCase):
       max_retries=0, retry_interval_secs=5, full_trace=False):
     """Run a list of test cases.
 
+    If the testing agent has a status_poller then the threads waiting on the
+    operations block on it rather than each polling their own status.
+
     Args:
       test_case_list: [list of OperationContract] Specifies the tests to run.
       context: [ExecutionContext] The citest execution context to run in.
@@ -495,19 +500,52 @@ class AgentTestCase(BaseTestCase):
       retry_interval_secs: [int] Time between retries of individual operations.
       full_trace: [bool] If True then provide detailed execution tracing.
     """
-    num_threads = min(max_concurrent, len(test_case_list))
-    pool = ThreadPool(processes=num_threads)
-    def run_one(test_case, **kwargs):
+    scheduler = TestCaseScheduler()
+    for test_case in test_case_list:
+      scheduler.add(test_case)
+    self.run_test_case_schedule(
+        context, scheduler, max_concurrent, timeout_ok=timeout_ok,
+        max_retries=max_retries, retry_interval_secs=retry_interval_secs,
+        full_trace=full_trace)
+
+  def run_test_case_schedule(
+      self, context, scheduler, max_concurrent, timeout_ok=False,
+      max_retries=0, retry_interval_secs=5, full_trace=False):
+    """Run the test cases in a TestCaseScheduler.
+
+    Each test case is run as soon as the test cases it depends on have passed
+    and a worker is free. Test cases depending on one that failed are skipped.
+
+    Args:
+      scheduler: [TestCaseScheduler] Specifies the tests to run.
+      See run_test_case_list for the remaining arguments.
+
+    Raises:
+      The exception from the first test case that failed, if any, once all
+      the test cases have finished or been skipped.
+
+    Returns:
+      list of TestCaseScheduleResult in the order the tests were added.
+    """
+    # pylint: disable=too-many-arguments
+    def run_one(test_case):
       """Helper function to run individual tests."""
-      kwargs_copy = dict(kwargs)
       self.run_test_case(
-          test_case=test_case, context=context, **kwargs_copy)
+          test_case=test_case, context=context, timeout_ok=timeout_ok,
+          max_retries=max_retries, retry_interval_secs=retry_interval_secs,
+          full_trace=full_trace)
 
+    num_tests = len(scheduler.test_cases)
     self.logger.info(
         'Running %d tests across %d threads.',
-        len(test_case_list), num_threads)
-    pool.map(run_one, test_case_list)
-    self.logger.info('Finished %d tests.', len(test_case_list))
+        num_tests, min(max_concurrent, num_tests))
+    results = scheduler.run(run_one, max_concurrent)
+    self.logger.info('Finished %d tests.', num_tests)
+
+    for result in results:
+      if result.exc_info is not None:
+        raise result.exc_info[0], result.exc_info[1], result.exc_info[2]
+    return results
 
   # context will be required later, but for transition period
   # keep it optional so that we dont need to update all the tests yet.
@@ -530,9 +568,14 @@ class AgentTestCase(BaseTestCase):
           the tracing when needed but not be overwhelmed by data when the
           default tracing is typically sufficient.
       poll_every_secs: [int] Number of seconds between wait polls. Default=1.
+      budget_secs: [float] If not None then the most seconds the whole test
+          may take. This sets a Deadline on the context for the duration of
+          the test (unless it already has an earlier one) that bounds the
+          operation waits, retries and contract verification.
     """
     if context is None:
       context = ExecutionContext()
+    budget_secs = kwargs.pop('budget_secs', None)
     timeout_ok = kwargs.pop('timeout_ok', False)
     max_retries = kwargs.pop('max_retries', 0)
     retry_interval_secs = kwargs.pop('retry_interval_secs', 5)
@@ -550,6 +593,12 @@ class AgentTestCase(BaseTestCase):
           'retry_interval_secs={secs} cannot be negative'.format(
               secs=retry_interval_secs))
 
+    prior_deadline = context.deadline
+    if budget_secs is not None:
+      context.deadline = (Deadline(budget_secs) if prior_deadline is None
+                          else prior_deadline.narrow(budget_secs))
+    deadline = context.deadline
+
     execution_trace = OperationContractExecutionTrace(test_case)
     verify_results = None
     final_status_ok = None
@@ -558,6 +607,7 @@ class AgentTestCase(BaseTestCase):
     status = None
     try:
       JournalLogger.begin_context('Test "{0}"'.format(test_case.title))
+      jp.begin_profile_scope(jp.PROFILE_TEST_SCOPE, test_case.title)
       JournalLogger.delegate(
           "store", test_case.operation,
           _title='Operation "{0}" Specification'.format(
@@ -569,12 +619,16 @@ class AgentTestCase(BaseTestCase):
       # it succeeded. We do not give multiple chances to satisfy the
       # verification.
       for i in range(max_tries):
+        if deadline is not None:
+          deadline.check('running operation "{0}"'.format(
+              test_case.operation.title))
         context.clear_key('OperationStatus')
         context.clear_key('AttemptInfo')
         attempt_info = execution_trace.new_attempt()
         status = None
         status = test_case.operation.execute(agent=self.testing_agent)
-        status.wait(poll_every_secs=poll_every_secs, trace_every=full_trace)
+        status.wait(poll_every_secs=poll_every_secs, trace_every=full_trace,
+                    deadline=deadline)
 
         summary = status.error or ('Operation status OK' if status.finished_ok
                                    else 'Operation status Unknown')
@@ -592,7 +646,13 @@ class AgentTestCase(BaseTestCase):
         if not status.exception_details:
           execution_trace.set_operation_summary('Completed test.')
           break
-        if max_tries - i > 1:
+        if max_tries - i > 1 and deadline is not None and deadline.clamp(
+            retry_interval_secs) < retry_interval_secs:
+          execution_trace.set_operation_summary(
+              'Gave up retrying operation. {0}'.format(deadline))
+          self.logger.error('Deadline budget exhausted. Giving up retrying.')
+          break
+        elif max_tries - i > 1:
           self.logger.warning(
               'Got an exception: %s.\nTrying again in %r secs...',
               status.exception_details, retry_interval_secs)
@@ -647,6 +707,8 @@ class AgentTestCase(BaseTestCase):
             self.logger.info('Invoking injected operation cleanup.')
             test_case.cleanup(context)
       finally:
+        context.deadline = prior_deadline
+        jp.end_profile_scope()
         JournalLogger.end_context(relation=context_relation)
 
     if not final_status_ok:
@@ -0,0 +1,206 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An HttpAgent whose coroutines do not block the event loop.
+
+HttpAgent's get_async, post_async, etc. coroutines send the message
+synchronously. An AsyncHttpAgent sends them over non-blocking sockets
+watched by the EventLoop instead, so a single thread can have thousands
+of messages in flight at once.
+
+Each message is sent on its own connection, which the server is asked to
+close once it has responded. Only http URLs are supported, and host names
+are resolved synchronously. Agents bound to a Cassette send synchronously.
+"""
+
+
+import errno
+import httplib
+import socket
+import urlparse
+
+from StringIO import StringIO
+
+from ..base import Future
+from ..base import Return
+from .http_agent import HttpAgent
+from .http_agent import HttpResponseType
+
+
+# The most bytes to read from a socket at a time.
+_RECV_SIZE = 65536
+
+
+class _BufferedSocket(object):
+  """Presents a received response as a socket so httplib can parse it."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, data):
+    self.__data = data
+
+  def makefile(self, *unused_args, **unused_kwargs):
+    """Implements the part of the socket interface used by HTTPResponse."""
+    return StringIO(self.__data)
+
+
+class _HttpExchange(object):
+  """Sends one HTTP request and receives its response on an EventLoop."""
+
+  @property
+  def future(self):
+    """Future for the (status, headers, body) of the response."""
+    return self.__future
+
+  def __init__(self, loop, address, request, timeout):
+    """Constructor.
+
+    Args:
+      loop: [EventLoop] The loop to run on.
+      address: [tuple] The (host, port) to connect to.
+      request: [string] The complete HTTP request to send.
+      timeout: [float] If not None then fail if there is no response by then.
+    """
+    self.__loop = loop
+    self.__request = request
+    self.__received = []
+    self.__future = Future()
+    self.__timer = None
+    self.__socket = None
+
+    try:
+      family, socktype, proto, _, sockaddr = socket.getaddrinfo(
+          address[0], address[1], 0, socket.SOCK_STREAM)[0]
+      self.__socket = socket.socket(family, socktype, proto)
+      self.__socket.setblocking(0)
+      code = self.__socket.connect_ex(sockaddr)
+      if code not in [0, errno.EINPROGRESS, errno.EWOULDBLOCK]:
+        raise socket.error(code, errno.errorcode.get(code, str(code)))
+    except socket.error as ex:
+      self.__fail(ex)
+      return
+
+    if timeout is not None:
+      self.__timer = loop.call_later(
+          timeout, self.__fail, socket.timeout('timed out'))
+    loop.add_writer(self.__socket.fileno(), self.__on_writable)
+
+  def __on_writable(self):
+    """Send as much of the request as the socket will take."""
+    try:
+      code = self.__socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+      if code:
+        raise socket.error(code, errno.errorcode.get(code, str(code)))
+      sent = self.__socket.send(self.__request)
+    except socket.error as ex:
+      if ex.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+        return
+      self.__fail(ex)
+      return
+
+    self.__request = self.__request[sent:]
+    if not self.__request:
+      self.__loop.remove_writer(self.__socket.fileno())
+      self.__loop.add_reader(self.__socket.fileno(), self.__on_readable)
+
+  def __on_readable(self):
+    """Receive the response until the server closes the connection."""
+    try:
+      data = self.__socket.recv(_RECV_SIZE)
+    except socket.error as ex:
+      if ex.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+        return
+      self.__fail(ex)
+      return
+
+    if data:
+      self.__received.append(data)
+      return
+
+    try:
+      response = httplib.HTTPResponse(_BufferedSocket(''.join(self.__received)))
+      response.begin()
+      result = (response.status, dict(response.getheaders()), response.read())
+    except httplib.HTTPException as ex:
+      self.__fail(ex)
+      return
+    self.__finish()
+    self.__future.set_result(result)
+
+  def __fail(self, ex):
+    """Abandon the exchange with an error."""
+    if self.__future.done():
+      return
+    self.__finish()
+    self.__future.set_exception(ex)
+
+  def __finish(self):
+    """Release the socket and timer."""
+    if self.__timer is not None:
+      self.__timer.cancel()
+    if self.__socket is not None:
+      fd = self.__socket.fileno()
+      self.__loop.remove_reader(fd)
+      self.__loop.remove_writer(fd)
+      self.__socket.close()
+
+
+class AsyncHttpAgent(HttpAgent):
+  """An HttpAgent that can send many messages concurrently on one thread.
+
+  The synchronous methods (get, post, etc.) behave as they do in HttpAgent.
+  """
+
+  def _send_http_request_async(self, loop, path, http_type, data=None,
+                               headers=None, trace=True, timeout=None):
+    """Specializes HttpAgent to send the message without blocking the loop."""
+    # pylint: disable=too-many-arguments
+    if self.cassette is not None:
+      # Cassettes record and replay through the synchronous implementation.
+      response = yield super(AsyncHttpAgent, self)._send_http_request_async(
+          loop, path, http_type, data=data, headers=headers, trace=trace,
+          timeout=timeout)
+      raise Return(response)
+
+    url, all_headers = self._prepare_http_request(
+        path, http_type, data=data, headers=headers, trace=trace)
+
+    parsed = urlparse.urlsplit(url)
+    if parsed.scheme != 'http':
+      raise ValueError('AsyncHttpAgent only supports http URLs: {0}'.format(
+          url))
+    selector = parsed.path or '/'
+    if parsed.query:
+      selector += '?' + parsed.query
+
+    lines = ['{0} {1} HTTP/1.1'.format(http_type, selector),
+             'Host: {0}'.format(parsed.netloc),
+             'Connection: close']
+    lines.extend(['{0}: {1}'.format(key, value)
+                  for key, value in all_headers.items()
+                  if key.lower() not in ['host', 'connection',
+                                         'content-length']])
+    if data is not None:
+      lines.append('Content-Length: {0}'.format(len(data)))
+    request = '\r\n'.join(lines) + '\r\n\r\n' + (data or '')
+
+    exchange = _HttpExchange(loop, (parsed.hostname, parsed.port or 80),
+                             request, timeout)
+    try:
+      status, response_headers, output = yield exchange.future
+    except (httplib.HTTPException, socket.error) as ex:
+      self._record_http_exception(ex)
+      raise Return(HttpResponseType(None, None, ex))
+
+    self._record_http_response(status, output, trace)
+    raise Return(HttpResponseType(status, output, None, response_headers))
@@ -0,0 +1,178 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs many OperationContracts concurrently on a single thread.
+
+AgentTestCase.run_test_case_list runs each test case on a thread of its own,
+which does not scale to thousands of lightweight checks. The
+AsyncOperationContractRunner instead runs each test case as a coroutine on an
+EventLoop. Agents, statuses and observers that implement the *_async
+coroutines without blocking (e.g. AsyncHttpAgent and HttpObjectObserver) can
+then wait on many test cases at once. Those that do not still work, but hold
+up the other test cases while they block.
+"""
+
+
+import logging
+import traceback
+
+from ..base import EventLoop
+from ..base import ExecutionContext
+from ..base import JournalLogger
+from ..base import JsonSnapshotableEntity
+from ..base import Return
+
+
+class AsyncOperationContractResult(JsonSnapshotableEntity):
+  """The outcome of running an OperationContract with the runner."""
+
+  @property
+  def test_case(self):
+    """The OperationContract that was run."""
+    return self.__test_case
+
+  @property
+  def status(self):
+    """The final AgentOperationStatus, or None if the operation did not run."""
+    return self.__status
+
+  @property
+  def verify_results(self):
+    """The ContractVerifyResult, or None if the contract was not verified."""
+    return self.__verify_results
+
+  @property
+  def exception(self):
+    """The exception that prevented the test case from finishing, if any."""
+    return self.__exception
+
+  def __init__(self, test_case, status, verify_results, exception=None):
+    self.__test_case = test_case
+    self.__status = status
+    self.__verify_results = verify_results
+    self.__exception = exception
+
+  def __nonzero__(self):
+    return bool(self.__exception is None
+                and self.__status is not None and self.__status.finished_ok
+                and self.__verify_results)
+
+  def __str__(self):
+    return '{0}: {1}'.format(self.__test_case.title,
+                             'OK' if self else 'FAILED')
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    builder = snapshot.edge_builder
+    relation = builder.determine_valid_relation(self)
+    builder.make(entity, 'Title', self.__test_case.title)
+    if self.__status is not None:
+      builder.make(entity, 'Status', self.__status)
+    if self.__verify_results is not None:
+      builder.make(entity, 'Contract Results', self.__verify_results,
+                   relation=relation)
+    if self.__exception is not None:
+      builder.make_error(entity, 'Exception', str(self.__exception))
+
+
+class AsyncOperationContractRunner(object):
+  """Runs OperationContracts as coroutines on an EventLoop."""
+
+  @property
+  def loop(self):
+    """The EventLoop the test cases run on."""
+    return self.__loop
+
+  def __init__(self, agent, loop=None, max_concurrent=100, poll_every_secs=1):
+    """Constructor.
+
+    Args:
+      agent: [BaseAgent] The agent to execute the operations with.
+      loop: [EventLoop] The loop to run on. If None then create one.
+      max_concurrent: [int] The most test cases to run at the same time.
+         This bounds the number of sockets that are open at once.
+      poll_every_secs: [float] Interval between refreshing pending statuses.
+    """
+    if max_concurrent < 1:
+      raise ValueError('max_concurrent must be positive.')
+    self.__agent = agent
+    self.__loop = loop or EventLoop()
+    self.__max_concurrent = max_concurrent
+    self.__poll_every_secs = poll_every_secs
+    self.logger = logging.getLogger(__name__)
+
+  def run(self, test_cases, context=None):
+    """Run the test cases until they have all finished.
+
+    A test case that raises an exception fails without affecting the others.
+
+    Args:
+      test_cases: [list of OperationContract] The test cases to run.
+      context: [ExecutionContext] The context each test case is run within
+         a copy of. If None then use an empty one.
+
+    Returns:
+      list of AsyncOperationContractResult in the order of test_cases.
+    """
+    context = context or ExecutionContext()
+    results = [None] * len(test_cases)
+    pending = iter(range(len(test_cases)))
+
+    def worker():
+      """Run the pending test cases one at a time."""
+      for index in pending:
+        results[index] = yield self.run_test_case_async(test_cases[index],
+                                                        context.copy())
+
+    num_workers = min(self.__max_concurrent, len(test_cases))
+    self.__loop.run_until_complete([worker() for _ in range(num_workers)])
+    return results
+
+  def run_test_case_async(self, test_case, context):
+    """Coroutine that runs a single test case from start to finish.
+
+    Args:
+      test_case: [OperationContract] The test case to run.
+      context: [ExecutionContext] The context to run within.
+
+    Returns:
+      AsyncOperationContractResult
+    """
+    loop = self.__loop
+    status = None
+    verify_results = None
+    exception = None
+    try:
+      status = yield test_case.operation.execute_async(loop,
+                                                       agent=self.__agent)
+      yield status.wait_async(loop, poll_every_secs=self.__poll_every_secs,
+                              deadline=context.deadline)
+      context.set_internal('OperationStatus', status)
+      if test_case.status_extractor:
+        test_case.status_extractor(status, context)
+      verify_results = yield test_case.contract.verify_async(loop, context)
+    except Exception as ex:  # pylint: disable=broad-except
+      self.logger.error('Test "%s" failed with exception: %s\n%s',
+                        test_case.title, ex, traceback.format_exc())
+      exception = ex
+    finally:
+      if test_case.cleanup:
+        context.set_internal('ContractVerifyResults', verify_results)
+        test_case.cleanup(context)
+
+    result = AsyncOperationContractResult(test_case, status, verify_results,
+                                          exception)
+    JournalLogger.delegate(
+        'store', result, _title='Test "{0}"'.format(test_case.title))
+    raise Return(result)
@@ -33,6 +33,7 @@ import time
 from ..base import JsonScrubber
 from ..base import JsonSnapshotableEntity
 from ..base import JournalLogger
+from ..base import Return
 
 
 class AgentError(Exception, JsonSnapshotableEntity):
@@ -87,11 +88,44 @@ class BaseAgent(JsonSnapshotableEntity):
     """
     self.__default_max_wait_secs = secs
 
+  @property
+  def status_poller(self):
+    """The StatusPoller that wait() refreshes statuses through, if any.
+
+    If None then each waiting thread refreshes its own status.
+    """
+    return self.__status_poller
+
+  @status_poller.setter
+  def status_poller(self, poller):
+    """Sets the StatusPoller to wait() on this agent's statuses with.
+
+    Args:
+      poller: [StatusPoller] The poller to use, or None for none.
+    """
+    self.__status_poller = poller
+
+  @property
+  def cassette(self):
+    """The Cassette that the agent records into or replays from, if any."""
+    return self.__cassette
+
+  @cassette.setter
+  def cassette(self, cassette):
+    """Sets the Cassette to record into or replay from.
+
+    Args:
+      cassette: [Cassette] The cassette to use, or None to use the service.
+    """
+    self.__cassette = cassette
+
   def __init__(self):
     self.logger = logging.getLogger(__name__)
     self.nojournal_logger = logging.LoggerAdapter(
         self.logger, {'citest_journal': {'nojournal':True}})
     self.__default_max_wait_secs = None
+    self.__status_poller = None
+    self.__cassette = None
     self.__config_dict = {}
 
   def export_to_json_snapshot(self, snapshot, entity):
@@ -101,6 +135,35 @@ class BaseAgent(JsonSnapshotableEntity):
     scrubbed_config = JsonScrubber()(self.__config_dict)
     builder.make_control(entity, 'Max Wait Secs', self.__default_max_wait_secs)
     builder.make_control(entity, 'Configuration', scrubbed_config)
+    if self.__cassette is not None:
+      builder.make_control(entity, 'Cassette', self.__cassette)
+
+  def refresh_statuses(self, statuses, trace=True):
+    """Refresh a batch of statuses that this agent executed.
+
+    This is called by a StatusPoller. The default implementation refreshes
+    each status in turn. Specializations can override this to refresh many
+    statuses with a single request, such as listing all the pending operations.
+
+    A status failing to refresh should not affect the others, so errors
+    are returned rather than raised.
+
+    Args:
+      statuses: [list of AgentOperationStatus] The statuses to refresh.
+      trace: [bool] Whether or not to trace the calls through the agent.
+
+    Returns:
+      list parallel to statuses with the sys.exc_info() from refreshing each
+      status, or None where it refreshed without error.
+    """
+    errors = []
+    for status in statuses:
+      try:
+        status.refresh(trace=trace)
+        errors.append(None)
+      except Exception:  # pylint: disable=broad-except
+        errors.append(sys.exc_info())
+    return errors
 
 
 class AgentOperationStatus(JsonSnapshotableEntity):
@@ -217,7 +280,7 @@ class AgentOperationStatus(JsonSnapshotableEntity):
         self.__class__.__name__ + '.refresh() needs to be specialized.')
 
   def wait(self, poll_every_secs=1, max_secs=None,
-           trace_every=False, trace_first=True):
+           trace_every=False, trace_first=True, deadline=None):
     """Wait until the status reaches a final state.
 
     Args:
@@ -226,7 +289,10 @@ class AgentOperationStatus(JsonSnapshotableEntity):
           0 is a poll, None is unbounded. Otherwise, number of seconds.
       trace_every: [bool] Whether or not to log every poll request.
       trace_first: [bool] Whether to log the first poll request.
+      deadline: [Deadline] If not None then do not wait past the deadline.
+          The status is still refreshed once if the budget is exhausted.
     """
+    # pylint: disable=too-many-arguments
     if self.finished:
       return
 
@@ -234,13 +300,19 @@ class AgentOperationStatus(JsonSnapshotableEntity):
       max_secs = self.operation.max_wait_secs
     if max_secs < 0 and max_secs is not None:
       raise ValueError()
+    if deadline is not None:
+      max_secs = deadline.clamp(max_secs)
 
     message = 'Wait on id={0}, max_secs={1}'.format(self.id, max_secs)
     JournalLogger.begin_context(message)
     context_relation = 'ERROR'
     try:
       self.refresh(trace=trace_first)
-      self.__wait_helper(poll_every_secs, max_secs, trace_every)
+      poller = self.agent.status_poller
+      if poller is None:
+        self.__wait_helper(poll_every_secs, max_secs, trace_every)
+      else:
+        poller.wait(self, poll_every_secs, max_secs, trace=trace_every)
       context_relation = 'VALID' if self.finished_ok else 'INVALID'
     finally:
       JournalLogger.end_context(relation=context_relation)
@@ -285,6 +357,55 @@ class AgentOperationStatus(JsonSnapshotableEntity):
 
     return True
 
+  def refresh_async(self, loop, trace=True):
+    """Coroutine that refreshes the status with the current data.
+
+    The default implementation calls refresh(), which blocks the event loop.
+    Specializations can override this to refresh without blocking.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      trace: [bool] Whether or not to trace the call through the agent update.
+    """
+    # pylint: disable=unused-argument
+    self.refresh(trace=trace)
+    raise Return(None)
+    yield  # pylint: disable=unreachable
+
+  def wait_async(self, loop, poll_every_secs=1, max_secs=None,
+                 trace_every=False, trace_first=True, deadline=None):
+    """Coroutine that waits until the status reaches a final state.
+
+    This is like wait() but sleeps on the event loop between polls so that
+    many statuses can be waited on concurrently by a single thread.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      See wait() for the remaining arguments.
+    """
+    # pylint: disable=too-many-arguments
+    if self.finished:
+      return
+
+    if max_secs is None:
+      max_secs = self.operation.max_wait_secs
+    if max_secs < 0 and max_secs is not None:
+      raise ValueError()
+    if deadline is not None:
+      max_secs = deadline.clamp(max_secs)
+
+    end_time = (sys.float_info.max if max_secs is None
+                else loop.time() + max_secs)
+    yield self.refresh_async(loop, trace=trace_first)
+    while not self.finished:
+      secs_remaining = end_time - loop.time()
+      if secs_remaining <= 0:
+        logging.getLogger(__name__).debug('Timed out waiting on id=%s',
+                                          self.id)
+        return
+      yield loop.sleep(min(secs_remaining, poll_every_secs))
+      yield self.refresh_async(loop, trace=trace_every)
+
   def _now(self):
     """Hook so we can mock out time.time() calls in wait()'s polling loop."""
     return time.time()
@@ -378,3 +499,20 @@ class AgentOperation(JsonSnapshotableEntity):
     # pylint: disable=unused-argument
     raise NotImplementedError(
         'execute was not specialized on {0}.'.format(self.__class__))
+
+  def execute_async(self, loop, agent=None):
+    """Coroutine that has the bound agent perform this operation.
+
+    The default implementation calls execute(), which blocks the event loop.
+    Specializations can override this to execute without blocking.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      agent: [BaseAgent] If provided, use instead of the one bound.
+
+    Returns:
+      OperationStatus for this invocation.
+    """
+    # pylint: disable=unused-argument
+    raise Return(self.execute(agent=agent))
+    yield  # pylint: disable=unreachable
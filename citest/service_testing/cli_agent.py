@@ -15,12 +15,12 @@
 
 import collections
 import re
-import subprocess
 
 from ..base import JournalLogger
 from ..base import JsonSnapshotableEntity
 from .. import json_contract as jc
 from . import base_agent
+from .cli_runner import SubprocessCliRunner
 
 
 class CliResponseType(collections.namedtuple('CliResponseType',
@@ -129,6 +129,21 @@ class CliAgentRunError(base_agent.AgentError):
 class CliAgent(base_agent.BaseAgent):
   """A specialization of BaseAgent for invoking command-line programs."""
 
+  @property
+  def cli_runner(self):
+    """The backend that runs the command lines (see cli_runner.py)."""
+    return self.__cli_runner
+
+  @cli_runner.setter
+  def cli_runner(self, runner):
+    """Sets the backend to run command lines with.
+
+    Args:
+      runner: [SubprocessCliRunner or PythonCliWorkerPool] The backend, or
+         None to run each command line in a new process.
+    """
+    self.__cli_runner = runner or SubprocessCliRunner()
+
   def __init__(self, program, output_scrubber=None):
     """Standard constructor.
 
@@ -138,10 +153,13 @@ class CliAgent(base_agent.BaseAgent):
     super(CliAgent, self).__init__()
     self.__program = program
     self.__output_scrubber = output_scrubber
+    self.__cli_runner = SubprocessCliRunner()
 
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     snapshot.edge_builder.make_mechanism(entity, 'Program', self.__program)
+    snapshot.edge_builder.make_mechanism(
+        entity, 'Runner', self.__cli_runner.__class__.__name__)
     super(CliAgent, self).export_to_json_snapshot(snapshot, entity)
 
   def _new_run_operation(self, title, args, max_wait_secs=None):
@@ -174,22 +192,19 @@ class CliAgent(base_agent.BaseAgent):
                                  _module=self.logger.name, _alwayslog=trace,
                                  _context='request')
 
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
-    stdout, stderr = process.communicate()
-
-    scrubber = output_scrubber or self.__output_scrubber
-    if scrubber:
-      log_msg = 'Scrubbing output with {0}'.format(scrubber.__class__.__name__)
-      JournalLogger.journal_or_log(log_msg,
-                                   _module=self.logger.name, _alwayslog=trace)
-      stdout = scrubber(stdout)
-
-    # Strip leading/trailing eolns that program may add to errors and output.
-    stderr = stderr.strip()
-    stdout = stdout.strip()
-    code = process.returncode
+    cassette = self.cassette
+    if cassette is not None and cassette.replaying:
+      recorded = cassette.replay('cli', {'command': command})
+      code = recorded['code']
+      stdout, stderr = [text.encode('utf-8') if isinstance(text, unicode)
+                        else text
+                        for text in [recorded['stdout'], recorded['stderr']]]
+    else:
+      code, stdout, stderr = self.__run_process(
+          command, trace, output_scrubber or self.__output_scrubber)
+      if cassette is not None:
+        cassette.record('cli', {'command': command},
+                        {'code': code, 'stdout': stdout, 'stderr': stderr})
 
     # Always log to journal
     if stdout and stderr:
@@ -209,6 +224,28 @@ class CliAgent(base_agent.BaseAgent):
 
     return CliResponseType(code, stdout, stderr)
 
+  def __run_process(self, command, trace, scrubber):
+    """Run the command with the cli_runner.
+
+    Args:
+      command: [list] The complete command line to run.
+      trace: If True then we should trace the call/response.
+      scrubber: [callable] If not None then scrub stdout with this.
+
+    Returns:
+      The exit code and the stripped stdout and stderr.
+    """
+    code, stdout, stderr = self.__cli_runner.run(command)
+
+    if scrubber:
+      log_msg = 'Scrubbing output with {0}'.format(scrubber.__class__.__name__)
+      JournalLogger.journal_or_log(log_msg,
+                                   _module=self.logger.name, _alwayslog=trace)
+      stdout = scrubber(stdout)
+
+    # Strip leading/trailing eolns that program may add to errors and output.
+    return code, stdout.strip(), stderr.strip()
+
 
 class CliRunOperation(base_agent.AgentOperation):
   """Specialization of AgentOperation that invokes a program."""
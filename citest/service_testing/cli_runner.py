@@ -0,0 +1,231 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Backends that a CliAgent runs its command lines with.
+
+By default a CliAgent spawns a new process for every command with a
+SubprocessCliRunner. Programs written in Python, such as gcloud, az and
+openstack, can spend longer starting their interpreter and importing their
+modules than doing the work asked of them. A PythonCliWorkerPool instead
+keeps warm worker processes that have already imported the program and
+passes each of them one argument vector at a time.
+
+  agent = GCloudAgent(...)
+  agent.cli_runner = PythonCliWorkerPool(
+      'gcloud', 'googlecloudsdk.gcloud_main:main',
+      python_path=['/path/to/google-cloud-sdk/lib'])
+
+Worker processes are only suitable for programs whose entry point can be
+called again within the same process, which is true of most argparse-style
+Python command-line programs. Either way the CliAgent captures, scrubs and
+reports the output in the same way.
+"""
+
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from ..base import RecordInputStream
+from ..base import RecordOutputStream
+
+
+class SubprocessCliRunner(object):
+  """Runs each command line in a new process."""
+  # pylint: disable=too-few-public-methods
+
+  def run(self, command):
+    """Run a command line.
+
+    Args:
+      command: [list] The program followed by its arguments.
+
+    Returns:
+      The exit code, stdout and stderr.
+    """
+    # pylint: disable=no-self-use
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+    stdout, stderr = process.communicate()
+    return process.returncode, stdout, stderr
+
+
+class _CliWorker(object):
+  """A worker process serving requests from a PythonCliWorkerPool."""
+
+  @property
+  def alive(self):
+    """Whether the worker can still serve requests."""
+    return self.__process.poll() is None
+
+  def __init__(self, command):
+    """Constructor.
+
+    Args:
+      command: [list] The command line that starts the worker.
+    """
+    self.__process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        close_fds=True)
+    self.__requests = RecordOutputStream(self.__process.stdin)
+    self.__responses = RecordInputStream(self.__process.stdout)
+    self.__encoder = json.JSONEncoder()
+    self.__decoder = json.JSONDecoder()
+
+  def run(self, argv):
+    """Have the worker run the program with argv.
+
+    Returns:
+      The exit code, stdout and stderr.
+    """
+    try:
+      self.__requests.append(self.__encoder.encode({'argv': argv}))
+      self.__requests.stream.flush()
+      response = self.__decoder.decode(self.__responses.next())
+    except (IOError, StopIteration, ValueError):
+      self.close()
+      return (self.__process.returncode or -1, '',
+              'CLI worker process exited with code {0}.'.format(
+                  self.__process.returncode))
+
+    return (response['exit_code'],
+            response['stdout'].encode('utf-8'),
+            response['stderr'].encode('utf-8'))
+
+  def close(self):
+    """Stop the worker."""
+    try:
+      self.__process.stdin.close()
+    except IOError:
+      pass
+    self.__process.wait()
+
+
+class PythonCliWorkerPool(object):
+  """Runs command lines in warm Python worker processes.
+
+  The workers are started as they are needed, up to max_workers at a time.
+  Each serves one command at a time. A worker that dies is replaced by the
+  next command to need one.
+  """
+
+  @property
+  def program(self):
+    """The program name that commands run by this pool begin with."""
+    return self.__program
+
+  @property
+  def num_workers(self):
+    """The number of worker processes currently running."""
+    with self.__condition:
+      return self.__num_workers
+
+  def __init__(self, program, entry_point, max_workers=4, python=None,
+               python_path=None):
+    """Constructor.
+
+    Args:
+      program: [string] The program that commands begin with (e.g. 'gcloud').
+         Commands for other programs are run in a new process instead.
+      entry_point: [string] The <module>:<function> to call for each command.
+         The function is called with sys.argv set to the command and may
+         return or raise SystemExit with the exit code.
+      max_workers: [int] The most worker processes to run at once.
+      python: [string] The Python interpreter to run the workers with.
+         Defaults to this one.
+      python_path: [list of string] Directories to add to the workers'
+         sys.path in order to import the entry_point.
+    """
+    # pylint: disable=too-many-arguments
+    if max_workers < 1:
+      raise ValueError('max_workers must be positive.')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'cli_worker.py')
+    self.__program = program
+    self.__worker_command = ([python or sys.executable, script, entry_point]
+                             + list(python_path or []))
+    self.__max_workers = max_workers
+    self.__condition = threading.Condition()
+    self.__idle = []
+    self.__num_workers = 0
+    self.__fallback = SubprocessCliRunner()
+    self.__logger = logging.getLogger(__name__)
+
+  def run(self, command):
+    """Run a command line in a worker.
+
+    Args:
+      command: [list] The program followed by its arguments.
+
+    Returns:
+      The exit code, stdout and stderr.
+    """
+    if os.path.basename(command[0]) != os.path.basename(self.__program):
+      return self.__fallback.run(command)
+
+    worker = self.__acquire()
+    try:
+      return worker.run(command)
+    finally:
+      self.__release(worker)
+
+  def close(self):
+    """Stop the idle workers.
+
+    Workers that are busy are stopped once they finish.
+    """
+    with self.__condition:
+      idle = self.__idle
+      self.__idle = []
+      self.__num_workers -= len(idle)
+      self.__max_workers = 0
+      self.__condition.notify_all()
+    for worker in idle:
+      worker.close()
+
+  def __acquire(self):
+    """Returns an idle worker, starting one if there are none."""
+    with self.__condition:
+      while not self.__idle and self.__num_workers >= self.__max_workers:
+        if self.__max_workers == 0:
+          raise ValueError('The PythonCliWorkerPool is closed.')
+        self.__condition.wait()
+      if self.__idle:
+        return self.__idle.pop()
+      self.__num_workers += 1
+
+    self.__logger.debug('Starting CLI worker %s', self.__worker_command)
+    try:
+      return _CliWorker(self.__worker_command)
+    except Exception:
+      with self.__condition:
+        self.__num_workers -= 1
+        self.__condition.notify()
+      raise
+
+  def __release(self, worker):
+    """Return a worker to the pool once it has finished a command."""
+    with self.__condition:
+      if worker.alive and self.__num_workers <= self.__max_workers:
+        self.__idle.append(worker)
+        worker = None
+      else:
+        self.__num_workers -= 1
+      self.__condition.notify()
+    if worker is not None:
+      worker.close()
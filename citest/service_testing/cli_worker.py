@@ -0,0 +1,149 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A warm worker process that runs a Python command-line program repeatedly.
+
+This is started by PythonCliWorkerPool (see cli_runner.py) as
+
+  python cli_worker.py <module>:<function> [<sys.path entry> ...]
+
+It imports the program's entry module once, then reads requests from stdin
+and writes responses to stdout. Each is a JSON document framed the same way
+as citest.base.RecordOutputStream, with a 32-bit length in network byte
+order. A request is {"argv": [...]}, a response is
+{"exit_code": int, "stdout": string, "stderr": string}.
+
+The program's output is captured at the file descriptor level so that output
+from any processes it spawns is captured too.
+
+This script deliberately only uses the standard library, and runs under
+either Python 2 or 3, so that it can use whatever interpreter the
+command-line program needs.
+"""
+
+
+import json
+import os
+import struct
+import sys
+import tempfile
+import traceback
+
+
+def read_frame(stream):
+  """Returns the next frame from the stream, or None at the end."""
+  size = stream.read(4)
+  if len(size) != 4:
+    return None
+  count = struct.unpack('!I', size)[0]
+  data = stream.read(count)
+  if len(data) != count:
+    return None
+  return data
+
+
+def write_frame(stream, data):
+  """Write a frame into the stream."""
+  stream.write(struct.pack('!I', len(data)))
+  stream.write(data)
+  stream.flush()
+
+
+def load_entry_point(spec):
+  """Returns the function named by a <module>:<function> spec."""
+  module_name, function_name = spec.split(':')
+  module = __import__(module_name, fromlist=[function_name])
+  return getattr(module, function_name)
+
+
+def call_entry_point(entry_point, argv):
+  """Call the program's entry point as if it were run with argv.
+
+  Returns:
+    The program exit code.
+  """
+  sys.argv = list(argv)
+  try:
+    code = entry_point()
+  except SystemExit as ex:
+    code = ex.code
+  except Exception:  # pylint: disable=broad-except
+    traceback.print_exc()
+    return 1
+
+  if code is None:
+    return 0
+  if isinstance(code, int):
+    return code
+  sys.stderr.write('{0}\n'.format(code))
+  return 1
+
+
+def run_captured(entry_point, argv):
+  """Run the program capturing its stdout and stderr.
+
+  Returns:
+    The exit code, stdout and stderr.
+  """
+  captured = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+  try:
+    os.dup2(captured[0].fileno(), 1)
+    os.dup2(captured[1].fileno(), 2)
+    try:
+      code = call_entry_point(entry_point, argv)
+    finally:
+      sys.stdout.flush()
+      sys.stderr.flush()
+      with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        os.dup2(devnull.fileno(), 2)
+
+    output = []
+    for stream in captured:
+      stream.seek(0)
+      output.append(stream.read())
+    return code, output[0], output[1]
+  finally:
+    for stream in captured:
+      stream.close()
+
+
+def main():
+  """Serve requests until stdin is closed."""
+  # Keep the protocol streams away from the program, even while importing it.
+  requests = os.fdopen(os.dup(0), 'rb')
+  responses = os.fdopen(os.dup(1), 'wb')
+  with open(os.devnull, 'r+') as devnull:
+    os.dup2(devnull.fileno(), 0)
+    os.dup2(devnull.fileno(), 1)
+
+  sys.path.extend(sys.argv[2:])
+  entry_point = load_entry_point(sys.argv[1])
+
+  decoder = json.JSONDecoder()
+  encoder = json.JSONEncoder()
+  while True:
+    data = read_frame(requests)
+    if data is None:
+      return
+    request = decoder.decode(data.decode('utf-8'))
+    code, stdout, stderr = run_captured(entry_point, request['argv'])
+    write_frame(responses, encoder.encode(
+        {'exit_code': code,
+         'stdout': stdout.decode('utf-8', 'replace'),
+         'stderr': stderr.decode('utf-8', 'replace')}).encode('utf-8'))
+
+
+if __name__ == '__main__':
+  main()
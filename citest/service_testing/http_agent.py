@@ -19,19 +19,24 @@ import base64
 import collections
 import httplib
 import json
+import socket
 import traceback
 import urllib2
 
 from ..base import JournalLogger
+from ..base import Return
 from ..base import JsonSnapshotableEntity
+from .http_connection_pool import HttpConnectionPool
 from .http_scrubber import HttpScrubber
+from .spooled_http_body import SpooledHttpBody
+from .spooled_http_body import read_http_body
 
 from . import base_agent
 
 
 class HttpResponseType(
     collections.namedtuple('HttpResponseType',
-                           ['http_code', 'output', 'exception']),
+                           ['http_code', 'output', 'exception', 'headers']),
     JsonSnapshotableEntity):
   """Holds the results from an HTTP message.
 
@@ -39,8 +44,13 @@ class HttpResponseType(
     http_code: The HTTP response code (or None if exception attempting to send).
     output: The HTTP response.
     exception: The exception if http_code is None
+    headers: [dict] The response headers keyed by their lower-case names.
   """
 
+  def __new__(cls, http_code, output, exception, headers=None):
+    return super(HttpResponseType, cls).__new__(
+        cls, http_code, output, exception, headers or {})
+
   @property
   def error_message(self):
     """A string denoting the error this response represents, if any."""
@@ -96,6 +106,37 @@ class HttpResponseType(
             code=self.http_code, body=self.output))
 
 
+class SpooledHttpResponseType(HttpResponseType):
+  """An HttpResponseType whose output was spooled to a file.
+
+  The output property reads the whole file each time it is used. Use the body
+  property to stream it or preview it instead.
+  """
+
+  @property
+  def body(self):
+    """The SpooledHttpBody holding the response."""
+    return self[1]
+
+  @property
+  def output(self):
+    """The HTTP response."""
+    return self[1].read()
+
+  def __str__(self):
+    return 'http_code={0} output=<{1}> exception={2!r}'.format(
+        self.http_code, self.body, self.exception)
+
+  def export_to_json_snapshot_with_format(self, snapshot, entity, format):
+    """Specializes HttpResponseType to only include a preview of the body."""
+    builder = snapshot.edge_builder
+    edge = builder.make(entity, 'HTTP Code', self.http_code)
+    if not self.ok():
+      edge.add_metadata('relation', 'ERROR')
+    builder.make_control(entity, 'Response Body', str(self.body))
+    builder.make_output(entity, 'Response Preview', self.body.preview())
+
+
 class HttpOperationStatus(base_agent.AgentOperationStatus):
   """Specialization of AgentOperationStatus for HttpAgent operations.
 
@@ -197,6 +238,16 @@ class HttpAgent(base_agent.BaseAgent):
     """Returns the bound base URL used when sending messages."""
     return self.__base_url
 
+  @property
+  def connection_pool(self):
+    """The HttpConnectionPool reusing connections, or None to not reuse them."""
+    return self.__connection_pool
+
+  @property
+  def spool_threshold_bytes(self):
+    """Response bodies larger than this are spooled to files, if not None."""
+    return self.__spool_threshold_bytes
+
   @property
   def http_scrubber(self):
     """Returns the bound scrubber for scrubbing components of HTTP messages."""
@@ -232,14 +283,28 @@ class HttpAgent(base_agent.BaseAgent):
     payload_dict = kwargs
     return json.JSONEncoder().encode(payload_dict)
 
-  def __init__(self, base_url):
+  def __init__(self, base_url, connection_pool=None,
+               spool_threshold_bytes=None, spool_dir=None):
     """Constructs instance.
 
     Args:
       base_url: [string] Specifies the base url to this agent's HTTP endpoint.
+      connection_pool: [HttpConnectionPool] If provided then send requests
+         over the pool's persistent connections, which may be shared with
+         other agents. Otherwise open a new connection for each request.
+         Note that the pool does not follow redirects or use proxies.
+      spool_threshold_bytes: [int] If not None then write response bodies
+         larger than this to files rather than keeping them in memory.
+         Their responses are SpooledHttpResponseType and only a preview is
+         journaled. Bodies are not spooled when using a connection_pool.
+      spool_dir: [string] The directory to keep spooled bodies in.
+         If None then they are temporary files deleted once unreferenced.
     """
     super(HttpAgent, self).__init__()
     self.__base_url = base_url
+    self.__connection_pool = connection_pool
+    self.__spool_threshold_bytes = spool_threshold_bytes
+    self.__spool_dir = spool_dir
     self.__status_class = HttpOperationStatus
     self.__headers = {}
     self.__http_scrubber = HttpScrubber()
@@ -262,6 +327,9 @@ class HttpAgent(base_agent.BaseAgent):
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     snapshot.edge_builder.make_control(entity, 'Base URL', self.__base_url)
+    if self.__connection_pool is not None:
+      snapshot.edge_builder.make_control(
+          entity, 'Connection Pool', self.__connection_pool)
     super(HttpAgent, self).export_to_json_snapshot(snapshot, entity)
 
   def new_post_operation(self, title, path, data, status_class=None,
@@ -312,7 +380,7 @@ class HttpAgent(base_agent.BaseAgent):
     return status_class(operation, http_response)
 
   def __send_http_request(self, path, http_type,
-                          data=None, headers=None, trace=True):
+                          data=None, headers=None, trace=True, timeout=None):
     """Send an HTTP message.
 
     Args:
@@ -321,10 +389,134 @@ class HttpAgent(base_agent.BaseAgent):
       data: [string] Data payload to send, if any.
       headers: [dict] Headers to write, if any.
       trace: [bool] True if should log request and response.
+      timeout: [float] Seconds to wait on the server, if bounded.
+
+    Returns:
+      HttpResponseType
+    """
+    url, all_headers = self._prepare_http_request(
+        path, http_type, data=data, headers=headers, trace=trace)
+
+    cassette = self.cassette
+    if cassette is None:
+      return self.__send_live_http_request(
+          url, http_type, data, all_headers, trace, timeout)
+
+    request = {'method': http_type,
+               'url': self.__http_scrubber.scrub_url(url),
+               'data': self.__http_scrubber.scrub_request(data)}
+    if cassette.replaying:
+      return self.__replay_http_response(cassette.replay('http', request),
+                                         trace)
+
+    response = self.__send_live_http_request(
+        url, http_type, data, all_headers, trace, timeout)
+    cassette.record('http', request, {
+        'http_code': response.http_code,
+        'output': (None if response.output is None
+                   else self.__http_scrubber.scrub_response(response.output)),
+        'exception': (None if response.exception is None
+                      else str(response.exception)),
+        'headers': self.__http_scrubber.scrub_headers(
+            dict(response.headers))})
+    return response
+
+  def __send_live_http_request(self, url, http_type, data, all_headers, trace,
+                               timeout):
+    """Send an HTTP message to the server.
+
+    Args:
+      url: [string] The full URL to send to.
+      all_headers: [dict] All the headers to send.
+      See __send_http_request for the remaining args.
+
+    Returns:
+      HttpResponseType
+    """
+    # pylint: disable=too-many-arguments
+    if self.__connection_pool is not None:
+      return self.__send_pooled_http_request(
+          url, http_type, data, all_headers, trace, timeout)
+
+    req = urllib2.Request(url=url, data=data, headers=all_headers)
+    req.get_method = lambda: http_type
+
+    code = None
+    output = None
+    exception = None
+    headers = None
+    try:
+      if timeout is None:
+        response = urllib2.urlopen(req)
+      else:
+        response = urllib2.urlopen(req, timeout=timeout)
+      code = response.getcode()
+      headers = dict(response.info().items())
+      output = self.__read_body(response)
+      self._record_http_response(code, output, trace)
+
+    except urllib2.HTTPError as ex:
+      code = ex.getcode()
+      if ex.info() is not None:
+        headers = dict(ex.info().items())
+      output = self.__read_body(ex)
+      self._record_http_response(code, output, trace)
+
+    except (urllib2.URLError, socket.timeout) as ex:
+      self._record_http_exception(ex)
+      exception = ex
+
+    if isinstance(output, SpooledHttpBody):
+      return SpooledHttpResponseType(code, output, exception, headers)
+    return HttpResponseType(code, output, exception, headers)
+
+  def __read_body(self, response):
+    """Read the response body, spooling it if it is too large.
+
+    Returns:
+      The body as a string or SpooledHttpBody.
+    """
+    if self.__spool_threshold_bytes is None:
+      return response.read()
+    return read_http_body(response, self.__spool_threshold_bytes,
+                          spool_dir=self.__spool_dir)
+
+  def __replay_http_response(self, recorded, trace):
+    """Reconstruct an HttpResponseType from a Cassette.
+
+    Args:
+      recorded: [dict] The response recorded by __send_http_request.
+      trace: [bool] True if should log the response.
 
     Returns:
       HttpResponseType
     """
+    if recorded['exception'] is not None:
+      exception = urllib2.URLError(recorded['exception'])
+      JournalLogger.journal_or_log(
+          'Replayed exception: {0}'.format(recorded['exception']))
+      return HttpResponseType(None, None, exception)
+
+    output = recorded['output']
+    if isinstance(output, unicode):
+      output = output.encode('utf-8')
+    self._record_http_response(recorded['http_code'], output, trace)
+    return HttpResponseType(recorded['http_code'], output, None,
+                            recorded['headers'])
+
+  def _prepare_http_request(self, path, http_type, data=None, headers=None,
+                            trace=True):
+    """Determine what to send for an HTTP message and record it.
+
+    This method is intended to be used internally and by subclasses that
+    send the messages some other way.
+
+    Args:
+      See __send_http_request.
+
+    Returns:
+      The full URL and the headers to send.
+    """
     if headers is None:
       all_headers = self.__headers
     else:
@@ -335,9 +527,6 @@ class HttpAgent(base_agent.BaseAgent):
       path = path[1:]
     url = '{0}/{1}'.format(self.__base_url, path)
 
-    req = urllib2.Request(url=url, data=data, headers=all_headers)
-    req.get_method = lambda: http_type
-
     scrubbed_url = self.__http_scrubber.scrub_url(url)
     scrubbed_data = self.__http_scrubber.scrub_request(data)
 
@@ -351,35 +540,61 @@ class HttpAgent(base_agent.BaseAgent):
       JournalLogger.journal_or_log(
           '{type} {url}'.format(type=http_type, url=scrubbed_url),
           _module=self.logger.name, _alwayslog=trace, _context='request')
+    return url, all_headers
 
-    code = None
-    output = None
-    exception = None
-    try:
-      response = urllib2.urlopen(req)
-      code = response.getcode()
-      output = response.read()
+  def _record_http_response(self, code, output, trace):
+    """Record the response to an HTTP message.
 
-      scrubbed_output = self.__http_scrubber.scrub_response(output)
+    Args:
+      code: [int] The HTTP status code.
+      output: [string or SpooledHttpBody] The response body.
+      trace: [bool] True if should log the response.
+    """
+    if isinstance(output, SpooledHttpBody):
       JournalLogger.journal_or_log_detail(
-          'HTTP {code}'.format(code=code),
-          scrubbed_output,
-          _module=self.logger.name, _alwayslog=trace, _context='response')
+          'HTTP {code} ({body})'.format(code=code, body=output),
+          output.preview(self.__http_scrubber.scrub_response),
+          _module=self.logger.name, _alwayslog=trace, _context='response',
+          blob_path=output.path, blob_size=output.size,
+          blob_sha256=output.sha256)
+      return
+
+    scrubbed_output = self.__http_scrubber.scrub_response(output)
+    JournalLogger.journal_or_log_detail(
+        'HTTP {code}'.format(code=code),
+        scrubbed_output,
+        _module=self.logger.name, _alwayslog=trace, _context='response')
+
+  def _record_http_exception(self, ex):
+    """Record an HTTP message that failed without a response.
+
+    This must be called from the exception handler.
+    """
+    JournalLogger.journal_or_log(
+        'Caught exception: {ex}\n{stack}'.format(
+            ex=ex, stack=traceback.format_exc()))
 
-    except urllib2.HTTPError as ex:
-      code = ex.getcode()
-      output = ex.read()
-      scrubbed_error = self.__http_scrubber.scrub_response(output)
-      JournalLogger.journal_or_log_detail(
-          'HTTP {code}'.format(code=code), scrubbed_error,
-          _module=self.logger.name, _alwayslog=trace, _context='response')
+  def __send_pooled_http_request(self, url, http_type, data, headers, trace,
+                                 timeout):
+    """Send an HTTP message over a connection from the connection pool.
 
-    except urllib2.URLError as ex:
-      JournalLogger.journal_or_log(
-          'Caught exception: {ex}\n{stack}'.format(
-              ex=ex, stack=traceback.format_exc()))
-      exception = ex
-    return HttpResponseType(code, output, exception)
+    Args:
+      url: [string] The full URL to send to.
+      See __send_http_request for the remaining args.
+
+    Returns:
+      HttpResponseType
+    """
+    try:
+      response = self.__connection_pool.request(
+          url, http_type, body=data, headers=headers, timeout=timeout)
+    except (httplib.HTTPException, socket.error) as ex:
+      self._record_http_exception(ex)
+      return HttpResponseType(None, None, ex)
+
+    self._record_http_response(response.status, response.body, trace)
+    return HttpResponseType(response.status, response.body, None,
+                            response.headers)
 
   def patch(self, path, data, content_type='application/json', trace=True):
     """Perform an HTTP PATCH."""
@@ -405,9 +620,63 @@ class HttpAgent(base_agent.BaseAgent):
         path, 'DELETE', data=data,
         headers={'Content-Type': content_type}, trace=trace)
 
-  def get(self, path, trace=True):
+  def get(self, path, trace=True, timeout=None):
     """Perform an HTTP GET."""
-    return self.__send_http_request(path, 'GET', trace=trace)
+    return self.__send_http_request(path, 'GET', trace=trace, timeout=timeout)
+
+  def _send_http_request_async(self, loop, path, http_type, data=None,
+                               headers=None, trace=True, timeout=None):
+    """Coroutine that sends an HTTP message.
+
+    This sends the message synchronously, blocking the event loop until the
+    response arrives. AsyncHttpAgent specializes this to not block.
+
+    Args:
+      loop: [EventLoop] The loop the coroutine runs on.
+      See __send_http_request for the remaining args.
+
+    Returns:
+      HttpResponseType
+    """
+    # pylint: disable=unused-argument
+    # pylint: disable=too-many-arguments
+    raise Return(self.__send_http_request(
+        path, http_type, data=data, headers=headers, trace=trace,
+        timeout=timeout))
+    yield  # pylint: disable=unreachable
+
+  def patch_async(self, loop, path, data, content_type='application/json',
+                  trace=True):
+    """Coroutine that performs an HTTP PATCH."""
+    return self._send_http_request_async(
+        loop, path, 'PATCH', data=data,
+        headers={'Content-Type': content_type}, trace=trace)
+
+  def post_async(self, loop, path, data, content_type='application/json',
+                 trace=True):
+    """Coroutine that performs an HTTP POST."""
+    return self._send_http_request_async(
+        loop, path, 'POST', data=data,
+        headers={'Content-Type': content_type}, trace=trace)
+
+  def put_async(self, loop, path, data, content_type='application/json',
+                trace=True):
+    """Coroutine that performs an HTTP PUT."""
+    return self._send_http_request_async(
+        loop, path, 'PUT', data=data,
+        headers={'Content-Type': content_type}, trace=trace)
+
+  def delete_async(self, loop, path, data, content_type='application/json',
+                   trace=True):
+    """Coroutine that performs an HTTP DELETE."""
+    return self._send_http_request_async(
+        loop, path, 'DELETE', data=data,
+        headers={'Content-Type': content_type}, trace=trace)
+
+  def get_async(self, loop, path, trace=True, timeout=None):
+    """Coroutine that performs an HTTP GET."""
+    return self._send_http_request_async(
+        loop, path, 'GET', trace=trace, timeout=timeout)
 
 
 class BaseHttpOperation(base_agent.AgentOperation):
@@ -480,6 +749,22 @@ class BaseHttpOperation(base_agent.AgentOperation):
     """Placeholder for specializations to perform actual HTTP messaging."""
     raise NotImplementedError()
 
+  def execute_async(self, loop, agent=None):
+    """Implements AgentOperation interface."""
+    if not self.agent:
+      if not isinstance(agent, HttpAgent):
+        raise TypeError('agent no HttpAgent: ' + agent.__class__.__name__)
+      self.bind_agent(agent)
+
+    status = yield self._send_message_async(loop, agent or self.agent,
+                                            trace=True)
+    raise Return(status)
+
+  def _send_message_async(self, loop, agent, trace):
+    """Placeholder for specializations to perform HTTP messaging in a coroutine.
+    """
+    raise NotImplementedError()
+
 
 class HttpPostOperation(BaseHttpOperation):
   """Specialization of AgentOperation that performs HTTP POST."""
@@ -490,6 +775,13 @@ class HttpPostOperation(BaseHttpOperation):
     status = agent._new_messaging_status(self, http_response)
     return status
 
+  def _send_message_async(self, loop, agent, trace):
+    """Implements BaseHttpOperation interface."""
+    # pylint: disable=protected-access
+    http_response = yield agent.post_async(loop, self.path, self.data,
+                                           trace=trace)
+    raise Return(agent._new_messaging_status(self, http_response))
+
 
 class HttpDeleteOperation(BaseHttpOperation):
   """Specialization of AgentOperation that performs HTTP DELETE."""
@@ -500,6 +792,13 @@ class HttpDeleteOperation(BaseHttpOperation):
     status = agent._new_messaging_status(self, http_response)
     return status
 
+  def _send_message_async(self, loop, agent, trace):
+    """Implements BaseHttpOperation interface."""
+    # pylint: disable=protected-access
+    http_response = yield agent.delete_async(loop, self.path, self.data,
+                                             trace=trace)
+    raise Return(agent._new_messaging_status(self, http_response))
+
 
 class HttpPutOperation(BaseHttpOperation):
   """Specialization of AgentOperation that performs HTTP PUT."""
@@ -510,6 +809,13 @@ class HttpPutOperation(BaseHttpOperation):
     status = agent._new_messaging_status(self, http_response)
     return status
 
+  def _send_message_async(self, loop, agent, trace):
+    """Implements BaseHttpOperation interface."""
+    # pylint: disable=protected-access
+    http_response = yield agent.put_async(loop, self.path, self.data,
+                                          trace=trace)
+    raise Return(agent._new_messaging_status(self, http_response))
+
 class HttpPatchOperation(BaseHttpOperation):
   """Specialization of AgentOperation that performs HTTP PATCH."""
   def _send_message(self, agent, trace):
@@ -518,3 +824,10 @@ class HttpPatchOperation(BaseHttpOperation):
     http_response = agent.patch(self.path, self.data, trace=trace)
     status = agent._new_messaging_status(self, http_response)
     return status
+
+  def _send_message_async(self, loop, agent, trace):
+    """Implements BaseHttpOperation interface."""
+    # pylint: disable=protected-access
+    http_response = yield agent.patch_async(loop, self.path, self.data,
+                                            trace=trace)
+    raise Return(agent._new_messaging_status(self, http_response))
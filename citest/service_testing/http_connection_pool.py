@@ -0,0 +1,283 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reuses persistent HTTP connections across requests.
+
+Opening a new connection for every request costs a TCP handshake, and a TLS
+handshake too for https. An HttpConnectionPool keeps the connections to each
+host open between requests (HTTP keep-alive) so that later requests, from any
+thread, can reuse them.
+
+Servers close idle connections whenever they please. A request that fails
+on a reused connection before any response arrived is assumed to have found
+the connection stale, so is sent once more on a new connection.
+"""
+
+
+import errno
+import httplib
+import logging
+import socket
+import threading
+import time
+import urlparse
+
+from ..base import JsonSnapshotableEntity
+
+
+# The socket errors indicating the server already closed a connection.
+_STALE_ERRNOS = frozenset([errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED])
+
+# The methods that are safe to send again if the server may have received them.
+_IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+
+class HttpConnectionPoolResponse(object):
+  """The response to a request sent through an HttpConnectionPool."""
+  # pylint: disable=too-few-public-methods
+
+  @property
+  def status(self):
+    """The HTTP status code."""
+    return self.__status
+
+  @property
+  def headers(self):
+    """The response headers keyed by their lower-case names."""
+    return self.__headers
+
+  @property
+  def body(self):
+    """The response body."""
+    return self.__body
+
+  def __init__(self, status, headers, body):
+    self.__status = status
+    self.__headers = headers
+    self.__body = body
+
+
+class HttpConnectionPool(JsonSnapshotableEntity):
+  """A thread-safe pool of persistent connections, per host.
+
+  Each connection is used by one request at a time. At most
+  max_connections_per_host connections are open to any one host. Requests
+  beyond that wait for a connection to be returned to the pool.
+  """
+
+  @property
+  def max_connections_per_host(self):
+    """The most connections that may be open to any one host."""
+    return self.__max_connections_per_host
+
+  @property
+  def idle_timeout_secs(self):
+    """How long an unused connection is kept before it is closed."""
+    return self.__idle_timeout_secs
+
+  @property
+  def num_connections_opened(self):
+    """The number of connections the pool has opened so far."""
+    return self.__num_connections_opened
+
+  @property
+  def num_connections_reused(self):
+    """The number of requests that reused a previously opened connection."""
+    return self.__num_connections_reused
+
+  def __init__(self, max_connections_per_host=4, idle_timeout_secs=60,
+               now_function=time.time):
+    """Constructor.
+
+    Args:
+      max_connections_per_host: [int] The most connections that may be open
+         to any one host at a time.
+      idle_timeout_secs: [float] How long to keep an unused connection open.
+      now_function: [callable] Returns the current time in seconds.
+    """
+    if max_connections_per_host < 1:
+      raise ValueError('max_connections_per_host must be positive.')
+    self.__max_connections_per_host = max_connections_per_host
+    self.__idle_timeout_secs = idle_timeout_secs
+    self.__now_function = now_function
+    self.__lock = threading.Condition()
+    self.__idle = {}     # list of (connection, time returned) keyed by host.
+    self.__num_open = {}  # The number of open connections keyed by host.
+    self.__num_connections_opened = 0
+    self.__num_connections_reused = 0
+    self.logger = logging.getLogger(__name__)
+
+  def export_to_json_snapshot(self, snapshot, entity):
+    """Implements JsonSnapshotableEntity interface."""
+    builder = snapshot.edge_builder
+    builder.make_control(entity, 'Max Connections Per Host',
+                         self.__max_connections_per_host)
+    builder.make_control(entity, 'Idle Timeout', self.__idle_timeout_secs)
+
+  def close(self):
+    """Close all the idle connections."""
+    with self.__lock:
+      idle = self.__idle
+      self.__idle = {}
+      for key, entries in idle.items():
+        self.__num_open[key] -= len(entries)
+      self.__lock.notify_all()
+    for entries in idle.values():
+      for connection, _ in entries:
+        connection.close()
+
+  def request(self, url, method, body=None, headers=None, timeout=None):
+    """Send an HTTP request on a pooled connection.
+
+    Args:
+      url: [string] The full URL to send to.
+      method: [string] The HTTP method (e.g. GET).
+      body: [string] The payload to send, if any.
+      headers: [dict] The headers to send, if any.
+      timeout: [float] Seconds to wait on the server, if bounded.
+
+    Raises:
+      socket.error or httplib.HTTPException if there was no response.
+
+    Returns:
+      HttpConnectionPoolResponse
+    """
+    parsed = urlparse.urlsplit(url)
+    if parsed.scheme not in ['http', 'https']:
+      raise ValueError('Unsupported URL scheme in {0}'.format(url))
+    key = (parsed.scheme, parsed.hostname,
+           parsed.port or (443 if parsed.scheme == 'https' else 80))
+    selector = parsed.path or '/'
+    if parsed.query:
+      selector += '?' + parsed.query
+
+    connection, reused = self.__acquire(key)
+    succeeded = False
+    try:
+      sent = False
+      try:
+        self.__send(connection, selector, method, body, headers, timeout)
+        sent = True
+        result = self.__read_response(connection, key)
+      except (httplib.BadStatusLine, httplib.CannotSendRequest,
+              socket.error) as ex:
+        # Once the request was sent the server may have acted on it, so
+        # only send it again if doing so cannot repeat a change.
+        if (not reused or not self.__is_stale_error(ex)
+            or (sent and method.upper() not in _IDEMPOTENT_METHODS)):
+          raise
+        self.logger.debug('Reconnecting to %s:%s after stale connection: %r',
+                          key[1], key[2], ex)
+        connection.close()
+        connection = self.__new_connection(key)
+        self.__send(connection, selector, method, body, headers, timeout)
+        result = self.__read_response(connection, key)
+      succeeded = True
+      return result
+    finally:
+      if not succeeded:
+        connection.close()
+        connection = None
+      self.__release(key, connection)
+
+  @staticmethod
+  def __is_stale_error(ex):
+    """Determine if ex indicates the server had already closed the connection.
+    """
+    if isinstance(ex, socket.timeout):
+      return False
+    if isinstance(ex, socket.error):
+      return ex.errno in _STALE_ERRNOS
+    return True
+
+  @staticmethod
+  def __send(connection, selector, method, body, headers, timeout):
+    """Send a request on the connection."""
+    # pylint: disable=too-many-arguments
+    connection.timeout = timeout
+    if connection.sock is not None:
+      connection.sock.settimeout(timeout)
+    connection.request(method, selector, body, headers or {})
+
+  def __read_response(self, connection, key):
+    """Read the entire response to the request sent on the connection.
+
+    The connection is closed if the server indicated it would close it.
+    """
+    response = connection.getresponse()
+    result = HttpConnectionPoolResponse(
+        response.status, dict(response.getheaders()), response.read())
+    if response.will_close:
+      self.logger.debug('%s:%s will not keep the connection alive.',
+                        key[1], key[2])
+      connection.close()
+    return result
+
+  def __new_connection(self, key):
+    """Create a new connection to the host identified by key."""
+    scheme, host, port = key
+    connection_class = (httplib.HTTPSConnection if scheme == 'https'
+                        else httplib.HTTPConnection)
+    with self.__lock:
+      self.__num_connections_opened += 1
+    return connection_class(host, port)
+
+  def __acquire(self, key):
+    """Take an idle connection to a host, or a new one if none are idle.
+
+    This blocks while max_connections_per_host connections are in use.
+
+    Returns:
+      The connection and whether it was previously used.
+    """
+    expired = []
+    try:
+      with self.__lock:
+        while True:
+          idle = self.__idle.get(key, [])
+          deadline = self.__now_function() - self.__idle_timeout_secs
+          while idle and idle[0][1] < deadline:
+            expired.append(idle.pop(0)[0])
+            self.__num_open[key] -= 1
+
+          if idle:
+            # Prefer the most recently used, which is least likely stale.
+            connection = idle.pop()[0]
+            self.__num_connections_reused += 1
+            return connection, True
+
+          if self.__num_open.get(key, 0) < self.__max_connections_per_host:
+            self.__num_open[key] = self.__num_open.get(key, 0) + 1
+            break
+          self.__lock.wait()
+    finally:
+      for connection in expired:
+        connection.close()
+
+    return self.__new_connection(key), False
+
+  def __release(self, key, connection):
+    """Return a connection taken by __acquire.
+
+    Args:
+      key: [tuple] Identifies the host the connection is to.
+      connection: [HTTPConnection] The connection or None if it was discarded.
+    """
+    with self.__lock:
+      if connection is not None and connection.sock is not None:
+        self.__idle.setdefault(key, []).append(
+            (connection, self.__now_function()))
+      else:
+        self.__num_open[key] -= 1
+      self.__lock.notify()
@@ -16,15 +16,16 @@
 
 
 # Standard python modules.
-import json
 import logging
 import re
 import traceback
 
 # citest modules.
 from .. import json_contract as jc
+from ..base import Return
 from ..json_predicate import JsonError
 from . import AgentError
+from .http_agent import SpooledHttpResponseType
 
 
 class HttpAgentError(AgentError):
@@ -55,57 +56,111 @@ class HttpObjectObserver(jc.ObjectObserver):
     """The HttpAgent used to make observations is bound in the constructor."""
     return self.__agent
 
-  def __init__(self, agent, path, filter=None):
+  def __init__(self, agent, path, filter=None, streaming=False,
+               watch_path=None, watch_fallback_secs=None):
     """Construct observer.
 
     Args:
       agent: [HttpAgent] Instance to use.
       path: [string] Path to GET from server that agent is bound to.
+      streaming: [bool] Whether to only decode the parts of the response
+         that the observation will be verified against.
+      watch_path: [string] If not None then a long-poll path that the server
+         holds until what the path observes changes. Retrying clauses GET
+         this repeatedly and observe again when it succeeds.
+      watch_fallback_secs: [float] When watching, the longest to wait for a
+         change before observing again anyway. None defers to the clause's
+         RetryPolicy.
     """
     # pylint: disable=redefined-builtin
-    super(HttpObjectObserver, self).__init__(filter)
+    # pylint: disable=too-many-arguments
+    super(HttpObjectObserver, self).__init__(filter, streaming=streaming)
     self.__agent = agent
     self.__path = path
+    self.__watch_path = watch_path
+    self.__watch_fallback_secs = watch_fallback_secs
 
   def __str__(self):
     return 'HttpObjectObserver({0})'.format(self.__agent)
 
+  def observation_cache_key(self, context):
+    """Implements ObjectObserver interface."""
+    return ['HttpObjectObserver', id(self.__agent), context.eval(self.__path)]
+
   def export_to_json_snapshot(self, snapshot, entity):
     """Implements JsonSnapshotableEntity interface."""
     snapshot.edge_builder.make_mechanism(entity, 'Agent', self.__agent)
     snapshot.edge_builder.make_control(entity, 'Path', self.__path)
     super(HttpObjectObserver, self).export_to_json_snapshot(snapshot, entity)
 
+  def open_change_stream(self, context, observation):
+    """Implements ObjectObserver interface."""
+    if self.__watch_path is None:
+      return None
+    watch_path = context.eval(self.__watch_path)
+    return jc.PollingChangeStream(
+        lambda: self.__agent.get(watch_path, trace=False).ok(),
+        fallback_secs=self.__watch_fallback_secs)
+
   def collect_observation(self, context, observation, trace=True):
     # This is where we'd use an HttpAgent to get a URL then
     # collect some thing out of the results.
-    result = self.agent.get(context.eval(self.__path), trace=trace)
+    deadline = context.deadline
+    result = self.agent.get(context.eval(self.__path), trace=trace,
+                            timeout=deadline.clamp(None) if deadline else None)
+    return self.__observe_result(context, result, observation)
+
+  def collect_observation_async(self, loop, context, observation, trace=True):
+    """Implements ObjectObserver interface."""
+    deadline = context.deadline
+    result = yield self.agent.get_async(
+        loop, context.eval(self.__path), trace=trace,
+        timeout=deadline.clamp(None) if deadline else None)
+    raise Return(self.__observe_result(context, result, observation))
+
+  def __observe_result(self, context, result, observation):
+    """Add the objects in an HTTP response to the observation.
+
+    Args:
+      context [ExecutionContext]: The context the observation is made within.
+      result [HttpResponseType]: The response to the observer's GET.
+      observation [Observation]: The observation we are building.
+
+    Returns:
+      The current list of objects we've observed so far.
+    """
     if not result.ok():
       http_agent_error = HttpAgentError(result)
       logging.getLogger(__name__).info(http_agent_error)
       observation.add_error(http_agent_error)
       return []
 
-    return self._do_decode_objects(result.output, observation)
+    if isinstance(result, SpooledHttpResponseType):
+      with result.body.open() as stream:
+        return self._do_decode_objects(context, stream, observation,
+                                       description=str(result.body))
+    return self._do_decode_objects(context, result.output, observation)
 
-  def _do_decode_objects(self, content, observation):
+  def _do_decode_objects(self, context, content, observation,
+                         description=None):
     """Implements helper method to extract observed objects.
 
     Args:
-      content [string]: A JSON encoded string containing the observation.
+      context [ExecutionContext]: The context the observation is made within.
+      content [string or file]: The JSON encoded observation.
       observation [Observation]: The observation we are building.
+      description [string]: Describes the content in errors if it is a file.
+         If None then the content itself is used.
 
     Returns:
       The current list of objects we've observed so far.
     """
-    decoder = json.JSONDecoder()
     try:
-      doc = decoder.decode(content)
-      if not isinstance(doc, list):
-        doc = [doc]
+      doc = self.decode_json_objects(context, content, observation)
       observation.add_all_objects(doc)
     except ValueError as ex:
-      error = 'Invalid JSON in response: %s' % content
+      error = 'Invalid JSON in response: %s' % (
+          content if description is None else description)
       logging.getLogger(__name__).info('%s\n%s\n----------------\n',
                                        error, traceback.format_exc())
       observation.add_error(JsonError(error, ex))
@@ -147,7 +202,8 @@ class HttpContractClauseBuilder(jc.ContractClauseBuilder):
     self.__agent = agent
     self.__strict = strict
 
-  def get_url_path(self, path, allow_http_error_status=None):
+  def get_url_path(self, path, allow_http_error_status=None, streaming=False,
+                   watch_path=None):
     """Perform the observation using HTTP GET on a path.
 
     Args:
@@ -157,8 +213,13 @@ class HttpContractClauseBuilder(jc.ContractClauseBuilder):
          404 would mean that we permit a 404 error, otherwise we may expect
          other constraints on the observed path as a normal clause would
          specify.
+      streaming [bool]: If True then only decode the parts of the response
+         that the clause's constraints refer to.
+      watch_path [string]: If not None then a long-poll path returning when
+         the observed path changes, to re-verify on rather than polling.
     """
-    self.observer = HttpObjectObserver(self.__agent, path)
+    self.observer = HttpObjectObserver(self.__agent, path, streaming=streaming,
+                                       watch_path=watch_path)
     if allow_http_error_status:
       error_verifier = HttpObservationFailureVerifier(
           'Got HTTP {0} Error'.format(allow_http_error_status),
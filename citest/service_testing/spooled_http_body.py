@@ -0,0 +1,173 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Keeps large HTTP response bodies in files rather than in memory.
+
+An HttpAgent with a spool_threshold_bytes reads response bodies with
+read_http_body. Bodies larger than the threshold are written to a file as
+they arrive and returned as a SpooledHttpBody, which reads the file back only
+when asked to. Only a preview of the head and tail of the body is journaled.
+"""
+
+
+import hashlib
+import mmap
+import os
+import tempfile
+
+
+# The number of bytes to read from the response at a time.
+_CHUNK_SIZE = 65536
+
+
+class SpooledHttpBody(object):
+  """An HTTP response body that was written to a file."""
+
+  # The number of bytes kept from each end of the body for previews.
+  PREVIEW_BYTES = 1024
+
+  @property
+  def path(self):
+    """The path of the file containing the body."""
+    return self.__path
+
+  @property
+  def size(self):
+    """The number of bytes in the body."""
+    return self.__size
+
+  @property
+  def sha256(self):
+    """The hex SHA-256 digest of the body."""
+    return self.__sha256
+
+  @property
+  def head(self):
+    """The first PREVIEW_BYTES bytes of the body."""
+    return self.__head
+
+  @property
+  def tail(self):
+    """The last PREVIEW_BYTES bytes of the body."""
+    return self.__tail
+
+  def __init__(self, path, size, sha256, head, tail, delete_when_unused=True):
+    """Constructor.
+
+    Args:
+      path: [string] The path of the file containing the body.
+      size: [int] The number of bytes in the body.
+      sha256: [string] The hex SHA-256 digest of the body.
+      head: [string] The first PREVIEW_BYTES bytes of the body.
+      tail: [string] The last PREVIEW_BYTES bytes of the body.
+      delete_when_unused: [bool] Whether to delete the file once this
+         instance is garbage collected.
+    """
+    # pylint: disable=too-many-arguments
+    self.__path = path
+    self.__size = size
+    self.__sha256 = sha256
+    self.__head = head
+    self.__tail = tail
+    self.__delete_when_unused = delete_when_unused
+
+  def __del__(self):
+    if self.__delete_when_unused:
+      self.delete()
+
+  def __str__(self):
+    return '{0} bytes in {1} sha256={2}'.format(
+        self.__size, self.__path, self.__sha256)
+
+  def preview(self, scrubber=None):
+    """Returns the head and tail of the body, omitting the middle.
+
+    Args:
+      scrubber: [callable] If not None then scrub the head and tail with this.
+    """
+    scrubber = scrubber or (lambda text: text)
+    if self.__size <= 2 * self.PREVIEW_BYTES:
+      # The head and tail overlap so between them they hold the whole body.
+      remaining = self.__size - len(self.__head)
+      return scrubber(
+          self.__head + (self.__tail[-remaining:] if remaining else ''))
+    head = scrubber(self.__head)
+    tail = scrubber(self.__tail)
+    return '{head}\n... {omitted} bytes omitted ...\n{tail}'.format(
+        head=head, omitted=self.__size - 2 * self.PREVIEW_BYTES, tail=tail)
+
+  def open(self):
+    """Returns a file object for reading the body from the start."""
+    return open(self.__path, 'rb')
+
+  def read(self):
+    """Returns the entire body as a string."""
+    with self.open() as stream:
+      return stream.read()
+
+  def mmap(self):
+    """Returns a read-only mmap of the body that the caller must close."""
+    if self.__size == 0:
+      raise ValueError('Cannot mmap an empty body.')
+    with self.open() as stream:
+      return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+  def delete(self):
+    """Delete the file containing the body."""
+    try:
+      os.remove(self.__path)
+    except OSError:
+      pass
+
+
+def read_http_body(stream, threshold_bytes, spool_dir=None):
+  """Read an HTTP response body, spooling it to a file if it is large.
+
+  Args:
+    stream: [file] The response to read the body from.
+    threshold_bytes: [int] Bodies larger than this are spooled.
+    spool_dir: [string] The directory to write spooled bodies into.
+       If None then they are written as temporary files that are deleted
+       once no longer referenced. Otherwise they are kept.
+
+  Returns:
+    The body as a string if it is no larger than threshold_bytes,
+    otherwise a SpooledHttpBody.
+  """
+  chunks = []
+  size = 0
+  while size <= threshold_bytes:
+    chunk = stream.read(_CHUNK_SIZE)
+    if not chunk:
+      return ''.join(chunks)
+    chunks.append(chunk)
+    size += len(chunk)
+
+  digest = hashlib.sha256()
+  head = ''.join(chunks)[:SpooledHttpBody.PREVIEW_BYTES]
+  tail = ''
+  handle, path = tempfile.mkstemp(prefix='citest-http-', suffix='.body',
+                                  dir=spool_dir)
+  with os.fdopen(handle, 'wb') as spool:
+    while chunks:
+      for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+        tail = (tail + chunk)[-SpooledHttpBody.PREVIEW_BYTES:]
+      chunk = stream.read(_CHUNK_SIZE)
+      chunks = [chunk] if chunk else []
+      size += len(chunk)
+
+  return SpooledHttpBody(path, size, digest.hexdigest(), head, tail,
+                         delete_when_unused=spool_dir is None)
@@ -0,0 +1,205 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Refreshes the pending AgentOperationStatus of many waiting threads.
+
+Normally each thread waiting on an AgentOperationStatus sleeps and refreshes
+the status on its own. When many operations are in flight at once (e.g. from
+AgentTestCase.run_test_case_list) that is a lot of uncoordinated requests.
+
+A StatusPoller owns all the pending statuses instead. A single thread
+refreshes them as they become due, and the waiting threads block until their
+status is finished or they time out. Statuses that become due at about the
+same time are refreshed together through BaseAgent.refresh_statuses, which
+an agent can specialize to refresh many statuses with a single request.
+
+To use a poller, bind it to the agent executing the operations:
+  agent.status_poller = StatusPoller()
+"""
+
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+
+class _PendingStatus(object):
+  """A status being waited on."""
+  # pylint: disable=too-few-public-methods
+
+  def __init__(self, status, poll_every_secs, end_time, trace, condition):
+    self.status = status
+    self.poll_every_secs = poll_every_secs
+    self.end_time = end_time
+    self.trace = trace
+    self.condition = condition
+    self.done = False
+    self.exc_info = None
+
+
+class StatusPoller(object):
+  """Refreshes pending statuses on behalf of the threads waiting on them."""
+
+  @property
+  def num_pending(self):
+    """The number of statuses currently being waited on."""
+    with self.__lock:
+      return len(self.__heap)
+
+  @property
+  def num_refresh_batches(self):
+    """The number of refresh_statuses calls made so far."""
+    return self.__num_refresh_batches
+
+  def __init__(self, coalesce_secs=0.25, now_function=time.time):
+    """Constructor.
+
+    Args:
+      coalesce_secs: [float] Statuses that become due within this many seconds
+         of one another are refreshed together, slightly early, rather than
+         one at a time.
+      now_function: [callable] Returns the current time in seconds.
+    """
+    self.__coalesce_secs = coalesce_secs
+    self.__now_function = now_function
+    self.__lock = threading.Lock()
+    self.__wakeup = threading.Condition(self.__lock)
+    self.__heap = []  # of (due_time, sequence, _PendingStatus)
+    self.__sequence = itertools.count()
+    self.__thread = None
+    self.__num_refresh_batches = 0
+
+  def wait(self, status, poll_every_secs, max_secs, trace=False):
+    """Block until the status finishes or max_secs elapse.
+
+    Args:
+      status: [AgentOperationStatus] The status to wait on. This should
+         already have been refreshed at least once.
+      poll_every_secs: [float] Interval between refreshing the status.
+      max_secs: [float] How long to wait before giving up. None is indefinite.
+      trace: [bool] Whether to log each refresh.
+
+    Raises:
+      The exception from refreshing the status, if any.
+
+    Returns:
+      True if the status finished, False if it timed out.
+    """
+    if status.finished:
+      return True
+
+    now = self.__now_function()
+    end_time = sys.float_info.max if max_secs is None else now + max_secs
+    with self.__lock:
+      pending = _PendingStatus(status, poll_every_secs, end_time, trace,
+                               threading.Condition(self.__lock))
+      if not self.__schedule(pending, now):
+        # Already out of time. The caller has refreshed the status once.
+        return status.finished
+      if self.__thread is None:
+        self.__thread = threading.Thread(
+            name='StatusPoller', target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+      while not pending.done:
+        pending.condition.wait()
+
+    if pending.exc_info is not None:
+      raise pending.exc_info[0], pending.exc_info[1], pending.exc_info[2]
+    return status.finished
+
+  def __schedule(self, pending, now):
+    """Add the status back to the heap for when it is next due.
+
+    Returns:
+      False if the status has already run out of time.
+    """
+    secs_remaining = pending.end_time - now
+    if secs_remaining <= 0:
+      return False
+    due_time = now + min(secs_remaining, pending.poll_every_secs)
+    heapq.heappush(self.__heap, (due_time, next(self.__sequence), pending))
+    if self.__heap[0][2] is pending:
+      self.__wakeup.notify()
+    return True
+
+  def __run(self):
+    """The body of the thread refreshing statuses as they become due."""
+    while True:
+      with self.__lock:
+        due = self.__take_due()
+        if due is None:
+          self.__thread = None
+          return
+
+      batches = {}
+      for pending in due:
+        key = (id(pending.status.agent), pending.trace)
+        batches.setdefault(key, []).append(pending)
+      for batch in batches.values():
+        self.__refresh_batch(batch)
+
+      now = self.__now_function()
+      with self.__lock:
+        for pending in due:
+          if (pending.exc_info is not None
+              or pending.status.finished
+              or not self.__schedule(pending, now)):
+            pending.done = True
+            pending.condition.notify()
+
+  def __take_due(self):
+    """Wait for the next statuses to become due, then remove them.
+
+    Returns:
+      list of _PendingStatus to refresh, or None if nothing is pending.
+    """
+    while self.__heap:
+      now = self.__now_function()
+      secs_until_due = self.__heap[0][0] - now
+      if secs_until_due > 0:
+        self.__wakeup.wait(secs_until_due)
+        continue
+
+      due = []
+      while self.__heap and self.__heap[0][0] <= now + self.__coalesce_secs:
+        due.append(heapq.heappop(self.__heap)[2])
+      return due
+    return None
+
+  def __refresh_batch(self, batch):
+    """Refresh a batch of statuses from the same agent."""
+    agent = batch[0].status.agent
+    trace = batch[0].trace
+    self.__num_refresh_batches += 1
+    try:
+      errors = agent.refresh_statuses([pending.status for pending in batch],
+                                      trace=trace)
+    except Exception:  # pylint: disable=broad-except
+      # The batch as a whole failed, so we cannot tell which status was at
+      # fault. Refresh each on its own so only that one sees the error.
+      errors = []
+      for pending in batch:
+        try:
+          pending.status.refresh(trace=trace)
+          errors.append(None)
+        except Exception:  # pylint: disable=broad-except
+          errors.append(sys.exc_info())
+
+    # The waiting threads raise these.
+    for pending, exc_info in zip(batch, errors or [None] * len(batch)):
+      pending.exc_info = exc_info
@@ -0,0 +1,279 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Schedules test cases that depend on one another across worker threads.
+
+A TestCaseScheduler runs a test case once all the test cases it depends on
+have passed. If one fails then the test cases depending on it are skipped.
+Test cases can also be tagged with the scarce resources they use (e.g. a
+quota) so that no more than a given number using a tag run at once.
+
+When more test cases are ready than there are idle workers, those with the
+highest priority run first. Among equal priorities, those heading the
+longest chain of dependent test cases (the critical path) run first so that
+the chain does not hold up the end of the run.
+
+  scheduler = TestCaseScheduler(tag_limits={'quota': 2})
+  create = scheduler.add(create_test_case, tags=['quota'])
+  scheduler.add(delete_test_case, depends_on=[create])
+  results = scheduler.run(run_function, max_concurrent=10)
+"""
+
+
+import collections
+import heapq
+import logging
+import sys
+import threading
+
+
+class TestCaseScheduleResult(
+    collections.namedtuple('TestCaseScheduleResult',
+                           ['test_case', 'status', 'exc_info'])):
+  """The outcome of a test case run by a TestCaseScheduler.
+
+  Attributes:
+    test_case: The test case.
+    status: [string] PASSED, FAILED or SKIPPED.
+    exc_info: [tuple] The sys.exc_info() from the failure, if FAILED.
+  """
+
+  PASSED = 'PASSED'
+  FAILED = 'FAILED'
+  SKIPPED = 'SKIPPED'
+
+  def __nonzero__(self):
+    return self.status == self.PASSED
+
+
+class _ScheduledTestCase(object):
+  """The scheduling state of a test case."""
+  # pylint: disable=too-few-public-methods
+  # pylint: disable=too-many-instance-attributes
+
+  def __init__(self, index, test_case, depends_on, tags, priority,
+               estimated_secs):
+    # pylint: disable=too-many-arguments
+    self.index = index
+    self.test_case = test_case
+    self.depends_on = depends_on
+    self.tags = tags
+    self.priority = priority
+    self.estimated_secs = estimated_secs
+    self.dependents = []
+    self.critical_path_secs = None
+    self.num_waiting_on = 0
+    self.blocked_by = None
+    self.result = None
+
+
+class TestCaseScheduler(object):
+  """Runs test cases in dependency order with bounded concurrency."""
+
+  @property
+  def test_cases(self):
+    """The test cases that were added, in order."""
+    return [scheduled.test_case for scheduled in self.__scheduled]
+
+  def __init__(self, tag_limits=None):
+    """Constructor.
+
+    Args:
+      tag_limits: [dict] The most test cases that may run at once using
+         each tag. Tags that are not in the dictionary are unlimited.
+    """
+    for tag, limit in (tag_limits or {}).items():
+      if limit < 1:
+        raise ValueError('The limit for tag "{0}" must be positive.'.format(
+            tag))
+    self.__tag_limits = dict(tag_limits or {})
+    self.__scheduled = []
+    self.__by_id = {}
+    self.logger = logging.getLogger(__name__)
+
+  def add(self, test_case, depends_on=None, tags=None, priority=0,
+          estimated_secs=1):
+    """Add a test case to the schedule.
+
+    Args:
+      test_case: [OperationContract] The test case to run.
+      depends_on: [list] The previously added test cases that must pass
+         before this one can run.
+      tags: [list of string] The resources this test case uses.
+      priority: [int] Ready test cases with higher priorities run first.
+      estimated_secs: [float] About how long the test case takes, used to
+         find the critical path.
+
+    Returns:
+      The test_case, for convenience.
+    """
+    # pylint: disable=too-many-arguments
+    if id(test_case) in self.__by_id:
+      raise ValueError('{0} was already added.'.format(test_case.title))
+    dependencies = []
+    for dependency in depends_on or []:
+      scheduled = self.__by_id.get(id(dependency))
+      if scheduled is None:
+        raise ValueError('{0} depends on {1}, which was not added.'.format(
+            test_case.title, dependency.title))
+      dependencies.append(scheduled)
+
+    scheduled = _ScheduledTestCase(
+        len(self.__scheduled), test_case, dependencies, list(tags or []),
+        priority, estimated_secs)
+    for dependency in dependencies:
+      dependency.dependents.append(scheduled)
+    self.__scheduled.append(scheduled)
+    self.__by_id[id(test_case)] = scheduled
+    return test_case
+
+  def run(self, run_function, max_concurrent):
+    """Run all the test cases.
+
+    Args:
+      run_function: [callable] Runs the test case it is given, raising an
+         exception if the test case fails.
+      max_concurrent: [int] The most test cases to run at once.
+
+    Returns:
+      list of TestCaseScheduleResult in the order that the test cases were
+      added.
+    """
+    if max_concurrent < 1:
+      raise ValueError('max_concurrent must be positive.')
+    run = _ScheduleRun(self.__scheduled, self.__tag_limits, run_function,
+                       self.logger)
+    threads = [threading.Thread(name='TestCaseScheduler-{0}'.format(i),
+                                target=run.work)
+               for i in range(min(max_concurrent, len(self.__scheduled)))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return [scheduled.result for scheduled in self.__scheduled]
+
+
+class _ScheduleRun(object):
+  """The state of a single TestCaseScheduler.run shared by its workers."""
+
+  def __init__(self, scheduled_list, tag_limits, run_function, logger):
+    """Constructor.
+
+    Args:
+      scheduled_list: [list of _ScheduledTestCase] The test cases to run.
+      tag_limits: [dict] The TestCaseScheduler tag limits.
+      run_function: [callable] Runs a test case.
+      logger: [Logger] The logger to report to.
+    """
+    self.__tag_limits = tag_limits
+    self.__run_function = run_function
+    self.__logger = logger
+    self.__condition = threading.Condition()
+    self.__ready = []  # heap of (-priority, -critical_path_secs, index, sc)
+    self.__running_by_tag = collections.defaultdict(int)
+    self.__num_unfinished = len(scheduled_list)
+
+    for scheduled in reversed(scheduled_list):
+      # Dependents are always added after what they depend on.
+      scheduled.critical_path_secs = scheduled.estimated_secs + max(
+          [dependent.critical_path_secs for dependent in scheduled.dependents]
+          or [0])
+    for scheduled in scheduled_list:
+      scheduled.result = None
+      scheduled.blocked_by = None
+      scheduled.num_waiting_on = len(scheduled.depends_on)
+      if not scheduled.depends_on:
+        self.__push_ready(scheduled)
+
+  def work(self):
+    """The body of a worker thread."""
+    with self.__condition:
+      while True:
+        scheduled = self.__take_next()
+        if scheduled is None:
+          if self.__num_unfinished == 0:
+            return
+          self.__condition.wait()
+          continue
+
+        self.__condition.release()
+        try:
+          self.__run_function(scheduled.test_case)
+          result = TestCaseScheduleResult(
+              scheduled.test_case, TestCaseScheduleResult.PASSED, None)
+        except Exception:  # pylint: disable=broad-except
+          self.__logger.error('Test case "%s" failed.',
+                              scheduled.test_case.title)
+          result = TestCaseScheduleResult(
+              scheduled.test_case, TestCaseScheduleResult.FAILED,
+              sys.exc_info())
+        finally:
+          self.__condition.acquire()
+
+        for tag in scheduled.tags:
+          self.__running_by_tag[tag] -= 1
+        self.__finish(scheduled, result)
+        self.__condition.notify_all()
+
+  def __push_ready(self, scheduled):
+    """Add a test case whose dependencies have all finished."""
+    heapq.heappush(self.__ready, (-scheduled.priority,
+                                  -scheduled.critical_path_secs,
+                                  scheduled.index, scheduled))
+
+  def __take_next(self):
+    """Remove the best ready test case whose tags have capacity.
+
+    Returns:
+      The _ScheduledTestCase to run, or None if none can run right now.
+    """
+    deferred = []
+    found = None
+    while self.__ready:
+      entry = heapq.heappop(self.__ready)
+      scheduled = entry[3]
+      if all(self.__running_by_tag[tag] < self.__tag_limits.get(tag, sys.maxint)
+             for tag in scheduled.tags):
+        found = scheduled
+        break
+      deferred.append(entry)
+
+    for entry in deferred:
+      heapq.heappush(self.__ready, entry)
+    if found is not None:
+      for tag in found.tags:
+        self.__running_by_tag[tag] += 1
+    return found
+
+  def __finish(self, scheduled, result):
+    """Record the result then release or skip the dependents."""
+    finished = [(scheduled, result)]
+    while finished:
+      scheduled, result = finished.pop()
+      scheduled.result = result
+      self.__num_unfinished -= 1
+      for dependent in scheduled.dependents:
+        if not result and dependent.blocked_by is None:
+          dependent.blocked_by = scheduled
+        dependent.num_waiting_on -= 1
+        if dependent.num_waiting_on:
+          continue
+        if dependent.blocked_by is None:
+          self.__push_ready(dependent)
+          continue
+        self.__logger.warning(
+            'Skipping test case "%s" because "%s" did not pass.',
+            dependent.test_case.title, dependent.blocked_by.test_case.title)
+        finished.append((dependent, TestCaseScheduleResult(
+            dependent.test_case, TestCaseScheduleResult.SKIPPED, None)))
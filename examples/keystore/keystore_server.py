@@ -23,6 +23,7 @@ import threading
 import time
 
 import BaseHTTPServer
+import SocketServer
 
 
 class ThreadSafeDict(object):
@@ -96,6 +97,23 @@ _key_store = ThreadSafeDict()
 
 
 class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  # Keep connections alive between requests so clients can reuse them.
+  # This requires every response to specify its Content-Length.
+  protocol_version = 'HTTP/1.1'
+
+  # Buffer each response so it is sent at once when flushed, rather than
+  # trickling out a line at a time and being held back by Nagle's algorithm.
+  wbufsize = -1
+
+  def send_body(self, code, headers, body, include_body=True):
+    self.send_response(code)
+    for key, value in headers.items():
+      self.send_header(key, value)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    if include_body:
+      self.wfile.write(body)
+
   def decode_request(self, request):
     parameters = {}
     path, ignore, query = request.partition('?')
@@ -110,10 +128,12 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     return path, parameters, fragment
 
   def do_HEAD(self):
-    self.send_response(200, {'Content-Type': 'text/html'})
+    self.send_body(200, {'Content-Type': 'text/html'}, '', include_body=False)
 
   def do_DELETE(self):
     path, parameters, fragment = self.decode_request(self.path)
+    # Consume the unused payload so it is not read as the next request.
+    self.rfile.read(int(self.headers.get('Content-Length', 0)))
     code = 404
     headers = {}
     body = 'Not Found: path={0}'.format(path)
@@ -122,11 +142,7 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     if path.startswith('/delete/'):
       code, headers, body = self.__do_delete(key, parameters)
 
-    self.send_response(code)
-    for key, value in headers.items():
-      self.send_header(key, value)
-    self.end_headers()
-    self.wfile.write(body)
+    self.send_body(code, headers, body)
 
   def do_POST(self):
     path, parameters, fragment = self.decode_request(self.path)
@@ -140,11 +156,7 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     elif path.startswith('/put_random/'):
       code, headers, body = self.__do_put_random(key, parameters)
 
-    self.send_response(code)
-    for key, value in headers.items():
-      self.send_header(key, value)
-    self.end_headers()
-    self.wfile.write(body)
+    self.send_body(code, headers, body)
 
   def do_GET(self):
     request = self.request
@@ -161,11 +173,7 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     elif path == '/exit':
       code, body = 200, 'BYE'
 
-    self.send_response(code)
-    for key, value in headers.items():
-      self.send_header(key, value)
-    self.end_headers()
-    self.wfile.write(body)
+    self.send_body(code, headers, body)
 
     if path == '/exit':
       sys.exit(0)
@@ -184,6 +192,8 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
     return 200, {}, 'OK'
 
   def __do_put_random(self, key, parameters):
+    # Consume the unused payload so it is not read as the next request.
+    self.rfile.read(int(self.headers.get('Content-Length', 0)))
     value = 'Random Value "{0}"'.format(time.time())
     if 'async' in parameters:
       def fn():
@@ -224,13 +234,19 @@ class SimpleRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
       return 404, {}, 'Key \"{0}\" Not Found'.format(key)
 
 
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+  # Each kept-alive connection is served by its own thread.
+  daemon_threads = True
+
+
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--port', default=8712, type=int)
   options = parser.parse_args()
 
-  httpd = BaseHTTPServer.HTTPServer(('localhost', options.port),
-                                    SimpleRequestHandler)
+  httpd = ThreadingHTTPServer(('localhost', options.port),
+                              SimpleRequestHandler)
   httpd.serve_forever()
 
 
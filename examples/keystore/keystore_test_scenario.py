@@ -40,6 +40,7 @@ import time
 
 from citest.service_testing import AgentTestScenario
 from citest.service_testing import HttpAgent
+from citest.service_testing import HttpConnectionPool
 
 
 class KeystoreTestScenario(AgentTestScenario):
@@ -101,7 +102,8 @@ class KeystoreTestScenario(AgentTestScenario):
   def new_agent(self, bindings):
     """Implements citest.service_testing.AgentTestScenario.new_agent."""
     return HttpAgent('http://{host}:{port}'.format(
-        host=bindings['HOST'], port=bindings['PORT']))
+        host=bindings['HOST'], port=bindings['PORT']),
+                     connection_pool=HttpConnectionPool())
 
   def cleanup(self):
     """Cleanup the scenario."""
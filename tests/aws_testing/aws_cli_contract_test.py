@@ -0,0 +1,79 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.aws_testing.aws_cli_contract module."""
+
+
+import json
+import unittest
+
+import citest.json_contract as jc
+from citest.aws_testing.aws_cli_contract import (
+    _add_ec2_filter_args,
+    _find_ec2_describe_command)
+
+
+class Ec2FilterTest(unittest.TestCase):
+  def test_find_command(self):
+    self.assertEqual(
+        'describe-instances',
+        _find_ec2_describe_command(['ec2', 'describe-instances']))
+    self.assertIsNone(_find_ec2_describe_command(['ec2', 'describe-hosts']))
+    self.assertIsNone(_find_ec2_describe_command(['s3', 'ls']))
+
+  def test_add_filters(self):
+    conditions = [
+        jc.FilterCondition('InstanceId', jc.FILTER_EQUALS, 'i-1234'),
+        jc.FilterCondition('State/Name', jc.FILTER_EQUALS, 'running'),
+        jc.FilterCondition('KeyName', jc.FILTER_CONTAINS, 'my*key?')]
+    args = ['ec2', 'describe-instances']
+    result = _add_ec2_filter_args(args, 'describe-instances', conditions)
+    self.assertEqual(['ec2', 'describe-instances', '--filters'], result[:3])
+    self.assertEqual(
+        [{'Name': 'instance-id', 'Values': ['i-1234']},
+         {'Name': 'instance-state-name', 'Values': ['running']},
+         {'Name': 'key-name', 'Values': ['*my\\*key\\?*']}],
+        json.JSONDecoder().decode(result[3]))
+    self.assertEqual(['ec2', 'describe-instances'], args)
+
+  def test_whitelist(self):
+    # EC2 rejects unknown filter names, so only whitelisted paths are used.
+    conditions = [
+        jc.FilterCondition('Tags/Value', jc.FILTER_EQUALS, 'test'),
+        jc.FilterCondition('InstanceId', jc.FILTER_EQUALS, 'i-1234'),
+        jc.FilterCondition('AmiLaunchIndex', jc.FILTER_EQUALS, 0)]
+    result = _add_ec2_filter_args([], 'describe-instances', conditions)
+    self.assertEqual(
+        [{'Name': 'instance-id', 'Values': ['i-1234']}],
+        json.JSONDecoder().decode(result[1]))
+
+    # The names are specific to each command.
+    args = ['ec2', 'describe-vpcs']
+    self.assertIs(args, _add_ec2_filter_args(args, 'describe-vpcs',
+                                             conditions[1:]))
+
+  def test_existing_filters(self):
+    condition = jc.FilterCondition('VpcId', jc.FILTER_EQUALS, 'vpc-1')
+    for args in [['ec2', 'describe-vpcs', '--filters', '[]'],
+                 ['ec2', 'describe-vpcs', '--filters=[]']]:
+      self.assertIs(
+          args, _add_ec2_filter_args(args, 'describe-vpcs', [condition]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,73 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.azure_testing.az_contract module."""
+
+
+import unittest
+
+import citest.json_contract as jc
+from citest.azure_testing.az_contract import _add_az_query_args
+
+
+class AzQueryTest(unittest.TestCase):
+  def test_add_query(self):
+    conditions = [
+        jc.FilterCondition('name', jc.FILTER_EQUALS, "it's"),
+        jc.FilterCondition('properties/state', jc.FILTER_CONTAINS, 'Succ'),
+        jc.FilterCondition('count', jc.FILTER_EQUALS, long(5)),
+        jc.FilterCondition('enabled', jc.FILTER_EQUALS, True)]
+    args = ['vm', 'list']
+    self.assertEqual(
+        ['vm', 'list', '--query',
+         "[?contains([@][].\"name\"[], 'it\\'s')"
+         " && ([@][].\"properties\"[].\"state\"[]"
+         " | [?type(@) == 'string' && contains(@, 'Succ')]"
+         " | length(@) > `0`)"
+         " && contains([@][].\"count\"[], `5`)"
+         " && contains([@][].\"enabled\"[], `true`)]"],
+        _add_az_query_args(args, conditions))
+    self.assertEqual(['vm', 'list'], args)
+
+  def test_quoted_identifiers(self):
+    conditions = [
+        jc.FilterCondition('tags/my-tag', jc.FILTER_EQUALS, 'x'),
+        jc.FilterCondition('tags/a.b', jc.FILTER_EQUALS, 'y')]
+    self.assertEqual(
+        ['--query',
+         "[?contains([@][].\"tags\"[].\"my-tag\"[], 'x')"
+         " && contains([@][].\"tags\"[].\"a.b\"[], 'y')]"],
+        _add_az_query_args([], conditions))
+
+  def test_unsupported_conditions(self):
+    conditions = [
+        jc.FilterCondition('name', jc.FILTER_EQUALS, 'back\\slash'),
+        jc.FilterCondition('count', jc.FILTER_CONTAINS, 5)]
+    args = ['vm', 'list']
+    self.assertIs(args, _add_az_query_args(args, conditions))
+    self.assertIs(args, _add_az_query_args(args, None))
+
+  def test_existing_query(self):
+    condition = jc.FilterCondition('name', jc.FILTER_EQUALS, 'vm')
+    for args in [['vm', 'list', '--query', '[0]'],
+                 ['vm', 'list', '--query=[0]']]:
+      self.assertIs(args, _add_az_query_args(args, [condition]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,77 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from citest.base import (
+    Cassette,
+    CassetteMissError)
+
+
+class CassetteTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.temp_dir, 'test.cassette')
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_record_and_replay(self):
+    cassette = Cassette(self.path, Cassette.RECORD)
+    self.assertFalse(cassette.replaying)
+    cassette.record('http', {'url': 'a'}, {'output': 'first'})
+    cassette.record('http', {'url': 'b'}, {'output': 'other'})
+    cassette.record('http', {'url': 'a'}, {'output': 'second'})
+    cassette.record('cli', {'url': 'a'}, {'output': 'cli'})
+    cassette.close()
+
+    cassette = Cassette(self.path, Cassette.REPLAY)
+    self.assertTrue(cassette.replaying)
+    self.assertEqual({'output': 'cli'}, cassette.replay('cli', {'url': 'a'}))
+    self.assertEqual({'output': 'first'}, cassette.replay('http', {'url': 'a'}))
+    self.assertEqual({'output': 'second'},
+                     cassette.replay('http', {'url': 'a'}))
+
+    # The last response repeats once the others are used up.
+    self.assertEqual({'output': 'second'},
+                     cassette.replay('http', {'url': 'a'}))
+    self.assertEqual({'output': 'other'}, cassette.replay('http', {'url': 'b'}))
+
+    with self.assertRaises(CassetteMissError):
+      cassette.replay('http', {'url': 'c'})
+    with self.assertRaises(ValueError):
+      cassette.record('http', {'url': 'c'}, {})
+
+  def test_match_function(self):
+    cassette = Cassette(self.path, Cassette.RECORD)
+    cassette.record('http', {'url': 'a', 'data': 'x'}, {'output': 'ok'})
+    cassette.close()
+
+    cassette = Cassette(self.path, Cassette.REPLAY,
+                        match_function=lambda kind, request: request['url'])
+    self.assertEqual({'output': 'ok'},
+                     cassette.replay('http', {'url': 'a', 'data': 'y'}))
+
+  def test_bad_mode(self):
+    with self.assertRaises(ValueError):
+      Cassette(self.path, 'rewind')
+
+
+if __name__ == '__main__':
+  unittest.main()
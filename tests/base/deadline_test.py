@@ -0,0 +1,77 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from citest.base import (
+    Deadline,
+    DeadlineExceededError,
+    ExecutionContext)
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self):
+    return self.now
+
+
+class DeadlineTest(unittest.TestCase):
+  def test_budget(self):
+    clock = FakeClock()
+    deadline = Deadline(10, now_function=clock)
+    self.assertEqual(110, deadline.end_time)
+    self.assertEqual(10, deadline.remaining_secs)
+    self.assertEqual(4, deadline.clamp(4))
+    self.assertEqual(10, deadline.clamp(None))
+    self.assertEqual(105, deadline.clamp_end_time(105))
+    self.assertEqual(110, deadline.clamp_end_time(200))
+    deadline.check('testing')
+
+    clock.now = 108
+    self.assertEqual(2, deadline.clamp(4))
+    self.assertFalse(deadline.expired)
+
+    clock.now = 111
+    self.assertTrue(deadline.expired)
+    self.assertEqual(0, deadline.clamp(4))
+    with self.assertRaises(DeadlineExceededError) as raised:
+      deadline.check('testing')
+    self.assertEqual(
+        'Deadline budget of 10 secs was exhausted before testing.',
+        str(raised.exception))
+    self.assertIs(deadline, raised.exception.deadline)
+
+  def test_narrow(self):
+    clock = FakeClock()
+    deadline = Deadline(10, now_function=clock)
+    self.assertIs(deadline, deadline.narrow(None))
+    self.assertIs(deadline, deadline.narrow(20))
+    narrower = deadline.narrow(5)
+    self.assertEqual(105, narrower.end_time)
+
+  def test_context(self):
+    context = ExecutionContext()
+    self.assertIsNone(context.deadline)
+    deadline = Deadline(10)
+    context.deadline = deadline
+    self.assertIs(deadline, context.deadline)
+    self.assertIs(deadline, context.copy().deadline)
+    context.deadline = None
+    self.assertIsNone(context.deadline)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,110 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+import socket
+import time
+import unittest
+
+from citest.base import (
+    EventLoop,
+    Future,
+    Return)
+
+
+def add_later(loop, secs, a, b):
+  yield loop.sleep(secs)
+  raise Return(a + b)
+
+
+def fail_later(loop, secs):
+  yield loop.sleep(secs)
+  raise ValueError('Failed')
+
+
+class EventLoopTest(unittest.TestCase):
+  def test_coroutine_result(self):
+    loop = EventLoop()
+    self.assertEqual(3, loop.run_until_complete(add_later(loop, 0, 1, 2)))
+
+  def test_nested_coroutines(self):
+    loop = EventLoop()
+    def outer():
+      first = yield add_later(loop, 0, 1, 2)
+      try:
+        yield fail_later(loop, 0)
+      except ValueError as ex:
+        raise Return((first, str(ex)))
+
+    self.assertEqual((3, 'Failed'), loop.run_until_complete(outer()))
+
+  def test_exception(self):
+    loop = EventLoop()
+    with self.assertRaises(ValueError):
+      loop.run_until_complete(fail_later(loop, 0))
+
+  def test_gather_runs_concurrently(self):
+    loop = EventLoop()
+    start = time.time()
+    results = loop.run_until_complete(
+        [add_later(loop, 0.1, i, i) for i in range(50)])
+    self.assertEqual([2 * i for i in range(50)], results)
+    self.assertLess(time.time() - start, 2)
+
+    with self.assertRaises(ValueError):
+      loop.run_until_complete([add_later(loop, 0, 1, 1),
+                               fail_later(loop, 0)])
+    self.assertEqual([], loop.run_until_complete([]))
+
+  def test_timers(self):
+    loop = EventLoop()
+    calls = []
+    loop.call_later(0.02, calls.append, 'second')
+    loop.call_later(0.01, calls.append, 'first')
+    loop.call_later(0.01, calls.append, 'cancelled').cancel()
+    loop.run_until_complete(loop.sleep(0.03))
+    self.assertEqual(['first', 'second'], calls)
+
+  def test_readers(self):
+    loop = EventLoop()
+    left, right = socket.socketpair()
+    future = Future()
+    def on_readable():
+      loop.remove_reader(left.fileno())
+      future.set_result(left.recv(100))
+
+    try:
+      loop.add_reader(left.fileno(), on_readable)
+      loop.call_later(0.01, right.send, 'hello')
+      self.assertEqual('hello', loop.run_until_complete(future))
+    finally:
+      left.close()
+      right.close()
+
+  def test_nothing_to_wait_for(self):
+    with self.assertRaises(RuntimeError):
+      EventLoop().run_until_complete(Future())
+
+  def test_cannot_wait_on_value(self):
+    loop = EventLoop()
+    def coroutine():
+      yield 'not a future'
+
+    with self.assertRaises(TypeError):
+      loop.run_until_complete(coroutine())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -29,6 +29,33 @@ class ExecutionContextTest(unittest.TestCase):
     self.assertEqual(123, context.eval(123))
     self.assertEqual('IX', context.eval(fn))
 
+  def test_access_recording(self):
+    context = ExecutionContext(x='X', y='Y')
+    context.add_internal('i', 'I')
+    context.begin_access_recording()
+    self.assertEqual('X', context['x'])
+    context.begin_access_recording()
+    self.assertEqual('I', context.get('i', None))
+    self.assertFalse('missing' in context)
+    self.assertEqual(set(['i', 'missing']), context.end_access_recording())
+    self.assertEqual('Y', context.peek('y', None))
+    self.assertEqual(set(['x', 'i', 'missing']),
+                     context.end_access_recording())
+
+  def test_copy(self):
+    context = ExecutionContext(x='X')
+    context.add_internal('i', 'I')
+    copy = context.copy()
+    copy['y'] = 'Y'
+    copy.clear_key('i')
+    self.assertEqual('X', copy['x'])
+    self.assertFalse('i' in copy)
+    self.assertEqual('I', context['i'])
+    self.assertFalse('y' in context)
+    self.assertEqual('external={0!r}, internal={1!r}'.format({'x': 'X'},
+                                                              {'i': 'I'}),
+                     repr(context))
+
 
 if __name__ == '__main__':
   unittest.main()
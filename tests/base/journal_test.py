@@ -144,6 +144,23 @@ class JournalTest(unittest.TestCase):
     got_obj = decoder.decode(input_stream.next())
     self.assertItemsEqual(expect_obj, got_obj)
 
+  def test_write_metrics(self):
+    output = StringIO()
+    journal = TestJournal(output)
+    offset = len(output.getvalue())
+
+    journal.write_metrics('My clause', {'attempts': 2, 'valid': True},
+                          kind='ContractClause')
+    input_stream = RecordInputStream(StringIO(output.getvalue()[offset:]))
+    got_obj = json.JSONDecoder(encoding='ASCII').decode(input_stream.next())
+    self.assertEqual('JournalMetrics', got_obj['_type'])
+    self.assertEqual('My clause', got_obj['_title'])
+    self.assertEqual({'attempts': 2, 'valid': True}, got_obj['_value'])
+    self.assertEqual('ContractClause', got_obj['kind'])
+
+    with self.assertRaises(TypeError):
+      journal.write_metrics('Bad', 'not a dict')
+
   def test_store(self):
     """Verify we store objects as JSON snapshots."""
     data = TestData('NAME', 1234, TestDetails())
@@ -199,6 +216,35 @@ class JournalTest(unittest.TestCase):
     json_object['_thread'] = threading.current_thread().ident
     self.assertItemsEqual(json_object, got[2])
 
+  def test_capture(self):
+    """Verify captured entries are held back until written together."""
+    journal = TestJournal(StringIO())
+    journal.begin_capture()
+    self.assertRaises(ValueError, journal.begin_capture)
+    journal.begin_context('Held')
+    journal.write_message('Held message.')
+    journal.end_context()
+
+    # Another thread is not being captured.
+    thread = threading.Thread(
+        target=lambda: journal.write_message('Other thread.'))
+    thread.start()
+    thread.join()
+
+    captured = journal.end_capture()
+    self.assertRaises(ValueError, journal.end_capture)
+    self.assertEquals(3, len(captured))
+    journal.write_captured(captured)
+    journal.terminate()
+
+    got = [json.JSONDecoder().decode(entry)
+           for entry in RecordInputStream(StringIO(journal.final_content))]
+    self.assertEquals(
+        ['Starting journal.', 'Other thread.', 'BEGIN', 'Held message.',
+         'END', 'Finished journal.'],
+        [entry.get('_value', entry.get('control')) for entry in got])
+    self.assertEquals(captured[0]['_timestamp'], got[2]['_timestamp'])
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,185 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.base.sharded_test_suite module."""
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from StringIO import StringIO
+
+from citest.base import (
+    Journal,
+    JournalLogger,
+    RecordInputStream,
+    ShardedTestSuite,
+    TestRunner,
+    set_global_journal,
+    unset_global_journal)
+
+
+def make_fixtures():
+  """Returns the TestCase classes to shard.
+
+  These are declared here so that the test loader does not find them.
+  """
+  class PassingFixture(unittest.TestCase):
+    def test_a(self):
+      JournalLogger.journal_or_log('PassingFixture.a pid={0}'.format(
+          os.getpid()))
+
+    def test_b(self):
+      JournalLogger.journal_or_log('PassingFixture.b pid={0}'.format(
+          os.getpid()))
+
+  class MixedFixture(unittest.TestCase):
+    def test_fail(self):
+      self.assertEqual(1, 2, 'Expected failure in worker')
+
+    def test_error(self):
+      raise KeyError('Expected error in worker')
+
+    def test_skip(self):
+      raise unittest.SkipTest('Skipped in worker')
+
+  class BrokenFixture(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+      raise ValueError('Broken class fixture')
+
+    def test_never_runs(self):
+      pass
+
+  return PassingFixture, MixedFixture, BrokenFixture
+
+
+def load_suite(*classes):
+  loader = unittest.TestLoader()
+  suite = unittest.TestSuite()
+  for klass in classes:
+    suite.addTests(loader.loadTestsFromTestCase(klass))
+  return suite
+
+
+class ShardedTestSuiteTest(unittest.TestCase):
+  def setUp(self):
+    self.log_dir = tempfile.mkdtemp()
+    self.prefix = os.path.join(self.log_dir, 'sharded')
+
+  def tearDown(self):
+    shutil.rmtree(self.log_dir)
+
+  def test_results(self):
+    passing, mixed, broken = make_fixtures()
+    suite = ShardedTestSuite(load_suite(passing, mixed, broken), 3,
+                             segment_path_prefix=self.prefix)
+    result = unittest.TestResult()
+    suite.run(result)
+
+    self.assertEqual(5, result.testsRun)
+    self.assertEqual(1, len(result.failures))
+    self.assertEqual('test_fail', result.failures[0][0]._testMethodName)
+    self.assertIn('Expected failure in worker', result.failures[0][1])
+    self.assertEqual(2, len(result.errors))
+    self.assertIn('Expected error in worker', result.errors[0][1])
+    self.assertIn('BrokenFixture', str(result.errors[1][0]))
+    self.assertIn('Broken class fixture', result.errors[1][1])
+    self.assertEqual([('test_skip', 'Skipped in worker')],
+                     [(test._testMethodName, reason)
+                      for test, reason in result.skipped])
+
+  def test_journal_merge(self):
+    passing, mixed, _ = make_fixtures()
+    output = StringIO()
+    journal = Journal()
+    journal.open_with_file(output)
+    prior_journal = unset_global_journal()
+    set_global_journal(journal)
+    try:
+      suite = ShardedTestSuite(load_suite(passing, mixed), 2,
+                               segment_path_prefix=self.prefix)
+      suite.run(unittest.TestResult())
+    finally:
+      unset_global_journal()
+      if prior_journal is not None:
+        set_global_journal(prior_journal)
+
+    entries = [json.JSONDecoder().decode(text)
+               for text in RecordInputStream(StringIO(output.getvalue()))]
+    titles = [entry['_title'] for entry in entries
+              if entry.get('control') == 'BEGIN']
+    self.assertEqual(['Worker process 0', 'Worker process 1'], titles)
+
+    # The passing fixture ran in a single worker process other than this one.
+    messages = [entry['_value'] for entry in entries
+                if str(entry.get('_value')).startswith('PassingFixture')]
+    self.assertEqual(2, len(messages))
+    pids = set([message.split('pid=')[1] for message in messages])
+    self.assertEqual(1, len(pids))
+    self.assertNotIn(str(os.getpid()), pids)
+
+    # The segments were removed once merged.
+    self.assertEqual([], os.listdir(self.log_dir))
+
+  def test_single_class_per_shard(self):
+    passing, mixed, broken = make_fixtures()
+    suite = ShardedTestSuite(load_suite(passing, mixed, broken), 10,
+                             segment_path_prefix=self.prefix)
+    self.assertEqual(6, suite.countTestCases())
+    result = unittest.TestResult()
+    suite.run(result)
+    self.assertEqual(5, result.testsRun)
+
+
+class PreparedTestRunner(TestRunner):
+  """A TestRunner with fixed bindings rather than command-line arguments."""
+
+  def __init__(self, bindings):
+    super(PreparedTestRunner, self).__init__()
+    self.__prepared_bindings = bindings
+
+  def _prepare(self):
+    self.bindings.update(self.__prepared_bindings)
+
+
+class ShardedTestRunnerTest(unittest.TestCase):
+  def setUp(self):
+    # Constructing a TestRunner replaces the global one.
+    # pylint: disable=protected-access
+    prior_runner = TestRunner._TestRunner__global_runner
+    def restore():
+      TestRunner._TestRunner__global_runner = prior_runner
+    self.addCleanup(restore)
+
+  def test_profile_predicates_rejected(self):
+    delegate_calls = []
+    runner = PreparedTestRunner({'NUM_PROCESSES': 2,
+                                 'PROFILE_PREDICATES': True})
+    with self.assertRaises(ValueError) as raised:
+      runner.run(unittest.FunctionTestCase(
+          lambda: delegate_calls.append(True)))
+    self.assertIn('--profile_predicates', str(raised.exception))
+    self.assertEqual([], delegate_calls)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -21,6 +21,7 @@ from citest.base import (
 
 import citest.gcp_testing as gt
 import citest.json_contract as jc
+import citest.json_predicate as jp
 import citest.service_testing as st
 
 import fake_gcloud_agent
@@ -65,6 +66,30 @@ class GCloudContractTest(unittest.TestCase):
         'instances', ['list'] + extra_args, project='PROJECT')
     self.assertEquals(command, gcloud.last_run_params)
 
+  def test_list_pushdown(self):
+    context = ExecutionContext()
+    default_response = st.CliResponseType(
+        0, '[{"name":"my-vm", "status":"RUNNING"}]', '')
+    gcloud = fake_gcloud_agent.FakeGCloudAgent(
+        'PROJECT', 'ZONE', default_response=default_response)
+    contract_builder = gt.GCloudContractBuilder(gcloud)
+
+    c1 = contract_builder.new_clause_builder('TITLE')
+    extra_args = ['--filter=zone:us-central1']
+    verifier = c1.list_resources('instances', extra_args=extra_args,
+                                 pushdown=True)
+    verifier.contains_match({'name': jp.STR_SUBSTR('vm'),
+                             'status': jp.STR_EQ('RUNNING')})
+    contract = contract_builder.build()
+    self.assertTrue(contract.verify(context))
+
+    filter_arg = [arg for arg in gcloud.last_run_params
+                  if arg.startswith('--filter=')]
+    self.assertEqual(1, len(filter_arg))
+    self.assertTrue(filter_arg[0].startswith('--filter=(zone:us-central1)'))
+    self.assertTrue('name~"vm"' in filter_arg[0])
+    self.assertTrue('status="RUNNING"' in filter_arg[0])
+
   def test_inspect_not_found_ok(self):
     context = ExecutionContext()
 
@@ -15,12 +15,17 @@
 # pylint: disable=missing-docstring
 # pylint: disable=invalid-name
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from mock import patch
 
 from citest.gcp_testing import gcp_agent
-from citest.base import ExecutionContext
+from citest.base import (
+    Cassette,
+    ExecutionContext)
 
 from .test_gcp_agent import (
     FakeGcpDiscovery,
@@ -28,6 +33,11 @@ from .test_gcp_agent import (
     TestGcpAgent)
 
 
+class PagingFakeGcpService(FakeGcpService):
+  def list_next(self, request, response):
+    return request if 'nextPageToken' in response else None
+
+
 class GcpAgentTest(unittest.TestCase):
   @patch('apiclient.discovery.build')
   def test_download(self, mock_discovery):
@@ -115,6 +125,30 @@ class GcpAgentTest(unittest.TestCase):
                      service.calls)
     self.assertEqual([1, 2, 3, 4, 5, 6], got)
 
+  def test_cassette(self):
+    context = ExecutionContext()
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, 'test.cassette')
+    try:
+      service = PagingFakeGcpService(
+          ['HELLO', {'items': [1, 2], 'nextPageToken': 'X'}, {'items': [3]}])
+      agent = TestGcpAgent.make_test_agent(service=service)
+      agent.cassette = Cassette(path, Cassette.RECORD)
+      agent.invoke_resource(context, 'get', 'my_test', 'MY_ID')
+      agent.list_resource(context, 'my_test')
+      agent.cassette.close()
+
+      # The requests are still made, but not executed.
+      service = PagingFakeGcpService([])
+      agent = TestGcpAgent.make_test_agent(service=service)
+      agent.cassette = Cassette(path, Cassette.REPLAY)
+      self.assertEqual(
+          'HELLO', agent.invoke_resource(context, 'get', 'my_test', 'MY_ID'))
+      self.assertEqual([1, 2, 3], agent.list_resource(context, 'my_test'))
+      self.assertNotIn('execute', service.calls)
+    finally:
+      shutil.rmtree(temp_dir)
+
   def test_resource_type_to_info(self):
     # Verify we can traverse a [nested] discovery document.
     doc = TestGcpAgent.load_discovery_document(
@@ -30,6 +30,7 @@ import citest.gcp_testing as gt
 import citest.json_predicate as jp
 import citest.json_contract as jc
 import citest.service_testing as st
+from citest.gcp_testing.gcp_contract import _add_compute_filter_kwargs
 
 from test_gcp_agent import (
     FakeGcpService,
@@ -128,6 +129,36 @@ class GcpContractTest(st.AgentTestCase):
                       agent.service.last_get_args)
 
 
+class ComputeFilterTest(unittest.TestCase):
+  def test_add_filter(self):
+    conditions = [
+        jc.FilterCondition('name', jc.FILTER_EQUALS, 'my "vm"'),
+        jc.FilterCondition('labels/env', jc.FILTER_EQUALS, 'test'),
+        jc.FilterCondition('cpus', jc.FILTER_EQUALS, long(5)),
+        jc.FilterCondition('ratio', jc.FILTER_EQUALS, 0.25),
+        jc.FilterCondition('preemptible', jc.FILTER_EQUALS, False)]
+    kwargs = {'project': 'p'}
+    self.assertEqual(
+        {'project': 'p',
+         'filter': '(name = "my \\"vm\\"") (labels.env = "test")'
+                   ' (cpus = 5) (ratio = 0.25) (preemptible = false)'},
+        _add_compute_filter_kwargs(kwargs, conditions))
+    self.assertEqual({'project': 'p'}, kwargs)
+
+  def test_unsupported_conditions(self):
+    conditions = [
+        jc.FilterCondition('name', jc.FILTER_CONTAINS, 'vm'),
+        jc.FilterCondition('disks/type', jc.FILTER_EQUALS, 'PERSISTENT')]
+    kwargs = {'project': 'p'}
+    self.assertIs(kwargs, _add_compute_filter_kwargs(kwargs, conditions))
+    self.assertIs(kwargs, _add_compute_filter_kwargs(kwargs, None))
+
+  def test_existing_filter(self):
+    kwargs = {'filter': 'zone = "us-central1-f"'}
+    self.assertIs(kwargs, _add_compute_filter_kwargs(
+        kwargs, [jc.FilterCondition('name', jc.FILTER_EQUALS, 'vm')]))
+
+
 if __name__ == '__main__':
   new_global_journal_with_path('./gce_contract_test.journal')
   unittest.main()
@@ -0,0 +1,174 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_contract.change_stream module."""
+
+
+import sys
+import threading
+import time
+import unittest
+
+from citest.base import ExecutionContext
+import citest.json_contract as jc
+import citest.json_predicate as jp
+
+
+class SlowPolicy(jc.RetryPolicy):
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    return end_time - now
+
+
+class WatchingObserver(jc.ObjectObserver):
+  """Observes a sequence of values, changing when notified."""
+
+  def __init__(self, values, fallback_secs=None):
+    super(WatchingObserver, self).__init__()
+    self.values = list(values)
+    self.calls = 0
+    self.fallback_secs = fallback_secs
+    self.stream = None
+    self.closed = False
+
+  def open_change_stream(self, context, observation):
+    observer = self
+
+    class Stream(jc.EventChangeStream):
+      def close(self):
+        observer.closed = True
+
+    self.stream = Stream(fallback_secs=self.fallback_secs)
+    return self.stream
+
+  def collect_observation(self, context, observation, trace=True):
+    self.calls += 1
+    observation.add_object(self.values[min(self.calls, len(self.values)) - 1])
+    return observation.objects
+
+
+class ChangeStreamTest(unittest.TestCase):
+  def test_event(self):
+    stream = jc.EventChangeStream(fallback_secs=3)
+    self.assertEqual(3, stream.fallback_secs)
+    self.assertFalse(stream.wait_for_change(0))
+    stream.notify()
+    stream.notify()
+    self.assertTrue(stream.wait_for_change(0))
+    self.assertFalse(stream.wait_for_change(0.01))
+    self.assertEqual(2, stream.num_changes)
+
+    timer = threading.Timer(0.05, stream.notify)
+    timer.start()
+    self.assertTrue(stream.wait_for_change(10))
+    timer.join()
+
+  def test_polling(self):
+    calls = []
+    def wait_function():
+      calls.append(len(calls))
+      if len(calls) == 1:
+        raise IOError('Failed')
+      return len(calls) == 2
+
+    stream = jc.PollingChangeStream(wait_function, retry_secs=0.01)
+    try:
+      self.assertTrue(stream.wait_for_change(10))
+    finally:
+      stream.close()
+    self.assertEqual(1, stream.num_changes)
+
+  def test_polling_does_not_spin(self):
+    calls = []
+    def wait_function():
+      calls.append(time.time())
+      return True
+
+    stream = jc.PollingChangeStream(wait_function, retry_secs=0.05)
+    try:
+      time.sleep(0.2)
+    finally:
+      stream.close()
+    self.assertLessEqual(len(calls), 6)
+    self.assertTrue(all(later - earlier >= 0.04
+                        for earlier, later in zip(calls, calls[1:])))
+
+  def test_process_stderr(self):
+    # The program would block on a full stderr pipe before reporting.
+    stream = jc.ProcessChangeStream(
+        [sys.executable, '-c',
+         'import sys, time\n'
+         'sys.stderr.write("x" * 1000000)\n'
+         'print "added"\n'
+         'sys.stdout.flush()\n'
+         'time.sleep(60)\n'])
+    try:
+      self.assertTrue(stream.wait_for_change(10))
+    finally:
+      stream.close()
+
+  def test_process(self):
+    stream = jc.ProcessChangeStream(
+        [sys.executable, '-c',
+         'import sys, time\n'
+         'print "added"\n'
+         'sys.stdout.flush()\n'
+         'time.sleep(60)\n'])
+    try:
+      self.assertTrue(stream.wait_for_change(10))
+      self.assertFalse(stream.wait_for_change(0.01))
+    finally:
+      stream.close()
+    self.assertEqual(1, stream.num_changes)
+
+  def test_clause_waits_for_change(self):
+    context = ExecutionContext()
+    verifier = jc.ValueObservationVerifier(
+        'Has A', constraints=[jp.STR_EQ('A')])
+    observer = WatchingObserver('BA')
+    clause = jc.ContractClause('TestClause', observer, verifier,
+                               retryable_for_secs=60, retry_policy=SlowPolicy())
+
+    start_time = time.time()
+    timer = threading.Timer(0.05, lambda: observer.stream.notify())
+    timer.start()
+    self.assertTrue(clause.verify(context))
+    timer.join()
+    self.assertLess(time.time() - start_time, 30)
+    self.assertEqual(2, observer.calls)
+    self.assertTrue(observer.closed)
+
+  def test_clause_fallback(self):
+    context = ExecutionContext()
+    verifier = jc.ValueObservationVerifier(
+        'Has A', constraints=[jp.STR_EQ('A')])
+    observer = WatchingObserver('BBA', fallback_secs=0.01)
+    clause = jc.ContractClause('TestClause', observer, verifier,
+                               retryable_for_secs=60, retry_policy=SlowPolicy())
+    self.assertTrue(clause.verify(context))
+    self.assertEqual(3, observer.calls)
+    self.assertTrue(observer.closed)
+
+    # Clauses that are not retried do not watch.
+    observer = WatchingObserver('A')
+    clause = jc.ContractClause('TestClause', observer, verifier)
+    self.assertTrue(clause.verify(context))
+    self.assertIsNone(observer.stream)
+
+
+if __name__ == '__main__':
+  unittest.main()
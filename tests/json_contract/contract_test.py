@@ -16,11 +16,23 @@
 # pylint: disable=missing-docstring
 # pylint: disable=invalid-name
 
+import json
+import threading
 import unittest
+from StringIO import StringIO
+
+import time
 
 from citest.base import (
+  Deadline,
+  DeadlineExceededError,
+  EventLoop,
   ExecutionContext,
-  JsonSnapshotHelper)
+  Journal,
+  JsonSnapshotHelper,
+  RecordInputStream,
+  set_global_journal,
+  unset_global_journal)
 
 import citest.json_contract as jc
 import citest.json_predicate as jp
@@ -85,6 +97,145 @@ class JsonContractTest(unittest.TestCase):
     self.assertEqual(expect_result, result)
     self.assertFalse(result)
 
+  def test_clause_retry_checks_validity_until_final_attempt(self):
+    context = ExecutionContext()
+    observation = jc.Observation()
+    observation.add_object('B')
+    fake_observer = FakeObserver(observation)
+
+    class CountingPredicate(jp.ValuePredicate):
+      def __init__(self):
+        super(CountingPredicate, self).__init__()
+        self.calls = 0
+        self.is_valid_calls = 0
+
+      def __call__(self, context, value):
+        self.calls += 1
+        return jp.STR_EQ('A')(context, value)
+
+      def is_valid(self, context, value):
+        self.is_valid_calls += 1
+        return value == 'A'
+
+      def __eq__(self, pred):
+        return self is pred
+
+      def __str__(self):
+        return 'CountingPredicate'
+
+      def export_to_json_snapshot(self, snapshot, entity):
+        pass
+
+    pred = CountingPredicate()
+    verifier = jc.ValueObservationVerifier('Has A', constraints=[pred])
+    clause = jc.ContractClause('TestClause', fake_observer, verifier,
+                               retryable_for_secs=0.3)
+    result = clause.verify(context)
+    self.assertFalse(result)
+    self.assertTrue(pred.is_valid_calls >= 1)
+    self.assertEqual(1, pred.calls)
+
+  def test_clause_deadline(self):
+    context = ExecutionContext()
+    observation = jc.Observation()
+    observation.add_object('B')
+    verifier = jc.ValueObservationVerifier(
+        'Has A', constraints=[jp.STR_EQ('A')])
+    clause = jc.ContractClause('TestClause', FakeObserver(observation),
+                               verifier, retryable_for_secs=60)
+
+    # The retries stop when the budget is exhausted.
+    context.deadline = Deadline(0.2)
+    start_time = time.time()
+    self.assertFalse(clause.verify(context))
+    self.assertLess(time.time() - start_time, 30)
+
+    # Once exhausted, the clause fails without observing.
+    result = clause.verify(context)
+    self.assertFalse(result)
+    errors = result.verify_results.observation.errors
+    self.assertEqual(1, len(errors))
+    self.assertTrue(isinstance(errors[0], DeadlineExceededError))
+
+  def check_clause_metrics(self, verify):
+    """Check the metrics written while verifying a clause.
+
+    Args:
+      verify: [callable] Verifies the clause in an ExecutionContext.
+
+    Returns:
+      The journal entries.
+    """
+    class SequenceObserver(jc.ObjectObserver):
+      def __init__(self, values):
+        super(SequenceObserver, self).__init__()
+        self.values = list(values)
+
+      def collect_observation(self, context, observation, trace=True):
+        observation.add_object(self.values.pop(0))
+        return observation.objects
+
+    class QuickPolicy(jc.RetryPolicy):
+      def next_delay(self, title, attempt, start_time, end_time, now,
+                     observation=None):
+        return 0.01
+
+    verifier = jc.ValueObservationVerifier(
+        'Has A', constraints=[jp.STR_EQ('A')])
+    clause = jc.ContractClause('TestClause', SequenceObserver('BBA'),
+                               verifier, retryable_for_secs=60,
+                               retry_policy=QuickPolicy())
+
+    output = StringIO()
+    journal = Journal()
+    journal.open_with_file(output)
+    prior_journal = unset_global_journal()
+    set_global_journal(journal)
+    try:
+      self.assertTrue(verify(clause, ExecutionContext()))
+    finally:
+      unset_global_journal()
+      if prior_journal is not None:
+        set_global_journal(prior_journal)
+
+    entries = [json.JSONDecoder().decode(entry)
+               for entry in RecordInputStream(StringIO(output.getvalue()))]
+    metrics = [entry for entry in entries
+               if entry.get('_type') == 'JournalMetrics']
+    self.assertEqual(1, len(metrics))
+    self.assertEqual('TestClause', metrics[0]['_title'])
+    self.assertEqual('ContractClause', metrics[0]['kind'])
+    values = metrics[0]['_value']
+    self.assertEqual(3, values['attempts'])
+    self.assertEqual(3, len(values['observe_secs']))
+    self.assertTrue(values['valid'])
+    self.assertEqual(60, values['retryable_for_secs'])
+    self.assertTrue(values['sleep_secs'] >= 0.02)
+    self.assertTrue(values['first_observation_secs']
+                    <= values['first_pass_secs']
+                    <= values['elapsed_secs'])
+    return entries
+
+  def test_clause_metrics(self):
+    self.check_clause_metrics(
+        lambda clause, context: clause.verify(context))
+
+  def test_clause_metrics_async(self):
+    loop = EventLoop()
+    entries = self.check_clause_metrics(
+        lambda clause, context: loop.run_until_complete(
+            clause.verify_async(loop, context)))
+
+    # The metrics and results are within the clause's context.
+    control = [(entry.get('control'), entry.get('_title'))
+               for entry in entries
+               if (entry.get('control')
+                   or entry.get('_type') == 'JournalMetrics')]
+    self.assertEqual([('BEGIN', 'Verifying ContractClause: TestClause'),
+                      (None, 'TestClause'),
+                      ('END', None)],
+                     control)
+
   def test_contract_success(self):
     context = ExecutionContext()
     observation = jc.Observation()
@@ -245,6 +396,72 @@ class JsonContractTest(unittest.TestCase):
     self.assertEqual(expect_result, result)
     self.assertFalse(result)
 
+  def test_contract_concurrent(self):
+    context = ExecutionContext()
+    observed = []
+    started = threading.Event()
+
+    class SlowObserver(jc.ObjectObserver):
+      def __init__(self, name, wait):
+        super(SlowObserver, self).__init__()
+        self.__name = name
+        self.__wait = wait
+
+      def collect_observation(self, context, observation, trace=True):
+        if self.__wait:
+          # The second clause starts before the first finishes observing.
+          started.wait(2)
+        else:
+          started.set()
+        observed.append(self.__name)
+        observation.add_object(self.__name)
+        return observation.objects
+
+    contract = jc.Contract(max_workers=3)
+    for name, wait, expect in [('A', True, 'A'), ('B', False, 'X'),
+                               ('C', False, 'C')]:
+      verifier = jc.ValueObservationVerifier(
+          'Has ' + expect, constraints=[jp.STR_EQ(expect)])
+      contract.add_clause(
+          jc.ContractClause(name, SlowObserver(name, wait), verifier))
+
+    output = StringIO()
+    journal = Journal()
+    journal.open_with_file(output)
+    prior_journal = unset_global_journal()
+    set_global_journal(journal)
+    try:
+      result = contract.verify(context)
+    finally:
+      unset_global_journal()
+      if prior_journal is not None:
+        set_global_journal(prior_journal)
+
+    self.assertFalse(result)
+    self.assertEqual('A', observed[-1])
+    self.assertEqual(['A', 'B', 'C'],
+                     [clause_result.clause.title
+                      for clause_result in result.clause_results])
+    self.assertEqual([True, False, True],
+                     [bool(clause_result)
+                      for clause_result in result.clause_results])
+
+    # Each clause's context is intact in the journal, in declaration order.
+    entries = [json.JSONDecoder().decode(entry)
+               for entry in RecordInputStream(StringIO(output.getvalue()))]
+    titles = []
+    depth = 0
+    for entry in entries:
+      if entry.get('_type') != 'JournalContextControl':
+        continue
+      if entry['control'] == 'BEGIN':
+        if depth == 0:
+          titles.append(entry['_title'])
+        depth += 1
+      else:
+        depth -= 1
+    self.assertEqual(['Verifying ContractClause: ' + name
+                      for name in ['A', 'B', 'C']], titles)
 
   def _try_verify(self, context, contract, observation,
                   expect_ok, expect_results=None, dump=False):
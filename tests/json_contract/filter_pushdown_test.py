@@ -0,0 +1,202 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_contract.filter_pushdown module."""
+
+
+import unittest
+
+from citest.base import ExecutionContext
+import citest.json_contract as jc
+import citest.json_predicate as jp
+
+
+_OBJECTS = [
+    {'name': 'alpha', 'status': 'RUNNING', 'size': 1,
+     'labels': {'env': 'test'}, 'tags': ['web', 'db'],
+     'disks': [{'type': 'ssd'}, {'type': 'hdd'}]},
+    {'name': 'beta', 'status': 'STOPPED', 'size': 2,
+     'labels': {'env': 'prod'}, 'tags': ['web'],
+     'disks': [{'type': 'hdd'}]},
+    {'name': 'gamma', 'status': 'RUNNING', 'size': 2,
+     'labels': {}, 'tags': [], 'disks': []}
+]
+
+
+def _satisfies(context, obj, condition):
+  """A reference implementation of how services apply a condition."""
+  values = [obj]
+  for key in condition.path.split('/'):
+    found = []
+    for value in values:
+      if isinstance(value, list):
+        found.extend([elem.get(key) for elem in value
+                      if isinstance(elem, dict) and key in elem])
+      elif isinstance(value, dict) and key in value:
+        found.append(value[key])
+    values = found
+  flat = []
+  for value in values:
+    flat.extend(value if isinstance(value, list) else [value])
+  if condition.op == jc.FILTER_EQUALS:
+    return condition.value in flat
+  return [value for value in flat
+          if isinstance(value, basestring) and condition.value in value] != []
+
+
+def _EQ(path, value):
+  return jc.FilterCondition(path, jc.FILTER_EQUALS, value)
+
+
+def _HAS(path, value):
+  return jc.FilterCondition(path, jc.FILTER_CONTAINS, value)
+
+
+class FilterPushdownTest(unittest.TestCase):
+  def assertPushdownPreservesOutcome(self, verifier, expect_conditions):
+    context = ExecutionContext()
+    conditions = verifier.filter_conditions(context)
+    self.assertEqual(expect_conditions, conditions)
+
+    filtered = jc.Observation()
+    filtered.add_all_objects(
+        [obj for obj in _OBJECTS
+         if all([_satisfies(context, obj, condition)
+                 for condition in conditions or []])])
+    unfiltered = jc.Observation()
+    unfiltered.add_all_objects(_OBJECTS)
+    self.assertEqual(verifier(context, unfiltered).valid,
+                     verifier(context, filtered).valid)
+    return filtered
+
+  def test_predicate_conditions(self):
+    context = ExecutionContext(env='test')
+    for pred, expect in [
+        (jp.PathPredicate('name', jp.STR_EQ('alpha')), [_EQ('name', 'alpha')]),
+        (jp.PathPredicate('name', jp.STR_SUBSTR('ph')), [_HAS('name', 'ph')]),
+        (jp.PathPredicate('size', jp.NUM_EQ(2)), [_EQ('size', 2)]),
+        (jp.PathPredicate('size', jp.NUM_LE(2)), []),
+        (jp.PathPredicate('labels/env',
+                          jp.STR_EQ(lambda context: context['env'])),
+         [_EQ('labels/env', 'test')]),
+        (jp.PathPredicate('disks', jp.DICT_SUBSET({'type': 'ssd'})),
+         [_HAS('disks/type', 'ssd')]),
+        (jp.DICT_MATCHES({'name': jp.STR_EQ('beta'),
+                          'labels/env': jp.EQUIVALENT('prod')}),
+         [_EQ('labels/env', 'prod'), _EQ('name', 'beta')]),
+        (jp.AND([jp.PathPredicate('name', jp.STR_EQ('beta')),
+                 jp.PathPredicate('size', jp.NUM_EQ(2))]),
+         [_EQ('name', 'beta'), _EQ('size', 2)]),
+        (jp.OR([jp.DICT_SUBSET({'status': 'RUNNING', 'size': 2}),
+                jp.DICT_SUBSET({'status': 'RUNNING', 'size': 1})]),
+         [_HAS('status', 'RUNNING')]),
+        (jp.NOT(jp.PathPredicate('name', jp.STR_EQ('beta'))), []),
+        (jp.PathPredicate('name', jp.STR_EQ('beta'),
+                          transform=lambda context, value: value), []),
+        (jp.PathPredicate('[0]/name', jp.STR_EQ('alpha')), []),
+        (jp.PathPredicate('', jp.LIST_MATCHES([jp.DICT_SUBSET({'size': 1})]),
+                          enumerate_terminals=False), []),
+        (jp.CardinalityPredicate(jp.PathPredicate('tags', jp.STR_EQ('web')),
+                                 min=0, max=0), [_EQ('tags', 'web')])]:
+      self.assertEqual(
+          sorted(expect),
+          sorted(jc.predicate_filter_conditions(context, pred)),
+          str(pred))
+
+  def test_element_path(self):
+    context = ExecutionContext()
+    name = jp.PathPredicate('items/metadata/name', jp.STR_EQ('a'))
+    label = jp.PathPredicate('items/metadata/labels/app', jp.STR_EQ('b'))
+    self.assertEqual([_EQ('metadata/name', 'a')],
+                     jc.predicate_filter_conditions(context, name, 'items'))
+    self.assertEqual([], jc.predicate_filter_conditions(context, name, 'x'))
+
+    # Above the elements each term may be satisfied by a different item.
+    self.assertEqual(
+        [], jc.predicate_filter_conditions(context, jp.AND([name, label]),
+                                           'items'))
+    # But within an element they are all satisfied by the same item.
+    self.assertEqual(
+        [_EQ('metadata/labels/app', 'b'), _EQ('metadata/name', 'a')],
+        sorted(jc.predicate_filter_conditions(
+            context,
+            jp.PathPredicate('items',
+                             jp.DICT_MATCHES({'metadata/name': jp.STR_EQ('a'),
+                                              'metadata/labels/app':
+                                                  jp.STR_EQ('b')})),
+            'items')))
+
+  def test_verifier_conditions(self):
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_path_eq('status', 'RUNNING')
+    builder.contains_path_value('size', 2)
+    self.assertPushdownPreservesOutcome(builder.build(), [])
+
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_match({'status': jp.STR_EQ('RUNNING'),
+                            'size': jp.NUM_EQ(2)})
+    builder.excludes_match({'status': jp.STR_EQ('RUNNING'),
+                            'labels': jp.DICT_SUBSET({'env': 'test'})})
+    filtered = self.assertPushdownPreservesOutcome(
+        builder.build(), [_EQ('status', 'RUNNING')])
+    self.assertEqual(2, len(filtered.objects))
+
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_path_eq('tags', 'web', min=2, max=2)
+    filtered = self.assertPushdownPreservesOutcome(
+        builder.build(), [_EQ('tags', 'web')])
+    self.assertEqual(2, len(filtered.objects))
+
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_path_eq('disks/type', 'ssd', min=0, max=0)
+    self.assertPushdownPreservesOutcome(builder.build(),
+                                        [_EQ('disks/type', 'ssd')])
+
+    builder = jc.ValueObservationVerifierBuilder('Test', strict=True)
+    builder.contains_path_eq('status', 'RUNNING')
+    self.assertPushdownPreservesOutcome(builder.build(), [])
+
+  def test_disjunction_and_failure_verifiers(self):
+    context = ExecutionContext()
+    found = jc.ValueObservationVerifierBuilder('Found')
+    found.contains_path_eq('name', 'alpha')
+    found.contains_match({'name': jp.STR_EQ('alpha'),
+                          'status': jp.STR_EQ('RUNNING')})
+    builder = jc.ObservationVerifierBuilder('Found or Not Found')
+    builder.append_verifier(jc.ObservationFailureVerifier('Not Found'))
+    builder.append_verifier_builder(found, new_term=True)
+    verifier = builder.build()
+    self.assertEqual([_EQ('name', 'alpha')],
+                     verifier.filter_conditions(context))
+
+    failure_only = jc.ObservationVerifierBuilder('Failure')
+    failure_only.append_verifier(jc.ObservationFailureVerifier('Not Found'))
+    self.assertIsNone(failure_only.build().filter_conditions(context))
+
+  def test_observer_plan_includes_filter(self):
+    context = ExecutionContext()
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_path_value('name', 'a')
+    observer = jc.ObjectObserver(
+        filter=jp.PathPredicate('status', jp.STR_EQ('RUNNING')),
+        pushdown=True)
+    self.assertEqual([_HAS('name', 'a'), _EQ('status', 'RUNNING')],
+                     observer.plan_filter_conditions(context, builder.build()))
+
+
+if __name__ == '__main__':
+  unittest.main()
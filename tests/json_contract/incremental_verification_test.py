@@ -0,0 +1,129 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_contract.incremental_verification module."""
+
+
+import copy
+import random
+import unittest
+
+from citest.base import ExecutionContext
+import citest.json_contract as jc
+import citest.json_predicate as jp
+
+
+def make_observation(objects):
+  observation = jc.Observation()
+  observation.add_all_objects(objects)
+  return observation
+
+
+def make_builder(strict, incremental):
+  builder = jc.ValueObservationVerifierBuilder(
+      'Test', strict=strict, incremental=incremental)
+  builder.contains_path_value('status', 'UP')
+  builder.contains_path_eq('tags', 'b', min=1, max=2)
+  builder.excludes_path_value('status', 'BROKEN')
+  builder.add_constraint(jp.DICT_SUBSET({'zone': 'z'}))
+  return builder
+
+
+class IncrementalVerificationTest(unittest.TestCase):
+  def test_object_identity(self):
+    self.assertEqual(('selfLink', 'http://x'),
+                     jc.object_identity({'selfLink': 'http://x', 'id': 1}))
+    self.assertEqual(('metadata/uid', 'u'),
+                     jc.object_identity({'metadata': {'uid': 'u',
+                                                      'name': 'n'}}))
+    self.assertEqual(('key', 3),
+                     jc.object_identity({'key': 3, 'name': 'n'}, 'key'))
+    self.assertIsNone(jc.object_identity({'key': 3}))
+    self.assertIsNone(jc.object_identity('text'))
+
+  def test_reuses_unchanged_objects(self):
+    context = ExecutionContext()
+    memo = jp.PredicateResultMemo()
+    context.set_internal(jp.PREDICATE_MEMO_CONTEXT_KEY, memo)
+    constraint = jp.PathPredicate('status', jp.STR_EQ('UP'))
+    incremental = jc.IncrementalValueVerification([constraint])
+
+    objects = [{'name': str(i), 'status': 'DOWN'} for i in range(10)]
+    memo.begin_attempt()
+    self.assertFalse(incremental.is_valid(context, objects, memo))
+    self.assertEqual((10, 0),
+                     (incremental.num_evaluated, incremental.num_reused))
+
+    objects = copy.deepcopy(objects)
+    objects[3]['status'] = 'UP'
+    objects.append({'name': 'new', 'status': 'DOWN'})
+    memo.begin_attempt()
+    self.assertTrue(incremental.is_valid(context, objects, memo))
+    self.assertEqual((2, 9),
+                     (incremental.num_evaluated, incremental.num_reused))
+
+    # Ambiguous identities cannot be verified incrementally.
+    self.assertIsNone(incremental.is_valid(
+        context, objects + [{'name': '3'}], memo))
+
+  def test_context_dependencies(self):
+    context = ExecutionContext(expect='UP')
+    memo = jp.PredicateResultMemo()
+    context.set_internal(jp.PREDICATE_MEMO_CONTEXT_KEY, memo)
+    incremental = jc.IncrementalValueVerification(
+        [jp.PathPredicate('status',
+                          jp.STR_EQ(lambda context: context['expect']))])
+    objects = [{'id': 1, 'status': 'UP'}]
+    self.assertTrue(incremental.is_valid(context, objects, memo))
+    context.set_snapshotable('expect', 'DOWN')
+    memo.begin_attempt()
+    self.assertFalse(incremental.is_valid(context, objects, memo))
+    self.assertEqual(1, incremental.num_evaluated)
+
+  def test_agrees_with_full_evaluation(self):
+    rand = random.Random(123)
+    for strict in [False, True]:
+      full = make_builder(strict, False).build()
+      verifier = make_builder(strict, True).build()
+      context = ExecutionContext()
+      memo = jp.PredicateResultMemo()
+      context.set_internal(jp.PREDICATE_MEMO_CONTEXT_KEY, memo)
+
+      objects = []
+      for _ in range(200):
+        memo.begin_attempt()
+        objects = copy.deepcopy(objects)
+        for _ in range(rand.randint(0, 3)):
+          choice = rand.randint(0, 3)
+          if choice == 0 or not objects:
+            objects.append({'id': rand.randint(0, 1000)})
+          elif choice == 1:
+            del objects[rand.randint(0, len(objects) - 1)]
+          else:
+            obj = objects[rand.randint(0, len(objects) - 1)]
+            obj['status'] = rand.choice(['UP', 'DOWN', 'BROKEN'])
+            obj['tags'] = rand.sample(['a', 'b', 'c'], rand.randint(0, 2))
+            obj['zone'] = rand.choice(['z', 'y'])
+
+        observation = make_observation(objects)
+        expect = bool(full(context, observation))
+        self.assertEqual(expect, verifier.is_valid(context, observation),
+                         'strict={0} objects={1}'.format(strict, objects))
+
+
+if __name__ == '__main__':
+  unittest.main()
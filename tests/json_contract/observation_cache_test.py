@@ -0,0 +1,123 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_contract.observation_cache module."""
+
+
+import unittest
+
+from citest.base import ExecutionContext
+import citest.json_contract as jc
+import citest.json_predicate as jp
+
+
+class CountingObserver(jc.ObjectObserver):
+  """Observes a list of objects, counting how often it is asked to."""
+
+  def __init__(self, request, objects, cacheable=True):
+    super(CountingObserver, self).__init__()
+    self.request = request
+    self.objects = objects
+    self.cacheable = cacheable
+    self.calls = 0
+
+  def observation_cache_key(self, context):
+    if not self.cacheable:
+      return None
+    return ['CountingObserver', context.eval(self.request)]
+
+  def collect_observation(self, context, observation, trace=True):
+    self.calls += 1
+    observation.add_all_objects(self.objects)
+    return observation.objects
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self):
+    return self.now
+
+
+class ObservationCacheTest(unittest.TestCase):
+  def collect(self, cache, context, observer, consumer):
+    observation = jc.Observation()
+    cache.collect_observation(context, observer, observation, consumer)
+    return observation
+
+  def test_share(self):
+    context = ExecutionContext(name='x')
+    clock = FakeClock()
+    cache = jc.ObservationCache(5, now_function=clock)
+    first = CountingObserver(['list', lambda context: context['name']], [1])
+    second = CountingObserver(['list', 'x'], [2])
+    other = CountingObserver(['list', 'y'], [3])
+
+    self.assertEqual([1], self.collect(cache, context, first, 'A').objects)
+    self.assertEqual([1], self.collect(cache, context, second, 'B').objects)
+    self.assertEqual([3], self.collect(cache, context, other, 'B').objects)
+    self.assertEqual((1, 0, 1), (first.calls, second.calls, other.calls))
+
+    # A consumer that already saw the entry asks for a new observation.
+    self.assertEqual([2], self.collect(cache, context, second, 'B').objects)
+    self.assertEqual(1, second.calls)
+
+    # Which is then shared with the others, until it expires.
+    self.assertEqual([2], self.collect(cache, context, first, 'A').objects)
+    clock.now += 5
+    self.assertEqual([1], self.collect(cache, context, first, 'C').objects)
+    self.assertEqual((2, 1), (first.calls, second.calls))
+    self.assertEqual((2, 4), (cache.hits, cache.misses))
+
+  def test_key_qualifiers(self):
+    context = ExecutionContext()
+    cache = jc.ObservationCache(5)
+    observer = CountingObserver('list', [1])
+    cache.collect_observation(context, observer,
+                              jc.Observation(projection_paths=['a']), 'A')
+    cache.collect_observation(context, observer,
+                              jc.Observation(projection_paths=['b']), 'B')
+    self.assertEqual(2, observer.calls)
+
+    uncacheable = CountingObserver('list', [1], cacheable=False)
+    self.collect(cache, context, uncacheable, 'A')
+    self.collect(cache, context, uncacheable, 'B')
+    self.assertEqual(2, uncacheable.calls)
+    self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+  def test_contract(self):
+    context = ExecutionContext()
+    observers = [CountingObserver('list', ['A', 'B']) for _ in range(3)]
+    for cache_secs, expect_calls in [(0, [1, 1, 1]), (60, [1, 0, 0])]:
+      for observer in observers:
+        observer.calls = 0
+      contract = jc.Contract(observation_cache_secs=cache_secs)
+      for index, observer in enumerate(observers):
+        verifier = jc.ValueObservationVerifier(
+            'Has B', constraints=[jp.STR_EQ('B')])
+        contract.add_clause(
+            jc.ContractClause('Clause {0}'.format(index), observer, verifier))
+      self.assertTrue(contract.verify(context))
+      self.assertEqual(expect_calls,
+                       [observer.calls for observer in observers])
+      self.assertIsNone(
+          context.peek(jc.OBSERVATION_CACHE_CONTEXT_KEY, None))
+
+
+if __name__ == '__main__':
+  unittest.main()
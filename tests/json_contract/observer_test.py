@@ -14,8 +14,12 @@
 
 # pylint: disable=missing-docstring
 
+import json
 import unittest
 
+from StringIO import StringIO
+from mock import patch
+
 from citest.base import ExecutionContext
 import citest.json_contract as jc
 import citest.json_predicate as jp
@@ -26,6 +30,17 @@ _NUMBER_DICT = {'a':1, 'b':2, 'three':3}
 _MIXED_DICT = {'a':'A', 'b':2, 'x':'X'}
 
 
+class JsonTextObserver(jc.ObjectObserver):
+  def __init__(self, text, **kwargs):
+    super(JsonTextObserver, self).__init__(**kwargs)
+    self.__text = text
+
+  def collect_observation(self, context, observation, trace=True):
+    observation.add_all_objects(
+        self.decode_json_objects(context, self.__text, observation))
+    return observation.objects
+
+
 class JsonObserverTest(unittest.TestCase):
   def test_observation(self):
     observation = jc.Observation()
@@ -157,6 +172,59 @@ class JsonObserverTest(unittest.TestCase):
           print 'GOT {0}'.format(verify_result)
           raise
 
+  def test_streaming_observer(self):
+    text = json.dumps([_LETTER_DICT, _NUMBER_DICT, _MIXED_DICT])
+    context = ExecutionContext()
+    builder = jc.ValueObservationVerifierBuilder('Test')
+    builder.contains_path_eq('a', 'A', min=2)
+    builder.excludes_path_value('x', 'Y')
+    verifier = builder.build()
+    self.assertEqual(['a', 'x'], verifier.projection_paths(context))
+
+    for streaming, expect_objects in [
+        (False, [_LETTER_DICT, _NUMBER_DICT, _MIXED_DICT]),
+        (True, [{'a': 'A'}, {'a': 1}, {'a': 'A', 'x': 'X'}])]:
+      observer = JsonTextObserver(text, streaming=streaming)
+      clause = jc.ContractClause('TestClause', observer, verifier)
+      result = clause.verify(context)
+      self.assertTrue(result)
+      self.assertEqual(expect_objects,
+                       result.verify_results.observation.objects)
+
+    # The filter's paths are decoded too.
+    observer = JsonTextObserver(text, streaming=True,
+                                filter=jp.PathEqPredicate('b', 'B'))
+    observation = jc.Observation(projection_paths=['a'])
+    self.assertEqual([{'a': 'A', 'b': 'B'}, {'a': 1, 'b': 2},
+                      {'a': 'A', 'b': 2}],
+                     observer.decode_json_objects(context, text, observation))
+
+  def test_decode_stream(self):
+    context = ExecutionContext()
+    text = json.JSONEncoder().encode([_LETTER_DICT, _NUMBER_DICT])
+    observer = JsonTextObserver(text, streaming=True)
+
+    # Without a projection the stream is decoded as a whole document.
+    with patch('citest.json_predicate.json_stream.JsonPathProjection',
+               side_effect=AssertionError('Should not project')):
+      self.assertEqual(
+          [_LETTER_DICT, _NUMBER_DICT],
+          observer.decode_json_objects(
+              context, StringIO(text), jc.Observation()))
+      self.assertEqual(
+          [_MIXED_DICT],
+          observer.decode_json_objects(
+              context, StringIO(json.JSONEncoder().encode(_MIXED_DICT)),
+              jc.Observation()))
+      with self.assertRaises(ValueError):
+        observer.decode_json_objects(
+            context, StringIO(text[:-1]), jc.Observation())
+
+    observation = jc.Observation(projection_paths=['a'])
+    self.assertEqual(
+        [{'a': 'A'}, {'a': 1}],
+        observer.decode_json_objects(context, StringIO(text), observation))
+
 
 if __name__ == '__main__':
   unittest.main()
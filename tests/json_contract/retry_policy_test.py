@@ -0,0 +1,171 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_contract.retry_policy module."""
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from citest.base import ExecutionContext
+from citest.service_testing import HttpResponseType
+from citest.service_testing.http_observer import HttpAgentError
+import citest.json_contract as jc
+import citest.json_predicate as jp
+
+
+class FakeResponse(dict):
+  """Resembles the httplib2 response in a googleapiclient HttpError."""
+
+  def __init__(self, status, headers):
+    super(FakeResponse, self).__init__(headers)
+    self.status = status
+
+
+class FakeHttpError(Exception):
+  def __init__(self, status, headers=None):
+    super(FakeHttpError, self).__init__('HTTP {0}'.format(status))
+    self.resp = FakeResponse(status, headers or {})
+
+
+class RecordingPolicy(jc.RetryPolicy):
+  def __init__(self):
+    self.delays = []
+    self.outcomes = []
+
+  def next_delay(self, title, attempt, start_time, end_time, now,
+                 observation=None):
+    self.delays.append(attempt)
+    return 0
+
+  def record_outcome(self, title, valid, elapsed_secs):
+    self.outcomes.append((title, valid))
+
+
+class SequenceObserver(jc.ObjectObserver):
+  def __init__(self, values):
+    super(SequenceObserver, self).__init__()
+    self.__values = list(values)
+
+  def collect_observation(self, context, observation, trace=True):
+    observation.add_object(self.__values.pop(0))
+    return observation.objects
+
+
+def make_observation(*errors):
+  observation = jc.Observation()
+  for error in errors:
+    observation.add_error(error)
+  return observation
+
+
+class RetryPolicyTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_fixed(self):
+    policy = jc.FixedRetryPolicy()
+    self.assertEqual(1, policy.next_delay('T', 1, 0, 5, 0))
+    self.assertEqual(3, policy.next_delay('T', 1, 0, 30, 10))
+    self.assertEqual(5, policy.next_delay('T', 9, 0, 600, 10))
+    self.assertEqual(0.5, policy.next_delay('T', 2, 0, 5, 4.5))
+
+  def test_exponential_backoff(self):
+    policy = jc.ExponentialBackoffRetryPolicy(
+        initial_secs=1, multiplier=2, max_secs=10, jitter=0.5,
+        random_function=lambda: 0.5)
+    self.assertEqual([0.75, 1.5, 3.0, 6.0, 7.5, 7.5],
+                     [policy.next_delay('T', attempt, 0, 100, 0)
+                      for attempt in range(1, 7)])
+    # Never past the deadline.
+    self.assertEqual(2, policy.next_delay('T', 6, 0, 100, 98))
+    self.assertEqual(0, policy.next_delay('T', 6, 0, 100, 101))
+
+  def test_server_hints(self):
+    self.assertIsNone(jc.server_retry_hint(None))
+    self.assertIsNone(jc.server_retry_hint(make_observation(
+        HttpAgentError(HttpResponseType(500, 'Oops', None)))))
+
+    retry_after = HttpAgentError(
+        HttpResponseType(503, '', None, {'retry-after': '7'}))
+    throttled = FakeHttpError(429)
+    dated = FakeHttpError(503, {'retry-after': 'Thu, 01 Jan 1970 00:01:40 GMT'})
+    self.assertEqual(7, jc.server_retry_hint(make_observation(retry_after)))
+    self.assertEqual(10, jc.server_retry_hint(make_observation(throttled)))
+    self.assertEqual(
+        20, jc.server_retry_hint(make_observation(dated), now=80))
+    self.assertEqual(
+        10, jc.server_retry_hint(make_observation(retry_after, throttled)))
+
+    policy = jc.ExponentialBackoffRetryPolicy(
+        initial_secs=1, jitter=0, throttled_secs=4)
+    self.assertEqual(4, policy.next_delay(
+        'T', 1, 0, 100, 0, make_observation(throttled)))
+    self.assertEqual(3, policy.next_delay(
+        'T', 1, 0, 100, 97, make_observation(retry_after)))
+
+  def test_learning(self):
+    path = os.path.join(self.temp_dir, 'stats.json')
+    stats = jc.ConvergenceStats(path, max_samples=3)
+    self.assertIsNone(stats.expected_secs('T'))
+    base = jc.ExponentialBackoffRetryPolicy(initial_secs=1, jitter=0)
+    policy = jc.LearningRetryPolicy(stats, base_policy=base)
+    self.assertEqual(1, policy.next_delay('T', 1, 0, 100, 1))
+
+    for secs in [30, 10, 20, 50]:
+      policy.record_outcome('T', True, secs)
+    policy.record_outcome('T', False, 100)
+    with open(path, 'r') as stream:
+      self.assertEqual({'T': [10, 20, 50]}, json.loads(stream.read()))
+
+    # A new policy learns from the file.
+    policy = jc.LearningRetryPolicy(jc.ConvergenceStats(path),
+                                    base_policy=base)
+    self.assertEqual(19, policy.next_delay('T', 1, 0, 100, 1))
+    self.assertEqual(10, policy.next_delay('T', 1, 0, 10, 0))
+    self.assertEqual(2, policy.next_delay('T', 2, 0, 100, 21))
+    self.assertEqual(1, policy.next_delay('Other', 1, 0, 100, 1))
+
+  def test_clause_uses_policy(self):
+    context = ExecutionContext()
+    verifier = jc.ValueObservationVerifier(
+        'Has A', constraints=[jp.STR_EQ('A')])
+
+    policy = RecordingPolicy()
+    clause = jc.ContractClause('TestClause', SequenceObserver('BBA'),
+                               verifier, retryable_for_secs=10,
+                               retry_policy=policy)
+    self.assertTrue(clause.verify(context))
+    self.assertEqual([1, 2], policy.delays)
+    self.assertEqual([('TestClause', True)], policy.outcomes)
+
+    context_policy = RecordingPolicy()
+    context.set_internal(jc.RETRY_POLICY_CONTEXT_KEY, context_policy)
+    clause = jc.ContractClause('TestClause', SequenceObserver('BA'),
+                               verifier, retryable_for_secs=10)
+    self.assertTrue(clause.verify(context))
+    self.assertEqual([1], context_policy.delays)
+
+
+if __name__ == '__main__':
+  unittest.main()
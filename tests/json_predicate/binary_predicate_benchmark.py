@@ -0,0 +1,195 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks DICT_SUBSET and DICT_MATCHES on wide cloud resource JSON.
+
+This is not part of the test suite. Run it directly:
+   PYTHONPATH=. python tests/json_predicate/binary_predicate_benchmark.py
+
+Each predicate is timed against a naive reference implementation that
+compares every expected list element with every actual element, and the
+outcomes are checked to agree.
+"""
+
+import argparse
+import timeit
+
+from citest.base import ExecutionContext
+import citest.json_predicate as jp
+
+
+def make_instance(num_items):
+  """Returns a GCE instance resource with num_items of metadata and tags."""
+  return {
+      'kind': 'compute#instance',
+      'id': '4912345678901234567',
+      'name': 'my-instance',
+      'zone': 'https://www.googleapis.com/compute/v1/projects/my-project'
+              '/zones/us-central1-f',
+      'status': 'RUNNING',
+      'tags': {'items': ['tag-{0}'.format(i) for i in range(num_items)],
+               'fingerprint': 'fyJ3QF2r0cA='},
+      'metadata': {
+          'kind': 'compute#metadata',
+          'items': [{'key': 'key-{0}'.format(i),
+                     'value': 'value-{0}'.format(i)}
+                    for i in range(num_items)]},
+      'networkInterfaces': [
+          {'network': 'global/networks/default',
+           'networkIP': '10.240.0.{0}'.format(i % 250),
+           'accessConfigs': [{'kind': 'compute#accessConfig',
+                              'type': 'ONE_TO_ONE_NAT',
+                              'name': 'external-nat'}]}
+          for i in range(8)],
+      'disks': [{'boot': i == 0, 'deviceName': 'disk-{0}'.format(i),
+                 'mode': 'READ_WRITE', 'licenses': ['debian-8-jessie']}
+                for i in range(16)]
+  }
+
+
+def make_deployment(num_items):
+  """Returns a Kubernetes deployment with num_items labels and env vars."""
+  labels = {'label-{0}'.format(i): 'value-{0}'.format(i)
+            for i in range(num_items)}
+  return {
+      'kind': 'Deployment',
+      'apiVersion': 'extensions/v1beta1',
+      'metadata': {'name': 'frontend', 'namespace': 'default',
+                   'labels': labels,
+                   'annotations': {'deployment.kubernetes.io/revision': '1'}},
+      'spec': {
+          'replicas': 3,
+          'template': {
+              'metadata': {'labels': labels},
+              'spec': {'containers': [
+                  {'name': 'container-{0}'.format(c),
+                   'image': 'gcr.io/my-project/frontend:v1',
+                   'ports': [{'containerPort': 8000 + p, 'protocol': 'TCP'}
+                             for p in range(4)],
+                   'env': [{'name': 'ENV_{0}'.format(i),
+                            'value': 'value-{0}'.format(i)}
+                           for i in range(num_items)]}
+                  for c in range(4)]}}}
+  }
+
+
+def naive_subset(expect, value):
+  """A reference DICT_SUBSET trying each expected element against each."""
+  # pylint: disable=too-many-return-statements
+  if isinstance(expect, dict):
+    if not isinstance(value, dict):
+      return False
+    for key, expect_value in expect.items():
+      if key not in value:
+        return False
+      value_value = value[key]
+      if isinstance(value_value, list) and not isinstance(expect_value, list):
+        expect_value = [expect_value]
+      if not naive_subset(expect_value, value_value):
+        return False
+    return True
+  if isinstance(expect, list):
+    if not isinstance(value, list):
+      return False
+    return all([any([naive_subset(elem, actual) for actual in value])
+                for elem in expect])
+  return expect == value
+
+
+def naive_matches(expect, value):
+  """A reference DICT_MATCHES checking each field independently."""
+  context = ExecutionContext()
+  return all([jp.PathPredicate(key, pred, enumerate_terminals=False)
+              .is_valid(context, value)
+              for key, pred in expect.items()])
+
+
+def make_cases(num_items):
+  """Returns the list of (name, predicate, reference, value) to benchmark."""
+  instance = make_instance(num_items)
+  deployment = make_deployment(num_items)
+  last = num_items - 1
+  metadata = [{'key': 'key-{0}'.format(i), 'value': 'value-{0}'.format(i)}
+              for i in range(0, num_items, 3)]
+  env = [{'name': 'ENV_{0}'.format(i)} for i in range(0, num_items, 5)]
+  subset = {
+      'instance metadata':
+          ({'metadata': {'items': metadata}}, instance),
+      'instance tags':
+          ({'tags': {'items': ['tag-{0}'.format(last), 'tag-0']}}, instance),
+      'instance missing metadata':
+          ({'metadata': {'items': metadata + [{'key': 'missing'}]}}, instance),
+      'deployment env':
+          ({'spec': {'template': {'spec': {'containers': [
+              {'name': 'container-3', 'env': env}]}}}}, deployment),
+  }
+  matches = {
+      'deployment labels':
+          ({'metadata/labels': jp.DICT_SUBSET(
+              {'label-{0}'.format(last): 'value-{0}'.format(last)}),
+            'kind': jp.STR_EQ('Deployment'),
+            'spec/replicas': jp.NUM_GE(1)}, deployment),
+      'instance fields':
+          (dict([('name', jp.STR_EQ('my-instance')),
+                 ('status', jp.STR_EQ('RUNNING')),
+                 ('zone', jp.STR_SUBSTR('us-central1')),
+                 ('metadata', jp.DICT_SUBSET({'items': metadata[-2:]}))]),
+           instance),
+  }
+  cases = []
+  for name, (expect, value) in sorted(subset.items()):
+    cases.append((name, jp.DICT_SUBSET(expect),
+                  lambda expect=expect, value=value: naive_subset(expect,
+                                                                  value),
+                  value))
+  for name, (expect, value) in sorted(matches.items()):
+    cases.append((name, jp.DICT_MATCHES(expect),
+                  lambda expect=expect, value=value: naive_matches(expect,
+                                                                   value),
+                  value))
+  return cases
+
+
+def main():
+  """Runs the benchmark."""
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--items', type=int, default=500,
+                      help='The number of metadata items, labels, etc.')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='The number of times to evaluate each predicate.')
+  options = parser.parse_args()
+
+  context = ExecutionContext()
+  print '{0:<28} {1:>7} {2:>11} {3:>11} {4:>11}'.format(
+      'case', 'valid', 'naive_secs', 'call_secs', 'valid_secs')
+  for name, pred, reference, value in make_cases(options.items):
+    expect = reference()
+    if bool(pred(context, value)) != expect:
+      raise AssertionError('{0}: __call__ disagrees with reference'.format(
+          name))
+    if pred.is_valid(context, value) != expect:
+      raise AssertionError('{0}: is_valid disagrees with reference'.format(
+          name))
+
+    naive_secs = timeit.timeit(reference, number=options.repeat)
+    call_secs = timeit.timeit(lambda: pred(context, value),
+                              number=options.repeat)
+    valid_secs = timeit.timeit(lambda: pred.is_valid(context, value),
+                               number=options.repeat)
+    print '{0:<28} {1!s:>7} {2:11.5f} {3:11.5f} {4:11.5f}'.format(
+        name, expect, naive_secs, call_secs, valid_secs)
+
+
+if __name__ == '__main__':
+  main()
@@ -302,6 +302,31 @@ class JsonBinaryPredicateTest(unittest.TestCase):
     self.assertFalse(result)
     self.assertEquals(expect, result)
 
+  def test_list_match_is_valid_agrees_with_call(self):
+    context = ExecutionContext(wanted='rule-2')
+    rules = [{'name': 'rule-{0}'.format(i), 'port': i % 3,
+              'tags': ['t{0}'.format(i)]}
+             for i in range(10)]
+    source = rules + ['rule-1', 3, {'name': ['rule-1', 'alias']}]
+    operands = [
+        [jp.DICT_SUBSET({'name': 'rule-1'})],
+        [jp.DICT_SUBSET({'name': lambda context: context['wanted']})],
+        [jp.DICT_SUBSET({'port': 1, 'tags': ['t4']})],
+        [jp.DICT_SUBSET({'port': 1})],
+        [jp.DICT_SUBSET({'name': 'missing'})],
+        [jp.STR_EQ('rule-1'), jp.NUM_EQ(3)],
+        [jp.NUM_EQ(4)],
+        [jp.DICT_SUBSET({'port': 0}), jp.DICT_SUBSET({'port': 1}),
+         jp.DICT_SUBSET({'port': 2}), jp.STR_SUBSTR('rule'),
+         jp.NUM_GE(0)],
+    ]
+    for want in operands:
+      for kwargs in [{}, {'unique': True}, {'strict': True}]:
+        pred = jp.LIST_MATCHES(want, **kwargs)
+        self.assertEqual(bool(pred(context, source)),
+                         pred.is_valid(context, source),
+                         '{0} {1}'.format(want, kwargs))
+
   def _match_dict_attribute_result(self, context, pred, key, value):
     return jp.PathPredicate(key, pred, source_pred=pred,
                             enumerate_terminals=False)(context, value)
@@ -705,6 +730,91 @@ class JsonBinaryPredicateTest(unittest.TestCase):
                            pred=jp.LIST_SIMILAR(actual_source)),
         result)
 
+  def test_list_similar_unordered_dicts(self):
+    context = ExecutionContext()
+    source = [{'a': [1, {'b': 2}]}, {'c': 'C'}, 1, {'c': 'C'}]
+    pred = jp.LIST_SIMILAR([{'c': 'C'}, 1, {'c': 'C'}, {'a': [1, {'b': 2}]}])
+    self.assertTrue(pred(context, source))
+
+    pred = jp.LIST_SIMILAR([{'c': 'C'}, 1, 1, {'a': [1, {'b': 2}]}])
+    self.assertFalse(pred(context, source))
+
+    pred = jp.LIST_SIMILAR([{'c': 'C'}, 1, {'c': 'C'}, {'a': [{'b': 2}, 1]}])
+    self.assertFalse(pred(context, source))
+
+  def test_dict_match_is_valid_agrees_with_call(self):
+    context = ExecutionContext(wanted='b')
+    sources = [{'a': 'b', 'n': 1, 'x': {'y': 'z'}, 'l': ['p', 'q']},
+               {'a': 'c', 'n': 1, 'x': {'y': 'z'}},
+               {'a': None, 'n': 2},
+               {'a': 'b'},
+               {}]
+    operands = [
+        {'a': jp.STR_EQ('b')},
+        {'a': jp.STR_EQ(lambda context: context['wanted'])},
+        {'a': jp.STR_SUBSTR('b'), 'n': jp.NUM_EQ(1)},
+        {'x/y': jp.STR_EQ('z')},
+        {'l': jp.LIST_SUBSET(['q'])},
+        {'a': jp.EQUIVALENT(None)},
+        {'missing': jp.NUM_GE(0)},
+    ]
+    for operand in operands:
+      for kwargs in [{}, {'strict': True}]:
+        pred = jp.DICT_MATCHES(operand, **kwargs)
+        for source in sources:
+          self.assertEqual(bool(pred(context, source)),
+                           pred.is_valid(context, source),
+                           '{0} {1} {2}'.format(operand, kwargs, source))
+
+  def test_wide_subset_is_valid_agrees_with_call(self):
+    context = ExecutionContext(zone='us-central1-f')
+    items = [{'key': 'key-{0}'.format(i), 'value': 'value-{0}'.format(i)}
+             for i in range(50)]
+    source = {
+        'name': 'my-instance',
+        'zone': 'us-central1-f',
+        'tags': {'items': ['tag-{0}'.format(i) for i in range(50)]},
+        'metadata': {'items': items + [items[0]]},
+        'disks': [{'boot': True, 'licenses': ['a', 'b']},
+                  {'boot': False, 'licenses': []}],
+        'nested': [['x', 'y'], ['z']],
+        'numbers': [1, 2.5, None]
+    }
+    operands = [
+        {'zone': lambda context: context['zone'], 'tags': {'items': ['tag-3']}},
+        {'metadata': {'items': [items[20], items[7], items[20]]}},
+        {'metadata': {'items': [{'key': 'key-9'}]}},
+        {'metadata': {'items': [{'key': 'key-9', 'value': 'value-8'}]}},
+        {'metadata': {'items': {'value': 'value-49'}}},
+        {'metadata': {'items': {'key': 'key-50'}}},
+        {'tags': {'items': 'tag-4'}},
+        {'tags': {'items': 'tag-'}},
+        {'tags': {'items': 'missing'}},
+        {'disks': [{'licenses': ['b']}, {'boot': False}]},
+        {'disks': {'licenses': ['c']}},
+        {'nested': [['y']]},
+        {'nested': 'z'},
+        {'nested': [['w']]},
+        {'numbers': [2.5, 1]},
+        {'numbers': [3]},
+    ]
+    for operand in operands:
+      pred = jp.DICT_SUBSET(operand)
+      result = pred(context, source)
+      self.assertEqual(bool(result), pred.is_valid(context, source),
+                       str(operand))
+
+    self.assertTrue(jp.LIST_SUBSET(['tag-7', 'tag-7', 'tag-0']).is_valid(
+        context, source['tags']['items']))
+    self.assertFalse(jp.LIST_SUBSET(['tag-7', 'tag']).is_valid(
+        context, source['tags']['items']))
+    self.assertTrue(jp.LIST_SUBSET([items[3]], strict=True)(
+        context, source['metadata']['items']))
+    self.assertFalse(jp.LIST_SUBSET([{'key': 'key-3'}], strict=True)(
+        context, source['metadata']['items']))
+    self.assertTrue(jp.LIST_SUBSET([{'key': 'key-3'}])(
+        context, source['metadata']['items']))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -150,6 +150,19 @@ class CardinalityPredicateTest(unittest.TestCase):
                   predicate, expect_path_result),
               result)
 
+  def test_is_valid_agrees_with_call(self):
+    context = ExecutionContext()
+    source = ['A', 'B', 'A', 'C']
+    for min in range(0, 4):
+      for max in [None] + range(0, 4):
+        if max is not None and min > max:
+          continue
+        for pred in [_eq_A, _eq_X, _AorB]:
+          predicate = jp.CardinalityPredicate(pred, min=min, max=max)
+          self.assertEqual(bool(predicate(context, source)),
+                           predicate.is_valid(context, source),
+                           '{0} min={1} max={2}'.format(pred, min, max))
+
 
 if __name__ == '__main__':
   unittest.main()
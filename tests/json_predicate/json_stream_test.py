@@ -0,0 +1,164 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_predicate.json_stream module."""
+
+
+import json
+import StringIO
+import unittest
+
+import citest.json_predicate as jp
+from citest.base import ExecutionContext
+from citest.json_predicate import json_stream
+
+
+_DOCUMENT = [
+    {'name': 'alpha', 'size': 1, 'tags': ['a', 'b'],
+     'labels': {'env': 'test', 'team': 'x\\"y'},
+     'disks': [{'type': 'ssd', 'gb': 10.5}, {'type': 'hdd', 'gb': -1e3}]},
+    {'name': u'b\u00e9ta', 'size': 12345678901234, 'tags': [],
+     'labels': None, 'disks': {'type': 'ssd', 'gb': 20}},
+    'not a dict',
+    [True, False, None]
+]
+
+
+class JsonStreamTest(unittest.TestCase):
+  def test_tokens(self):
+    self.assertEqual(
+        [(json_stream.BEGIN_OBJECT, None),
+         (json_stream.KEY, 'a'),
+         (json_stream.BEGIN_ARRAY, None),
+         (json_stream.VALUE, 1),
+         (json_stream.VALUE, -2.5),
+         (json_stream.VALUE, 'x'),
+         (json_stream.VALUE, None),
+         (json_stream.END_ARRAY, None),
+         (json_stream.END_OBJECT, None)],
+        list(jp.iter_json_tokens(' {"a" : [1, -2.5,"x",null ]} ')))
+
+  def test_decode_matches_json(self):
+    text = json.dumps(_DOCUMENT, indent=2)
+    projection = jp.JsonPathProjection(None)
+    for chunk_size in [1, 2, 3, 5, 64, 1024]:
+      self.assertEqual(
+          _DOCUMENT,
+          projection.decode_elements(StringIO.StringIO(text),
+                                     chunk_size=chunk_size))
+    self.assertEqual(_DOCUMENT, projection.decode_elements(text))
+    self.assertEqual([_DOCUMENT[0]],
+                     projection.decode_elements(json.dumps(_DOCUMENT[0])))
+    self.assertEqual(
+        [_DOCUMENT[0]],
+        projection.decode_elements(iter(['{"name": "al', 'pha", "size"',
+                                         ': 1, "tags": ["a", "b"], ',
+                                         '"labels": {"env": "test", ',
+                                         '"team": "x\\\\\\"y"}, "disks": ',
+                                         '[{"type": "ssd", "gb": 10',
+                                         '.5}, {"type": "hdd", "gb": -1',
+                                         'e3}]}'])))
+
+  def test_invalid_json(self):
+    projection = jp.JsonPathProjection(None)
+    for text in ['', '[1,', '{"a" 1}', '[1] 2', '{"a": 1,}', '[tru]',
+                 '{"a": "b}', '{1: 2}', '[1 2]', '[}']:
+      self.assertRaises(ValueError, projection.decode_elements, text)
+
+  def test_projection(self):
+    text = json.dumps(_DOCUMENT)
+    self.assertEqual(
+        [{'name': 'alpha'}, {'name': u'b\u00e9ta'}, 'not a dict',
+         [True, False, None]],
+        jp.JsonPathProjection(['name']).decode_elements(text))
+    self.assertEqual(
+        [{'disks': [{'gb': 10.5}, {'gb': -1e3}]},
+         {'disks': {'gb': 20}}, 'not a dict', [True, False, None]],
+        jp.JsonPathProjection(['disks/gb']).decode_elements(text))
+    self.assertEqual(
+        [{'disks': [None, {'type': 'hdd', 'gb': -1e3}]},
+         {'disks': {}}, 'not a dict', [True, False, None]],
+        jp.JsonPathProjection(['disks[1]']).decode_elements(text))
+    self.assertEqual(
+        [None, {'size': 12345678901234, 'labels': None}, None, None],
+        jp.JsonPathProjection(['[1]/size', '[1]/labels/env'])
+        .decode_elements(text))
+    self.assertEqual(
+        _DOCUMENT, jp.JsonPathProjection(['']).decode_elements(text))
+
+  def test_predicates_agree_on_projection(self):
+    text = json.dumps(_DOCUMENT)
+    context = ExecutionContext()
+    preds = [
+        jp.CardinalityPredicate(
+            jp.PathPredicate('disks/type', jp.STR_EQ('ssd')), min=2, max=2),
+        jp.PathPredicate('disks[1]', jp.DICT_MATCHES({'gb': jp.NUM_LE(0)})),
+        jp.PathPredicate('labels', jp.DICT_MATCHES({'env': jp.STR_EQ('test')})),
+        jp.PathPredicate('tags', jp.LIST_SIMILAR(['b', 'a']),
+                         enumerate_terminals=False),
+        jp.AND([jp.PathPredicate('size', jp.NUM_GE(10)),
+                jp.NOT(jp.PathPredicate('labels/env'))]),
+        jp.PathPredicate('', jp.DICT_MATCHES({'name': jp.STR_SUBSTR('ta'),
+                                              'disks/gb': jp.NUM_EQ(20)})),
+        jp.PathPredicate('[0]/name', jp.STR_EQ('alpha')),
+    ]
+    for pred in preds:
+      paths = jp.predicate_paths(context, pred)
+      self.assertIsNotNone(paths)
+      projected = jp.JsonPathProjection(paths).decode_elements(text)
+      self.assertEqual(pred(context, _DOCUMENT).valid,
+                       pred(context, projected).valid,
+                       '{0} with {1}'.format(pred, paths))
+      self.assertTrue(len(json.dumps(projected)) < len(text))
+
+    self.assertIsNone(jp.predicate_paths(context, jp.STR_EQ('x')))
+    self.assertIsNone(jp.predicate_paths(
+        context, jp.DICT_MATCHES({'name': jp.STR_EQ('x')}, strict=True)))
+    self.assertEqual(['size'], jp.predicate_paths(
+        context, jp.PathPredicate('size', jp.NUM_EQ(2),
+                                  transform=lambda ctx, x: x * 2)))
+    self.assertEqual(['labels/env', 'size'], jp.predicate_paths(
+        ExecutionContext(path='size'),
+        jp.OR([jp.PathPredicate('labels/env'),
+               jp.PathPredicate(lambda context: context['path'])])))
+
+  def test_iter_elements_is_incremental(self):
+    def chunks():
+      yield '[{"a": 1}, '
+      yield '{"a": 2}, '
+      raise RuntimeError('Read too far')
+
+    elements = jp.JsonPathProjection(['a']).iter_elements(chunks())
+    self.assertEqual({'a': 1}, next(elements))
+    self.assertEqual({'a': 2}, next(elements))
+    self.assertRaises(RuntimeError, next, elements)
+
+  def test_large_strings_across_chunks(self):
+    value = 'x' * 1000 + '\\u00e9' + 'y' * 1000
+    text = json.dumps([{'big': value, 'keep': 1}])
+    self.assertEqual(
+        [{'keep': 1}],
+        jp.JsonPathProjection(['keep']).decode_elements(
+            StringIO.StringIO(text), chunk_size=7))
+    self.assertEqual(
+        [{'big': value}],
+        jp.JsonPathProjection(['big']).decode_elements(
+            StringIO.StringIO(text), chunk_size=7))
+
+
+if __name__ == '__main__':
+  unittest.main()
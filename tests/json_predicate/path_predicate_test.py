@@ -27,6 +27,7 @@ from citest.json_predicate import (
     DONT_ENUMERATE_TERMINAL,
     PathPredicate,
     PathPredicateResultBuilder,
+    PathPredicateTrie,
     PathValue,
     PathValueResult,
     MissingPathError,
@@ -419,5 +420,105 @@ class JsonPathPredicateTest(unittest.TestCase):
     pred_result = pred(context, source)
     self.assertEqual(expect, pred_result)
 
+  def test_trie_matches_individual_predicates(self):
+    context = ExecutionContext()
+    source = [
+        {'name': 'first', 'tags': ['a', 'b'], 'nested': [{'x': 1}, {'x': 2}]},
+        {'name': 'second', 'tags': [], 'nested': {'x': 3}},
+        {'name': 'third', 'tags': 'c', 'nested': [[{'x': 4}], {'y': 5}]},
+        'not a dict',
+        [{'name': 'inner'}]
+    ]
+    preds = [
+        PathPredicate('name'),
+        PathPredicate('name', jp.STR_EQ('second')),
+        PathPredicate('tags'),
+        PathPredicate('tags' + DONT_ENUMERATE_TERMINAL),
+        PathPredicate('tags[1]'),
+        PathPredicate('nested/x', jp.NUM_GE(2)),
+        PathPredicate('nested[0]/x'),
+        PathPredicate('nested/y'),
+        PathPredicate('[1]/name'),
+        PathPredicate('missing/path'),
+        PathPredicate('name' + PATH_SEP),
+        PathPredicate(''),
+        PathPredicate('', jp.DICT_SUBSET({'name': 'third'})),
+        PathPredicate(DONT_ENUMERATE_TERMINAL),
+    ]
+
+    expect = [pred(context, source) for pred in preds]
+    got = PathPredicateTrie(preds)(context, source)
+    self.assertEqual(len(expect), len(got))
+    for pred, expect_result, got_result in zip(preds, expect, got):
+      self.assertEqual(expect_result, got_result, pred)
+
+  def test_trie_shares_duplicate_paths(self):
+    context = ExecutionContext()
+    source = {'a': [{'b': 1}, {'b': 2}, {'c': 3}]}
+    preds = [PathPredicate('a/b', jp.NUM_EQ(1)),
+             PathPredicate('a/b', jp.NUM_EQ(2)),
+             PathPredicate('a/b')]
+    got = PathPredicateTrie(preds)(context, source)
+    self.assertEqual([pred(context, source) for pred in preds], got)
+    self.assertEqual([1, 2], [pv.value for pv in got[2].path_values])
+
+  def test_is_valid_agrees_with_call(self):
+    context = ExecutionContext()
+    source = [{'a': [{'b': 1}, {'b': 2}], 'c': 'hello'},
+              {'a': {'b': 3}, 'c': ['x', 'y']},
+              'not a dict']
+    preds = [
+        PathPredicate('a/b', jp.NUM_EQ(2)),
+        PathPredicate('a/b', jp.NUM_EQ(4)),
+        PathPredicate('a[1]/b'),
+        PathPredicate('a[0]/b', jp.NUM_GE(3)),
+        PathPredicate('c', jp.STR_EQ('y')),
+        PathPredicate('c' + DONT_ENUMERATE_TERMINAL, jp.LIST_SIMILAR(['y'])),
+        PathPredicate('missing'),
+        PathPredicate('c' + PATH_SEP),
+        PathPredicate('', jp.NOT(jp.DICT_SUBSET({'c': 'hello'}))),
+        PathPredicate('a/b', jp.AND([jp.NUM_GE(1), jp.NUM_LE(1)])),
+        PathPredicate('a/b', transform=lambda ctx, value: value * 10,
+                      pred=jp.NUM_EQ(30)),
+    ]
+    for pred in preds:
+      self.assertEqual(bool(pred(context, source)),
+                       pred.is_valid(context, source),
+                       pred)
+
+  def test_is_valid_streams_without_batch(self):
+    context = ExecutionContext()
+    transformed = []
+    def transform(ctx, value):
+      transformed.append(value)
+      return value
+
+    # Neither predicate can use a batch, so values are taken as needed.
+    large = [{'a': {'b': i}} for i in range(1000)]
+    pred = PathPredicate('a', jp.DICT_SUBSET({'b': 0}), transform=transform)
+    self.assertTrue(pred.is_valid(context, large))
+    self.assertEqual(1, len(transformed))
+
+    del transformed[:]
+    small = range(10)
+    pred = PathPredicate('', jp.NUM_EQ(0), transform=transform)
+    self.assertTrue(pred.is_valid(context, small))
+    self.assertEqual(1, len(transformed))
+
+  def test_is_valid_stops_early(self):
+    class CountingDict(dict):
+      num_gets = 0
+      def get(self, key, default=None):
+        CountingDict.num_gets += 1
+        return super(CountingDict, self).get(key, default)
+
+    # The rest of the list is not traversed once a value is found.
+    context = ExecutionContext()
+    source = [CountingDict({'a': {'b': i}}) for i in range(1000)]
+    pred = PathPredicate('a', jp.DICT_SUBSET({'b': 0}))
+    self.assertTrue(pred.is_valid(context, source))
+    self.assertEqual(1, CountingDict.num_gets)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,176 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_predicate.predicate_compiler module."""
+
+
+import os
+import StringIO
+import threading
+import unittest
+
+import citest.json_predicate as jp
+from citest.base import ExecutionContext
+
+
+_SOURCE = [
+    {'name': 'alpha', 'size': 1, 'tags': ['a', 'b'],
+     'disks': [{'type': 'ssd', 'gb': 10}, {'type': 'hdd', 'gb': 100}]},
+    {'name': 'beta', 'size': 5, 'tags': [],
+     'disks': {'type': 'ssd', 'gb': 20}},
+    {'name': 'gamma', 'size': 10, 'tags': 'c',
+     'disks': [[{'type': 'hdd', 'gb': 30}]]},
+    'not a dict',
+    7
+]
+
+
+def _all_subclasses(klass):
+  found = []
+  for subclass in klass.__subclasses__():
+    found.append(subclass)
+    found.extend(_all_subclasses(subclass))
+  return found
+
+
+class CompilerDifferentialChecker(object):
+  """Checks every interpreted predicate call against its compiled form."""
+
+  def __init__(self):
+    self.__state = threading.local()
+    self.__patched = []
+    self.disagreements = []
+    self.check_count = 0
+
+  def __make_checked_call(self, original):
+    def checked_call(pred, context, value):
+      result = original(pred, context, value)
+      if getattr(self.__state, 'active', False):
+        return result
+
+      self.__state.active = True
+      try:
+        self.check_count += 1
+        try:
+          compiled = pred.compile()(context, value)
+        except Exception as ex:
+          self.disagreements.append((pred, value, ex))
+        else:
+          if compiled != bool(result):
+            self.disagreements.append((pred, value, result))
+      finally:
+        self.__state.active = False
+      return result
+    return checked_call
+
+  def install(self):
+    for klass in set(_all_subclasses(jp.ValuePredicate)):
+      if (klass.__module__.startswith('citest.json_predicate')
+          and '__call__' in klass.__dict__):
+        original = klass.__dict__['__call__']
+        self.__patched.append((klass, original))
+        klass.__call__ = self.__make_checked_call(original)
+
+  def uninstall(self):
+    for klass, original in self.__patched:
+      klass.__call__ = original
+    self.__patched = []
+
+
+class PredicateCompilerTest(unittest.TestCase):
+  def assertAgrees(self, pred, values=None, context=None):
+    context = context or ExecutionContext()
+    values = _SOURCE + [_SOURCE] if values is None else values
+    compiled = pred.compile()
+    for value in values:
+      self.assertEqual(bool(pred(context, value)), compiled(context, value),
+                       '{0} on {1!r}'.format(pred, value))
+
+  def test_compile_is_cached(self):
+    pred = jp.PathPredicate('size', jp.NUM_GE(5))
+    self.assertIs(pred.compile(), pred.compile())
+
+  def test_binary(self):
+    for pred in [jp.NUM_LE(5), jp.NUM_GE(5), jp.NUM_EQ(7), jp.NUM_NE(7),
+                 jp.STR_EQ('not a dict'), jp.STR_SUBSTR('dict'),
+                 jp.STR_NE('x'), jp.DICT_EQ(_SOURCE[1]),
+                 jp.LIST_EQ(_SOURCE), jp.LIST_SIMILAR(list(reversed(_SOURCE))),
+                 jp.NUM_LE(lambda context: context['limit'])]:
+      self.assertAgrees(pred, context=ExecutionContext(limit=6))
+
+  def test_paths(self):
+    for path in ['name', 'disks/type', 'disks[1]/gb', 'disks[0]/gb',
+                 'disks@', 'disks/', 'tags', 'tags@', 'missing', '', '@',
+                 '[1]/name', 'disks/gb/x']:
+      self.assertAgrees(jp.PathPredicate(path))
+    self.assertAgrees(jp.PathPredicate('disks/gb', jp.NUM_GE(25)))
+    self.assertAgrees(jp.PathPredicate('disks/gb', jp.NUM_EQ(20),
+                                       transform=lambda ctx, x: x * 2))
+    self.assertAgrees(jp.PathPredicate(lambda context: 'name',
+                                       jp.STR_EQ('beta')))
+
+  def test_cardinality_and_map(self):
+    for min_count in range(0, 3):
+      for max_count in [None, 0, 1, 2, 3]:
+        self.assertAgrees(jp.CardinalityPredicate(
+            jp.PathPredicate('disks/type', jp.STR_EQ('ssd')),
+            min=min_count, max=max_count))
+        self.assertAgrees(jp.MapPredicate(
+            jp.DICT_SUBSET({'size': 5}), min=min_count, max=max_count))
+
+  def test_dicts_and_logic(self):
+    self.assertAgrees(jp.DICT_SUBSET({'name': 'alpha', 'size': 1}))
+    self.assertAgrees(jp.DICT_SUBSET({'tags': ['a']}))
+    self.assertAgrees(jp.DICT_SUBSET({'disks': {'type': 'ssd'}}))
+    self.assertAgrees(jp.DICT_MATCHES({'name': jp.STR_SUBSTR('a'),
+                                       'size': jp.NUM_LE(5)}))
+    self.assertAgrees(jp.DICT_MATCHES({'name': jp.STR_SUBSTR('a')},
+                                      strict=True))
+    name_a = jp.PathPredicate('name', jp.STR_SUBSTR('a'))
+    small = jp.PathPredicate('size', jp.NUM_LE(5))
+    self.assertAgrees(jp.AND([name_a, small]))
+    self.assertAgrees(jp.OR([name_a, small]))
+    self.assertAgrees(jp.NOT(small))
+    self.assertAgrees(jp.IF(name_a, small))
+    self.assertAgrees(jp.IF(name_a, small, jp.NOT(small)))
+
+  def test_agrees_with_interpreter_on_json_predicate_tests(self):
+    checker = CompilerDifferentialChecker()
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    # The memo tests count how often predicates are called, which the
+    # checker would throw off by evaluating the compiled predicates too.
+    excluded = ['predicate_compiler_test', 'predicate_memo_test']
+    for test in loader.discover(os.path.dirname(os.path.abspath(__file__)),
+                                pattern='*_test.py'):
+      if not [name for name in excluded if name in str(test)]:
+        suite.addTest(test)
+
+    checker.install()
+    try:
+      result = unittest.TextTestRunner(stream=StringIO.StringIO(),
+                                       verbosity=0).run(suite)
+    finally:
+      checker.uninstall()
+
+    self.assertTrue(result.wasSuccessful(), result.failures + result.errors)
+    self.assertTrue(checker.check_count > 100)
+    self.assertEqual([], checker.disagreements)
+
+
+if __name__ == '__main__':
+  unittest.main()
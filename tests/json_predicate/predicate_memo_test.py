@@ -0,0 +1,121 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_predicate.predicate_memo module."""
+
+
+import unittest
+
+import citest.json_predicate as jp
+from citest.base import ExecutionContext
+
+
+class CountingPredicate(jp.ValuePredicate):
+  def __init__(self, pred):
+    super(CountingPredicate, self).__init__()
+    self.pred = pred
+    self.calls = 0
+
+  def __call__(self, context, value):
+    self.calls += 1
+    return self.pred(context, value)
+
+  def is_valid(self, context, value):
+    self.calls += 1
+    return self.pred.is_valid(context, value)
+
+
+class PredicateResultMemoTest(unittest.TestCase):
+  def test_fingerprint(self):
+    self.assertEqual(jp.fingerprint_json({'a': [1, {'b': 'B'}]}),
+                     jp.fingerprint_json({'a': [1, {'b': 'B'}]}))
+    self.assertNotEqual(jp.fingerprint_json({'a': [1, {'b': 'B'}]}),
+                        jp.fingerprint_json({'a': [{'b': 'B'}, 1]}))
+    self.assertNotEqual(jp.fingerprint_json(1), jp.fingerprint_json(True))
+    self.assertNotEqual(jp.fingerprint_json(1), jp.fingerprint_json(1.0))
+    self.assertNotEqual(jp.fingerprint_json([]), jp.fingerprint_json({}))
+    self.assertRaises(TypeError, jp.fingerprint_json, [object()])
+
+  def test_reuse_unchanged_values(self):
+    context = ExecutionContext()
+    memo = jp.PredicateResultMemo()
+    pred = CountingPredicate(jp.DICT_SUBSET({'name': 'A'}))
+
+    memo.begin_attempt()
+    first = memo(context, pred, {'name': 'A', 'x': 1})
+    self.assertTrue(memo.is_valid(context, pred, {'name': 'A', 'x': 1}))
+    self.assertEqual(2, pred.calls)
+
+    memo.begin_attempt()
+    second = memo(context, pred, {'name': 'A', 'x': 1})
+    self.assertTrue(memo.is_valid(context, pred, {'name': 'A', 'x': 1}))
+    self.assertEqual(2, pred.calls)
+    self.assertEqual(first, second)
+    self.assertEqual(2, memo.hit_count)
+
+    memo.begin_attempt()
+    self.assertFalse(memo(context, pred, {'name': 'B', 'x': 1}))
+    self.assertEqual(3, pred.calls)
+
+  def test_context_dependencies_invalidate(self):
+    context = ExecutionContext(wanted='A')
+    memo = jp.PredicateResultMemo()
+    pred = CountingPredicate(
+        jp.STR_EQ(lambda context: context['wanted']))
+
+    self.assertTrue(memo(context, pred, 'A'))
+    self.assertTrue(memo(context, pred, 'A'))
+    self.assertEqual(1, pred.calls)
+
+    context['wanted'] = 'B'
+    self.assertFalse(memo(context, pred, 'A'))
+    self.assertEqual(2, pred.calls)
+
+  def test_non_json_dependencies_are_not_remembered(self):
+    context = ExecutionContext()
+    context.set_internal('Status', object())
+    memo = jp.PredicateResultMemo()
+    pred = CountingPredicate(
+        jp.STR_EQ(lambda context: 'A' if context['Status'] else 'B'))
+
+    self.assertTrue(memo(context, pred, 'A'))
+    self.assertTrue(memo(context, pred, 'A'))
+    self.assertEqual(2, pred.calls)
+
+  def test_path_predicate_uses_context_memo(self):
+    context = ExecutionContext()
+    memo = jp.PredicateResultMemo()
+    context.set_internal(jp.PREDICATE_MEMO_CONTEXT_KEY, memo)
+    pred = CountingPredicate(jp.NUM_GE(2))
+    path_pred = jp.PathPredicate('a/b', pred)
+
+    source = [{'a': {'b': 1}}, {'a': {'b': 2}}, {'a': {'b': 3}}]
+    expect = path_pred(context, source)
+    self.assertEqual(3, pred.calls)
+
+    memo.begin_attempt()
+    changed = [{'a': {'b': 1}}, {'a': {'b': 2}}, {'a': {'b': 4}}]
+    path_pred(context, changed)
+    self.assertEqual(4, pred.calls)
+
+    memo.begin_attempt()
+    self.assertEqual(expect, path_pred(context, source))
+    self.assertTrue(path_pred.is_valid(context, source))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,152 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_predicate.predicate_profiler module."""
+
+
+import json
+import unittest
+
+import citest.json_predicate as jp
+from citest.base import (
+    ExecutionContext,
+    JsonSnapshot)
+
+
+class FakeTimer(object):
+  """A timer that advances one second each time it is read."""
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    self.now += 1.0
+    return self.now
+
+
+class PredicateProfilerTest(unittest.TestCase):
+  def tearDown(self):
+    profiler = jp.get_active_profiler()
+    if profiler is not None:
+      profiler.disable()
+
+  def test_enable_disable(self):
+    original_call = jp.PathPredicate.__dict__['__call__']
+    original_is_valid = jp.PathPredicate.__dict__['is_valid']
+    profiler = jp.PredicateProfiler()
+    profiler.enable()
+    self.assertTrue(profiler.enabled)
+    self.assertIs(profiler, jp.get_active_profiler())
+    self.assertIsNot(original_call, jp.PathPredicate.__dict__['__call__'])
+    self.assertRaises(ValueError, jp.PredicateProfiler().enable)
+
+    profiler.disable()
+    self.assertFalse(profiler.enabled)
+    self.assertIsNone(jp.get_active_profiler())
+    self.assertIs(original_call, jp.PathPredicate.__dict__['__call__'])
+    self.assertIs(original_is_valid, jp.PathPredicate.__dict__['is_valid'])
+
+    # Nothing is recorded while disabled.
+    jp.PathPredicate('a', jp.NUM_EQ(1))(ExecutionContext(), {'a': 1})
+    self.assertEqual([], profiler.get_stats())
+
+  def test_profile(self):
+    context = ExecutionContext()
+    num_eq = jp.NUM_EQ(1)
+    path_pred = jp.PathPredicate('a', num_eq)
+    source = [{'a': 1}, {'a': 2}, {'b': 1}]
+
+    profiler = jp.PredicateProfiler(timer=FakeTimer())
+    profiler.enable()
+    try:
+      jp.begin_profile_scope(jp.PROFILE_TEST_SCOPE, 'MyTest')
+      jp.begin_profile_scope(jp.PROFILE_CLAUSE_SCOPE, 'MyClause')
+      self.assertTrue(path_pred(context, source))
+      jp.end_profile_scope()
+      self.assertFalse(path_pred.is_valid(context, {'a': 2}))
+      jp.end_profile_scope()
+    finally:
+      profiler.disable()
+
+    stats = {(entry.predicate, entry.clause): entry
+             for entry in profiler.get_stats()}
+    self.assertEqual(4, len(stats))
+
+    outer = stats[(path_pred, 'MyClause')]
+    self.assertEqual('MyTest', outer.test)
+    self.assertEqual((1, 1, 0, 3), (outer.calls, outer.valid_count,
+                                    outer.invalid_count,
+                                    outer.objects_examined))
+    inner = stats[(num_eq, 'MyClause')]
+    self.assertEqual((2, 1, 1, 2), (inner.calls, inner.valid_count,
+                                    inner.invalid_count,
+                                    inner.objects_examined))
+
+    # Each timed call takes one tick, plus the ticks of the nested calls.
+    self.assertEqual(2.0, inner.total_secs)
+    self.assertEqual(2.0, inner.self_secs)
+    self.assertEqual(5.0, outer.total_secs)
+    self.assertEqual(3.0, outer.self_secs)
+
+    not_in_clause = stats[(path_pred, None)]
+    self.assertEqual((1, 0, 1), (not_in_clause.calls,
+                                 not_in_clause.valid_count,
+                                 not_in_clause.invalid_count))
+
+  def test_reports(self):
+    context = ExecutionContext()
+    pred = jp.PathPredicate('a', jp.STR_EQ('x'))
+    profiler = jp.PredicateProfiler(timer=FakeTimer())
+    profiler.enable()
+    try:
+      jp.begin_profile_scope(jp.PROFILE_TEST_SCOPE, 'MyTest')
+      jp.begin_profile_scope(jp.PROFILE_CLAUSE_SCOPE, 'MyClause')
+      pred(context, {'a': 'x'})
+      jp.end_profile_scope()
+      jp.end_profile_scope()
+    finally:
+      profiler.disable()
+
+    report = profiler.to_json()
+    json.dumps(report)
+    self.assertEqual(2, len(report['predicates']))
+    self.assertEqual('PathPredicate', report['predicates'][0]['class'])
+    self.assertEqual(
+        [{'test': 'MyTest', 'clause': 'MyClause', 'calls': 2, 'objects': 2,
+          'predicate_secs': 3.0}],
+        report['clauses'])
+    self.assertEqual(
+        [{'test': 'MyTest', 'calls': 2, 'objects': 2, 'predicate_secs': 3.0}],
+        report['tests'])
+
+    text = profiler.format_text_report()
+    self.assertTrue('PathPredicate' in text)
+    self.assertTrue("'MyTest' / 'MyClause'" in text)
+
+    snapshot = JsonSnapshot()
+    snapshot.add_object(profiler)
+    edges = snapshot.to_json_object()['_entities'][1]['_edges']
+    self.assertEqual(['Tests', 'Clauses', 'Predicates'],
+                     [edge['label'] for edge in edges])
+    self.assertEqual(report['clauses'], edges[1]['_value'])
+
+    profiler.reset()
+    self.assertEqual([], profiler.get_stats())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,80 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+
+
+"""Tests the citest.json_predicate.vectorized_ops module."""
+
+
+import unittest
+
+import citest.json_predicate as jp
+from citest.base import ExecutionContext
+from citest.json_predicate import vectorized_ops
+
+
+_NUMBERS = [i * 1.5 for i in range(40)] + [7, True, 'seven', None, 2 ** 40]
+_STRINGS = (['name-{0}'.format(i) for i in range(40)]
+            + [u'unicode-name-3', 'other', 3, None, {'name': 'name-3'}])
+
+
+class VectorizedOpsTest(unittest.TestCase):
+  def check_batch_agrees(self, pred, values):
+    context = ExecutionContext()
+    expect = [pred.is_valid(context, value) for value in values]
+    batch = pred.is_valid_batch(context, values)
+    if vectorized_ops.numpy_available():
+      self.assertEqual(expect, batch)
+    else:
+      self.assertIsNone(batch)
+
+  def test_numeric_batch(self):
+    self.check_batch_agrees(jp.NUM_LE(7), _NUMBERS)
+    self.check_batch_agrees(jp.NUM_GE(7), _NUMBERS)
+    self.check_batch_agrees(jp.NUM_GE(7.5), _NUMBERS)
+    self.check_batch_agrees(
+        jp.NUM_LE(lambda context: 3), _NUMBERS)
+
+  def test_substring_batch(self):
+    self.check_batch_agrees(jp.STR_SUBSTR('name-3'), _STRINGS)
+    self.check_batch_agrees(jp.STR_SUBSTR(u'unicode'), _STRINGS)
+    self.check_batch_agrees(jp.STR_SUBSTR(''), _STRINGS)
+
+  def test_unsupported_batches(self):
+    context = ExecutionContext()
+    self.assertIsNone(jp.NUM_LE(7).is_valid_batch(context, _NUMBERS[:3]))
+    self.assertIsNone(
+        jp.NUM_LE(7).is_valid_batch(context, _NUMBERS + [2 ** 60]))
+    self.assertIsNone(
+        jp.STR_SUBSTR('x').is_valid_batch(context, _STRINGS + ['x\0']))
+    self.assertIsNone(jp.NUM_EQ(7).is_valid_batch(context, _NUMBERS))
+
+  def test_path_predicate_is_valid(self):
+    context = ExecutionContext()
+    source = [{'size': value, 'name': name}
+              for value, name in zip(_NUMBERS, _STRINGS)]
+    for pred in [jp.PathPredicate('size', jp.NUM_GE(100)),
+                 jp.PathPredicate('size', jp.NUM_LE(7)),
+                 jp.PathPredicate('name', jp.STR_SUBSTR('name-39')),
+                 jp.PathPredicate('name', jp.STR_SUBSTR('missing')),
+                 jp.CardinalityPredicate(jp.PathPredicate(
+                     'size', jp.NUM_GE(10)), min=20, max=40)]:
+      self.assertEqual(bool(pred(context, source)),
+                       pred.is_valid(context, source),
+                       pred)
+
+
+if __name__ == '__main__':
+  unittest.main()
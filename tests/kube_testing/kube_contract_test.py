@@ -0,0 +1,71 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.kube_testing.kube_contract module."""
+
+
+import unittest
+
+import citest.json_contract as jc
+from citest.kube_testing.kube_contract import _add_kube_selector_args
+
+
+class KubeSelectorTest(unittest.TestCase):
+  def test_add_selectors(self):
+    conditions = [
+        jc.FilterCondition('metadata/name', jc.FILTER_EQUALS, 'my-pod'),
+        jc.FilterCondition('metadata/namespace', jc.FILTER_EQUALS, 'test'),
+        jc.FilterCondition('metadata/labels/app', jc.FILTER_EQUALS, 'web'),
+        jc.FilterCondition('metadata/labels/tier', jc.FILTER_EQUALS, '')]
+    args = ['get', 'pods']
+    self.assertEqual(
+        ['get', 'pods',
+         '--field-selector=metadata.name=my-pod,metadata.namespace=test',
+         '--selector=app=web,tier='],
+        _add_kube_selector_args(args, conditions))
+    self.assertEqual(['get', 'pods'], args)
+
+  def test_unsupported_conditions(self):
+    conditions = [
+        jc.FilterCondition('metadata/name', jc.FILTER_CONTAINS, 'pod'),
+        jc.FilterCondition('metadata/name', jc.FILTER_EQUALS, 'a,b'),
+        jc.FilterCondition('metadata/labels/app', jc.FILTER_EQUALS, 'a b'),
+        jc.FilterCondition('metadata/labels/-app', jc.FILTER_EQUALS, 'web'),
+        jc.FilterCondition('metadata/labels/app', jc.FILTER_EQUALS, 5),
+        jc.FilterCondition('spec/nodeName', jc.FILTER_EQUALS, 'node')]
+    self.assertEqual(['get', 'pods'],
+                     _add_kube_selector_args(['get', 'pods'], conditions))
+
+  def test_existing_selectors(self):
+    conditions = [
+        jc.FilterCondition('metadata/name', jc.FILTER_EQUALS, 'my-pod'),
+        jc.FilterCondition('metadata/labels/app', jc.FILTER_EQUALS, 'web')]
+    self.assertEqual(
+        ['get', 'pods', '-l', 'tier=db',
+         '--field-selector=metadata.name=my-pod'],
+        _add_kube_selector_args(['get', 'pods', '-l', 'tier=db'], conditions))
+    self.assertEqual(
+        ['get', 'pods', '--field-selector=status.phase=Running',
+         '--selector=app=web'],
+        _add_kube_selector_args(
+            ['get', 'pods', '--field-selector=status.phase=Running'],
+            conditions))
+
+
+if __name__ == '__main__':
+  unittest.main()
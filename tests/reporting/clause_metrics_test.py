@@ -0,0 +1,76 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test citest.reporting.clause_metrics module."""
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from citest.base import Journal
+from citest.reporting.clause_metrics import (
+    ClauseMetricsProcessor,
+    percentile)
+
+
+class ClauseMetricsTest(unittest.TestCase):
+  def test_percentile(self):
+    self.assertIsNone(percentile([], 50))
+    self.assertEqual(3, percentile([5, 1, 3], 50))
+    self.assertEqual(1, percentile([5, 1, 3], 0))
+    self.assertEqual(5, percentile([5, 1, 3], 100))
+    self.assertEqual(4.5, percentile([1, 2, 3, 4, 5, 6, 7, 8], 50))
+
+  def test_aggregate_journals(self):
+    temp_dir = tempfile.mkdtemp()
+    try:
+      paths = []
+      for index, secs in enumerate([1, 3, None]):
+        path = os.path.join(temp_dir, 'test{0}.journal'.format(index))
+        journal = Journal()
+        journal.open_with_path(path)
+        journal.write_message('Not a metric.')
+        journal.write_metrics('Other', {'attempts': 7}, kind='Other')
+        journal.write_metrics(
+            'Clause', {'attempts': index + 1, 'first_pass_secs': secs,
+                       'sleep_secs': index, 'observe_secs': [0.5, 1.5]},
+            kind='ContractClause')
+        journal.terminate()
+        paths.append(path)
+
+      processor = ClauseMetricsProcessor()
+      for path in paths:
+        processor.process(path)
+      processor.terminate()
+    finally:
+      shutil.rmtree(temp_dir)
+
+    self.assertEqual(['Clause'], processor.summaries.keys())
+    summary = processor.summaries['Clause']
+    self.assertEqual(3, summary.num_verified)
+    self.assertEqual(2, summary.num_passed)
+    stats = summary.percentiles([0, 50, 100])
+    self.assertEqual([1, 2, 3], stats['attempts'])
+    self.assertEqual([1, 2, 3], stats['first_pass_secs'])
+    self.assertEqual([0.5, 1.0, 1.5], stats['observe_secs'])
+
+    lines = processor.render_text([50]).split('\n')
+    self.assertEqual('Clause\tPassed\tMetric\tp50', lines[0])
+    self.assertIn('Clause\t2/3\tattempts\t2.000', lines)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,118 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests recording and replaying agents with a citest.base.Cassette."""
+
+
+import BaseHTTPServer
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from citest.base import (
+    Cassette,
+    CassetteMissError)
+import citest.service_testing as st
+
+
+class EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  def do_GET(self):
+    code = 404 if self.path == '/missing' else 200
+    body = 'path={0} secret=xyz'.format(self.path)
+    self.send_response(code)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+def make_scrubber():
+  return st.HttpScrubber(
+      url_scrubber=lambda url: url.split('?')[0],
+      response_scrubber=lambda text: text.replace('xyz', '*****'))
+
+
+class AgentCassetteTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.temp_dir, 'test.cassette')
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_http_agent(self):
+    server = BaseHTTPServer.HTTPServer(('localhost', 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+      agent = st.HttpAgent('http://localhost:{0}'.format(server.server_port))
+      agent.http_scrubber = make_scrubber()
+      agent.cassette = Cassette(self.path, Cassette.RECORD)
+      recorded = [agent.get('found?key=1'), agent.get('missing')]
+      agent.cassette.close()
+    finally:
+      server.shutdown()
+      server.server_close()
+    self.assertEqual([200, 404], [response.http_code for response in recorded])
+
+    # Replay without a server, matching the scrubbed URL and response.
+    agent = st.HttpAgent('http://localhost:{0}'.format(server.server_port))
+    agent.http_scrubber = make_scrubber()
+    agent.cassette = Cassette(self.path, Cassette.REPLAY)
+    found = agent.get('found?key=2')
+    self.assertEqual(200, found.http_code)
+    self.assertEqual('path=/found?key=1 secret=*****', found.output)
+    self.assertEqual(
+        str(len(recorded[0].output)), found.headers['content-length'])
+    self.assertEqual(404, agent.get('missing').http_code)
+    with self.assertRaises(CassetteMissError):
+      agent.get('unknown')
+
+  def test_http_agent_exception(self):
+    agent = st.HttpAgent('http://localhost:1')
+    agent.cassette = Cassette(self.path, Cassette.RECORD)
+    self.assertIsNotNone(agent.get('a').exception)
+    agent.cassette.close()
+
+    agent.cassette = Cassette(self.path, Cassette.REPLAY)
+    response = agent.get('a')
+    self.assertIsNone(response.http_code)
+    self.assertIsNotNone(response.exception)
+
+  def test_cli_agent(self):
+    agent = st.CliAgent('echo')
+    agent.cassette = Cassette(self.path, Cassette.RECORD)
+    self.assertEqual((0, 'hello', ''), tuple(agent.run(['hello'])))
+    agent.cassette.close()
+
+    # Replay without the program.
+    agent = st.CliAgent(os.path.join(self.temp_dir, 'echo'))
+    agent.cassette = Cassette(
+        self.path, Cassette.REPLAY,
+        match_function=lambda kind, request: (
+            kind, tuple(request['command'][1:])))
+    self.assertEqual((0, 'hello', ''), tuple(agent.run(['hello'])))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -22,7 +22,11 @@ import citest.service_testing.agent_test_case as agent_test_case
 import citest.service_testing as st
 import citest.json_contract as jc
 
-from citest.base import (ExecutionContext, ConfigurationBindingsBuilder)
+from citest.base import (
+    Deadline,
+    DeadlineExceededError,
+    ExecutionContext,
+    ConfigurationBindingsBuilder)
 from fake_agent import (
     FakeAgent,
     FakeOperation,
@@ -142,6 +146,46 @@ class AgentTestCaseTest(st.AgentTestCase):
           operation_contract, context=HelperClass.execution_context)
     self.assertEquals(1, HelperClass.cleanup_calls)
 
+  def test_run_test_deadline(self):
+    operation = FakeOperation('TestOperation', self.testing_agent)
+    contract = jc.Contract()
+    contract.add_clause(jc.ContractClause(
+        'TestClause', observer=FakeObserver(), verifier=FakeVerifier(True)))
+    operation_contract = st.OperationContract(operation, contract)
+
+    context = ExecutionContext()
+    prior_deadline = Deadline(60)
+    context.deadline = prior_deadline
+    self.run_test_case(operation_contract, context=context, budget_secs=30)
+    self.assertIs(prior_deadline, context.deadline)
+
+    # An exhausted budget fails fast rather than running the operation.
+    self.assertRaises(DeadlineExceededError, self.run_test_case,
+                      operation_contract, context=context, budget_secs=0)
+    self.assertIs(prior_deadline, context.deadline)
+
+  def test_run_test_case_schedule(self):
+    def make_test_case(title, valid):
+      contract = jc.Contract()
+      contract.add_clause(jc.ContractClause(
+          'TestClause', observer=FakeObserver(),
+          verifier=FakeVerifier(valid)))
+      return st.OperationContract(
+          FakeOperation(title, self.testing_agent), contract)
+
+    scheduler = st.TestCaseScheduler()
+    create = scheduler.add(make_test_case('Create', False))
+    scheduler.add(make_test_case('Delete', True), depends_on=[create])
+    scheduler.add(make_test_case('Other', True))
+    self.assertRaises(AssertionError, self.run_test_case_schedule,
+                      ExecutionContext(), scheduler, max_concurrent=2)
+
+    scheduler = st.TestCaseScheduler()
+    scheduler.add(make_test_case('Other', True))
+    results = self.run_test_case_schedule(
+        ExecutionContext(), scheduler, max_concurrent=2)
+    self.assertEqual(['PASSED'], [result.status for result in results])
+
   def test_run_test_simple_ok(self):
     self._do_run_test_case(
         succeed=True, with_callbacks=False, with_context=False)
@@ -0,0 +1,175 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.async_http_agent and async_runner modules.
+"""
+
+
+import BaseHTTPServer
+import SocketServer
+import threading
+import time
+import unittest
+
+from citest.base import (
+    EventLoop,
+    Return)
+import citest.service_testing as st
+
+from .fake_agent import (FakeAgent, FakeStatus)
+
+
+class StoreHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  store = {}
+
+  def do_GET(self):
+    if self.path.startswith('/slow'):
+      time.sleep(0.2)
+      self.__respond(200, '"slow"')
+    elif self.path in self.store:
+      self.__respond(200, self.store[self.path])
+    else:
+      self.__respond(404, '"missing"')
+
+  def do_POST(self):
+    length = int(self.headers.getheader('Content-Length', 0))
+    self.store[self.path] = self.rfile.read(length)
+    self.__respond(200, '{}')
+
+  def __respond(self, code, body):
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class ThreadedServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+  request_queue_size = 100
+
+  def handle_error(self, request, client_address):
+    # Clients that time out close the connection before the response is sent.
+    pass
+
+
+class AsyncHttpAgentTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.server = ThreadedServer(('localhost', 0), StoreHandler)
+    cls.thread = threading.Thread(target=cls.server.serve_forever)
+    cls.thread.daemon = True
+    cls.thread.start()
+    cls.base_url = 'http://localhost:{0}'.format(cls.server.server_port)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.server.shutdown()
+    cls.server.server_close()
+
+  def test_concurrent_get(self):
+    loop = EventLoop()
+    agent = st.AsyncHttpAgent(self.base_url)
+    start = time.time()
+    responses = loop.run_until_complete(
+        [agent.get_async(loop, 'slow/{0}'.format(i)) for i in range(20)])
+    self.assertLess(time.time() - start, 20 * 0.2 / 2)
+    self.assertEqual([200] * 20, [response.http_code for response in responses])
+    self.assertEqual('"slow"', responses[0].output)
+
+  def test_post_then_get(self):
+    loop = EventLoop()
+    agent = st.AsyncHttpAgent(self.base_url)
+    def post_then_get():
+      posted = yield agent.post_async(loop, 'posted', '{"a": 1}')
+      got = yield agent.get_async(loop, 'posted')
+      raise Return((posted, got))
+
+    posted, got = loop.run_until_complete(post_then_get())
+    self.assertTrue(posted.ok())
+    self.assertEqual('{"a": 1}', got.output)
+    self.assertIn('content-type', [key.lower() for key in got.headers])
+
+  def test_http_error(self):
+    loop = EventLoop()
+    agent = st.AsyncHttpAgent(self.base_url)
+    response = loop.run_until_complete(agent.get_async(loop, 'unknown'))
+    self.assertEqual(404, response.http_code)
+    self.assertFalse(response.ok())
+
+  def test_connection_refused(self):
+    loop = EventLoop()
+    response = loop.run_until_complete(
+        st.AsyncHttpAgent('http://localhost:1').get_async(loop, 'a'))
+    self.assertIsNone(response.http_code)
+    self.assertIsNotNone(response.exception)
+
+  def test_timeout(self):
+    loop = EventLoop()
+    agent = st.AsyncHttpAgent(self.base_url)
+    response = loop.run_until_complete(
+        agent.get_async(loop, 'slow/timeout', timeout=0.05))
+    self.assertIsNone(response.http_code)
+    self.assertIsNotNone(response.exception)
+
+  def test_blocking_agent_fallback(self):
+    loop = EventLoop()
+    agent = st.HttpAgent(self.base_url)
+    response = loop.run_until_complete(agent.get_async(loop, 'unknown'))
+    self.assertEqual(404, response.http_code)
+
+  def test_wait_async(self):
+    loop = EventLoop()
+    operation = st.AgentOperation('TestStatus', agent=FakeAgent())
+    status = FakeStatus(operation)
+    status.set_expected_iterations(3)
+    loop.run_until_complete(status.wait_async(loop, poll_every_secs=0.01))
+    self.assertTrue(status.finished)
+    self.assertEqual(4, status.got_refresh_count)
+
+  def test_runner(self):
+    agent = st.AsyncHttpAgent(self.base_url)
+    def make_test_case(key, value, expect):
+      builder = st.HttpContractBuilder(agent)
+      (builder.new_clause_builder('Has ' + key, retryable_for_secs=0.1)
+       .get_url_path(key)
+       .contains_path_eq('value', expect))
+      return st.OperationContract(
+          agent.new_post_operation('Post ' + key, key,
+                                   '{{"value": {0}}}'.format(value)),
+          contract=builder.build())
+
+    test_cases = [make_test_case('runner/{0}'.format(i), i, i)
+                  for i in range(10)]
+    test_cases.append(make_test_case('runner/bad', 1, 2))
+    runner = st.AsyncOperationContractRunner(agent, max_concurrent=4,
+                                             poll_every_secs=0.01)
+    results = runner.run(test_cases)
+    self.assertEqual([True] * 10 + [False],
+                     [bool(result) for result in results])
+    self.assertEqual([case.title for case in test_cases],
+                     [result.test_case.title for result in results])
+    self.assertIsNone(results[-1].exception)
+    self.assertFalse(results[-1].verify_results)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,7 @@
 
 
 import unittest
+from citest.base import Deadline
 import citest.service_testing as st
 
 from .fake_agent import (
@@ -180,6 +181,18 @@ class BaseAgentTest(unittest.TestCase):
     # Last call truncated to the 2 secs remaining.
     self.assertEqual(2, status.got_sleep_secs)
 
+  def test_wait_deadline(self):
+    agent = FakeAgent(time_series=[100] + [100 + i for i in range(5)])
+    operation = st.AgentOperation('TestStatus', agent=agent)
+    status = FakeStatus(operation)
+
+    # The deadline leaves only 3 of the 10 secs.
+    deadline = Deadline(3, now_function=lambda: 0)
+    status.set_expected_iterations(10)
+    status.wait(max_secs=10, deadline=deadline)
+    self.assertFalse(status.finished)
+    self.assertEqual(3, status.got_sleep_count)
+
 
 if __name__ == '__main__':
   loader = unittest.TestLoader()
@@ -0,0 +1,143 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.cli_runner module."""
+
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import citest.service_testing as st
+
+
+FAKE_CLI_SOURCE = """
+import os
+import sys
+import time
+
+calls = []
+
+def main():
+  calls.append(sys.argv)
+  command = sys.argv[1]
+  if command == 'echo':
+    print ' '.join(sys.argv[2:])
+  elif command == 'fail':
+    sys.stderr.write('Bad request\\n')
+    sys.exit(3)
+  elif command == 'raise':
+    raise RuntimeError('Unexpected')
+  elif command == 'count':
+    print len(calls)
+  elif command == 'pid':
+    time.sleep(0.1)
+    print os.getpid()
+  elif command == 'spawn':
+    os.system('echo From a child process')
+  elif command == 'crash':
+    os._exit(9)
+  return 0
+"""
+
+
+class CliRunnerTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.module_dir = tempfile.mkdtemp()
+    with open(os.path.join(cls.module_dir, 'fake_cli.py'), 'w') as stream:
+      stream.write(FAKE_CLI_SOURCE)
+
+  @classmethod
+  def tearDownClass(cls):
+    shutil.rmtree(cls.module_dir)
+
+  def make_pool(self, max_workers=1):
+    pool = st.PythonCliWorkerPool('fake', 'fake_cli:main',
+                                  max_workers=max_workers,
+                                  python_path=[self.module_dir])
+    self.addCleanup(pool.close)
+    return pool
+
+  def test_agent(self):
+    agent = st.CliAgent(
+        'fake', output_scrubber=lambda text: text.replace('secret', '*****'))
+    agent.cli_runner = self.make_pool()
+
+    self.assertEqual(st.CliResponseType(0, 'Hello *****', ''),
+                     agent.run(['echo', 'Hello', 'secret']))
+    self.assertEqual(st.CliResponseType(3, '', 'Bad request'),
+                     agent.run(['fail']))
+    response = agent.run(['raise'])
+    self.assertEqual(1, response.exit_code)
+    self.assertIn('RuntimeError: Unexpected', response.error)
+    self.assertEqual(st.CliResponseType(0, 'From a child process', ''),
+                     agent.run(['spawn']))
+
+    agent.cli_runner = None
+    self.assertIsInstance(agent.cli_runner, st.SubprocessCliRunner)
+
+  def test_workers_stay_warm(self):
+    pool = self.make_pool()
+    self.assertEqual([(0, '1\n', ''), (0, '2\n', '')],
+                     [pool.run(['fake', 'count']) for _ in range(2)])
+    self.assertEqual(1, pool.num_workers)
+
+    # A worker that dies is replaced.
+    code, stdout, stderr = pool.run(['fake', 'crash'])
+    self.assertEqual((9, ''), (code, stdout))
+    self.assertIn('exited with code 9', stderr)
+    self.assertEqual(0, pool.num_workers)
+    self.assertEqual((0, '1\n', ''), pool.run(['fake', 'count']))
+
+  def test_max_workers(self):
+    pool = self.make_pool(max_workers=2)
+    pids = []
+    def run():
+      pids.append(pool.run(['fake', 'pid'])[1])
+
+    start = time.time()
+    threads = [threading.Thread(target=run) for _ in range(6)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(2, len(set(pids)))
+    self.assertEqual(2, pool.num_workers)
+    self.assertGreaterEqual(time.time() - start, 0.3)
+
+  def test_other_programs(self):
+    pool = self.make_pool()
+    self.assertEqual((0, 'hello\n', ''), pool.run(['echo', 'hello']))
+    self.assertEqual(0, pool.num_workers)
+
+  def test_closed(self):
+    pool = self.make_pool()
+    pool.run(['fake', 'count'])
+    pool.close()
+    self.assertEqual(0, pool.num_workers)
+    with self.assertRaises(ValueError):
+      pool.run(['fake', 'count'])
+
+
+if __name__ == '__main__':
+  unittest.main()
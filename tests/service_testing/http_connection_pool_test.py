@@ -0,0 +1,159 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.http_connection_pool module."""
+
+
+import BaseHTTPServer
+import httplib
+import SocketServer
+import threading
+import unittest
+
+import citest.service_testing as st
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+  posts = []
+
+  def do_POST(self):
+    self.posts.append(self.rfile.read(int(self.headers['Content-Length'])))
+    # Close without responding, as a server failing mid-request would.
+    self.close_connection = 1
+
+  def do_GET(self):
+    code = 404 if self.path == '/missing' else 200
+    body = '{0} {1}'.format(self.path, id(self.connection))
+    self.send_response(code)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+    if self.path == '/drop':
+      # Close without telling the client, as a server timing out would.
+      self.close_connection = 1
+
+  def log_message(self, *args):
+    pass
+
+
+class ThreadedServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self):
+    return self.now
+
+
+class HttpConnectionPoolTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.server = ThreadedServer(('localhost', 0), KeepAliveHandler)
+    cls.thread = threading.Thread(target=cls.server.serve_forever)
+    cls.thread.daemon = True
+    cls.thread.start()
+    cls.base_url = 'http://localhost:{0}'.format(cls.server.server_port)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.server.shutdown()
+    cls.server.server_close()
+
+  def test_reuse(self):
+    pool = st.HttpConnectionPool()
+    first = pool.request(self.base_url + '/a', 'GET')
+    second = pool.request(self.base_url + '/b?x=1', 'GET', timeout=10)
+    self.assertEqual(200, first.status)
+    self.assertTrue(second.body.startswith('/b?x=1 '))
+    self.assertEqual(first.body.split()[1], second.body.split()[1])
+    self.assertEqual((1, 1), (pool.num_connections_opened,
+                              pool.num_connections_reused))
+    pool.close()
+
+  def test_stale_connection(self):
+    pool = st.HttpConnectionPool()
+    pool.request(self.base_url + '/drop', 'GET')
+    response = pool.request(self.base_url + '/a', 'GET')
+    self.assertEqual(200, response.status)
+    self.assertEqual(2, pool.num_connections_opened)
+    pool.close()
+
+  def test_post_not_resent(self):
+    pool = st.HttpConnectionPool()
+    del KeepAliveHandler.posts[:]
+    pool.request(self.base_url + '/a', 'GET')
+    with self.assertRaises(httplib.BadStatusLine):
+      pool.request(self.base_url + '/post', 'POST', body='change')
+    self.assertEqual(['change'], KeepAliveHandler.posts)
+    self.assertEqual(1, pool.num_connections_opened)
+    pool.close()
+
+  def test_idle_timeout(self):
+    clock = FakeClock()
+    pool = st.HttpConnectionPool(idle_timeout_secs=10, now_function=clock)
+    pool.request(self.base_url + '/a', 'GET')
+    clock.now += 11
+    pool.request(self.base_url + '/a', 'GET')
+    self.assertEqual((2, 0), (pool.num_connections_opened,
+                              pool.num_connections_reused))
+    pool.close()
+
+  def test_max_connections(self):
+    pool = st.HttpConnectionPool(max_connections_per_host=2)
+    errors = []
+    def send():
+      try:
+        for _ in range(5):
+          pool.request(self.base_url + '/a', 'GET')
+      except Exception as ex:  # pylint: disable=broad-except
+        errors.append(ex)
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual([], errors)
+    self.assertLessEqual(pool.num_connections_opened, 2)
+    self.assertEqual(20, pool.num_connections_opened
+                     + pool.num_connections_reused)
+    pool.close()
+
+  def test_agent(self):
+    pool = st.HttpConnectionPool()
+    agent = st.HttpAgent(self.base_url, connection_pool=pool)
+    self.assertIs(pool, agent.connection_pool)
+    self.assertTrue(agent.get('a').ok())
+    response = agent.get('missing')
+    self.assertEqual(404, response.http_code)
+    self.assertIn('content-length', response.headers)
+    self.assertEqual(1, pool.num_connections_opened)
+
+    response = st.HttpAgent('http://localhost:1',
+                            connection_pool=pool).get('a')
+    self.assertIsNone(response.http_code)
+    self.assertIsNotNone(response.exception)
+    pool.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,177 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.spooled_http_body module."""
+
+
+import BaseHTTPServer
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from StringIO import StringIO
+
+from citest.base import (
+    ExecutionContext,
+    Journal,
+    RecordInputStream,
+    set_global_journal,
+    unset_global_journal)
+import citest.json_contract as jc
+import citest.service_testing as st
+from citest.service_testing.spooled_http_body import read_http_body
+
+
+LARGE_DOC = json.JSONEncoder().encode(
+    [{'name': 'item{0}'.format(i), 'secret': 'xyz'} for i in range(1000)])
+
+
+class LargeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  def do_GET(self):
+    body = {'/large': LARGE_DOC,
+            '/invalid': LARGE_DOC[:-1]}.get(self.path, '{"small": true}')
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class SpooledHttpBodyTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.server = BaseHTTPServer.HTTPServer(('localhost', 0), LargeHandler)
+    cls.thread = threading.Thread(target=cls.server.serve_forever)
+    cls.thread.daemon = True
+    cls.thread.start()
+    cls.base_url = 'http://localhost:{0}'.format(cls.server.server_port)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.server.shutdown()
+    cls.server.server_close()
+
+  def test_small_body(self):
+    self.assertEqual('hello', read_http_body(StringIO('hello'), 5))
+
+  def test_large_body(self):
+    text = ''.join(chr(ord('a') + i % 26) for i in range(200000))
+    body = read_http_body(StringIO(text), 100)
+    self.assertEqual(len(text), body.size)
+    self.assertEqual(hashlib.sha256(text).hexdigest(), body.sha256)
+    self.assertEqual(text[:1024], body.head)
+    self.assertEqual(text[-1024:], body.tail)
+    self.assertEqual(text, body.read())
+    mapped = body.mmap()
+    try:
+      self.assertEqual(text[1000:1010], mapped[1000:1010])
+    finally:
+      mapped.close()
+
+    preview = body.preview(scrubber=lambda text: text.upper())
+    self.assertTrue(preview.startswith(text[:1024].upper() + '\n...'))
+    self.assertTrue(preview.endswith('...\n' + text[-1024:].upper()))
+
+    # The temporary file goes away with the body.
+    path = body.path
+    self.assertTrue(os.path.exists(path))
+    del body
+    self.assertFalse(os.path.exists(path))
+
+  def test_preview_overlap(self):
+    text = ''.join(chr(ord('a') + i % 26) for i in range(1500))
+    self.assertEqual(text, read_http_body(StringIO(text), 100).preview())
+    self.assertEqual(text[:200],
+                     read_http_body(StringIO(text[:200]), 100).preview())
+
+  def test_spool_dir(self):
+    spool_dir = tempfile.mkdtemp()
+    try:
+      body = read_http_body(StringIO('x' * 1000), 100, spool_dir=spool_dir)
+      path = body.path
+      self.assertEqual(spool_dir, os.path.dirname(path))
+      del body
+      self.assertTrue(os.path.exists(path))
+    finally:
+      shutil.rmtree(spool_dir)
+
+  def test_agent(self):
+    agent = st.HttpAgent(self.base_url, spool_threshold_bytes=1000)
+    agent.http_scrubber = st.HttpScrubber(
+        response_scrubber=lambda text: text.replace('xyz', '*****'))
+
+    response = agent.get('small')
+    self.assertNotIsInstance(response, st.SpooledHttpResponseType)
+    self.assertEqual('{"small": true}', response.output)
+
+    output = StringIO()
+    journal = Journal()
+    journal.open_with_file(output)
+    prior_journal = unset_global_journal()
+    set_global_journal(journal)
+    try:
+      response = agent.get('large', trace=False)
+    finally:
+      unset_global_journal()
+      if prior_journal is not None:
+        set_global_journal(prior_journal)
+
+    self.assertIsInstance(response, st.SpooledHttpResponseType)
+    self.assertTrue(response.ok())
+    self.assertEqual(LARGE_DOC, response.output)
+    self.assertEqual(len(LARGE_DOC), response.body.size)
+
+    messages = [json.JSONDecoder().decode(entry)
+                for entry in RecordInputStream(StringIO(output.getvalue()))]
+    message = [entry for entry in messages
+               if entry.get('_context') == 'response'][0]
+    self.assertEqual(response.body.path, message['blob_path'])
+    self.assertLess(len(message['_value']), 3000)
+    self.assertNotIn('xyz', message['_value'])
+
+  def test_observer(self):
+    agent = st.HttpAgent(self.base_url, spool_threshold_bytes=1000)
+    observer = st.HttpObjectObserver(agent, 'large')
+    observation = jc.Observation()
+    observer.collect_observation(ExecutionContext(), observation)
+    self.assertEqual(1000, len(observation.objects))
+    self.assertEqual({'name': 'item999', 'secret': 'xyz'},
+                     observation.objects[-1])
+
+  def test_observer_invalid_json(self):
+    agent = st.HttpAgent(self.base_url, spool_threshold_bytes=1000)
+    observer = st.HttpObjectObserver(agent, 'invalid')
+    observation = jc.Observation()
+    observer.collect_observation(ExecutionContext(), observation)
+    self.assertEqual([], observation.objects)
+    self.assertEqual(1, len(observation.errors))
+    message = str(observation.errors[0])
+    self.assertNotIn('<open file', message)
+    self.assertIn('{0} bytes in '.format(len(LARGE_DOC) - 1), message)
+    self.assertIn(
+        'sha256=' + hashlib.sha256(LARGE_DOC[:-1]).hexdigest(), message)
+
+
+if __name__ == '__main__':
+  unittest.main()
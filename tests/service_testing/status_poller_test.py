@@ -0,0 +1,186 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.status_poller module."""
+
+
+import threading
+import time
+import unittest
+
+from citest.base import Deadline
+import citest.service_testing as st
+
+from .fake_agent import (FakeAgent, FakeStatus)
+
+
+class BatchingAgent(FakeAgent):
+  def __init__(self):
+    super(BatchingAgent, self).__init__()
+    self.batch_sizes = []
+    self.error = None
+
+  def refresh_statuses(self, statuses, trace=True):
+    self.batch_sizes.append(len(statuses))
+    if self.error:
+      raise self.error
+    return super(BatchingAgent, self).refresh_statuses(statuses, trace=trace)
+
+
+class FailingStatus(FakeStatus):
+  def __init__(self, operation):
+    super(FailingStatus, self).__init__(operation)
+    self.refresh_error = None
+
+  def refresh(self, trace=True):
+    if self.refresh_error:
+      raise self.refresh_error
+    super(FailingStatus, self).refresh(trace=trace)
+
+
+def make_status(agent, iterations, klass=FakeStatus):
+  status = klass(st.AgentOperation('TestStatus', agent=agent))
+  status.set_expected_iterations(iterations)
+  status.refresh()
+  return status
+
+
+class StatusPollerTest(unittest.TestCase):
+  def test_finished(self):
+    agent = BatchingAgent()
+    poller = st.StatusPoller()
+    status = make_status(agent, 0)
+    self.assertTrue(poller.wait(status, 0.01, None))
+    self.assertEqual([], agent.batch_sizes)
+
+  def test_coalesces_refreshes(self):
+    agent = BatchingAgent()
+    poller = st.StatusPoller(coalesce_secs=0.05)
+    statuses = [make_status(agent, 3) for _ in range(20)]
+    results = [None] * len(statuses)
+    def wait(index):
+      results[index] = poller.wait(statuses[index], 0.02, None)
+
+    threads = [threading.Thread(target=wait, args=[i])
+               for i in range(len(statuses))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual([True] * 20, results)
+    self.assertEqual([4] * 20,
+                     [status.got_refresh_count for status in statuses])
+    self.assertEqual(20 * 3, sum(agent.batch_sizes))
+    self.assertLess(len(agent.batch_sizes), 20)
+    self.assertEqual(len(agent.batch_sizes), poller.num_refresh_batches)
+    self.assertEqual(0, poller.num_pending)
+
+  def test_timeout(self):
+    agent = BatchingAgent()
+    poller = st.StatusPoller()
+    status = make_status(agent, 1000)
+    start = time.time()
+    self.assertFalse(poller.wait(status, 0.01, 0.1))
+    self.assertFalse(status.finished)
+    self.assertLess(time.time() - start, 1)
+
+  def run_in_thread(self, function):
+    """Run function, failing rather than hanging if it does not return."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function()))
+    thread.daemon = True
+    thread.start()
+    thread.join(5)
+    self.assertFalse(thread.is_alive(), 'Timed out')
+    return results[0]
+
+  def test_no_time_left(self):
+    agent = BatchingAgent()
+    poller = st.StatusPoller()
+    status = make_status(agent, 1000)
+    self.assertFalse(self.run_in_thread(lambda: poller.wait(status, 1, 0)))
+    self.assertEqual(1, status.got_refresh_count)
+    self.assertEqual([], agent.batch_sizes)
+    self.assertEqual(0, poller.num_pending)
+
+  def test_agent_status_wait_expired_deadline(self):
+    agent = BatchingAgent()
+    agent.status_poller = st.StatusPoller()
+    status = FakeStatus(st.AgentOperation('TestStatus', agent=agent))
+    status.set_expected_iterations(1000)
+    deadline = Deadline(0)
+    self.assertTrue(deadline.expired)
+    self.run_in_thread(
+        lambda: status.wait(poll_every_secs=1, deadline=deadline))
+    self.assertFalse(status.finished)
+    self.assertEqual(1, status.got_refresh_count)
+
+  def test_refresh_error(self):
+    agent = BatchingAgent()
+    poller = st.StatusPoller()
+    failing = make_status(agent, 5, klass=FailingStatus)
+    failing.refresh_error = IOError('Failed')
+    healthy = make_status(agent, 2)
+    results = {}
+    def wait(name, status):
+      try:
+        results[name] = poller.wait(status, 0.05, None)
+      except IOError as ex:
+        results[name] = ex
+
+    threads = [threading.Thread(target=wait, args=['failing', failing]),
+               threading.Thread(target=wait, args=['healthy', healthy])]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    # Only the status that failed sees the error.
+    self.assertEqual(2, agent.batch_sizes[0])
+    self.assertIsInstance(results['failing'], IOError)
+    self.assertTrue(results['healthy'])
+    self.assertEqual(3, healthy.got_refresh_count)
+
+    # The poller still works after the failure.
+    self.assertTrue(poller.wait(make_status(agent, 2), 0.01, None))
+
+  def test_batch_refresh_error(self):
+    agent = BatchingAgent()
+    agent.error = ValueError('Failed')
+    poller = st.StatusPoller()
+
+    # Each status is refreshed on its own when the batch fails.
+    status = make_status(agent, 2)
+    self.assertTrue(poller.wait(status, 0.01, None))
+    self.assertEqual(3, status.got_refresh_count)
+
+  def test_agent_status_wait(self):
+    agent = BatchingAgent()
+    agent.status_poller = st.StatusPoller()
+    status = FakeStatus(st.AgentOperation('TestStatus', agent=agent))
+    status.set_expected_iterations(2)
+    status.wait(poll_every_secs=0.01)
+    self.assertTrue(status.finished)
+    self.assertEqual(3, status.got_refresh_count)
+    self.assertEqual(0, status.got_sleep_count)
+    self.assertEqual([1, 1], agent.batch_sizes)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,131 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+
+"""Tests the citest.service_testing.test_case_scheduler module."""
+
+
+import threading
+import time
+import unittest
+
+import citest.service_testing as st
+
+
+class FakeTestCase(object):
+  def __init__(self, title):
+    self.title = title
+
+
+class Recorder(object):
+  def __init__(self, fail=None, secs=0):
+    self.lock = threading.Lock()
+    self.events = []
+    self.running = 0
+    self.max_running = 0
+    self.fail = set(fail or [])
+    self.secs = secs
+
+  def __call__(self, test_case):
+    with self.lock:
+      self.events.append('+' + test_case.title)
+      self.running += 1
+      self.max_running = max(self.max_running, self.running)
+    time.sleep(self.secs)
+    with self.lock:
+      self.events.append('-' + test_case.title)
+      self.running -= 1
+    if test_case.title in self.fail:
+      raise ValueError(test_case.title)
+
+
+def statuses(results):
+  return [(result.test_case.title, result.status) for result in results]
+
+
+class TestCaseSchedulerTest(unittest.TestCase):
+  def test_dependencies(self):
+    scheduler = st.TestCaseScheduler()
+    a = scheduler.add(FakeTestCase('A'))
+    b = scheduler.add(FakeTestCase('B'), depends_on=[a])
+    scheduler.add(FakeTestCase('C'), depends_on=[a, b])
+    scheduler.add(FakeTestCase('D'))
+    recorder = Recorder(secs=0.01)
+    results = scheduler.run(recorder, max_concurrent=4)
+
+    self.assertTrue(all(results))
+    events = recorder.events
+    self.assertLess(events.index('-A'), events.index('+B'))
+    self.assertLess(events.index('-B'), events.index('+C'))
+    self.assertLess(events.index('+D'), events.index('-A'))
+
+  def test_failure_skips_dependents(self):
+    scheduler = st.TestCaseScheduler()
+    a = scheduler.add(FakeTestCase('A'))
+    b = scheduler.add(FakeTestCase('B'), depends_on=[a])
+    scheduler.add(FakeTestCase('C'), depends_on=[b])
+    scheduler.add(FakeTestCase('D'))
+    results = scheduler.run(Recorder(fail=['A']), max_concurrent=2)
+
+    self.assertEqual([('A', 'FAILED'), ('B', 'SKIPPED'), ('C', 'SKIPPED'),
+                      ('D', 'PASSED')],
+                     statuses(results))
+    self.assertEqual(ValueError, results[0].exc_info[0])
+    self.assertIsNone(results[1].exc_info)
+
+  def test_tag_limits(self):
+    scheduler = st.TestCaseScheduler(tag_limits={'quota': 2})
+    for i in range(6):
+      scheduler.add(FakeTestCase('Q{0}'.format(i)), tags=['quota'])
+    scheduler.add(FakeTestCase('Free'))
+    recorder = Recorder(secs=0.02)
+    results = scheduler.run(recorder, max_concurrent=7)
+
+    self.assertTrue(all(results))
+    self.assertEqual(3, recorder.max_running)
+
+  def test_critical_path_first(self):
+    scheduler = st.TestCaseScheduler()
+    scheduler.add(FakeTestCase('Leaf'))
+    head = scheduler.add(FakeTestCase('Head'))
+    middle = scheduler.add(FakeTestCase('Middle'), depends_on=[head])
+    scheduler.add(FakeTestCase('Tail'), depends_on=[middle])
+    scheduler.add(FakeTestCase('Urgent'), priority=1)
+    recorder = Recorder()
+    scheduler.run(recorder, max_concurrent=1)
+
+    self.assertEqual(['Urgent', 'Head', 'Middle', 'Leaf', 'Tail'],
+                     [event[1:] for event in recorder.events
+                      if event[0] == '+'])
+
+  def test_add_errors(self):
+    scheduler = st.TestCaseScheduler()
+    test_case = scheduler.add(FakeTestCase('A'))
+    with self.assertRaises(ValueError):
+      scheduler.add(test_case)
+    with self.assertRaises(ValueError):
+      scheduler.add(FakeTestCase('B'), depends_on=[FakeTestCase('C')])
+    self.assertEqual([test_case], scheduler.test_cases)
+
+  def test_tag_limit_errors(self):
+    for limit in [0, -1]:
+      with self.assertRaises(ValueError):
+        st.TestCaseScheduler(tag_limits={'quota': limit})
+
+
+if __name__ == '__main__':
+  unittest.main()